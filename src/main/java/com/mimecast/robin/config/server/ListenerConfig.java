@@ -0,0 +1,115 @@
+package com.mimecast.robin.config.server;
+
+import com.mimecast.robin.config.ConfigFoundation;
+
+import java.util.Map;
+
+/**
+ * Server listener configuration container.
+ *
+ * <p>This is a container for listeners defined in the server configuration.
+ * <p>One instance will be made for every listener defined.
+ * <br>If none are defined a single listener is made from the top level bind, port and backlog.
+ * <p>Listener values not defined fall back to the top level server values.
+ * <p>This can be used to emulate an MTA with SMTP, submission and implicit TLS ports in one server.
+ *
+ * @see ServerConfig
+ */
+public class ListenerConfig extends ConfigFoundation {
+
+    /**
+     * Constructs a new ListenerConfig instance with given map.
+     *
+     * @param map Properties map.
+     */
+    @SuppressWarnings("rawtypes")
+    public ListenerConfig(Map map) {
+        super(map);
+    }
+
+    /**
+     * Gets listener name.
+     * <p>This is the bind address and port and identifies the listener across config reloads.
+     *
+     * @return Name string.
+     */
+    public String getName() {
+        return getBind() + ":" + getPort();
+    }
+
+    /**
+     * Gets bind address.
+     *
+     * @return Bind address string.
+     */
+    public String getBind() {
+        return getStringProperty("bind", "::");
+    }
+
+    /**
+     * Gets bind port.
+     *
+     * @return Bind address number.
+     */
+    public int getPort() {
+        return Math.toIntExact(getLongProperty("port", 25L));
+    }
+
+    /**
+     * Gets backlog size.
+     *
+     * @return Backlog size.
+     */
+    public int getBacklog() {
+        return Math.toIntExact(getLongProperty("backlog", 25L));
+    }
+
+    /**
+     * Gets number of acceptors.
+     * <p>Above one the port is opened that many times with SO_REUSEPORT.
+     * <br>The kernel spreads incoming connections between them.
+     *
+     * @return Acceptors count.
+     */
+    public int getAcceptors() {
+        return Math.max(1, Math.toIntExact(getLongProperty("acceptors", 1L)));
+    }
+
+    /**
+     * Is implicit TLS enabled.
+     * <p>Connections are encrypted before the welcome message is sent.
+     *
+     * @return Boolean.
+     */
+    public boolean isSecure() {
+        return getBooleanProperty("secure", false);
+    }
+
+    /**
+     * Is AUTH enabled.
+     *
+     * @return Boolean.
+     */
+    public boolean isAuth() {
+        return getBooleanProperty("auth", false);
+    }
+
+    /**
+     * Is STARTTLS enabled.
+     *
+     * @return Boolean.
+     */
+    public boolean isStartTls() {
+        return getBooleanProperty("starttls", true);
+    }
+
+    /**
+     * Gets storage durability policy.
+     * <p>One of sync, enqueue, write or fsync.
+     *
+     * @return Durability policy string.
+     */
+    public String getDurability() {
+        return getStringProperty("durability", "sync");
+    }
+}
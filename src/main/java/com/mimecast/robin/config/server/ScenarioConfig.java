@@ -2,8 +2,12 @@ package com.mimecast.robin.config.server;
 
 import com.mimecast.robin.config.ConfigFoundation;
 
+import java.util.HashMap;
+import java.util.LinkedHashMap;
 import java.util.List;
 import java.util.Map;
+import java.util.Optional;
+import java.util.regex.Pattern;
 
 /**
  * Server scenario configuration container.
@@ -12,12 +16,25 @@ import java.util.Map;
  * <p>One instance will be made for every scenario defined.
  * <p>This can be used to define specific behaviours for the server.
  * <p>As in when to reject a command and with what response.
+ * <p>RCPT values are compiled to patterns once on construction.
+ * <p>Scenarios can also slow the server down to test how clients cope.
+ * <br>Replies can be delayed per command and reads throttled to a number of bytes per second.
  *
  * @see ServerConfig
  */
 @SuppressWarnings("unchecked")
 public class ScenarioConfig extends ConfigFoundation {
 
+    /**
+     * RCPT patterns and responses in configuration order.
+     */
+    private final Map<Pattern, String> rcptPatterns = new LinkedHashMap<>();
+
+    /**
+     * Reply delays in milliseconds by command.
+     */
+    private final Map<String, Long> delays = new HashMap<>();
+
     /**
      * Constructs a new ScenarioConfig instance with given map.
      *
@@ -26,6 +43,21 @@ public class ScenarioConfig extends ConfigFoundation {
     @SuppressWarnings("rawtypes")
     public ScenarioConfig(Map map) {
         super(map);
+
+        List<Map<String, String>> entries = getRcpt();
+        if (entries != null) {
+            for (Map<String, String> entry : entries) {
+                if (entry.get("value") != null) {
+                    rcptPatterns.put(Pattern.compile(entry.get("value")), entry.get("response"));
+                }
+            }
+        }
+
+        Map<String, Object> delay = getMapProperty("delay");
+        for (Map.Entry<String, Object> entry : delay.entrySet()) {
+            Object value = entry.getValue();
+            delays.put(entry.getKey().toLowerCase(), value instanceof Number ? ((Number) value).longValue() : Long.parseLong(String.valueOf(value)));
+        }
     }
 
     /**
@@ -82,4 +114,47 @@ public class ScenarioConfig extends ConfigFoundation {
     public String getData() {
         return getStringProperty("data");
     }
+
+    /**
+     * Gets reply delay for given command.
+     * <p>Delays are defined in a map of command to milliseconds.
+     * <br>The reply is held back and no further input read until the delay ends.
+     * <p>Event driven engines pause on a shared timer while the thread engine sleeps.
+     *
+     * @param command Command key.
+     * @return Delay in milliseconds.
+     */
+    public long getDelay(String command) {
+        Long delay = delays.get(command);
+        return delay != null ? delay : 0L;
+    }
+
+    /**
+     * Gets read rate.
+     * <p>DATA and BDAT payload reads are throttled to this many bytes per second as they are read.
+     * <br>Command lines are paused for after they are read so event driven engines wait on a timer.
+     * <p>Zero disables throttling.
+     *
+     * @return Bytes per second.
+     */
+    public long getReadRate() {
+        return getLongProperty("readRate", 0L);
+    }
+
+    /**
+     * Gets RCPT response for given address.
+     * <p>Returns the response of the first RCPT value matching the whole address.
+     *
+     * @param address Address string.
+     * @return Optional of response string.
+     */
+    public Optional<String> getRcptResponse(String address) {
+        for (Map.Entry<Pattern, String> entry : rcptPatterns.entrySet()) {
+            if (entry.getKey().matcher(address).matches()) {
+                return Optional.ofNullable(entry.getValue());
+            }
+        }
+
+        return Optional.empty();
+    }
 }
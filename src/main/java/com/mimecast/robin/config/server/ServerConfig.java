@@ -10,18 +10,61 @@ import java.util.*;
  *
  * <p>This class provides type safe access to server configuration.
  * <p>It also maps authentication users and behaviour scenarios to corresponding objects.
+ * <p>Users and scenarios are compiled once on construction into immutable indexes.
+ * <br>Lookups by username and EHLO domain are then constant time regardless of configuration size.
+ * <p>Each listener gets a view of this configuration with its own AUTH and STARTTLS policy.
+ * <br>Views share the compiled users and scenarios.
  *
  * @see UserConfig
  * @see ScenarioConfig
+ * @see ListenerConfig
  */
 @SuppressWarnings("unchecked")
 public class ServerConfig extends ConfigFoundation {
 
+    /**
+     * Users indexed by username.
+     */
+    private Map<String, UserConfig> users = Collections.emptyMap();
+
+    /**
+     * Scenarios indexed by EHLO domain.
+     */
+    private Map<String, ScenarioConfig> scenarios = Collections.emptyMap();
+
+    /**
+     * Listeners.
+     */
+    private List<ListenerConfig> listeners = Collections.emptyList();
+
+    /**
+     * Listener configuration views indexed by listener name.
+     */
+    private Map<String, ServerConfig> views = Collections.emptyMap();
+
     /**
      * Constructs a new ServerConfig instance.
      */
     public ServerConfig() {
         super();
+        compile();
+    }
+
+    /**
+     * Constructs a new ServerConfig listener view.
+     *
+     * @param base     ServerConfig instance.
+     * @param listener ListenerConfig instance.
+     */
+    private ServerConfig(ServerConfig base, ListenerConfig listener) {
+        super(new HashMap<>(base.map));
+        map.put("auth", listener.isAuth());
+        map.put("starttls", listener.isStartTls());
+        map.put("durability", listener.getDurability());
+
+        users = base.users;
+        scenarios = base.scenarios;
+        listeners = base.listeners;
     }
 
     /**
@@ -32,6 +75,59 @@ public class ServerConfig extends ConfigFoundation {
      */
     public ServerConfig(String path) throws IOException {
         super(path);
+        compile();
+    }
+
+    /**
+     * Compiles users and scenarios indexes.
+     * <p>Scenario RCPT patterns are compiled here so invalid expressions fail on load.
+     */
+    @SuppressWarnings("rawtypes")
+    private void compile() {
+        if (map == null) {
+            return;
+        }
+
+        Map<String, UserConfig> userIndex = new LinkedHashMap<>();
+        for (Map<String, String> user : (List<Map<String, String>>) getListProperty("users")) {
+            UserConfig userConfig = new UserConfig(user);
+            userIndex.putIfAbsent(userConfig.getName(), userConfig);
+        }
+        users = Collections.unmodifiableMap(userIndex);
+
+        Map<String, ScenarioConfig> scenarioIndex = new HashMap<>();
+        for (Object object : getMapProperty("scenarios").entrySet()) {
+            Map.Entry entry = (Map.Entry) object;
+            scenarioIndex.put((String) entry.getKey(), new ScenarioConfig((Map) entry.getValue()));
+        }
+        scenarios = Collections.unmodifiableMap(scenarioIndex);
+
+        // Listeners inherit top level values.
+        Map<String, Object> defaults = new HashMap<>();
+        for (String key : new String[]{"bind", "port", "backlog", "acceptors", "auth", "starttls", "durability"}) {
+            if (hasProperty(key)) {
+                defaults.put(key, map.get(key));
+            }
+        }
+
+        List<Map> entries = getListProperty("listeners");
+        if (entries.isEmpty()) {
+            entries = Collections.singletonList(new HashMap<>());
+        }
+
+        List<ListenerConfig> listenerList = new ArrayList<>();
+        for (Map entry : entries) {
+            Map<String, Object> merged = new HashMap<>(defaults);
+            merged.putAll(entry);
+            listenerList.add(new ListenerConfig(merged));
+        }
+        listeners = Collections.unmodifiableList(listenerList);
+
+        Map<String, ServerConfig> viewIndex = new HashMap<>();
+        for (ListenerConfig listener : listeners) {
+            viewIndex.put(listener.getName(), new ServerConfig(this, listener));
+        }
+        views = Collections.unmodifiableMap(viewIndex);
     }
 
     /**
@@ -61,6 +157,176 @@ public class ServerConfig extends ConfigFoundation {
         return Math.toIntExact(getLongProperty("backlog", 25L));
     }
 
+    /**
+     * Gets number of acceptors.
+     * <p>Number of sockets listening on the same port via SO_REUSEPORT, each accepting on its own thread.
+     *
+     * @return Acceptors count.
+     */
+    public int getAcceptors() {
+        return Math.toIntExact(getLongProperty("acceptors", 1L));
+    }
+
+    /**
+     * Gets maximum message size.
+     * <p>Advertised as SIZE in EHLO and enforced at MAIL and while receiving.
+     * <p>Zero disables the limit.
+     *
+     * @return Size in bytes.
+     * @see <a href="https://tools.ietf.org/html/rfc1870">RFC 1870</a>
+     */
+    public long getMaxSize() {
+        return getLongProperty("maxSize", 0L);
+    }
+
+    /**
+     * Gets receipt pool size.
+     * <p>Maximum number of connections handled at once.
+     * <p>Zero starts a new thread for every connection.
+     *
+     * @return Pool size.
+     */
+    public int getPoolSize() {
+        return Math.toIntExact(getLongProperty("poolSize", 0L));
+    }
+
+    /**
+     * Gets receipt queue size.
+     * <p>Maximum number of connections waiting for a receipt pool worker.
+     *
+     * @return Queue size.
+     */
+    public int getQueueSize() {
+        return Math.toIntExact(getLongProperty("queueSize", 0L));
+    }
+
+    /**
+     * Gets receipt pool overflow policy.
+     * <p>This can be reject (421 and close) or block (stop accepting until a worker frees up).
+     *
+     * @return Overflow policy string.
+     */
+    public String getOverflow() {
+        return getStringProperty("overflow", "reject");
+    }
+
+    /**
+     * Is virtual threads enabled.
+     * <p>Runs receipts on virtual threads if the runtime supports them (Java 21+).
+     *
+     * @return Boolean.
+     */
+    public boolean isVirtualThreads() {
+        return getBooleanProperty("virtualThreads", false);
+    }
+
+    /**
+     * Gets engine.
+     * <p>Thread engine runs a blocking receipt per connection.
+     * <p>Selector engine parks idle connections on a selector and only uses a worker to process commands.
+     *
+     * @return Engine name (thread or selector).
+     */
+    public String getEngine() {
+        return getStringProperty("engine", "thread");
+    }
+
+    /**
+     * Gets selector threads.
+     * <p>Number of event loops parking idle connections when using the selector engine.
+     *
+     * @return Integer.
+     */
+    public int getSelectorThreads() {
+        return Math.toIntExact(getLongProperty("selectorThreads", 2L));
+    }
+
+    /**
+     * Gets connection rate limit.
+     * <p>Number of connections a client address may open per minute.
+     * <p>Zero disables rate limiting.
+     *
+     * @return Connections per minute.
+     */
+    public int getRateLimit() {
+        return Math.toIntExact(getLongProperty("rateLimit", 0L));
+    }
+
+    /**
+     * Gets connection rate burst.
+     * <p>Number of connections a client address may open at once before the rate limit applies.
+     *
+     * @return Burst size.
+     */
+    public int getRateBurst() {
+        return Math.toIntExact(getLongProperty("rateBurst", 10L));
+    }
+
+    /**
+     * Gets connection limit.
+     * <p>Number of concurrent connections allowed per client address.
+     * <p>Zero disables the limit.
+     *
+     * @return Connections per address.
+     */
+    public int getConnectionLimit() {
+        return Math.toIntExact(getLongProperty("connectionLimit", 0L));
+    }
+
+    /**
+     * Gets limit response.
+     * <p>Sent to clients over the rate or connection limit before closing.
+     *
+     * @return Response string.
+     */
+    public String getLimitResponse() {
+        return getStringProperty("limitResponse", "421 4.7.0 Too many connections from your address, try again later");
+    }
+
+    /**
+     * Is config reload enabled.
+     * <p>Watches server.json and publishes a new snapshot to new connections when it changes.
+     * <p>Listener settings like bind, port and pools are not reloaded.
+     *
+     * @return Boolean.
+     */
+    public boolean isConfigReload() {
+        return getBooleanProperty("configReload", false);
+    }
+
+    /**
+     * Gets drain timeout.
+     * <p>Seconds given to open connections to finish their transactions on shutdown.
+     * <p>Connections still open after are sent a 421 and closed.
+     *
+     * @return Drain timeout in seconds.
+     */
+    public int getDrainTimeout() {
+        return Math.toIntExact(getLongProperty("drainTimeout", 30L));
+    }
+
+    /**
+     * Gets idle timeout.
+     * <p>Seconds a session may wait for a command before the idle reaper closes it.
+     * <p>Zero disables the reaper.
+     *
+     * @return Idle timeout in seconds.
+     */
+    public int getIdleTimeout() {
+        return Math.toIntExact(getLongProperty("idleTimeout", 0L));
+    }
+
+    /**
+     * Gets DATA budget.
+     * <p>Bytes of DATA and BDAT payload all connections may have read but not yet stored.
+     * <p>Zero disables the budget.
+     *
+     * @return Budget in bytes.
+     */
+    public long getDataBudget() {
+        return getLongProperty("dataBudget", 0L);
+    }
+
     /**
      * Gets transactions limit.
      * <p>This defines how many commands will be processed before breaking receipt loop.
@@ -81,6 +347,52 @@ public class ServerConfig extends ConfigFoundation {
         return Math.toIntExact(getLongProperty("errorLimit", 3L));
     }
 
+    /**
+     * Gets command line limit.
+     * <p>Max length of a command line in bytes including CRLF as per RFC 5321.
+     * <br>Longer lines get a 500 and the connection closed.
+     * <p>Zero disables the limit.
+     *
+     * @return Limit in bytes.
+     */
+    public int getCommandLineLimit() {
+        return Math.toIntExact(getLongProperty("commandLineLimit", 512L));
+    }
+
+    /**
+     * Gets DATA line limit.
+     * <p>Max length of a DATA line in bytes including CRLF as per RFC 5321.
+     * <br>Longer lines get a 500, the message discarded and the connection closed.
+     * <p>Zero disables the limit.
+     *
+     * @return Limit in bytes.
+     */
+    public int getDataLineLimit() {
+        return Math.toIntExact(getLongProperty("dataLineLimit", 1000L));
+    }
+
+    /**
+     * Gets command rate.
+     * <p>Commands per second a connection may send once the burst is used up.
+     * <br>Connections going faster get a 421 and are closed.
+     * <p>Zero disables the limit.
+     *
+     * @return Commands per second.
+     */
+    public int getCommandRate() {
+        return Math.toIntExact(getLongProperty("commandRate", 0L));
+    }
+
+    /**
+     * Gets command burst.
+     * <p>Commands a connection may send at once before the command rate applies.
+     *
+     * @return Commands count.
+     */
+    public int getCommandBurst() {
+        return Math.toIntExact(getLongProperty("commandBurst", 50L));
+    }
+
     /**
      * Is AUTH enabled.
      *
@@ -135,17 +447,112 @@ public class ServerConfig extends ConfigFoundation {
         return getStringProperty("storage", "/tmp/store");
     }
 
+    /**
+     * Gets storage type.
+     * <p>Either local for a file per message, memory to spool messages in memory
+     * or segment for an append-only segment store.
+     *
+     * @return Storage type string.
+     */
+    public String getStorageType() {
+        return getStringProperty("storageType", "local");
+    }
+
+    /**
+     * Gets segment size.
+     * <p>Segments are sealed once they grow past this size.
+     *
+     * @return Segment size in bytes.
+     */
+    public long getSegmentSize() {
+        return Math.max(1L, getLongProperty("segmentSize", 268435456L));
+    }
+
+    /**
+     * Gets segment store retention.
+     * <p>Messages older than this are removed by compaction.
+     *
+     * @return Retention in seconds (0 to keep forever).
+     */
+    public long getRetention() {
+        return Math.max(0L, getLongProperty("retention", 0L));
+    }
+
+    /**
+     * Gets segment store compaction interval.
+     *
+     * @return Interval in seconds (0 to disable).
+     */
+    public long getCompactInterval() {
+        return Math.max(0L, getLongProperty("compactInterval", 3600L));
+    }
+
+    /**
+     * Gets memory spool threshold.
+     * <p>Spooled messages larger than this spill to disk.
+     *
+     * @return Threshold in bytes.
+     */
+    public long getSpoolThreshold() {
+        return Math.max(0L, getLongProperty("spoolThreshold", 1048576L));
+    }
+
+    /**
+     * Gets memory spool cap.
+     * <p>Memory all spooled messages together may use.
+     *
+     * @return Cap in bytes.
+     */
+    public long getSpoolMemory() {
+        return Math.max(0L, getLongProperty("spoolMemory", 268435456L));
+    }
+
+    /**
+     * Gets storage compression.
+     * <p>Either none, gzip or deflate.
+     *
+     * @return Compression type string.
+     */
+    public String getCompression() {
+        return getStringProperty("compression", "none");
+    }
+
+    /**
+     * Gets storage compression level.
+     *
+     * @return Level from 0 to 9.
+     */
+    public int getCompressionLevel() {
+        return Math.max(0, Math.min(9, Math.toIntExact(getLongProperty("compressionLevel", 6L))));
+    }
+
+    /**
+     * Gets storage durability policy.
+     * <p>Sync stores messages on the session thread.
+     * <br>Enqueue, write and fsync store them behind it and reply once queued, written or synced to disk.
+     *
+     * @return Durability policy string.
+     */
+    public String getDurability() {
+        return getStringProperty("durability", "sync");
+    }
+
+    /**
+     * Gets number of storage writer threads.
+     *
+     * @return Thread count.
+     */
+    public int getStorageThreads() {
+        return Math.max(1, Math.toIntExact(getLongProperty("storageThreads", 2L)));
+    }
+
     /**
      * Gets users list.
      *
      * @return Users list.
      */
     public List<UserConfig> getUsers() {
-        List<UserConfig> users = new ArrayList<>();
-        for (Map<String, String> user : (List<Map<String, String>>) getListProperty("users")) {
-            users.add(new UserConfig(user));
-        }
-        return users;
+        return new ArrayList<>(users.values());
     }
 
     /**
@@ -155,12 +562,7 @@ public class ServerConfig extends ConfigFoundation {
      * @return Optional of UserConfig.
      */
     public Optional<UserConfig> getUser(String find) {
-        for (UserConfig user : getUsers()) {
-            if (user.getName().equals(find)) {
-                return Optional.of(user);
-            }
-        }
-        return Optional.empty();
+        return Optional.ofNullable(users.get(find));
     }
 
     /**
@@ -168,13 +570,41 @@ public class ServerConfig extends ConfigFoundation {
      *
      * @return Scenarios map.
      */
-    @SuppressWarnings("rawtypes")
     public Map<String, ScenarioConfig> getScenarios() {
-        Map<String, ScenarioConfig> scenarios = new HashMap<>();
-        for (Object object : getMapProperty("scenarios").entrySet()) {
-            Map.Entry entry = (Map.Entry) object;
-            scenarios.put((String) entry.getKey(), new ScenarioConfig((Map) entry.getValue()));
-        }
         return scenarios;
     }
+
+    /**
+     * Gets scenario for given EHLO domain.
+     * <p>Falls back to the wildcard scenario if any.
+     *
+     * @param ehlo EHLO domain.
+     * @return Optional of ScenarioConfig.
+     */
+    public Optional<ScenarioConfig> getScenario(String ehlo) {
+        ScenarioConfig scenario = ehlo != null ? scenarios.get(ehlo) : null;
+        return Optional.ofNullable(scenario != null ? scenario : scenarios.get("*"));
+    }
+
+    /**
+     * Gets listeners.
+     * <p>Defaults to a single listener using the top level bind, port and backlog.
+     *
+     * @return Unmodifiable list of ListenerConfig.
+     */
+    public List<ListenerConfig> getListeners() {
+        return listeners;
+    }
+
+    /**
+     * Gets configuration view for given listener.
+     * <p>The view applies the listener AUTH and STARTTLS policy.
+     *
+     * @param listener ListenerConfig instance.
+     * @return ServerConfig instance, self if listener is null or unknown.
+     */
+    public ServerConfig getServerConfig(ListenerConfig listener) {
+        ServerConfig view = listener != null ? views.get(listener.getName()) : null;
+        return view != null ? view : this;
+    }
 }
@@ -0,0 +1,143 @@
+package com.mimecast.robin.config.server;
+
+import com.mimecast.robin.main.Config;
+import org.apache.logging.log4j.LogManager;
+import org.apache.logging.log4j.Logger;
+
+import java.io.IOException;
+import java.nio.file.*;
+import java.util.concurrent.TimeUnit;
+
+/**
+ * Server configuration file watcher.
+ *
+ * <p>Watches the configuration directory and reloads server.json when it changes.
+ * <p>The new file is parsed and compiled in the background and only published if valid.
+ * <br>An invalid or partially written file is logged and the current snapshot kept.
+ * <p>New connections pick up the new snapshot while open ones finish on the one they started with.
+ *
+ * @see ServerConfig
+ * @see Config#setServer(ServerConfig)
+ */
+public class ServerConfigWatcher implements Runnable {
+    private static final Logger log = LogManager.getLogger(ServerConfigWatcher.class);
+
+    /**
+     * Quiet period to let editors finish writing before reloading.
+     */
+    private static final long SETTLE = 250L;
+
+    /**
+     * Path to server.json.
+     */
+    private final Path path;
+
+    /**
+     * Watcher thread.
+     */
+    private Thread thread;
+
+    /**
+     * Constructs a new ServerConfigWatcher instance with given server.json path.
+     *
+     * @param path Path to server.json.
+     */
+    public ServerConfigWatcher(Path path) {
+        this.path = path.toAbsolutePath();
+    }
+
+    /**
+     * Starts watching in a daemon thread.
+     *
+     * @return Self.
+     */
+    public ServerConfigWatcher start() {
+        thread = new Thread(this, "config-watcher");
+        thread.setDaemon(true);
+        thread.start();
+        return this;
+    }
+
+    /**
+     * Stops watching.
+     */
+    public void stop() {
+        if (thread != null) {
+            thread.interrupt();
+        }
+    }
+
+    /**
+     * Watch loop.
+     */
+    @Override
+    public void run() {
+        try (WatchService watchService = path.getFileSystem().newWatchService()) {
+            path.getParent().register(watchService,
+                    StandardWatchEventKinds.ENTRY_CREATE,
+                    StandardWatchEventKinds.ENTRY_MODIFY);
+            log.info("Watching for changes: {}", path);
+
+            while (!Thread.currentThread().isInterrupted()) {
+                WatchKey key = watchService.take();
+                boolean changed = isChanged(key);
+
+                // Collapse bursts of events into a single reload.
+                WatchKey next;
+                while ((next = watchService.poll(SETTLE, TimeUnit.MILLISECONDS)) != null) {
+                    changed = isChanged(next) || changed;
+                }
+
+                if (changed) {
+                    reload();
+                }
+            }
+        } catch (InterruptedException e) {
+            Thread.currentThread().interrupt();
+        } catch (IOException | ClosedWatchServiceException e) {
+            log.error("Config watcher stopped: {}", e.getMessage());
+        }
+    }
+
+    /**
+     * Is server.json among the key events.
+     * <p>Resets the key to keep receiving events.
+     *
+     * @param key WatchKey instance.
+     * @return Boolean.
+     */
+    private boolean isChanged(WatchKey key) {
+        boolean changed = false;
+        for (WatchEvent<?> event : key.pollEvents()) {
+            if (path.getFileName().equals(event.context())) {
+                changed = true;
+            }
+        }
+        key.reset();
+
+        return changed;
+    }
+
+    /**
+     * Reloads server.json and publishes it if valid.
+     *
+     * @return Boolean, true if a new snapshot was published.
+     */
+    public boolean reload() {
+        try {
+            ServerConfig serverConfig = new ServerConfig(path.toString());
+            if (serverConfig.isEmpty()) {
+                throw new IOException("Empty configuration");
+            }
+
+            Config.setServer(serverConfig);
+            log.info("Reloaded server config: {}", path);
+            return true;
+
+        } catch (IOException | RuntimeException e) {
+            log.error("Server config not reloaded, keeping current: {}", e.getMessage());
+        }
+
+        return false;
+    }
+}
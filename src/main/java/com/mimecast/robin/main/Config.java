@@ -36,8 +36,9 @@ public class Config {
 
     /**
      * Server configuration.
+     * <p>Volatile so a reloaded snapshot is visible to new connections without locking.
      */
-    private static ServerConfig server = new ServerConfig();
+    private static volatile ServerConfig server = new ServerConfig();
 
     /**
      * Client default configuration.
@@ -82,6 +83,17 @@ public class Config {
         server = new ServerConfig(path);
     }
 
+    /**
+     * Sets server config.
+     * <p>Publishes a new snapshot atomically.
+     * <br>Connections already open keep the snapshot they were created with.
+     *
+     * @param serverConfig ServerConfig instance.
+     */
+    public static void setServer(ServerConfig serverConfig) {
+        server = serverConfig;
+    }
+
     /**
      * Gets client config.
      *
@@ -16,6 +16,9 @@ import java.util.Optional;
  * <p>Each extension has a server and a client implementation.
  * <p>The server will select the appropriate extension to the SMTP verb it receives.
  * <p>The client however has a behaviour which defines what command will be issued when.
+ * <p>Extensions are keyed by lower case name so verb keys, already folded, are looked up directly.
+ * <p>Server processors that are reusable are built once into a dispatch table shared by every connection.
+ * <br>The table is rebuilt when extensions are added or removed.
  *
  * @see Verb
  * @see ClientProcessor
@@ -29,6 +32,11 @@ public class Extensions {
      */
     private static final Map<String, Extension> map = new HashMap<>();
 
+    /**
+     * Shared server processors dispatch table.
+     */
+    private static volatile Map<String, ServerProcessor> processors = new HashMap<>();
+
     /*
       Default extensions.
      */
@@ -48,6 +56,8 @@ public class Extensions {
         map.put("rset", new Extension(ServerRset::new, ClientRset::new));
         map.put("help", new Extension(ServerHelp::new, ClientHelp::new));
         map.put("quit", new Extension(ServerQuit::new, ClientQuit::new));
+
+        buildProcessors();
     }
 
     /**
@@ -77,7 +87,7 @@ public class Extensions {
             throw new IllegalArgumentException("Verb cannot be null");
         }
 
-        return isExtension(verb.getKey());
+        return map.containsKey(verb.getKey());
     }
 
     /**
@@ -105,7 +115,7 @@ public class Extensions {
             throw new IllegalArgumentException("Verb cannot be null");
         }
 
-        return getExtension(verb.getKey());
+        return Optional.ofNullable(map.get(verb.getKey()));
     }
 
     /**
@@ -122,6 +132,42 @@ public class Extensions {
         return Optional.ofNullable(map.get(name.toLowerCase()));
     }
 
+    /**
+     * Gets server processor by verb.
+     * <p>Reusable processors come from the dispatch table, others are built for every command.
+     *
+     * @param verb Verb instance.
+     * @return ServerProcessor instance or null if not an extension.
+     */
+    public static ServerProcessor getServerProcessor(Verb verb) {
+        if (verb == null) {
+            throw new IllegalArgumentException("Verb cannot be null");
+        }
+
+        ServerProcessor processor = processors.get(verb.getKey());
+        if (processor != null) {
+            return processor;
+        }
+
+        Extension extension = map.get(verb.getKey());
+        return extension != null ? extension.getServer() : null;
+    }
+
+    /**
+     * Builds shared server processors dispatch table.
+     */
+    private static synchronized void buildProcessors() {
+        Map<String, ServerProcessor> table = new HashMap<>();
+        for (Map.Entry<String, Extension> entry : map.entrySet()) {
+            ServerProcessor processor = entry.getValue().getServer();
+            if (processor != null && processor.isReusable()) {
+                table.put(entry.getKey(), processor);
+            }
+        }
+
+        processors = table;
+    }
+
     /**
      * Adds an extension.
      *
@@ -134,6 +180,8 @@ public class Extensions {
         }
 
         map.put(name.toLowerCase(), pair);
+        buildProcessors();
+        ServerEhlo.clearAdverts();
     }
 
     /**
@@ -143,6 +191,8 @@ public class Extensions {
      */
     public static void removeExtension(String name) {
         map.remove(name.toLowerCase());
+        buildProcessors();
+        ServerEhlo.clearAdverts();
     }
 
     /**
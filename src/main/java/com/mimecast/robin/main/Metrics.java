@@ -0,0 +1,104 @@
+package com.mimecast.robin.main;
+
+import java.util.Collections;
+import java.util.Map;
+import java.util.TreeMap;
+import java.util.concurrent.ConcurrentHashMap;
+import java.util.concurrent.atomic.LongAdder;
+
+/**
+ * Server metrics container.
+ *
+ * <p>Holds named counters shared by all connections.
+ * <p>Counters are created on first use and are cheap to increment from many threads.
+ */
+public class Metrics {
+
+    /**
+     * Replies written by server connections.
+     */
+    public static final String REPLIES = "smtp.replies";
+
+    /**
+     * Reply flushes because no more input was buffered.
+     */
+    public static final String FLUSH_DRAINED = "smtp.flush.drained";
+
+    /**
+     * Reply flushes forced by a synchronising command.
+     */
+    public static final String FLUSH_SYNC = "smtp.flush.sync";
+
+    /**
+     * Reply flushes on connection close.
+     */
+    public static final String FLUSH_CLOSE = "smtp.flush.close";
+
+    /**
+     * Sessions closed by the idle reaper.
+     */
+    public static final String IDLE_REAPED = "smtp.idle.reaped";
+
+    /**
+     * Reads held back waiting for DATA budget.
+     */
+    public static final String DATA_BUDGET_WAITS = "smtp.data.budget.waits";
+
+    /**
+     * Spooled messages spilled to disk.
+     */
+    public static final String SPOOL_SPILLS = "storage.spool.spills";
+
+    /**
+     * Counters container.
+     */
+    private static final Map<String, LongAdder> counters = new ConcurrentHashMap<>();
+
+    /**
+     * Protected constructor.
+     */
+    private Metrics() {
+        throw new IllegalStateException("Static class");
+    }
+
+    /**
+     * Increments counter.
+     *
+     * @param name Counter name.
+     */
+    public static void increment(String name) {
+        add(name, 1L);
+    }
+
+    /**
+     * Adds to counter.
+     *
+     * @param name  Counter name.
+     * @param value Value to add.
+     */
+    public static void add(String name, long value) {
+        counters.computeIfAbsent(name, k -> new LongAdder()).add(value);
+    }
+
+    /**
+     * Gets counter value.
+     *
+     * @param name Counter name.
+     * @return Counter value or 0 if not used yet.
+     */
+    public static long get(String name) {
+        LongAdder counter = counters.get(name);
+        return counter != null ? counter.sum() : 0L;
+    }
+
+    /**
+     * Gets all counter values sorted by name.
+     *
+     * @return Map of counter name and value.
+     */
+    public static Map<String, Long> getAll() {
+        Map<String, Long> values = new TreeMap<>();
+        counters.forEach((name, counter) -> values.put(name, counter.sum()));
+        return Collections.unmodifiableMap(values);
+    }
+}
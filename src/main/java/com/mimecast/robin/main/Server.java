@@ -1,11 +1,36 @@
 package com.mimecast.robin.main;
 
+import com.mimecast.robin.config.server.ListenerConfig;
+import com.mimecast.robin.config.server.ServerConfig;
+import com.mimecast.robin.config.server.ServerConfigWatcher;
+import com.mimecast.robin.smtp.ClientLimiter;
+import com.mimecast.robin.smtp.Listener;
+import com.mimecast.robin.smtp.ReceiptExecutor;
+import com.mimecast.robin.smtp.Receipts;
+import com.mimecast.robin.smtp.SelectorListener;
 import com.mimecast.robin.smtp.SmtpListener;
+import com.mimecast.robin.smtp.io.DataBudget;
+import com.mimecast.robin.storage.MemorySpool;
+import com.mimecast.robin.storage.SegmentStorageClient;
+import com.mimecast.robin.storage.SegmentStore;
+import com.mimecast.robin.storage.SpoolStorageClient;
+import com.mimecast.robin.storage.StorageWriter;
+import com.mimecast.robin.util.ReusePort;
 
 import javax.naming.ConfigurationException;
+import java.io.File;
 import java.io.IOException;
 import java.nio.file.Files;
 import java.nio.file.Paths;
+import java.util.ArrayList;
+import java.util.HashMap;
+import java.util.List;
+import java.util.Map;
+import java.util.concurrent.CopyOnWriteArrayList;
+import java.util.concurrent.ExecutorService;
+import java.util.concurrent.Executors;
+import java.util.concurrent.ScheduledExecutorService;
+import java.util.concurrent.TimeUnit;
 
 /**
  * Socket listener.
@@ -14,18 +39,43 @@ import java.nio.file.Paths;
  * <p>It's initilized with a configuration dir path.
  * <p>The configuration path is used to load the global configuration files.
  * <p>Loads both client and server configuration files.
+ * <p>Runs one listener per configured listener entry, by default a single one on the top level port.
+ * <br>Entries with several acceptors run one listener per acceptor on the same port.
  *
  * @see SmtpListener
+ * @see SelectorListener
  */
 class Server extends Foundation {
 
     /**
-     * Listener instance.
+     * Listener instances.
      */
-    private static SmtpListener port25;
+    private static final List<Listener> listeners = new CopyOnWriteArrayList<>();
+
+    /**
+     * Accept rate report interval in seconds.
+     */
+    private static final long ACCEPT_REPORT = 60L;
+
+    /**
+     * Receipt executor shared by thread engine listeners.
+     */
+    private static ReceiptExecutor executor;
+
+    /**
+     * Worker executor shared by selector engine listeners.
+     */
+    private static ExecutorService workers;
+
+    /**
+     * Segment store if storage type is segment.
+     */
+    private static SegmentStore segmentStore;
 
     /**
      * Runner.
+     * <p>Starts every configured listener, each accepting on its own thread.
+     * <br>All listeners share one worker pool, storage and configuration.
      *
      * @param path Directory path.
      * @throws ConfigurationException Unable to read/parse config file.
@@ -34,31 +84,227 @@ class Server extends Foundation {
         init(path); // Initialize foundation.
         registerShutdown(); // Shutdown hook.
         loadKeystore(); // Load Keystore.
+        watchConfig(path); // Config reload.
+        loadStorage(); // Storage backend.
+
+        ServerConfig config = Config.getServer();
+        boolean selector = "selector".equalsIgnoreCase(config.getEngine());
+
+        // Idle reaper and DATA budget.
+        if (config.getIdleTimeout() > 0) {
+            Receipts.startReaper(config.getIdleTimeout());
+        }
+        DataBudget.setLimit(config.getDataBudget());
+
+        // Per client address limits shared by all listeners.
+        ClientLimiter limiter = new ClientLimiter(config);
+        if (!limiter.isEnabled()) {
+            limiter = null;
+        }
+
+        // Shared workers.
+        if (selector) {
+            workers = SelectorListener.buildWorkers(config.getPoolSize());
+        } else {
+            executor = new ReceiptExecutor(
+                    config.getPoolSize(),
+                    config.getQueueSize(),
+                    config.getOverflow(),
+                    config.isVirtualThreads()
+            ).setLimiter(limiter);
+        }
+
+        // Listeners.
+        for (ListenerConfig listenerConfig : config.getListeners()) {
+            int acceptors = listenerConfig.getAcceptors();
+            if (acceptors > 1 && !ReusePort.isSupported()) {
+                log.warn("SO_REUSEPORT requires Java 9+, listening on {} with a single acceptor.", listenerConfig.getName());
+                acceptors = 1;
+            }
+
+            for (int i = 0; i < acceptors; i++) {
+                try {
+                    listeners.add(selector ?
+                            new SelectorListener(listenerConfig, workers, config.getSelectorThreads(), i).setLimiter(limiter) :
+                            new SmtpListener(listenerConfig, executor, i));
+                } catch (IOException e) {
+                    log.fatal("Error listening on {} acceptor {}: {}", listenerConfig.getName(), i, e.getMessage());
+                }
+            }
+        }
+        reportAccepts();
+        reportMetrics();
+
+        // Accept on a thread per listener.
+        List<Thread> threads = new ArrayList<>();
+        for (Listener listener : listeners) {
+            Thread thread = new Thread(listener::listen, "listener-" + listener.getListenerConfig().getPort() + "-" + listener.getAcceptor());
+            thread.start();
+            threads.add(thread);
+        }
+
+        for (Thread thread : threads) {
+            try {
+                thread.join();
+            } catch (InterruptedException e) {
+                Thread.currentThread().interrupt();
+                break;
+            }
+        }
+    }
+
+    /**
+     * Logs the accept rate of every acceptor periodically.
+     * <p>Shows how evenly the kernel spreads connections between acceptors sharing a port.
+     */
+    private static void reportAccepts() {
+        ScheduledExecutorService reporter = Executors.newSingleThreadScheduledExecutor(runnable -> {
+            Thread thread = new Thread(runnable, "accept-reporter");
+            thread.setDaemon(true);
+            return thread;
+        });
+
+        Map<Listener, Long> last = new HashMap<>();
+        reporter.scheduleAtFixedRate(() -> {
+            for (Listener listener : listeners) {
+                long accepted = listener.getAccepted();
+                long delta = accepted - last.getOrDefault(listener, 0L);
+                last.put(listener, accepted);
+
+                if (delta > 0) {
+                    log.info("Acceptor {} on {}: {} accepted, {}/s.", listener.getAcceptor(),
+                            listener.getListenerConfig().getName(), accepted, String.format("%.1f", (double) delta / ACCEPT_REPORT));
+                }
+            }
+        }, ACCEPT_REPORT, ACCEPT_REPORT, TimeUnit.SECONDS);
+    }
+
+    /**
+     * Logs server metrics periodically.
+     * <p>Runs on the accept report interval and only when counters moved.
+     */
+    private static void reportMetrics() {
+        ScheduledExecutorService reporter = Executors.newSingleThreadScheduledExecutor(runnable -> {
+            Thread thread = new Thread(runnable, "metrics-reporter");
+            thread.setDaemon(true);
+            return thread;
+        });
 
-        // Listener.
-        port25 = new SmtpListener(
-                Config.getServer().getPort(),
-                Config.getServer().getBacklog(),
-                Config.getServer().getBind()
-        );
+        Map<String, Long> last = new HashMap<>();
+        reporter.scheduleAtFixedRate(() -> {
+            Map<String, Long> values = Metrics.getAll();
+            if (!values.equals(last)) {
+                logMetrics(values);
+                last.clear();
+                last.putAll(values);
+            }
+        }, ACCEPT_REPORT, ACCEPT_REPORT, TimeUnit.SECONDS);
+    }
+
+    /**
+     * Logs server metrics.
+     * <p>Replies per flush shows how much reply batching pipelined clients get.
+     *
+     * @param values Counter values.
+     */
+    private static void logMetrics(Map<String, Long> values) {
+        if (values.isEmpty()) {
+            return;
+        }
+
+        long flushes = values.getOrDefault(Metrics.FLUSH_DRAINED, 0L) +
+                values.getOrDefault(Metrics.FLUSH_SYNC, 0L) +
+                values.getOrDefault(Metrics.FLUSH_CLOSE, 0L);
+        long replies = values.getOrDefault(Metrics.REPLIES, 0L);
+
+        log.info("Metrics: {}, replies per flush {}.", values,
+                flushes > 0 ? String.format("%.2f", (double) replies / flushes) : "n/a");
     }
 
     /**
      * Shutdown hook.
+     * <p>Stops accepting, drains open connections then closes listeners and workers.
+     * <br>Storage written behind is finished and flushed last.
      */
     private static void registerShutdown() {
         Runtime.getRuntime().addShutdownHook(new Thread(() -> {
-            if (port25 != null && port25.getListener() != null) {
+            if (!listeners.isEmpty()) {
                 log.info("Service is shutting down.");
+            }
+            for (Listener listener : listeners) {
+                if (listener.getListener() != null) {
+                    try {
+                        listener.serverShutdown();
+                    } catch (IOException e) {
+                        log.info("Shutdown in progress.. please wait.");
+                    }
+                }
+            }
+
+            // Let transactions in progress finish.
+            Receipts.drain(Config.getServer().getDrainTimeout());
+            for (Listener listener : listeners) {
+                listener.close();
+            }
+
+            if (executor != null) {
+                executor.shutdown();
+            }
+            if (workers != null) {
+                workers.shutdown();
+            }
+            StorageWriter.shutdown(Config.getServer().getDrainTimeout());
+            MemorySpool.flush();
+            if (segmentStore != null) {
                 try {
-                    port25.serverShutdown();
+                    segmentStore.close();
                 } catch (IOException e) {
-                    log.info("Shutdown in progress.. please wait.");
+                    log.error("Segment store not closed: {}", e.getMessage());
                 }
             }
+            logMetrics(Metrics.getAll());
         }));
     }
 
+    /**
+     * Loads storage backend.
+     * <p>Local storage writes a file per message and needs no setup.
+     * <br>Memory storage spools messages in memory and spills them to local storage files.
+     * <br>Segment storage appends messages to a shared segment store.
+     * <p>Any of these may be written behind the session as the listener durability policy allows.
+     */
+    private static void loadStorage() {
+        ServerConfig config = Config.getServer();
+        StorageWriter.configure(config.getStorageThreads());
+
+        if ("memory".equalsIgnoreCase(config.getStorageType())) {
+            MemorySpool.setLimit(config.getSpoolMemory());
+            long threshold = config.getSpoolThreshold();
+            Factories.setStorageClient(() -> new SpoolStorageClient("eml", threshold));
+
+        } else if ("segment".equalsIgnoreCase(config.getStorageType())) {
+            try {
+                segmentStore = new SegmentStore(Paths.get(config.getStorageDir()), config.getSegmentSize())
+                        .startCompactor(config.getRetention(), config.getCompactInterval());
+                SegmentStore store = segmentStore;
+                Factories.setStorageClient(() -> new SegmentStorageClient(store));
+            } catch (IOException e) {
+                log.fatal("Error opening segment store, using local storage: {}", e.getMessage());
+            }
+        }
+    }
+
+    /**
+     * Watch server.json for changes if enabled.
+     *
+     * @param path Directory path.
+     */
+    private static void watchConfig(String path) {
+        if (Config.getServer().isConfigReload()) {
+            new ServerConfigWatcher(Paths.get(path != null ? path : "cfg" + File.separator, "server.json")).start();
+        }
+    }
+
     /**
      * Load Keystore.
      */
@@ -7,6 +7,7 @@ import com.mimecast.robin.mime.parts.MimePart;
 import com.mimecast.robin.mime.parts.MultipartMimePart;
 import com.mimecast.robin.mime.parts.TextMimePart;
 import com.mimecast.robin.smtp.io.LineInputStream;
+import com.mimecast.robin.util.CompressionUtils;
 import org.apache.commons.codec.DecoderException;
 import org.apache.commons.codec.binary.Base64;
 import org.apache.commons.codec.net.QuotedPrintableCodec;
@@ -16,7 +17,6 @@ import org.apache.logging.log4j.Logger;
 
 import java.io.ByteArrayOutputStream;
 import java.io.FileInputStream;
-import java.io.FileNotFoundException;
 import java.io.IOException;
 import java.security.MessageDigest;
 import java.security.NoSuchAlgorithmException;
@@ -52,12 +52,13 @@ public class EmailParser {
 
     /**
      * Constructs new EmailParser instance with given path.
+     * <p>Compressed files are decompressed transparently.
      *
      * @param path Path to email.
-     * @throws FileNotFoundException File not found.
+     * @throws IOException File not found or unreadable.
      */
-    public EmailParser(String path) throws FileNotFoundException {
-        this.stream = new LineInputStream(new FileInputStream(path));
+    public EmailParser(String path) throws IOException {
+        this.stream = new LineInputStream(CompressionUtils.decompress(new FileInputStream(path)));
     }
 
     /**
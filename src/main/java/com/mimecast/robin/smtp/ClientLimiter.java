@@ -0,0 +1,391 @@
+package com.mimecast.robin.smtp;
+
+import com.mimecast.robin.config.server.ServerConfig;
+import org.apache.logging.log4j.LogManager;
+import org.apache.logging.log4j.Logger;
+
+import java.io.IOException;
+import java.io.OutputStream;
+import java.net.InetAddress;
+import java.net.Socket;
+import java.nio.charset.StandardCharsets;
+import java.util.Iterator;
+import java.util.Map;
+import java.util.concurrent.ConcurrentHashMap;
+import java.util.concurrent.TimeUnit;
+import java.util.concurrent.atomic.AtomicLong;
+import java.util.concurrent.locks.ReentrantLock;
+
+/**
+ * Per client address connection limiter.
+ *
+ * <p>Checked by the listeners before an email receipt is scheduled.
+ * <p>Every client address gets a token bucket refilled at the configured rate and a concurrent connection counter.
+ * <br>Connections over either limit are sent the limit response and closed.
+ * <p>Client state lives in a concurrent map and expires once idle with a full bucket.
+ * <br>Every acquire sweeps a fixed number of entries so expiry costs the same no matter how many addresses are seen.
+ * <br>Past a maximum number of tracked addresses a new one evicts the least used idle entry of a small sample.
+ * <br>If every sampled entry has open connections the new address is rejected so a flood of unique addresses stays limited.
+ *
+ * @see ReceiptExecutor
+ * @see SelectorListener
+ */
+public class ClientLimiter {
+    private static final Logger log = LogManager.getLogger(ClientLimiter.class);
+
+    /**
+     * Entries checked for expiry on every acquire.
+     */
+    private static final int SWEEP = 2;
+
+    /**
+     * Maximum number of tracked client addresses.
+     */
+    private static final int MAX_CLIENTS = 65536;
+
+    /**
+     * Entries sampled for eviction once at the maximum.
+     */
+    private static final int EVICT_SAMPLE = 16;
+
+    /**
+     * Tokens added per nanosecond.
+     */
+    private final double rate;
+
+    /**
+     * Bucket size.
+     */
+    private final int burst;
+
+    /**
+     * Concurrent connections per address.
+     */
+    private final int concurrent;
+
+    /**
+     * Limit response.
+     */
+    private final String response;
+
+    /**
+     * Idle time in nanoseconds after which a client entry expires.
+     * <p>This is the time it takes to refill an empty bucket.
+     */
+    private final long ttl;
+
+    /**
+     * Client state by address.
+     */
+    private final Map<InetAddress, Client> clients = new ConcurrentHashMap<>();
+
+    /**
+     * Sweep lock.
+     * <p>Acceptors skip the sweep rather than wait for it.
+     */
+    private final ReentrantLock sweepLock = new ReentrantLock();
+
+    /**
+     * Sweep position.
+     */
+    private Iterator<Client> sweeper;
+
+    /**
+     * Rejected connections counter.
+     */
+    private final AtomicLong rejected = new AtomicLong();
+
+    /**
+     * Constructs a new ClientLimiter instance with given server configuration.
+     *
+     * @param config ServerConfig instance.
+     */
+    public ClientLimiter(ServerConfig config) {
+        this(config.getRateLimit(), config.getRateBurst(), config.getConnectionLimit(), config.getLimitResponse());
+    }
+
+    /**
+     * Constructs a new ClientLimiter instance.
+     *
+     * @param rateLimit  Connections per minute per address (0 to disable).
+     * @param burst      Connections allowed at once before the rate applies.
+     * @param concurrent Concurrent connections per address (0 to disable).
+     * @param response   Limit response.
+     */
+    public ClientLimiter(int rateLimit, int burst, int concurrent, String response) {
+        this.rate = rateLimit / (double) TimeUnit.MINUTES.toNanos(1);
+        this.burst = Math.max(1, burst);
+        this.concurrent = concurrent;
+        this.response = response + "\r\n";
+        this.ttl = rateLimit > 0 ? (long) Math.ceil(this.burst / rate) : 0L;
+    }
+
+    /**
+     * Is any limit enabled.
+     *
+     * @return Boolean.
+     */
+    public boolean isEnabled() {
+        return rate > 0 || concurrent > 0;
+    }
+
+    /**
+     * Acquires a connection permit for given address.
+     *
+     * @param address Client address.
+     * @return Permit instance or null if over limit.
+     */
+    public Permit acquire(InetAddress address) {
+        long now = System.nanoTime();
+        sweep(now);
+
+        while (true) {
+            Client client = clients.get(address);
+            if (client == null) {
+                if (clients.size() >= MAX_CLIENTS && !evict(now)) {
+                    rejected.incrementAndGet();
+                    log.info("Connection limit reached tracking {}.", address.getHostAddress());
+                    return null;
+                }
+                client = clients.computeIfAbsent(address, k -> new Client(k, now));
+            }
+
+            synchronized (client) {
+                // Expired while we got hold of it.
+                if (client.removed) continue;
+
+                if (client.acquire(now)) {
+                    return client;
+                }
+            }
+
+            rejected.incrementAndGet();
+            log.info("Connection limit reached for {}.", address.getHostAddress());
+            return null;
+        }
+    }
+
+    /**
+     * Sends limit response and closes socket.
+     *
+     * @param socket Socket instance.
+     */
+    public void reject(Socket socket) {
+        try (Socket sock = socket) {
+            OutputStream out = sock.getOutputStream();
+            out.write(response.getBytes(StandardCharsets.US_ASCII));
+            out.flush();
+        } catch (IOException e) {
+            log.info("Error rejecting connection: {}", e.getMessage());
+        }
+    }
+
+    /**
+     * Expires a fixed number of idle client entries.
+     *
+     * @param now Current nano time.
+     */
+    private void sweep(long now) {
+        if (!sweepLock.tryLock()) return;
+        try {
+            for (int i = 0; i < SWEEP; i++) {
+                if (sweeper == null || !sweeper.hasNext()) {
+                    sweeper = clients.values().iterator();
+                    if (!sweeper.hasNext()) return;
+                }
+
+                Client client = sweeper.next();
+                if (client.expire(now)) {
+                    clients.remove(client.address, client);
+                }
+            }
+        } finally {
+            sweepLock.unlock();
+        }
+    }
+
+    /**
+     * Evicts the least used idle client entry of a sample.
+     * <p>Least used is the fullest bucket and then the longest idle.
+     *
+     * @param now Current nano time.
+     * @return Boolean, false if no sampled entry is idle.
+     */
+    private boolean evict(long now) {
+        sweepLock.lock();
+        try {
+            Client candidate = null;
+            double candidateTokens = 0;
+            for (int i = 0; i < EVICT_SAMPLE; i++) {
+                if (sweeper == null || !sweeper.hasNext()) {
+                    sweeper = clients.values().iterator();
+                    if (!sweeper.hasNext()) break;
+                }
+
+                Client client = sweeper.next();
+                synchronized (client) {
+                    if (client.removed || client.active > 0) continue;
+
+                    double tokens = client.refill(now);
+                    if (candidate == null || tokens > candidateTokens || (tokens == candidateTokens && client.last < candidate.last)) {
+                        candidate = client;
+                        candidateTokens = tokens;
+                    }
+                }
+            }
+
+            if (candidate != null && candidate.evict()) {
+                clients.remove(candidate.address, candidate);
+                return true;
+            }
+
+            return false;
+        } finally {
+            sweepLock.unlock();
+        }
+    }
+
+    /**
+     * Gets number of tracked client addresses.
+     *
+     * @return Integer.
+     */
+    public int getClients() {
+        return clients.size();
+    }
+
+    /**
+     * Gets number of connections rejected due to limits.
+     *
+     * @return Long.
+     */
+    public long getRejected() {
+        return rejected.get();
+    }
+
+    /**
+     * Connection permit.
+     * <p>Released once the connection closes.
+     */
+    @FunctionalInterface
+    public interface Permit {
+
+        /**
+         * Releases permit.
+         */
+        void release();
+    }
+
+    /**
+     * Client address state.
+     * <p>Guarded by its own monitor.
+     */
+    private class Client implements Permit {
+
+        /**
+         * Client address.
+         */
+        private final InetAddress address;
+
+        /**
+         * Tokens in bucket.
+         */
+        private double tokens;
+
+        /**
+         * Last acquire or release nano time.
+         */
+        private long last;
+
+        /**
+         * Open connections.
+         */
+        private int active = 0;
+
+        /**
+         * Removed from map.
+         */
+        private boolean removed = false;
+
+        /**
+         * Constructs a new Client instance.
+         *
+         * @param address Client address.
+         * @param now     Current nano time.
+         */
+        Client(InetAddress address, long now) {
+            this.address = address;
+            this.tokens = burst;
+            this.last = now;
+        }
+
+        /**
+         * Refills bucket and takes a token and a connection slot if available.
+         *
+         * @param now Current nano time.
+         * @return Boolean.
+         */
+        boolean acquire(long now) {
+            if (rate > 0) {
+                tokens = Math.min(burst, tokens + (now - last) * rate);
+            }
+            last = now;
+
+            if ((rate > 0 && tokens < 1) || (concurrent > 0 && active >= concurrent)) {
+                return false;
+            }
+
+            if (rate > 0) {
+                tokens -= 1;
+            }
+            active++;
+            return true;
+        }
+
+        /**
+         * Releases connection slot.
+         */
+        @Override
+        public synchronized void release() {
+            active--;
+            if (rate > 0) {
+                long now = System.nanoTime();
+                tokens = Math.min(burst, tokens + (now - last) * rate);
+                last = now;
+            }
+        }
+
+        /**
+         * Gets tokens the bucket would hold now.
+         *
+         * @param now Current nano time.
+         * @return Tokens.
+         */
+        synchronized double refill(long now) {
+            return rate > 0 ? Math.min(burst, tokens + (now - last) * rate) : tokens;
+        }
+
+        /**
+         * Marks client removed if idle.
+         *
+         * @return Boolean.
+         */
+        synchronized boolean evict() {
+            if (active <= 0) {
+                removed = true;
+            }
+            return removed;
+        }
+
+        /**
+         * Marks client removed if idle with a full bucket.
+         *
+         * @param now Current nano time.
+         * @return Boolean.
+         */
+        synchronized boolean expire(long now) {
+            removed = active <= 0 && now - last >= ttl;
+            return removed;
+        }
+    }
+}
@@ -1,27 +1,52 @@
 package com.mimecast.robin.smtp;
 
+import com.mimecast.robin.config.server.ListenerConfig;
+import com.mimecast.robin.config.server.ScenarioConfig;
+import com.mimecast.robin.config.server.ServerConfig;
 import com.mimecast.robin.main.Config;
 import com.mimecast.robin.main.Extensions;
 import com.mimecast.robin.smtp.connection.Connection;
-import com.mimecast.robin.smtp.extension.Extension;
+import com.mimecast.robin.smtp.extension.server.ServerProcessor;
+import com.mimecast.robin.smtp.io.LineTooLongException;
+import com.mimecast.robin.smtp.verb.BdatVerb;
 import com.mimecast.robin.smtp.verb.Verb;
+import com.mimecast.robin.util.Sleep;
 import org.apache.logging.log4j.LogManager;
 import org.apache.logging.log4j.Logger;
 
 import java.io.IOException;
 import java.net.Socket;
 import java.util.Optional;
+import java.util.concurrent.atomic.AtomicBoolean;
+import java.util.concurrent.atomic.AtomicInteger;
 
 /**
  * Email receipt runnable.
  *
  * <p>This is used to create threads for incoming connections.
  * <p>A new instance will be constructed for every socket connection the server receives.
+ * <p>Open receipts are tracked so the server can drain them on shutdown and reap idle ones.
+ * <p>Command lines over the line limit get a 500 and commands over the command rate a 421 before closing.
+ * <p>Scenario reply delays and command line read throttling pause the receipt after a command.
+ * <br>DATA and BDAT payloads are throttled by the connection while read.
+ * <br>The thread engine sleeps through the pause while event driven engines resume the receipt from a timer.
+ *
+ * @see Receipts
  */
 @SuppressWarnings("WeakerAccess")
 public class EmailReceipt implements Runnable {
     private static final Logger log = LogManager.getLogger(EmailReceipt.class);
 
+    /**
+     * Shutdown response.
+     */
+    private static final String SHUTDOWN_RESPONSE = "421 4.3.2 Service shutting down";
+
+    /**
+     * Command rate response.
+     */
+    private static final String RATE_RESPONSE = "421 4.7.0 Too many commands, closing connection";
+
     /**
      * Connection instance.
      */
@@ -39,6 +64,69 @@ public class EmailReceipt implements Runnable {
      */
     private int errorLimit = Config.getServer().getErrorLimit();
 
+    /**
+     * Transactions processed.
+     */
+    private int transactions = 0;
+
+    /**
+     * Command tokens left.
+     * <p>Negative until the first command fills the bucket.
+     */
+    private double commandTokens = -1;
+
+    /**
+     * Last command nano time.
+     */
+    private long commandTime;
+
+    /**
+     * Pause in milliseconds before replies are flushed and the next command is read.
+     */
+    private long pause = 0L;
+
+    /**
+     * Processing a command.
+     */
+    private static final int BUSY = 0;
+
+    /**
+     * Waiting for the next command.
+     */
+    private static final int IDLE = 1;
+
+    /**
+     * Taken over by a shutdown from another thread.
+     */
+    private static final int CLOSING = 2;
+
+    /**
+     * Receipt state.
+     * <p>The session goes from idle to busy and shutdowns from idle to closing so only one of them owns an idle connection.
+     */
+    private final AtomicInteger state = new AtomicInteger(IDLE);
+
+    /**
+     * Mail transaction in progress.
+     */
+    private volatile boolean transaction = false;
+
+    /**
+     * Last activity nano time.
+     */
+    private volatile long lastActive = System.nanoTime();
+
+    /**
+     * Closed boolean.
+     */
+    private final AtomicBoolean closed = new AtomicBoolean();
+
+    /**
+     * Close handler.
+     * <p>Lets the engine running the receipt know it was closed from elsewhere.
+     */
+    private Runnable closeHandler;
+
     /**
      * Constructs a new EmailReceipt instance with given Connection instance.
      * <p>For testing purposes only.
@@ -55,8 +143,18 @@ public class EmailReceipt implements Runnable {
      * @param socket Inbound socket.
      */
     public EmailReceipt(Socket socket) {
+        this(socket, null);
+    }
+
+    /**
+     * Constructs a new EmailReceipt instance with given socket and listener.
+     *
+     * @param socket   Inbound socket.
+     * @param listener ListenerConfig instance the socket was accepted on.
+     */
+    public EmailReceipt(Socket socket, ListenerConfig listener) {
         try {
-            connection = new Connection(socket);
+            connection = new Connection(socket, listener);
         } catch (IOException e) {
             log.info("Error initializing streams: {}", e.getMessage());
         }
@@ -72,30 +170,397 @@ public class EmailReceipt implements Runnable {
      */
     public void run() {
         try {
+            if (open()) {
+                while (step()) {
+                    // This thread is ours to hold so sleep through pauses.
+                    long millis = takePause();
+                    if (millis > 0) {
+                        Sleep.nap((int) Math.min(Integer.MAX_VALUE, millis));
+                        if (!flush()) break;
+                    }
+                }
+            }
+        } finally {
+            close();
+        }
+    }
+
+    /**
+     * Opens the receipt by sending the welcome message.
+     * <p>Together with step() and close() this makes the receipt a per connection state machine.
+     * <br>Event driven engines call step() only once the socket has data to read.
+     *
+     * @return Boolean, false if the connection should be closed.
+     */
+    public boolean open() {
+        if (connection == null) return false;
+
+        try {
+            if (Receipts.isDraining()) {
+                connection.write(SHUTDOWN_RESPONSE);
+                return false;
+            }
+
+            Receipts.add(this);
             connection.write("220 " + connection.getSession().getRdns() + " ESMTP; " + connection.getSession().getDate());
+            lastActive = System.nanoTime();
+            state.set(IDLE);
+            return true;
 
-            Verb verb;
-            for (int i = 0; i < transactionsLimit; i++) {
-                String read = connection.read().trim();
-                verb = new Verb(read);
+        } catch (IOException e) {
+            log.info("Error reading/writing: {}", e.getMessage());
+        }
 
-                // Don't process if error.
-                if (!isError(verb)) process(verb);
+        return false;
+    }
 
-                // Break the loop.
-                // Break if error limit reached.
-                if (verb.getCommand().equalsIgnoreCase("quit") || errorLimit <= 0) {
-                    if (errorLimit <= 0) {
-                        log.warn("Error limit reached.");
-                    }
-                    break;
+    /**
+     * Reads and processes a single command.
+     *
+     * @return Boolean, false if the connection should be closed.
+     */
+    public boolean step() {
+        if (transactions >= transactionsLimit) return false;
+        transactions++;
+
+        try {
+            String line;
+            try {
+                line = connection.readCommand();
+            } catch (LineTooLongException e) {
+                if (!busy()) return false;
+                log.warn("Command line too long: {}", e.getMessage());
+                connection.write(ServerProcessor.LINE_RESPONSE);
+                return false;
+            }
+            if (!busy()) return false;
+            String read = line.trim();
+
+            if (isThrottled()) {
+                log.warn("Command rate exceeded.");
+                connection.write(RATE_RESPONSE);
+                return false;
+            }
+
+            // BDAT is parsed once for the processor and the LAST checks below.
+            Verb verb = new Verb(read);
+            if (verb.getKey().equals("bdat")) {
+                verb = new BdatVerb(verb);
+            }
+
+            // No new transactions while draining.
+            if (Receipts.isDraining() && !transaction && !verb.getKey().equals("quit")) {
+                connection.write(SHUTDOWN_RESPONSE);
+                return false;
+            }
+
+            // Don't process if error.
+            if (!isError(verb)) process(verb);
+
+            // Replies are held back while paused.
+            pause = getPause(verb, line.length());
+
+            // Synchronising commands flush buffered replies.
+            if (isSync(verb) && pause == 0) connection.flush();
+
+            // Break the loop.
+            // Break if error limit reached.
+            if (verb.getCommand().equalsIgnoreCase("quit") || errorLimit <= 0) {
+                if (errorLimit <= 0) {
+                    log.warn("Error limit reached.");
                 }
+                return false;
             }
+
+            transaction = isTransaction(verb);
+            lastActive = System.nanoTime();
+            state.set(IDLE);
+            return true;
+
+        } catch (IOException e) {
+            log.info("Error reading/writing: {}", e.getMessage());
+
+        } catch (RuntimeException e) {
+            // Closed like any other failure so the connection is not leaked.
+            log.error("Error processing command: {}", e.getMessage(), e);
+        }
+
+        return false;
+    }
+
+    /**
+     * Marks receipt busy once a command was read.
+     * <p>Fails if a shutdown took over the idle connection meanwhile, in which case it is left to the shutdown.
+     *
+     * @return Boolean.
+     */
+    private boolean busy() {
+        return state.compareAndSet(IDLE, BUSY);
+    }
+
+    /**
+     * Flushes buffered replies.
+     * <p>Event driven engines call this before parking the connection.
+     *
+     * @return Boolean, false if the connection should be closed.
+     */
+    public boolean flush() {
+        try {
+            connection.flush();
+            return true;
+
+        } catch (IOException e) {
+            log.info("Error reading/writing: {}", e.getMessage());
+        }
+
+        return false;
+    }
+
+    /**
+     * Gets and clears pause.
+     * <p>Replies are held back until the pause ends and flush() is called.
+     *
+     * @return Pause in milliseconds.
+     */
+    public long takePause() {
+        long millis = pause;
+        pause = 0L;
+        return millis;
+    }
+
+    /**
+     * Gets scenario pause after given command.
+     * <p>Sums the reply delay for the command and the time to read its line at the read rate.
+     * <br>DATA and BDAT payloads are throttled while read so only the command line is paused for.
+     *
+     * @param verb      Verb instance.
+     * @param bytesRead Bytes read for the command line.
+     * @return Pause in milliseconds.
+     */
+    private long getPause(Verb verb, long bytesRead) {
+        Optional<ScenarioConfig> opt = connection.getScenario();
+        if (!opt.isPresent()) return 0L;
+
+        long millis = opt.get().getDelay(verb.getKey());
+        long rate = opt.get().getReadRate();
+        if (rate > 0 && bytesRead > 0) {
+            millis += bytesRead * 1000L / rate;
+        }
+
+        return millis;
+    }
+
+    /**
+     * Is command rate exceeded.
+     * <p>Takes a token from the connection command bucket refilled at the configured command rate.
+     *
+     * @return Boolean.
+     */
+    private boolean isThrottled() {
+        ServerConfig serverConfig = connection.getServerConfig();
+        int rate = serverConfig != null ? serverConfig.getCommandRate() : 0;
+        if (rate <= 0) return false;
+
+        long now = System.nanoTime();
+        int burst = Math.max(1, serverConfig.getCommandBurst());
+        if (commandTokens < 0) {
+            commandTokens = burst;
+        } else {
+            commandTokens = Math.min(burst, commandTokens + (now - commandTime) * rate / 1e9);
+        }
+        commandTime = now;
+
+        if (commandTokens < 1) return true;
+        commandTokens--;
+        return false;
+    }
+
+    /**
+     * Is synchronising command.
+     * <p>The client waits for the reply of DATA, BDAT LAST, QUIT and STARTTLS before sending more.
+     *
+     * @param verb Verb instance.
+     * @return Boolean.
+     */
+    private boolean isSync(Verb verb) {
+        switch (verb.getKey()) {
+            case "data":
+            case "quit":
+            case "starttls":
+                return true;
+
+            case "bdat":
+                return ((BdatVerb) verb).isLast();
+
+            default:
+                return false;
+        }
+    }
+
+    /**
+     * Is mail transaction in progress after given command.
+     *
+     * @param verb Verb instance.
+     * @return Boolean.
+     */
+    private boolean isTransaction(Verb verb) {
+        switch (verb.getKey()) {
+            case "mail":
+            case "rcpt":
+                return true;
+
+            case "bdat":
+                return !((BdatVerb) verb).isLast();
+
+            case "data":
+            case "rset":
+            case "helo":
+            case "ehlo":
+            case "quit":
+                return false;
+
+            default:
+                return transaction;
+        }
+    }
+
+    /**
+     * Closes the receipt connection.
+     */
+    public void close() {
+        if (closed.getAndSet(true)) return;
+
+        Receipts.remove(this);
+        if (connection != null) {
+            connection.close();
+        }
+        if (closeHandler != null) {
+            closeHandler.run();
+        }
+    }
+
+    /**
+     * Sets close handler.
+     *
+     * @param closeHandler Runnable instance.
+     * @return Self.
+     */
+    public EmailReceipt setCloseHandler(Runnable closeHandler) {
+        this.closeHandler = closeHandler;
+        return this;
+    }
+
+    /**
+     * Is closed.
+     *
+     * @return Boolean.
+     */
+    public boolean isClosed() {
+        return closed.get();
+    }
+
+    /**
+     * Gets last activity nano time.
+     *
+     * @return Nano time.
+     */
+    long getLastActive() {
+        return lastActive;
+    }
+
+    /**
+     * Sends shutdown reply and closes the connection.
+     */
+    void shutdown() {
+        shutdown(SHUTDOWN_RESPONSE);
+    }
+
+    /**
+     * Sends given reply and closes the connection.
+     * <p>Called from a thread other than the one running the receipt.
+     * <br>Idle receipts are taken over and closed outright, the session thread gives up on its next command.
+     * <br>Busy ones only have their socket closed so the thread running them fails and cleans up its own storage.
+     * <br>The reply is written under the connection write lock so it never lands within another reply.
+     *
+     * @param response Reply string.
+     */
+    void shutdown(String response) {
+        if (connection == null) return;
+
+        boolean idle = state.compareAndSet(IDLE, CLOSING);
+        if (!idle && state.get() == CLOSING) return;
+
+        try {
+            connection.write(response);
+            connection.flush();
+        } catch (IOException e) {
+            log.info("Error writing shutdown reply: {}", e.getMessage());
+        }
+
+        if (idle) {
+            close();
+        } else {
+            connection.abort();
+        }
+    }
+
+    /**
+     * Is waiting for the next command.
+     *
+     * @return Boolean.
+     */
+    boolean isIdle() {
+        return state.get() == IDLE;
+    }
+
+    /**
+     * Is mail transaction in progress.
+     *
+     * @return Boolean.
+     */
+    boolean isTransaction() {
+        return transaction;
+    }
+
+    /**
+     * Has more input already buffered.
+     * <p>Pipelined commands or decrypted TLS data may be waiting without the socket being readable.
+     *
+     * @return Boolean.
+     */
+    public boolean hasPendingInput() {
+        return connection != null && connection.hasPendingInput();
+    }
+
+    /**
+     * Is TLS negotiated.
+     * <p>Engines can't read ahead of TLS connections as their bytes must go through the TLS socket.
+     *
+     * @return Boolean.
+     */
+    public boolean isSecure() {
+        return connection != null && connection.isSecure();
+    }
+
+    /**
+     * Hands bytes read ahead by the engine back to the connection.
+     * <p>They are read before anything still waiting on the socket.
+     *
+     * @param bytes  Byte array.
+     * @param offset Offset.
+     * @param length Length.
+     * @return Boolean, false if the connection should be closed.
+     */
+    public boolean unread(byte[] bytes, int offset, int length) {
+        try {
+            connection.unread(bytes, offset, length);
+            return true;
+
         } catch (IOException e) {
             log.info("Error reading/writing: {}", e.getMessage());
         }
 
-        connection.close();
+        return false;
     }
 
     /**
@@ -106,7 +571,7 @@ public class EmailReceipt implements Runnable {
      * @throws IOException Unable to communicate.
      */
     private boolean isError(Verb verb) throws IOException {
-        if (verb.isError()) {
+        if (verb.isError(connection.getServerConfig())) {
             connection.write("500 Syntax error");
             errorLimit--;
             return true;
@@ -124,10 +589,8 @@ public class EmailReceipt implements Runnable {
      */
     private boolean process(Verb verb) throws IOException {
         if (Extensions.isExtension(verb)) {
-            Optional<Extension> opt = Extensions.getExtension(verb);
-            if (opt.isPresent()) {
-                return opt.get().getServer().process(connection, verb);
-            }
+            ServerProcessor processor = Extensions.getServerProcessor(verb);
+            return processor != null && processor.process(connection, verb);
         } else {
             errorLimit--;
             if (errorLimit == 0) {
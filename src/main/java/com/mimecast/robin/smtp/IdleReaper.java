@@ -0,0 +1,167 @@
+package com.mimecast.robin.smtp;
+
+import com.mimecast.robin.main.Metrics;
+import org.apache.logging.log4j.LogManager;
+import org.apache.logging.log4j.Logger;
+
+import java.util.ArrayList;
+import java.util.Iterator;
+import java.util.List;
+import java.util.Set;
+import java.util.concurrent.ConcurrentHashMap;
+import java.util.concurrent.TimeUnit;
+
+/**
+ * Idle session reaper.
+ *
+ * <p>Closes receipts waiting for a command longer than the idle timeout.
+ * <p>Receipts are kept on a timer wheel with one slot per second.
+ * <br>They only record their last activity time so staying active costs nothing.
+ * <br>When its slot comes up a receipt is either reaped or moved to the slot of its new deadline.
+ * <p>Unlike socket timeouts this works the same for parked selector connections which have no thread reading.
+ *
+ * @see Receipts
+ */
+public class IdleReaper implements Runnable {
+    private static final Logger log = LogManager.getLogger(IdleReaper.class);
+
+    /**
+     * Idle timeout response.
+     */
+    private static final String IDLE_RESPONSE = "421 4.4.2 Idle timeout, closing connection";
+
+    /**
+     * Tick length in milliseconds.
+     */
+    private static final long TICK = 1000L;
+
+    /**
+     * Number of wheel slots.
+     * <p>Longer deadlines go around the wheel more than once.
+     */
+    private static final int SLOTS = 64;
+
+    /**
+     * Idle timeout in nanoseconds.
+     */
+    private final long timeout;
+
+    /**
+     * Timer wheel.
+     */
+    private final List<Set<EmailReceipt>> wheel = new ArrayList<>(SLOTS);
+
+    /**
+     * Current slot.
+     */
+    private volatile int cursor = 0;
+
+    /**
+     * Reaper thread.
+     */
+    private Thread thread;
+
+    /**
+     * Constructs a new IdleReaper instance with given idle timeout.
+     *
+     * @param seconds Idle timeout in seconds.
+     */
+    public IdleReaper(long seconds) {
+        this.timeout = TimeUnit.SECONDS.toNanos(seconds);
+        for (int i = 0; i < SLOTS; i++) {
+            wheel.add(ConcurrentHashMap.newKeySet());
+        }
+    }
+
+    /**
+     * Starts reaping in a daemon thread.
+     *
+     * @return Self.
+     */
+    public IdleReaper start() {
+        thread = new Thread(this, "idle-reaper");
+        thread.setDaemon(true);
+        thread.start();
+        return this;
+    }
+
+    /**
+     * Stops reaping.
+     */
+    public void stop() {
+        if (thread != null) {
+            thread.interrupt();
+        }
+    }
+
+    /**
+     * Adds receipt.
+     *
+     * @param receipt EmailReceipt instance.
+     */
+    public void add(EmailReceipt receipt) {
+        schedule(receipt, System.nanoTime());
+    }
+
+    /**
+     * Puts receipt in the slot of its deadline.
+     *
+     * @param receipt EmailReceipt instance.
+     * @param now     Current nano time.
+     */
+    private void schedule(EmailReceipt receipt, long now) {
+        long remaining = TimeUnit.NANOSECONDS.toMillis(receipt.getLastActive() + timeout - now);
+        int ticks = (int) Math.min(SLOTS - 1L, Math.max(1L, remaining / TICK + 1));
+        wheel.get((cursor + ticks) % SLOTS).add(receipt);
+    }
+
+    /**
+     * Reaper loop.
+     */
+    @Override
+    public void run() {
+        log.info("Reaping sessions idle for {} seconds.", TimeUnit.NANOSECONDS.toSeconds(timeout));
+        while (!Thread.currentThread().isInterrupted()) {
+            try {
+                Thread.sleep(TICK);
+            } catch (InterruptedException e) {
+                Thread.currentThread().interrupt();
+                break;
+            }
+
+            tick(System.nanoTime());
+        }
+    }
+
+    /**
+     * Advances the wheel by one slot.
+     * <p>Reaps idle receipts in the slot and reschedules the rest.
+     *
+     * @param now Current nano time.
+     * @return Number of receipts reaped.
+     */
+    int tick(long now) {
+        int next = (cursor + 1) % SLOTS;
+        cursor = next;
+
+        int reaped = 0;
+        Iterator<EmailReceipt> iterator = wheel.get(next).iterator();
+        while (iterator.hasNext()) {
+            EmailReceipt receipt = iterator.next();
+            iterator.remove();
+
+            if (receipt.isClosed()) continue;
+
+            if (receipt.isIdle() && now - receipt.getLastActive() >= timeout) {
+                log.info("Reaping idle session.");
+                receipt.shutdown(IDLE_RESPONSE);
+                Metrics.increment(Metrics.IDLE_REAPED);
+                reaped++;
+            } else {
+                schedule(receipt, now);
+            }
+        }
+
+        return reaped;
+    }
+}
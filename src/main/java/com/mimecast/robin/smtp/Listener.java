@@ -0,0 +1,68 @@
+package com.mimecast.robin.smtp;
+
+import com.mimecast.robin.config.server.ListenerConfig;
+
+import java.io.IOException;
+import java.net.ServerSocket;
+
+/**
+ * SMTP listener.
+ *
+ * <p>Common interface of the listener engines so the server can run any number of them side by side.
+ * <p>Listeners are bound on construction and accept connections once listen() is called.
+ * <p>A listener configured with several acceptors runs one instance per acceptor on the same port.
+ * <p>On shutdown listeners stop accepting first and are closed once open connections are drained.
+ *
+ * @see SmtpListener
+ * @see SelectorListener
+ */
+public interface Listener {
+
+    /**
+     * Accepts connections until shutdown.
+     * <p>Blocks the calling thread.
+     */
+    void listen();
+
+    /**
+     * Shutdown.
+     * <p>Stops accepting connections.
+     *
+     * @throws IOException Unable to communicate.
+     */
+    void serverShutdown() throws IOException;
+
+    /**
+     * Closes listener and any resources left once connections are drained.
+     */
+    void close();
+
+    /**
+     * Gets listener.
+     *
+     * @return ServerSocket instance.
+     */
+    ServerSocket getListener();
+
+    /**
+     * Gets listener configuration.
+     *
+     * @return ListenerConfig instance.
+     */
+    ListenerConfig getListenerConfig();
+
+    /**
+     * Gets acceptor index.
+     * <p>Zero unless the listener runs several acceptors.
+     *
+     * @return Acceptor index.
+     */
+    int getAcceptor();
+
+    /**
+     * Gets number of connections accepted.
+     *
+     * @return Accepted count.
+     */
+    long getAccepted();
+}
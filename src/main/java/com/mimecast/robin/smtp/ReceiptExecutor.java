@@ -0,0 +1,407 @@
+package com.mimecast.robin.smtp;
+
+import com.mimecast.robin.config.server.ListenerConfig;
+import com.mimecast.robin.util.VirtualThreads;
+import org.apache.logging.log4j.LogManager;
+import org.apache.logging.log4j.Logger;
+
+import java.io.IOException;
+import java.io.OutputStream;
+import java.net.Socket;
+import java.nio.charset.StandardCharsets;
+import java.util.concurrent.*;
+import java.util.concurrent.atomic.AtomicInteger;
+import java.util.concurrent.atomic.AtomicLong;
+
+/**
+ * Email receipt executor.
+ *
+ * <p>Schedules an email receipt for each socket accepted by the listener.
+ * <p>If a client limiter is set connections over the per address limits are rejected before scheduling.
+ * <p>When a pool size is configured receipts are ran by a bounded worker pool with a bounded queue.
+ * <p>Once both are full the overflow policy decides if the connection is rejected or the accept loop blocks.
+ * <p>With no pool size configured every connection gets its own thread.
+ * <p>Threads can be virtual threads where the runtime supports them.
+ * <br>This suits receipts best as they spend most of their time blocked reading the socket.
+ * <p>Virtual threads are never pooled.
+ * <br>Each receipt gets its own and the pool size only limits how many run at once.
+ *
+ * @see SmtpListener
+ * @see EmailReceipt
+ */
+public class ReceiptExecutor {
+    private static final Logger log = LogManager.getLogger(ReceiptExecutor.class);
+
+    /**
+     * Overflow policy to reject connections with a 421.
+     */
+    public static final String REJECT = "reject";
+
+    /**
+     * Overflow policy to block the accept loop.
+     */
+    public static final String BLOCK = "block";
+
+    /**
+     * Overflow rejection response.
+     */
+    private static final String REJECT_RESPONSE = "421 4.3.2 Too many connections, try again later\r\n";
+
+    /**
+     * Worker pool instance.
+     * <p>Null if running thread per connection.
+     */
+    private final ThreadPoolExecutor pool;
+
+    /**
+     * Running virtual receipts limit.
+     * <p>Null unless running virtual threads with a pool size.
+     */
+    private final Semaphore slots;
+
+    /**
+     * Maximum number of virtual receipts waiting for a slot.
+     */
+    private final int queueSize;
+
+    /**
+     * Virtual receipts waiting for a slot counter.
+     */
+    private final AtomicInteger waiting = new AtomicInteger();
+
+    /**
+     * Block accept loop on overflow.
+     */
+    private final boolean block;
+
+    /**
+     * Virtual thread factory.
+     * <p>Null if running platform threads.
+     */
+    private final ThreadFactory virtualFactory;
+
+    /**
+     * Active receipts counter.
+     */
+    private final AtomicInteger active = new AtomicInteger();
+
+    /**
+     * Rejected connections counter.
+     */
+    private final AtomicLong rejected = new AtomicLong();
+
+    /**
+     * Thread name counter.
+     */
+    private final AtomicInteger threads = new AtomicInteger();
+
+    /**
+     * ClientLimiter instance.
+     * <p>Null if not limiting clients.
+     */
+    private ClientLimiter limiter;
+
+    /**
+     * Constructs a new ReceiptExecutor instance.
+     *
+     * @param poolSize  Maximum number of worker threads (0 for thread per connection).
+     * @param queueSize Maximum number of connections waiting for a worker.
+     * @param overflow  Overflow policy (reject or block).
+     */
+    public ReceiptExecutor(int poolSize, int queueSize, String overflow) {
+        this(poolSize, queueSize, overflow, false);
+    }
+
+    /**
+     * Constructs a new ReceiptExecutor instance.
+     *
+     * @param poolSize  Maximum number of worker threads (0 for thread per connection).
+     * @param queueSize Maximum number of connections waiting for a worker.
+     * @param overflow  Overflow policy (reject or block).
+     * @param virtual   Run receipts on virtual threads.
+     */
+    public ReceiptExecutor(int poolSize, int queueSize, String overflow, boolean virtual) {
+        this.block = BLOCK.equalsIgnoreCase(overflow);
+        this.virtualFactory = virtual ? VirtualThreads.factory("receipt-virtual-") : null;
+        if (virtualFactory != null) {
+            log.info("Running receipts on virtual threads.");
+        }
+
+        this.queueSize = queueSize;
+        if (poolSize > 0 && virtualFactory != null) {
+            pool = null;
+            slots = new Semaphore(poolSize);
+            log.info("Limiting virtual receipts to {} running and {} waiting on {} overflow.", poolSize, queueSize, block ? BLOCK : REJECT);
+        } else if (poolSize > 0) {
+            slots = null;
+            BlockingQueue<Runnable> queue = queueSize > 0 ? new ArrayBlockingQueue<>(queueSize) : new SynchronousQueue<>();
+            pool = new ThreadPoolExecutor(poolSize, poolSize, 60L, TimeUnit.SECONDS, queue, this::newThread, this::overflow);
+            pool.allowCoreThreadTimeOut(true);
+            log.info("Started receipt pool with {} workers and {} queue size on {} overflow.", poolSize, queueSize, block ? BLOCK : REJECT);
+        } else {
+            pool = null;
+            slots = null;
+        }
+    }
+
+    /**
+     * Schedules receipt for given socket.
+     *
+     * @param socket Accepted socket.
+     */
+    public void execute(Socket socket) {
+        execute(socket, null);
+    }
+
+    /**
+     * Schedules receipt for given socket accepted on given listener.
+     *
+     * @param socket   Accepted socket.
+     * @param listener ListenerConfig instance.
+     */
+    public void execute(Socket socket, ListenerConfig listener) {
+        ClientLimiter.Permit permit = null;
+        if (limiter != null) {
+            permit = limiter.acquire(socket.getInetAddress());
+            if (permit == null) {
+                limiter.reject(socket);
+                return;
+            }
+        }
+
+        Receipt receipt = new Receipt(socket, listener, permit);
+
+        if (pool != null) {
+            pool.execute(receipt);
+        } else if (slots != null) {
+            limit(receipt);
+        } else {
+            newThread(receipt).start();
+        }
+    }
+
+    /**
+     * Starts virtual receipt within the pool size limit.
+     * <p>Receipts over the limit wait for a slot on their own thread while the queue has room.
+     * <br>Once it is full the overflow policy applies.
+     *
+     * @param receipt Receipt instance.
+     */
+    private void limit(Receipt receipt) {
+        if (slots.tryAcquire()) {
+            newThread(() -> runLimited(receipt)).start();
+            return;
+        }
+
+        if (waiting.incrementAndGet() <= queueSize) {
+            newThread(() -> {
+                try {
+                    slots.acquire();
+                } catch (InterruptedException e) {
+                    waiting.decrementAndGet();
+                    Thread.currentThread().interrupt();
+                    reject(receipt);
+                    return;
+                }
+                waiting.decrementAndGet();
+                runLimited(receipt);
+            }).start();
+            return;
+        }
+        waiting.decrementAndGet();
+
+        if (block) {
+            try {
+                slots.acquire();
+                newThread(() -> runLimited(receipt)).start();
+                return;
+            } catch (InterruptedException e) {
+                log.info("Interrupted waiting for receipt slot.");
+                Thread.currentThread().interrupt();
+            }
+        }
+
+        reject(receipt);
+    }
+
+    /**
+     * Runs receipt and frees its slot.
+     *
+     * @param receipt Receipt instance.
+     */
+    private void runLimited(Receipt receipt) {
+        try {
+            receipt.run();
+        } finally {
+            slots.release();
+        }
+    }
+
+    /**
+     * Sets client limiter.
+     *
+     * @param limiter ClientLimiter instance.
+     * @return Self.
+     */
+    public ReceiptExecutor setLimiter(ClientLimiter limiter) {
+        this.limiter = limiter;
+        return this;
+    }
+
+    /**
+     * Thread factory.
+     *
+     * @param runnable Runnable instance.
+     * @return Thread instance.
+     */
+    private Thread newThread(Runnable runnable) {
+        if (virtualFactory != null) {
+            return virtualFactory.newThread(runnable);
+        }
+
+        return new Thread(runnable, "receipt-" + threads.incrementAndGet());
+    }
+
+    /**
+     * Overflow handler.
+     * <p>Blocks until queue space is available or rejects the connection.
+     *
+     * @param runnable Runnable instance.
+     * @param executor Executor instance.
+     */
+    private void overflow(Runnable runnable, ThreadPoolExecutor executor) {
+        if (block && !executor.isShutdown()) {
+            try {
+                executor.getQueue().put(runnable);
+                return;
+            } catch (InterruptedException e) {
+                log.info("Interrupted waiting for receipt queue.");
+                Thread.currentThread().interrupt();
+            }
+        }
+
+        reject((Receipt) runnable);
+    }
+
+    /**
+     * Rejects receipt on overflow.
+     *
+     * @param receipt Receipt instance.
+     */
+    private void reject(Receipt receipt) {
+        rejected.incrementAndGet();
+        log.warn("Receipt pool full, rejecting connection. Active: {}, Queued: {}, Rejected: {}", getActive(), getQueued(), getRejected());
+        receipt.reject();
+    }
+
+    /**
+     * Gets number of receipts currently running.
+     *
+     * @return Integer.
+     */
+    public int getActive() {
+        return active.get();
+    }
+
+    /**
+     * Gets number of connections waiting for a worker.
+     *
+     * @return Integer.
+     */
+    public int getQueued() {
+        if (pool != null) {
+            return pool.getQueue().size();
+        }
+
+        return slots != null ? Math.min(waiting.get(), queueSize) : 0;
+    }
+
+    /**
+     * Gets number of connections rejected due to overflow.
+     *
+     * @return Long.
+     */
+    public long getRejected() {
+        return rejected.get();
+    }
+
+    /**
+     * Shutdown.
+     * <p>Running receipts are left to finish.
+     */
+    public void shutdown() {
+        if (pool != null) {
+            pool.shutdown();
+        }
+    }
+
+    /**
+     * Receipt runnable wrapper.
+     * <p>Builds the receipt on the worker thread and keeps the active counter.
+     */
+    private class Receipt implements Runnable {
+
+        /**
+         * Accepted socket.
+         */
+        private final Socket socket;
+
+        /**
+         * Listener the socket was accepted on.
+         */
+        private final ListenerConfig listener;
+
+        /**
+         * Client limiter permit.
+         * <p>Null if not limiting clients.
+         */
+        private final ClientLimiter.Permit permit;
+
+        /**
+         * Constructs a new Receipt instance.
+         *
+         * @param socket   Accepted socket.
+         * @param listener ListenerConfig instance.
+         * @param permit   ClientLimiter.Permit instance.
+         */
+        Receipt(Socket socket, ListenerConfig listener, ClientLimiter.Permit permit) {
+            this.socket = socket;
+            this.listener = listener;
+            this.permit = permit;
+        }
+
+        @Override
+        public void run() {
+            active.incrementAndGet();
+            try {
+                new EmailReceipt(socket, listener).run();
+            } finally {
+                active.decrementAndGet();
+                release();
+            }
+        }
+
+        /**
+         * Releases client limiter permit.
+         */
+        void release() {
+            if (permit != null) {
+                permit.release();
+            }
+        }
+
+        /**
+         * Rejects connection.
+         */
+        void reject() {
+            release();
+            try (Socket sock = socket) {
+                OutputStream out = sock.getOutputStream();
+                out.write(REJECT_RESPONSE.getBytes(StandardCharsets.US_ASCII));
+                out.flush();
+            } catch (IOException e) {
+                log.info("Error rejecting connection: {}", e.getMessage());
+            }
+        }
+    }
+}
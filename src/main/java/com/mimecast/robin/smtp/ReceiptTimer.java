@@ -0,0 +1,65 @@
+package com.mimecast.robin.smtp;
+
+import java.util.concurrent.ScheduledExecutorService;
+import java.util.concurrent.ScheduledFuture;
+import java.util.concurrent.ScheduledThreadPoolExecutor;
+import java.util.concurrent.TimeUnit;
+
+/**
+ * Shared receipt timer.
+ *
+ * <p>Schedules paused receipts to resume once their response delay or read throttle pause ends.
+ * <p>A single daemon thread serves all event driven connections so a paused session holds no thread.
+ * <br>Scheduled tasks should only hand the receipt back to a worker.
+ *
+ * @see SelectorListener
+ */
+public class ReceiptTimer {
+
+    /**
+     * Scheduler instance.
+     */
+    private static volatile ScheduledExecutorService scheduler;
+
+    /**
+     * Protected constructor.
+     */
+    private ReceiptTimer() {
+        throw new IllegalStateException("Static class");
+    }
+
+    /**
+     * Schedules task.
+     *
+     * @param task  Runnable instance.
+     * @param delay Delay in milliseconds.
+     * @return ScheduledFuture instance.
+     */
+    public static ScheduledFuture<?> schedule(Runnable task, long delay) {
+        return getScheduler().schedule(task, delay, TimeUnit.MILLISECONDS);
+    }
+
+    /**
+     * Gets scheduler.
+     * <p>Started on first use.
+     *
+     * @return ScheduledExecutorService instance.
+     */
+    private static ScheduledExecutorService getScheduler() {
+        if (scheduler == null) {
+            synchronized (ReceiptTimer.class) {
+                if (scheduler == null) {
+                    ScheduledThreadPoolExecutor executor = new ScheduledThreadPoolExecutor(1, runnable -> {
+                        Thread thread = new Thread(runnable, "receipt-timer");
+                        thread.setDaemon(true);
+                        return thread;
+                    });
+                    executor.setRemoveOnCancelPolicy(true);
+                    scheduler = executor;
+                }
+            }
+        }
+
+        return scheduler;
+    }
+}
@@ -0,0 +1,156 @@
+package com.mimecast.robin.smtp;
+
+import org.apache.logging.log4j.LogManager;
+import org.apache.logging.log4j.Logger;
+
+import java.util.Set;
+import java.util.concurrent.ConcurrentHashMap;
+import java.util.concurrent.TimeUnit;
+
+/**
+ * Live email receipts.
+ *
+ * <p>Tracks open receipts across all listeners and engines so the server can drain them on shutdown.
+ * <p>Once draining new connections and new transactions get a 421 while transactions in progress may finish.
+ * <br>Idle sessions are closed right away and whatever is left once the drain period ends is closed as well.
+ * <p>If an idle timeout is configured receipts are also handed to the idle reaper.
+ *
+ * @see EmailReceipt
+ * @see IdleReaper
+ */
+public class Receipts {
+    private static final Logger log = LogManager.getLogger(Receipts.class);
+
+    /**
+     * Drain progress poll interval in milliseconds.
+     */
+    private static final long POLL = 100L;
+
+    /**
+     * Live receipts.
+     */
+    private static final Set<EmailReceipt> live = ConcurrentHashMap.newKeySet();
+
+    /**
+     * Draining boolean.
+     */
+    private static volatile boolean draining = false;
+
+    /**
+     * IdleReaper instance.
+     * <p>Null if not reaping idle sessions.
+     */
+    private static volatile IdleReaper reaper;
+
+    /**
+     * Protected constructor.
+     */
+    private Receipts() {
+        throw new IllegalStateException("Static class");
+    }
+
+    /**
+     * Adds receipt.
+     *
+     * @param receipt EmailReceipt instance.
+     */
+    static void add(EmailReceipt receipt) {
+        live.add(receipt);
+
+        IdleReaper idleReaper = reaper;
+        if (idleReaper != null) {
+            idleReaper.add(receipt);
+        }
+    }
+
+    /**
+     * Starts idle reaper.
+     *
+     * @param seconds Idle timeout in seconds.
+     */
+    public static synchronized void startReaper(long seconds) {
+        if (reaper == null) {
+            reaper = new IdleReaper(seconds).start();
+        }
+    }
+
+    /**
+     * Removes receipt.
+     *
+     * @param receipt EmailReceipt instance.
+     */
+    static void remove(EmailReceipt receipt) {
+        live.remove(receipt);
+    }
+
+    /**
+     * Gets number of live receipts.
+     *
+     * @return Integer.
+     */
+    public static int getLive() {
+        return live.size();
+    }
+
+    /**
+     * Is draining.
+     *
+     * @return Boolean.
+     */
+    public static boolean isDraining() {
+        return draining;
+    }
+
+    /**
+     * Sets draining.
+     * <p>For testing purposes only.
+     *
+     * @param draining Boolean.
+     */
+    static void setDraining(boolean draining) {
+        Receipts.draining = draining;
+    }
+
+    /**
+     * Drains live receipts.
+     * <p>Blocks until all receipts closed or the drain period ended.
+     * <br>Listeners should stop accepting before this is called.
+     *
+     * @param seconds Drain period in seconds.
+     * @return Number of receipts closed forcibly.
+     */
+    public static int drain(long seconds) {
+        draining = true;
+        log.info("Draining {} connections for up to {} seconds.", live.size(), seconds);
+
+        // Nothing to wait for on idle sessions.
+        for (EmailReceipt receipt : live) {
+            if (receipt.isIdle() && !receipt.isTransaction()) {
+                receipt.shutdown();
+            }
+        }
+
+        long deadline = System.nanoTime() + TimeUnit.SECONDS.toNanos(seconds);
+        while (!live.isEmpty() && System.nanoTime() < deadline) {
+            try {
+                Thread.sleep(POLL);
+            } catch (InterruptedException e) {
+                Thread.currentThread().interrupt();
+                break;
+            }
+        }
+
+        int forced = 0;
+        for (EmailReceipt receipt : live) {
+            receipt.shutdown();
+            forced++;
+        }
+
+        if (forced > 0) {
+            log.warn("Drain period ended, closed {} connections.", forced);
+        } else {
+            log.info("All connections drained.");
+        }
+        return forced;
+    }
+}
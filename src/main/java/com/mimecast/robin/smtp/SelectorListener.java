@@ -0,0 +1,766 @@
+package com.mimecast.robin.smtp;
+
+import com.mimecast.robin.config.server.ListenerConfig;
+import com.mimecast.robin.main.Config;
+import com.mimecast.robin.util.ReusePort;
+import com.mimecast.robin.util.VirtualThreads;
+import org.apache.logging.log4j.LogManager;
+import org.apache.logging.log4j.Logger;
+
+import java.io.IOException;
+import java.net.InetAddress;
+import java.net.InetSocketAddress;
+import java.net.ServerSocket;
+import java.nio.ByteBuffer;
+import java.nio.channels.*;
+import java.util.ArrayList;
+import java.util.Iterator;
+import java.util.List;
+import java.util.Queue;
+import java.util.concurrent.*;
+import java.util.concurrent.atomic.AtomicBoolean;
+import java.util.concurrent.atomic.AtomicInteger;
+import java.util.concurrent.atomic.AtomicLong;
+
+/**
+ * SMTP selector listener.
+ *
+ * <p>Event driven alternative to the SmtpListener.
+ * <p>Idle connections are parked on a handful of selector event loops and hold no thread.
+ * <p>Event loops read plain connections without blocking until a whole command line is buffered.
+ * <br>Only then is the connection handed to a worker which processes commands via the receipt state machine.
+ * <br>This way clients sending partial command lines hold no worker.
+ * <br>The worker keeps going while input is already buffered (pipelining or decrypted TLS data) then parks it again.
+ * <p>Commands are processed by the same extensions and server processors as the thread engine.
+ * <br>These remain stream based so a connection is switched to blocking mode while a worker handles it.
+ * <br>DATA and BDAT payloads and TLS connections, which are handed over as soon as readable, still hold their worker while they trickle in.
+ * <br>So unless a pool size is set every busy connection gets a worker, virtual if the runtime supports them.
+ * <p>Several listeners may share one worker executor.
+ * <p>If a client limiter is set connections over the per address limits are rejected before a receipt is built.
+ * <p>With several acceptors each instance opens the same port with SO_REUSEPORT and runs its own event loops.
+ * <p>Receipts paused by a scenario delay or read throttle wait on the shared receipt timer rather than a worker.
+ *
+ * @see EmailReceipt
+ * @see ReceiptTimer
+ * @see SmtpListener
+ */
+public class SelectorListener implements Listener {
+    private static final Logger log = LogManager.getLogger(SelectorListener.class);
+
+    /**
+     * Read ahead buffer size if command lines are unlimited.
+     */
+    private static final int READ_AHEAD_SIZE = 8192;
+
+    /**
+     * ServerSocketChannel instance.
+     */
+    private ServerSocketChannel listener;
+
+    /**
+     * Server shutdown boolean.
+     */
+    private volatile boolean serverShutdown = false;
+
+    /**
+     * Event loops closed boolean.
+     */
+    private volatile boolean closed = false;
+
+    /**
+     * ListenerConfig instance.
+     */
+    private final ListenerConfig listenerConfig;
+
+    /**
+     * Shutdown workers with the listener.
+     * <p>False if workers are shared with other listeners.
+     */
+    private final boolean ownWorkers;
+
+    /**
+     * Event loops.
+     */
+    private final EventLoop[] loops;
+
+    /**
+     * Worker executor.
+     */
+    private final ExecutorService workers;
+
+    /**
+     * Open connections counter.
+     */
+    private final AtomicInteger connections = new AtomicInteger();
+
+    /**
+     * Accepted connections counter.
+     */
+    private final AtomicLong accepted = new AtomicLong();
+
+    /**
+     * Acceptor index.
+     */
+    private final int acceptor;
+
+    /**
+     * ClientLimiter instance.
+     * <p>Null if not limiting clients.
+     */
+    private ClientLimiter limiter;
+
+    /**
+     * Next event loop index.
+     */
+    private int next = 0;
+
+    /**
+     * Constructs a new SelectorListener instance.
+     *
+     * @param port    Port number.
+     * @param backlog Backlog size.
+     * @param bind    Interface to bind to.
+     */
+    public SelectorListener(int port, int backlog, String bind) {
+        this(port, backlog, bind, Config.getServer().getSelectorThreads(), Config.getServer().getPoolSize());
+    }
+
+    /**
+     * Constructs a new SelectorListener instance with given sizes.
+     *
+     * @param port      Port number.
+     * @param backlog   Backlog size.
+     * @param bind      Interface to bind to.
+     * @param selectors Number of event loops.
+     * @param poolSize  Number of worker threads (0 for a worker per busy connection).
+     */
+    public SelectorListener(int port, int backlog, String bind, int selectors, int poolSize) {
+        this.listenerConfig = SmtpListener.listenerConfig(port, backlog, bind);
+        this.workers = buildWorkers(poolSize);
+        this.ownWorkers = true;
+        this.acceptor = 0;
+        this.loops = new EventLoop[Math.max(1, selectors)];
+
+        try {
+            bind();
+        } catch (IOException e) {
+            log.fatal("Error listening: {}", e.getMessage());
+            close();
+            return;
+        }
+
+        try {
+            listen();
+        } finally {
+            close();
+        }
+    }
+
+    /**
+     * Constructs a new SelectorListener instance with given listener configuration and workers.
+     * <p>The socket is bound and event loops started but connections are only accepted once listen() is called.
+     *
+     * @param listenerConfig ListenerConfig instance.
+     * @param workers        Worker executor, shared with other listeners.
+     * @param selectors      Number of event loops.
+     * @throws IOException Unable to bind.
+     */
+    public SelectorListener(ListenerConfig listenerConfig, ExecutorService workers, int selectors) throws IOException {
+        this(listenerConfig, workers, selectors, 0);
+    }
+
+    /**
+     * Constructs a new SelectorListener instance with given listener configuration, workers and acceptor index.
+     * <p>If the listener has several acceptors the socket is opened with SO_REUSEPORT.
+     *
+     * @param listenerConfig ListenerConfig instance.
+     * @param workers        Worker executor, shared with other listeners.
+     * @param selectors      Number of event loops.
+     * @param acceptor       Acceptor index.
+     * @throws IOException Unable to bind.
+     */
+    public SelectorListener(ListenerConfig listenerConfig, ExecutorService workers, int selectors, int acceptor) throws IOException {
+        this.listenerConfig = listenerConfig;
+        this.workers = workers;
+        this.ownWorkers = false;
+        this.acceptor = acceptor;
+        this.loops = new EventLoop[Math.max(1, selectors)];
+
+        try {
+            bind();
+        } catch (IOException e) {
+            close();
+            throw e;
+        }
+    }
+
+    /**
+     * Binds server socket channel and starts event loops.
+     *
+     * @throws IOException Unable to bind.
+     */
+    private void bind() throws IOException {
+        listener = ServerSocketChannel.open();
+        if (listenerConfig.getAcceptors() > 1) {
+            ReusePort.enable(listener);
+        }
+        listener.socket().bind(new InetSocketAddress(InetAddress.getByName(listenerConfig.getBind()), listenerConfig.getPort()), listenerConfig.getBacklog());
+
+        for (int i = 0; i < loops.length; i++) {
+            loops[i] = new EventLoop(Selector.open());
+            Thread thread = new Thread(loops[i], "selector-" + listenerConfig.getPort() + "-" + acceptor + "-" + (i + 1));
+            thread.setDaemon(true);
+            thread.start();
+        }
+        log.info("Started selector listener on {} acceptor {} with {} event loops{}.",
+                listenerConfig.getName(), acceptor, loops.length, listenerConfig.isSecure() ? " and implicit TLS" : "");
+    }
+
+    /**
+     * Accepts connections until shutdown then closes the listener.
+     * <p>Event loops keep serving open connections until close() is called.
+     */
+    @Override
+    public void listen() {
+        log.info("Expecting connection.");
+        try {
+            acceptConnection();
+        } finally {
+            closeListener();
+        }
+    }
+
+    /**
+     * Builds worker executor.
+     * <p>Can be shared by several listeners.
+     * <p>Workers block while reading DATA and BDAT payloads and TLS records.
+     * <br>So with no pool size every busy connection gets a worker, virtual if the runtime supports them.
+     * <br>A fixed pool of a few workers would let a handful of slow senders stall every other connection.
+     *
+     * @param poolSize Number of worker threads (0 for a worker per busy connection).
+     * @return ExecutorService instance.
+     */
+    public static ExecutorService buildWorkers(int poolSize) {
+        if (Config.getServer().isVirtualThreads() || (poolSize <= 0 && VirtualThreads.isSupported())) {
+            ThreadFactory factory = VirtualThreads.factory("selector-worker-virtual-");
+            if (factory != null) {
+                log.info("Running selector workers on virtual threads.");
+                return Executors.newCachedThreadPool(factory);
+            }
+        }
+
+        AtomicInteger threads = new AtomicInteger();
+        ThreadFactory factory = runnable -> new Thread(runnable, "selector-worker-" + threads.incrementAndGet());
+        if (poolSize <= 0) {
+            return Executors.newCachedThreadPool(factory);
+        }
+
+        // Queue is unbounded as every connection has at most one pending task.
+        return Executors.newFixedThreadPool(poolSize, factory);
+    }
+
+    /**
+     * Accept incomming connection.
+     */
+    private void acceptConnection() {
+        try {
+            do {
+                SocketChannel channel = listener.accept();
+                accepted.incrementAndGet();
+                log.info("Accepted connection from {}:{}.", channel.socket().getInetAddress().getHostAddress(), channel.socket().getPort());
+
+                ClientLimiter.Permit permit = null;
+                if (limiter != null) {
+                    permit = limiter.acquire(channel.socket().getInetAddress());
+                    if (permit == null) {
+                        limiter.reject(channel.socket());
+                        continue;
+                    }
+                }
+
+                Receipt receipt = new Receipt(channel, loops[next], permit);
+                next = (next + 1) % loops.length;
+                connections.incrementAndGet();
+                workers.execute(receipt::open);
+            } while (!serverShutdown);
+
+        } catch (ClosedChannelException e) {
+            log.info("Listener closed.");
+
+        } catch (IOException e) {
+            log.info("Error reading/writing: {}", e.getMessage());
+        }
+    }
+
+    /**
+     * Closes listener.
+     */
+    private void closeListener() {
+        serverShutdown = true;
+        try {
+            if (listener != null && listener.isOpen()) {
+                listener.close();
+                log.info("Closed listener.");
+            }
+        } catch (IOException e) {
+            log.info("Listener already closed.");
+        }
+    }
+
+    /**
+     * Closes listener and event loops.
+     */
+    @Override
+    public void close() {
+        closeListener();
+        closed = true;
+        for (EventLoop loop : loops) {
+            if (loop != null) {
+                loop.close();
+            }
+        }
+    }
+
+    /**
+     * Shutdown.
+     *
+     * @throws IOException Unable to communicate.
+     */
+    @Override
+    public void serverShutdown() throws IOException {
+        serverShutdown = true;
+        if (listener != null) {
+            listener.close();
+        }
+        if (ownWorkers) {
+            workers.shutdown();
+        }
+    }
+
+    /**
+     * Gets listener.
+     *
+     * @return ServerSocket instance.
+     */
+    @Override
+    public ServerSocket getListener() {
+        return listener != null ? listener.socket() : null;
+    }
+
+    /**
+     * Gets listener configuration.
+     *
+     * @return ListenerConfig instance.
+     */
+    @Override
+    public ListenerConfig getListenerConfig() {
+        return listenerConfig;
+    }
+
+    /**
+     * Sets client limiter.
+     * <p>Must be set before listen() is called.
+     *
+     * @param limiter ClientLimiter instance.
+     * @return Self.
+     */
+    public SelectorListener setLimiter(ClientLimiter limiter) {
+        this.limiter = limiter;
+        return this;
+    }
+
+    /**
+     * Gets acceptor index.
+     *
+     * @return Acceptor index.
+     */
+    @Override
+    public int getAcceptor() {
+        return acceptor;
+    }
+
+    /**
+     * Gets number of connections accepted.
+     *
+     * @return Accepted count.
+     */
+    @Override
+    public long getAccepted() {
+        return accepted.get();
+    }
+
+    /**
+     * Gets number of open connections.
+     *
+     * @return Integer.
+     */
+    public int getConnections() {
+        return connections.get();
+    }
+
+    /**
+     * Selector event loop.
+     * <p>Waits for parked connections to become readable and hands them to workers.
+     */
+    private class EventLoop implements Runnable {
+
+        /**
+         * Selector instance.
+         */
+        private final Selector selector;
+
+        /**
+         * Receipts waiting to be parked.
+         */
+        private final Queue<Receipt> pending = new ConcurrentLinkedQueue<>();
+
+        /**
+         * Constructs a new EventLoop instance.
+         *
+         * @param selector Selector instance.
+         */
+        EventLoop(Selector selector) {
+            this.selector = selector;
+        }
+
+        /**
+         * Parks receipt until readable.
+         * <p>Called by workers.
+         *
+         * @param receipt Receipt instance.
+         */
+        void park(Receipt receipt) {
+            pending.add(receipt);
+            selector.wakeup();
+        }
+
+        @Override
+        public void run() {
+            List<Receipt> ready = new ArrayList<>();
+
+            while (selector.isOpen() && !closed) {
+                try {
+                    selector.select();
+                    register();
+
+                    collect(ready);
+                    while (!ready.isEmpty()) {
+                        // Deregister cancelled keys so channels can go back to blocking mode.
+                        selector.selectNow();
+                        for (Receipt receipt : ready) {
+                            receipt.resume();
+                        }
+                        ready.clear();
+                        collect(ready);
+                    }
+
+                } catch (ClosedSelectorException e) {
+                    break;
+
+                } catch (IOException e) {
+                    log.error("Selector error: {}", e.getMessage());
+                }
+            }
+
+            shutdown();
+        }
+
+        /**
+         * Registers pending receipts.
+         */
+        private void register() {
+            Receipt receipt;
+            while ((receipt = pending.poll()) != null) {
+                try {
+                    receipt.channel.configureBlocking(false);
+                    receipt.channel.register(selector, SelectionKey.OP_READ, receipt);
+                } catch (IOException e) {
+                    log.info("Error parking connection: {}", e.getMessage());
+                    receipt.close();
+                }
+            }
+        }
+
+        /**
+         * Collects readable receipts with a command line ready.
+         * <p>Their keys are cancelled as a worker takes over the connection.
+         *
+         * @param ready Ready receipts list.
+         */
+        private void collect(List<Receipt> ready) {
+            Iterator<SelectionKey> iterator = selector.selectedKeys().iterator();
+            while (iterator.hasNext()) {
+                SelectionKey key = iterator.next();
+                iterator.remove();
+
+                if (key.isValid() && key.isReadable()) {
+                    Receipt receipt = (Receipt) key.attachment();
+                    if (receipt.readAhead()) {
+                        key.cancel();
+                        ready.add(receipt);
+                    }
+                }
+            }
+        }
+
+        /**
+         * Stops event loop.
+         */
+        void close() {
+            selector.wakeup();
+        }
+
+        /**
+         * Closes parked connections and selector.
+         * <p>Runs on the event loop thread once stopped.
+         */
+        private void shutdown() {
+            try {
+                for (SelectionKey key : selector.keys()) {
+                    ((Receipt) key.attachment()).close();
+                }
+                selector.close();
+
+                Receipt receipt;
+                while ((receipt = pending.poll()) != null) {
+                    receipt.close();
+                }
+            } catch (ClosedSelectorException | IOException e) {
+                log.info("Selector already closed.");
+            }
+        }
+    }
+
+    /**
+     * Selector receipt.
+     * <p>Binds the receipt state machine to its channel and event loop.
+     */
+    private class Receipt {
+
+        /**
+         * SocketChannel instance.
+         * <p>Kept as the receipt socket may be replaced with a TLS socket.
+         */
+        private final SocketChannel channel;
+
+        /**
+         * EventLoop instance.
+         */
+        private final EventLoop loop;
+
+        /**
+         * Client limiter permit.
+         * <p>Null if not limiting clients.
+         */
+        private final ClientLimiter.Permit permit;
+
+        /**
+         * EmailReceipt instance.
+         */
+        private EmailReceipt receipt;
+
+        /**
+         * Closed boolean.
+         */
+        private final AtomicBoolean closed = new AtomicBoolean();
+
+        /**
+         * Bytes read ahead by the event loop.
+         * <p>Null until first used.
+         */
+        private ByteBuffer buffer;
+
+        /**
+         * Constructs a new Receipt instance.
+         *
+         * @param channel SocketChannel instance.
+         * @param loop    EventLoop instance.
+         * @param permit  ClientLimiter.Permit instance.
+         */
+        Receipt(SocketChannel channel, EventLoop loop, ClientLimiter.Permit permit) {
+            this.channel = channel;
+            this.loop = loop;
+            this.permit = permit;
+        }
+
+        /**
+         * Builds receipt and sends welcome message.
+         * <p>Runs on a worker.
+         */
+        void open() {
+            boolean parked = false;
+            try {
+                // Idle reaper or drain may close the receipt while parked.
+                receipt = new EmailReceipt(channel.socket(), listenerConfig).setCloseHandler(this::close);
+                parked = receipt.open() && receipt.flush();
+                if (parked) {
+                    loop.park(this);
+                }
+            } finally {
+                if (!parked) {
+                    close();
+                }
+            }
+        }
+
+        /**
+         * Reads available input without blocking.
+         * <p>Runs on the event loop.
+         * <br>Input is buffered until it holds a whole command line or the buffer is full,
+         * which leaves too long lines for the worker to reject.
+         * <br>TLS connections are handed over right away as their bytes must go through the TLS socket.
+         *
+         * @return Boolean, true once the connection should be handed to a worker.
+         */
+        boolean readAhead() {
+            if (receipt == null || receipt.isSecure()) return true;
+
+            try {
+                if (buffer == null) {
+                    int limit = Config.getServer().getCommandLineLimit();
+                    buffer = ByteBuffer.allocate(limit > 0 ? limit : READ_AHEAD_SIZE);
+                }
+
+                int start = buffer.position();
+                if (channel.read(buffer) == -1) return true;
+
+                // A CR ends the line only once the byte after it shows it is not part of a CRLF.
+                for (int i = start; i < buffer.position(); i++) {
+                    byte b = buffer.get(i);
+                    if (b == '\n' || (b == '\r' && i + 1 < buffer.position())) {
+                        return true;
+                    }
+                }
+
+                return !buffer.hasRemaining();
+
+            } catch (IOException e) {
+                // Worker runs into the same error and closes.
+                return true;
+            }
+        }
+
+        /**
+         * Hands the connection to a worker.
+         */
+        void resume() {
+            try {
+                channel.configureBlocking(true);
+                workers.execute(this::step);
+            } catch (IOException | RejectedExecutionException e) {
+                log.info("Error resuming connection: {}", e.getMessage());
+                close();
+            }
+        }
+
+        /**
+         * Processes commands while input is available then parks.
+         * <p>Runs on a worker.
+         * <br>The connection is closed on any failure, unchecked ones included, so it is never leaked.
+         */
+        void step() {
+            boolean kept = false;
+            try {
+                kept = steps();
+            } finally {
+                if (!kept) {
+                    close();
+                }
+            }
+        }
+
+        /**
+         * Processes commands while input is available then parks or pauses.
+         *
+         * @return Boolean, false if the connection should be closed.
+         */
+        private boolean steps() {
+            // Bytes read ahead go back to the receipt input.
+            if (buffer != null && buffer.position() > 0) {
+                boolean unread = receipt.unread(buffer.array(), 0, buffer.position());
+                buffer.clear();
+                if (!unread) return false;
+            }
+
+            boolean open;
+            long pause;
+            do {
+                open = receipt.step();
+                pause = open ? receipt.takePause() : 0L;
+            } while (open && pause == 0 && receipt.hasPendingInput());
+
+            // Paused receipts hold no worker until the timer hands them back.
+            if (open && pause > 0) {
+                ReceiptTimer.schedule(this::unpause, pause);
+                return true;
+            }
+
+            // Replies are flushed once input is drained.
+            if (open && receipt.flush() && !SelectorListener.this.closed) {
+                loop.park(this);
+                return true;
+            }
+
+            return false;
+        }
+
+        /**
+         * Hands the paused connection back to a worker.
+         * <p>Runs on the receipt timer.
+         */
+        void unpause() {
+            try {
+                workers.execute(this::proceed);
+            } catch (RejectedExecutionException e) {
+                log.info("Error resuming connection: {}", e.getMessage());
+                close();
+            }
+        }
+
+        /**
+         * Flushes held back replies then carries on with buffered input or parks.
+         * <p>Runs on a worker.
+         */
+        void proceed() {
+            // Idle reaper or drain may close the receipt while paused.
+            if (closed.get()) return;
+
+            boolean kept = false;
+            try {
+                if (receipt.flush() && !SelectorListener.this.closed) {
+                    if (receipt.hasPendingInput()) {
+                        kept = steps();
+                    } else {
+                        loop.park(this);
+                        kept = true;
+                    }
+                }
+            } finally {
+                if (!kept) {
+                    close();
+                }
+            }
+        }
+
+        /**
+         * Closes receipt.
+         */
+        void close() {
+            if (closed.getAndSet(true)) return;
+
+            if (receipt != null) {
+                receipt.close();
+            } else {
+                try {
+                    channel.close();
+                } catch (IOException e) {
+                    log.info("Error closing channel: {}", e.getMessage());
+                }
+            }
+            connections.decrementAndGet();
+            if (permit != null) {
+                permit.release();
+            }
+        }
+    }
+}
@@ -1,23 +1,35 @@
 package com.mimecast.robin.smtp;
 
+import com.mimecast.robin.config.server.ListenerConfig;
+import com.mimecast.robin.main.Config;
+import com.mimecast.robin.util.ReusePort;
 import org.apache.logging.log4j.LogManager;
 import org.apache.logging.log4j.Logger;
 
 import java.io.IOException;
 import java.net.InetAddress;
+import java.net.InetSocketAddress;
 import java.net.ServerSocket;
 import java.net.Socket;
 import java.net.SocketException;
+import java.nio.channels.ServerSocketChannel;
+import java.util.HashMap;
+import java.util.Map;
+import java.util.concurrent.atomic.AtomicLong;
 
 /**
  * SMTP socket listener.
  *
  * <p>This runs a ServerSocket bound to configured interface and port.
+ * <p>Several listeners may share one receipt executor.
  * <p>An email receipt instance will be constructed for each accepted connection.
+ * <p>Receipts are scheduled via the receipt executor.
+ * <p>With several acceptors each instance opens the same port with SO_REUSEPORT.
  *
  * @see EmailReceipt
+ * @see ReceiptExecutor
  */
-public class SmtpListener {
+public class SmtpListener implements Listener {
     private static final Logger log = LogManager.getLogger(SmtpListener.class);
 
     /**
@@ -28,7 +40,33 @@ public class SmtpListener {
     /**
      * Server shutdown boolean.
      */
-    private boolean serverShutdown = false;
+    private volatile boolean serverShutdown = false;
+
+    /**
+     * ListenerConfig instance.
+     */
+    private final ListenerConfig listenerConfig;
+
+    /**
+     * ReceiptExecutor instance.
+     */
+    private final ReceiptExecutor executor;
+
+    /**
+     * Shutdown executor with the listener.
+     * <p>False if the executor was given and may be shared with other listeners.
+     */
+    private final boolean ownExecutor;
+
+    /**
+     * Acceptor index.
+     */
+    private final int acceptor;
+
+    /**
+     * Accepted connections counter.
+     */
+    private final AtomicLong accepted = new AtomicLong();
 
     /**
      * Constructs a new SmtpListener instance.
@@ -38,25 +76,148 @@ public class SmtpListener {
      * @param bind    Interface to bind to.
      */
     public SmtpListener(int port, int backlog, String bind) {
-        try (ServerSocket socket = new ServerSocket(port, backlog, InetAddress.getByName(bind))) {
-            listener = socket;
-            log.info("Started listener.");
+        this(port, backlog, bind, new ReceiptExecutor(
+                Config.getServer().getPoolSize(),
+                Config.getServer().getQueueSize(),
+                Config.getServer().getOverflow(),
+                Config.getServer().isVirtualThreads()
+        ), true);
+    }
 
-            log.info("Expecting connection.");
-            acceptConnection();
+    /**
+     * Constructs a new SmtpListener instance with given executor.
+     *
+     * @param port     Port number.
+     * @param backlog  Backlog size.
+     * @param bind     Interface to bind to.
+     * @param executor ReceiptExecutor instance.
+     */
+    public SmtpListener(int port, int backlog, String bind, ReceiptExecutor executor) {
+        this(port, backlog, bind, executor, false);
+    }
+
+    /**
+     * Constructs a new SmtpListener instance with given executor and ownership.
+     *
+     * @param port        Port number.
+     * @param backlog     Backlog size.
+     * @param bind        Interface to bind to.
+     * @param executor    ReceiptExecutor instance.
+     * @param ownExecutor Shutdown executor with the listener.
+     */
+    private SmtpListener(int port, int backlog, String bind, ReceiptExecutor executor, boolean ownExecutor) {
+        this.executor = executor;
+        this.ownExecutor = ownExecutor;
+        this.listenerConfig = listenerConfig(port, backlog, bind);
+        this.acceptor = 0;
 
+        try {
+            bind();
         } catch (IOException e) {
             log.fatal("Error listening: {}", e.getMessage());
+            close();
+            return;
+        }
 
-        } finally {
+        listen();
+    }
+
+    /**
+     * Constructs a new SmtpListener instance with given listener configuration and executor.
+     * <p>The socket is bound but connections are only accepted once listen() is called.
+     * <br>Several listeners can share the same executor.
+     *
+     * @param listenerConfig ListenerConfig instance.
+     * @param executor       ReceiptExecutor instance.
+     * @throws IOException Unable to bind.
+     */
+    public SmtpListener(ListenerConfig listenerConfig, ReceiptExecutor executor) throws IOException {
+        this(listenerConfig, executor, 0);
+    }
+
+    /**
+     * Constructs a new SmtpListener instance with given listener configuration, executor and acceptor index.
+     * <p>If the listener has several acceptors the socket is opened with SO_REUSEPORT.
+     *
+     * @param listenerConfig ListenerConfig instance.
+     * @param executor       ReceiptExecutor instance.
+     * @param acceptor       Acceptor index.
+     * @throws IOException Unable to bind.
+     */
+    public SmtpListener(ListenerConfig listenerConfig, ReceiptExecutor executor, int acceptor) throws IOException {
+        this.executor = executor;
+        this.ownExecutor = false;
+        this.listenerConfig = listenerConfig;
+        this.acceptor = acceptor;
+        bind();
+    }
+
+    /**
+     * Builds listener configuration from arguments.
+     * <p>Other listener values fall back to the top level configuration.
+     *
+     * @param port    Port number.
+     * @param backlog Backlog size.
+     * @param bind    Interface to bind to.
+     * @return ListenerConfig instance.
+     */
+    static ListenerConfig listenerConfig(int port, int backlog, String bind) {
+        Map<String, Object> map = new HashMap<>();
+        map.put("port", (long) port);
+        map.put("backlog", (long) backlog);
+        map.put("bind", bind);
+        return new ListenerConfig(map);
+    }
+
+    /**
+     * Binds server socket.
+     *
+     * @throws IOException Unable to bind.
+     */
+    private void bind() throws IOException {
+        InetAddress address = InetAddress.getByName(listenerConfig.getBind());
+        if (listenerConfig.getAcceptors() > 1) {
+            // Blocking channel sockets accept like a plain ServerSocket.
+            ServerSocketChannel channel = ServerSocketChannel.open();
+            ReusePort.enable(channel);
             try {
-                if (listener != null) {
-                    listener.close();
-                    log.info("Closed listener.");
-                }
-            } catch (Exception e) {
-                log.info("Listener already closed.");
+                channel.socket().bind(new InetSocketAddress(address, listenerConfig.getPort()), listenerConfig.getBacklog());
+            } catch (IOException e) {
+                channel.close();
+                throw e;
+            }
+            listener = channel.socket();
+        } else {
+            listener = new ServerSocket(listenerConfig.getPort(), listenerConfig.getBacklog(), address);
+        }
+        log.info("Started listener on {} acceptor {}{}.", listenerConfig.getName(), acceptor, listenerConfig.isSecure() ? " with implicit TLS" : "");
+    }
+
+    /**
+     * Accepts connections until shutdown then closes the listener.
+     */
+    @Override
+    public void listen() {
+        log.info("Expecting connection.");
+        try {
+            acceptConnection();
+        } finally {
+            close();
+        }
+    }
+
+    /**
+     * Closes listener.
+     */
+    @Override
+    public void close() {
+        try {
+            if (listener != null) {
+                listener.close();
+                log.info("Closed listener.");
             }
+        } catch (Exception e) {
+            log.info("Listener already closed.");
         }
     }
 
@@ -67,8 +228,9 @@ public class SmtpListener {
         try {
             do {
                 Socket sock = listener.accept();
+                accepted.incrementAndGet();
                 log.info("Accepted connection from {}:{}.", sock.getInetAddress().getHostAddress(), sock.getPort());
-                new Thread(new EmailReceipt(sock)).start();
+                executor.execute(sock, listenerConfig);
             } while (!serverShutdown);
 
         } catch (SocketException e) {
@@ -84,11 +246,15 @@ public class SmtpListener {
      *
      * @throws IOException Unable to communicate.
      */
+    @Override
     public void serverShutdown() throws IOException {
         serverShutdown = true;
         if (listener != null) {
             listener.close();
         }
+        if (ownExecutor) {
+            executor.shutdown();
+        }
     }
 
     /**
@@ -96,7 +262,47 @@ public class SmtpListener {
      *
      * @return ServerSocket instance.
      */
+    @Override
     public ServerSocket getListener() {
         return listener;
     }
+
+    /**
+     * Gets listener configuration.
+     *
+     * @return ListenerConfig instance.
+     */
+    @Override
+    public ListenerConfig getListenerConfig() {
+        return listenerConfig;
+    }
+
+    /**
+     * Gets receipt executor.
+     *
+     * @return ReceiptExecutor instance.
+     */
+    public ReceiptExecutor getExecutor() {
+        return executor;
+    }
+
+    /**
+     * Gets acceptor index.
+     *
+     * @return Acceptor index.
+     */
+    @Override
+    public int getAcceptor() {
+        return acceptor;
+    }
+
+    /**
+     * Gets number of connections accepted.
+     *
+     * @return Accepted count.
+     */
+    @Override
+    public long getAccepted() {
+        return accepted.get();
+    }
 }
@@ -1,6 +1,7 @@
 package com.mimecast.robin.smtp.connection;
 
 import com.mimecast.robin.config.client.LoggingConfig;
+import com.mimecast.robin.config.server.ListenerConfig;
 import com.mimecast.robin.config.server.ScenarioConfig;
 import com.mimecast.robin.config.server.ServerConfig;
 import com.mimecast.robin.config.server.UserConfig;
@@ -11,12 +12,13 @@ import com.mimecast.robin.smtp.EmailReceipt;
 import com.mimecast.robin.smtp.io.LineInputStream;
 import com.mimecast.robin.smtp.session.Session;
 import com.mimecast.robin.smtp.transaction.SessionTransactionList;
+import com.mimecast.robin.storage.TransactionStorage;
 import com.mimecast.robin.util.Sleep;
 import org.apache.commons.lang3.StringUtils;
 import org.apache.logging.log4j.LogManager;
 import org.apache.logging.log4j.Logger;
 
-import java.io.DataOutputStream;
+import java.io.BufferedOutputStream;
 import java.io.IOException;
 import java.net.InetSocketAddress;
 import java.net.Socket;
@@ -42,11 +44,22 @@ public class Connection extends SmtpFoundation {
      */
     private SessionTransactionList sessionTransactionList = new SessionTransactionList();
 
+    /**
+     * Server configuration snapshot.
+     * <p>Captured on construction so a config reload does not change an open connection.
+     */
+    private final ServerConfig serverConfig;
+
     /**
      * Connection server.
      */
     private String server = null;
 
+    /**
+     * [Server] Storage kept open across BDAT chunks of the current MAIL transaction.
+     */
+    private TransactionStorage transactionStorage;
+
     /**
      * [Client] Constructs a new Connection instance with given Session.
      * <p>This is primarly here for unit testing.
@@ -67,6 +80,7 @@ public class Connection extends SmtpFoundation {
     @SuppressWarnings("unchecked")
     public Connection(Session session) {
         this.session = session;
+        this.serverConfig = Config.getServer();
 
         if (Config.getProperties().hasProperty("logging")) {
             LoggingConfig logging = new LoggingConfig(Config.getProperties().getMapProperty("logging"));
@@ -81,10 +95,32 @@ public class Connection extends SmtpFoundation {
      * @throws IOException Unable to communicate.
      */
     public Connection(Socket socket) throws IOException {
+        this(socket, null);
+    }
+
+    /**
+     * [Server] Constructs a new Connection instance with given Socket and listener.
+     * <p>The connection uses the listener view of the server configuration.
+     * <p>Implicit TLS listeners encrypt the socket before any data is exchanged.
+     *
+     * @param socket   Socket instance.
+     * @param listener ListenerConfig instance, null for the top level configuration.
+     * @throws IOException Unable to communicate.
+     */
+    public Connection(Socket socket, ListenerConfig listener) throws IOException {
         // Socket.
         this.socket = socket;
+        this.coalesce = true;
+        this.serverConfig = Config.getServer().getServerConfig(listener);
+        this.maxLineLength = toMaxLineLength(serverConfig.getCommandLineLimit());
         setTimeout(DEFAULTTIMEOUT);
 
+        // Implicit TLS.
+        boolean secure = listener != null && listener.isSecure();
+        if (secure) {
+            startTLS(false);
+        }
+
         // Streams.
         buildStreams();
 
@@ -97,6 +133,9 @@ public class Connection extends SmtpFoundation {
 
         session.setFriendAddr(socket.getInetAddress().getHostAddress());
         session.setFriendRdns(socket.getInetAddress().getHostName());
+        if (secure) {
+            session.setStartTls(true);
+        }
     }
 
     /**
@@ -153,8 +192,24 @@ public class Connection extends SmtpFoundation {
      * @throws IOException Unable to communicate.
      */
     public void buildStreams() throws IOException {
-        inc = new LineInputStream(socket.getInputStream());
-        out = new DataOutputStream(socket.getOutputStream());
+        inc = new LineInputStream(socket.getInputStream(), maxLineLength);
+        out = socket.getOutputStream();
+
+        // Server replies are buffered and flushed before waiting for more input.
+        if (coalesce) {
+            out = new BufferedOutputStream(out);
+            inc.setDrainListener(this::drained);
+        }
+    }
+
+    /**
+     * Converts a line limit including CRLF as defined in RFC 5321 to a max line length excluding EOL.
+     *
+     * @param limit Line limit including CRLF (0 for unlimited).
+     * @return Max line length excluding EOL (0 for unlimited).
+     */
+    public static int toMaxLineLength(int limit) {
+        return limit > 0 ? Math.max(1, limit - 2) : 0;
     }
 
     /**
@@ -184,6 +239,15 @@ public class Connection extends SmtpFoundation {
         return server;
     }
 
+    /**
+     * [Server] Gets server configuration snapshot.
+     *
+     * @return ServerConfig instance.
+     */
+    public ServerConfig getServerConfig() {
+        return serverConfig;
+    }
+
     /**
      * [Server] Gets server username.
      *
@@ -191,7 +255,7 @@ public class Connection extends SmtpFoundation {
      * @return Optional of UserConfig.
      */
     public Optional<UserConfig> getUser(String username) {
-        return Config.getServer().getUser(username);
+        return serverConfig.getUser(username);
     }
 
     /**
@@ -200,19 +264,64 @@ public class Connection extends SmtpFoundation {
      * @return Optional of ScenarioConfig.
      */
     public Optional<ScenarioConfig> getScenario() {
-        return Optional.ofNullable(Config.getServer())
-                .map(ServerConfig::getScenarios)
-                .map(s -> {
-                    ScenarioConfig c = s.get(session.getEhlo());
-                    return c != null ? c : s.get("*");
-                });
+        return serverConfig != null ? serverConfig.getScenario(session.getEhlo()) : Optional.empty();
+    }
+
+    /**
+     * [Server] Gets scenario read rate to throttle DATA and BDAT payload reads to.
+     *
+     * @return Bytes per second, 0 if not throttled.
+     */
+    @Override
+    protected long getReadRate() {
+        return getScenario().map(ScenarioConfig::getReadRate).orElse(0L);
+    }
+
+    /**
+     * [Server] Gets transaction storage.
+     *
+     * @return TransactionStorage instance or null if no BDAT chunks pending.
+     */
+    public TransactionStorage getTransactionStorage() {
+        return transactionStorage;
+    }
+
+    /**
+     * [Server] Sets transaction storage.
+     *
+     * @param transactionStorage TransactionStorage instance.
+     * @return Self.
+     */
+    public Connection setTransactionStorage(TransactionStorage transactionStorage) {
+        this.transactionStorage = transactionStorage;
+        return this;
+    }
+
+    /**
+     * [Server] Closes transaction storage if any.
+     * <p>Used when a transaction ends before the last BDAT chunk.
+     */
+    public void closeTransactionStorage() {
+        if (transactionStorage != null) {
+            transactionStorage.close();
+            transactionStorage = null;
+        }
     }
 
     /**
      * [Server] Reset connection.
      */
-    @SuppressWarnings("EmptyMethod")
     public void reset() {
         // TODO Implement reset.
+        closeTransactionStorage();
+    }
+
+    /**
+     * Close socket and any pending transaction storage.
+     */
+    @Override
+    public void close() {
+        closeTransactionStorage();
+        super.close();
     }
 }
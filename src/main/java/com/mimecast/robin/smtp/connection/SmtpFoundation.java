@@ -1,23 +1,33 @@
 package com.mimecast.robin.smtp.connection;
 
 import com.mimecast.robin.main.Factories;
+import com.mimecast.robin.main.Metrics;
+import com.mimecast.robin.smtp.io.DataBudget;
+import com.mimecast.robin.smtp.io.DotUnstuffingOutputStream;
 import com.mimecast.robin.smtp.io.LineInputStream;
+import com.mimecast.robin.smtp.io.LineTooLongException;
 import com.mimecast.robin.smtp.io.SlowOutputStream;
 import com.mimecast.robin.util.Random;
+import com.mimecast.robin.util.Sleep;
 import org.apache.commons.lang3.StringUtils;
 import org.apache.logging.log4j.LogManager;
 import org.apache.logging.log4j.Logger;
 
 import javax.net.ssl.SSLSocket;
-import java.io.DataOutputStream;
+import java.io.EOFException;
 import java.io.IOException;
 import java.io.OutputStream;
 import java.net.Socket;
+import java.nio.ByteBuffer;
+import java.nio.channels.Channels;
+import java.nio.channels.FileChannel;
+import java.nio.channels.ReadableByteChannel;
 import java.nio.charset.Charset;
 import java.nio.charset.StandardCharsets;
 import java.util.ArrayList;
 import java.util.Arrays;
 import java.util.List;
+import java.util.concurrent.locks.ReentrantLock;
 
 /**
  * SMTP foundation for socket reads and writes.
@@ -42,6 +52,11 @@ public abstract class SmtpFoundation {
      */
     public static final int EXTENDEDTIMEOUT = 120000;
 
+    /**
+     * Bulk read buffer size.
+     */
+    private static final int BULK_BUFFER_SIZE = 65536;
+
     /**
      * Socket instance.
      */
@@ -54,8 +69,34 @@ public abstract class SmtpFoundation {
 
     /**
      * Socket output stream container.
+     * <p>Kept as a plain stream as DataOutputStream synchronizes writes which pins virtual threads.
+     */
+    OutputStream out;
+
+    /**
+     * [Server] Coalesce replies.
+     * <p>Replies are buffered and flushed once the input is drained or a synchronising command is reached.
+     * <br>This lets a PIPELINING batch be answered with a single write.
      */
-    DataOutputStream out;
+    boolean coalesce = false;
+
+    /**
+     * [Server] Buffered replies pending flush.
+     */
+    private boolean pending = false;
+
+    /**
+     * Reply write lock.
+     * <p>Lets shutdowns write from another thread without interleaving with the session replies.
+     * <br>A lock rather than synchronized as monitors pin virtual threads.
+     */
+    private final ReentrantLock writeLock = new ReentrantLock();
+
+    /**
+     * [Server] Max command line length excluding EOL (0 for unlimited).
+     * <p>Lines growing longer fail with a LineTooLongException without being buffered.
+     */
+    int maxLineLength = 0;
 
     /**
      * Default TLS protocols supported as string array.
@@ -116,6 +157,15 @@ public abstract class SmtpFoundation {
         return socket instanceof SSLSocket ? ((SSLSocket) socket).getSession().getProtocol() : "";
     }
 
+    /**
+     * Is TLS negociated.
+     *
+     * @return Boolean.
+     */
+    public boolean isSecure() {
+        return socket instanceof SSLSocket;
+    }
+
     /**
      * Gets TLS cipher suite used if TLS negociated.
      *
@@ -125,6 +175,44 @@ public abstract class SmtpFoundation {
         return socket instanceof SSLSocket ? ((SSLSocket) socket).getSession().getCipherSuite() : "";
     }
 
+    /**
+     * Has pending input.
+     * <p>Checks for bytes already buffered by the input streams.
+     * <p>For TLS sockets this includes decrypted data not yet read.
+     *
+     * @return Boolean.
+     */
+    public boolean hasPendingInput() {
+        try {
+            return inc != null && inc.available() > 0;
+        } catch (IOException e) {
+            return false;
+        }
+    }
+
+    /**
+     * [Server] Pushes bytes read ahead back to the input.
+     * <p>They are read before anything still waiting on the socket.
+     *
+     * @param bytes  Byte array.
+     * @param offset Offset.
+     * @param length Length.
+     * @throws IOException Unable to unread.
+     */
+    public void unread(byte[] bytes, int offset, int length) throws IOException {
+        inc.unread(bytes, offset, length);
+    }
+
+    /**
+     * Gets number of bytes read from socket.
+     * <p>Counts from the last time the streams were built.
+     *
+     * @return Bytes count.
+     */
+    public long getBytesRead() {
+        return inc != null ? inc.getBytesRead() : 0L;
+    }
+
     /**
      * Read from socket without expecting a particular response code.
      *
@@ -147,18 +235,20 @@ public abstract class SmtpFoundation {
         String receivedCode = "";
 
         try {
-            byte[] read;
-            while ((read = inc.readLine()) != null) {
+            int length;
+            while ((length = inc.nextLine()) != -1) {
+                checkLineSplit();
+                String read = new String(inc.getLineBuffer(), 0, length);
                 if (log.isTraceEnabled()) {
-                    log.trace("<< {}", StringUtils.stripEnd(new String(read, UTF_8), null));
+                    log.trace("<< {}", StringUtils.stripEnd(read, null));
                 }
 
                 if (expectedCode.length() == 3) {
-                    receivedCode = new String(read).trim().substring(0, expectedCode.length());
+                    receivedCode = read.trim().substring(0, expectedCode.length());
                 }
-                received.append(new String(read));
+                received.append(read);
 
-                if (isSmtpStop(read)) {
+                if (isSmtpStop(inc.getLineBuffer(), length)) {
                     break;
                 }
             }
@@ -178,88 +268,187 @@ public abstract class SmtpFoundation {
         return received.toString();
     }
 
+    /**
+     * [Server] Read a single command line from socket.
+     * <p>Unlike read() this never joins lines so a command can't grow past the max line length.
+     *
+     * @return String read from buffer or empty if end of stream.
+     * @throws IOException Unable to communicate.
+     */
+    public String readCommand() throws IOException {
+        try {
+            // Decoded straight from the line buffer without copying the line first.
+            int length = inc.nextLine();
+            if (length == -1) {
+                return "";
+            }
+            checkLineSplit();
+
+            String read = new String(inc.getLineBuffer(), 0, length);
+            if (log.isTraceEnabled()) {
+                log.trace("<< {}", StringUtils.stripEnd(read, null));
+            }
+            return read;
+
+        } catch (IOException e) {
+            log.info("Error reading: {}", e.getMessage());
+            throw e;
+        }
+    }
+
+    /**
+     * Fails if the last line read was split at the max line length.
+     *
+     * @throws LineTooLongException Line too long.
+     */
+    private void checkLineSplit() throws LineTooLongException {
+        if (inc.isLineSplit()) {
+            throw new LineTooLongException(inc.getMaxLineLength());
+        }
+    }
+
     /**
      * Check for SMTP multiline last line.
      *
-     * @param bytes Byte array.
+     * @param bytes  Byte array.
+     * @param length Line length.
      * @return True if last line.
      */
-    private boolean isSmtpStop(byte[] bytes) {
-        return bytes.length < 4 || bytes[3] != DASH;
+    private boolean isSmtpStop(byte[] bytes, int length) {
+        return length < 4 || bytes[3] != DASH;
     }
 
     /**
      * Read fixed number of bytes from socket.
+     * <p>Every read is charged to the DATA budget once it returns until written.
+     * <p>Reads are throttled to the read rate if any.
      *
      * @param bytesToRead  Number of bytes to read.
      * @param outputStream OutputStream instance.
      * @throws IOException Unable to communicate.
      */
     public void readBytes(int bytesToRead, OutputStream outputStream) throws IOException {
-        for (int i = 0; i < bytesToRead; i++) {
-            outputStream.write((byte) inc.read());
+        long rate = getReadRate();
+        byte[] buffer = new byte[Math.min(bytesToRead, BULK_BUFFER_SIZE)];
+        int remaining = bytesToRead;
+        while (remaining > 0) {
+            int read = inc.read(buffer, 0, getReadLength(Math.min(remaining, buffer.length), rate));
+            if (read == -1) {
+                throw new EOFException("End of stream with " + remaining + " bytes left to read");
+            }
+
+            long budget = DataBudget.acquire(read);
+            try {
+                outputStream.write(buffer, 0, read);
+                remaining -= read;
+            } finally {
+                DataBudget.release(budget);
+            }
+            throttle(read, rate);
         }
     }
 
+    /**
+     * Read fixed number of bytes from socket to given file channel.
+     * <p>Uses FileChannel.transferFrom() reading via the connection input stream.
+     * <br>This way bytes already buffered are not lost and socket timeouts still apply.
+     * <p>Bytes are appended at the current channel position which is moved past them.
+     * <p>Transfers are done in bulk buffer sized steps.
+     * <br>Every read within a step is charged to the DATA budget once it returns until written.
+     * <p>Steps are throttled to the read rate if any.
+     *
+     * @param bytesToRead Number of bytes to read.
+     * @param channel     FileChannel instance.
+     * @return Number of bytes transferred.
+     * @throws IOException Unable to communicate.
+     */
+    public long readBytes(int bytesToRead, FileChannel channel) throws IOException {
+        long rate = getReadRate();
+        BudgetChannel source = new BudgetChannel(Channels.newChannel(inc));
+        long position = channel.position();
+        long transferred = 0;
+        while (transferred < bytesToRead) {
+            int length = getReadLength((int) Math.min(bytesToRead - transferred, BULK_BUFFER_SIZE), rate);
+            long count;
+            try {
+                count = channel.transferFrom(source, position + transferred, length);
+            } finally {
+                source.release();
+            }
+
+            if (count <= 0) {
+                throw new EOFException("End of stream with " + (bytesToRead - transferred) + " bytes left to read");
+            }
+            transferred += count;
+            throttle(count, rate);
+        }
+
+        channel.position(position + transferred);
+        return transferred;
+    }
+
     /**
      * Read multiline data from socket to given output stream.
-     * <p>To remove the &lt;CRLF&gt;.&lt;CRLF&gt; terminator we need to keep EOL's.
-     * <p>This lets us check previous line endings + current line for the terminator as per RFC 5321.
+     * <p>Data is read in bulk and decoded by a dot unstuffing stream until the &lt;CRLF&gt;.&lt;CRLF&gt; terminator.
+     * <p>Bytes read past the terminator are unread for the next command.
+     * <p>Every read is charged to the DATA budget once it returns until decoded to the output stream.
+     * <p>Reads are throttled to the read rate if any.
      *
      * @param out OutputStream instance.
      * @throws IOException Unable to communicate.
+     * @see DotUnstuffingOutputStream
      */
     public void readMultiline(OutputStream out) throws IOException {
+        readMultiline(out, 0);
+    }
+
+    /**
+     * Read multiline data from socket to given output stream with given max line length.
+     * <p>Lines growing longer fail with a LineTooLongException.
+     * <p>End of stream before the terminator fails with an EOFException.
+     *
+     * @param out           OutputStream instance.
+     * @param maxLineLength Max line length excluding EOL (0 for unlimited).
+     * @throws IOException Unable to communicate.
+     * @see DotUnstuffingOutputStream
+     */
+    public void readMultiline(OutputStream out, int maxLineLength) throws IOException {
         try {
-            byte[] read;
-            byte[] eol = new byte[0];
-            while ((read = inc.readLine()) != null) {
-                // Stop if terminator found
-                int length = eol.length + read.length;
-                if ((length == 5 || length == 3) && isTerminator(eol, read)) {
+            long rate = getReadRate();
+            byte[] buffer = new byte[8192];
+            DotUnstuffingOutputStream decoder = new DotUnstuffingOutputStream(out, buffer.length, maxLineLength);
+            boolean eof = false;
+            while (!decoder.isTerminated()) {
+                int read = inc.read(buffer, 0, getReadLength(buffer.length, rate));
+                if (read == -1) {
+                    eof = true;
                     break;
                 }
 
-                // Write previous EOL if any
-                out.write(eol);
-                // Get current EOL and store
-                eol = getEol(read);
+                long budget = DataBudget.acquire(read);
+                try {
+                    int consumed = decoder.decode(buffer, 0, read);
+                    if (consumed < read) {
+                        inc.unread(buffer, consumed, read - consumed);
+                    }
+                } finally {
+                    DataBudget.release(budget);
+                }
+                throttle(read, rate);
+            }
+            decoder.finish();
 
-                // Write line without EOL
-                out.write(trimBytes(read, eol.length));
+            // A dot and CR line may only end the data at end of stream, anything else is a partial message.
+            if (eof && !decoder.isTerminated()) {
+                throw new EOFException("End of stream before end of data");
             }
+
         } catch (IOException e) {
             log.info("Error reading: {}", e.getMessage());
             throw e;
         }
     }
 
-    /**
-     * Is fullstop.
-     * <p>Check given byte arrays form &lt;CRLF&gt;.&lt;CRLF&gt; terminator sequence.
-     *
-     * @param arrays Byte arrays.
-     * @return Boolean.
-     */
-    private boolean isTerminator(byte[]... arrays) {
-        int length = 0;
-        for (byte[] array : arrays) {
-            length += array.length;
-        }
-
-        byte[] total = new byte[length];
-        int pos = 0;
-        for (byte[] array : arrays) {
-            System.arraycopy(array, 0, total, pos, array.length);
-            pos += array.length;
-        }
-
-        return (total.length == 5 && total[0] == 13 && total[1] == 10 && total[2] == 46 && total[3] == 13 && total[4] == 10) ||
-                // For non compliant cases
-                (total.length == 3 && total[0] == 10 && total[1] == 46 && total[2] == 10) ||
-                (total.length == 3 && total[0] == 13 && total[1] == 46 && total[2] == 13);
-    }
-
     /**
      * Gets EOL.
      * <p>Gets EOL bytes from given byte array.
@@ -306,7 +495,7 @@ public abstract class SmtpFoundation {
     }
 
     /**
-     * Write string to a socket via the instance DataOutputStream.
+     * Write string to a socket via the instance OutputStream.
      *
      * @param string String to write to socket.
      * @throws IOException Unable to communicate.
@@ -316,24 +505,73 @@ public abstract class SmtpFoundation {
     }
 
     /**
-     * Write bytes to a socket via the instance DataOutputStream.
+     * Write bytes to a socket via the instance OutputStream.
      *
      * @param bytes String to write to socket.
      * @throws IOException Unable to communicate.
      */
     @SuppressWarnings("java:S2629") // Info should always be enabled.
     public void write(byte[] bytes) throws IOException {
+        writeLock.lock();
         try {
             out.write(bytes);
             log.info(LOG_WRITE, new String(bytes).trim());
+
+            if (coalesce) {
+                pending = true;
+                Metrics.increment(Metrics.REPLIES);
+            }
+        } catch (IOException e) {
+            log.info("Error writing: {}", e.getMessage());
+            throw e;
+        } finally {
+            writeLock.unlock();
+        }
+    }
+
+    /**
+     * Flush buffered replies.
+     * <p>Used by synchronising commands.
+     *
+     * @throws IOException Unable to communicate.
+     */
+    public void flush() throws IOException {
+        flush(Metrics.FLUSH_SYNC);
+    }
+
+    /**
+     * Flush buffered replies as input is drained.
+     *
+     * @throws IOException Unable to communicate.
+     */
+    void drained() throws IOException {
+        flush(Metrics.FLUSH_DRAINED);
+    }
+
+    /**
+     * Flush buffered replies if any and count the flush reason.
+     *
+     * @param reason Metrics counter name.
+     * @throws IOException Unable to communicate.
+     */
+    private void flush(String reason) throws IOException {
+        writeLock.lock();
+        try {
+            if (pending) {
+                pending = false;
+                Metrics.increment(reason);
+                out.flush();
+            }
         } catch (IOException e) {
             log.info("Error writing: {}", e.getMessage());
             throw e;
+        } finally {
+            writeLock.unlock();
         }
     }
 
     /**
-     * Write to a socket via the instance DataOutputStream.
+     * Write to a socket via the instance OutputStream.
      * <p>Used for BDAT deliveries.
      *
      * @param bytes      String to write to socket.
@@ -416,14 +654,11 @@ public abstract class SmtpFoundation {
     public void stream(LineInputStream inputStream, int slowBytes, int slowWait) throws IOException {
         OutputStream outStream = slowBytes >= 1 && slowWait >= 100 ? new SlowOutputStream(out, slowBytes, slowWait) : out;
 
-        String string;
         byte[] bytes;
         while ((bytes = inputStream.readLine()) != null) {
-            string = new String(bytes).trim();
-
             // Dot stuffing.
-            if (string.equals(".")) {
-                outStream.write(".".getBytes(UTF_8));
+            if (bytes.length > 0 && bytes[0] == '.') {
+                outStream.write('.');
             }
 
             outStream.write(bytes);
@@ -443,6 +678,7 @@ public abstract class SmtpFoundation {
      */
     public void startTLS(boolean client) throws SmtpException {
         try {
+            flush();
             socket = Factories.getTLSSocket()
                     .setSocket(socket)
                     .setProtocols(protocols)
@@ -459,6 +695,12 @@ public abstract class SmtpFoundation {
      * Close socket.
      */
     public void close() {
+        try {
+            flush(Metrics.FLUSH_CLOSE);
+        } catch (IOException e) {
+            log.info("Replies not flushed on close.");
+        }
+
         try {
             if (socket != null && !socket.isClosed()) {
                 socket.close();
@@ -468,4 +710,111 @@ public abstract class SmtpFoundation {
             log.info("Socket already closed.");
         }
     }
+
+    /**
+     * Closes socket only.
+     * <p>Used to interrupt a connection from another thread.
+     * <br>The thread using the connection fails its next read or write and closes it.
+     */
+    public void abort() {
+        try {
+            if (socket != null && !socket.isClosed()) {
+                socket.close();
+                log.info("Socket aborted.");
+            }
+        } catch (IOException e) {
+            log.info("Socket already closed.");
+        }
+    }
+
+    /**
+     * Gets read rate to throttle DATA and BDAT payload reads to.
+     *
+     * @return Bytes per second, 0 if not throttled.
+     */
+    protected long getReadRate() {
+        return 0L;
+    }
+
+    /**
+     * Gets length of next read within given read rate.
+     * <p>Throttled reads take at most a second worth of bytes so the rate holds between naps.
+     *
+     * @param length Wanted length.
+     * @param rate   Bytes per second, 0 if not throttled.
+     * @return Length.
+     */
+    private static int getReadLength(int length, long rate) {
+        return rate > 0 ? (int) Math.max(1L, Math.min(length, rate)) : length;
+    }
+
+    /**
+     * Throttles reads to given read rate.
+     * <p>Naps for as long as reading given bytes takes at the rate.
+     * <br>Called once the DATA budget is given back so nothing is held while napping.
+     *
+     * @param bytes Bytes read.
+     * @param rate  Bytes per second, 0 if not throttled.
+     */
+    private static void throttle(long bytes, long rate) {
+        long millis = rate > 0 ? bytes * 1000L / rate : 0L;
+        if (millis > 0) {
+            Sleep.nap((int) Math.min(Integer.MAX_VALUE, millis));
+        }
+    }
+
+    /**
+     * Readable channel charging the DATA budget with every read.
+     * <p>transferFrom() writes every read before the next one.
+     * <br>So a charge is given back on the next read or release(), never held while waiting for another.
+     */
+    private static class BudgetChannel implements ReadableByteChannel {
+
+        /**
+         * Source channel.
+         */
+        private final ReadableByteChannel source;
+
+        /**
+         * Bytes charged by the last read.
+         */
+        private long held = 0L;
+
+        /**
+         * Constructs a new BudgetChannel instance.
+         *
+         * @param source Source channel.
+         */
+        BudgetChannel(ReadableByteChannel source) {
+            this.source = source;
+        }
+
+        @Override
+        public int read(ByteBuffer dst) throws IOException {
+            release();
+            int read = source.read(dst);
+            if (read > 0) {
+                held = DataBudget.acquire(read);
+            }
+            return read;
+        }
+
+        /**
+         * Gives back the bytes charged.
+         */
+        void release() {
+            DataBudget.release(held);
+            held = 0L;
+        }
+
+        @Override
+        public boolean isOpen() {
+            return source.isOpen();
+        }
+
+        @Override
+        public void close() throws IOException {
+            source.close();
+        }
+    }
 }
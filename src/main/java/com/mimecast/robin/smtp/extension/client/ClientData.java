@@ -12,12 +12,19 @@ import org.apache.commons.io.input.BoundedInputStream;
 import java.io.*;
 import java.nio.file.Files;
 import java.nio.file.Path;
+import java.util.ArrayList;
+import java.util.List;
 
 /**
  * DATA extension processor.
  */
 public class ClientData extends ClientProcessor {
 
+    /**
+     * Maximum number of BDAT chunks written before reading responses when pipelining.
+     */
+    private static final int PIPELINING_WINDOW = 32;
+
     /**
      * MessageEnvelope instance.
      */
@@ -150,35 +157,42 @@ public class ClientData extends ClientProcessor {
 
     /**
      * BDAT processor.
+     * <p>When PIPELINING is advertised chunks are written without waiting for each response.
+     * <br>Responses are then read in order, at most every PIPELINING_WINDOW chunks.
      *
      * @param inputStream InputStream instance.
      * @return Boolean.
      * @throws IOException Unable to communicate.
      */
     private boolean processBdat(InputStream inputStream) throws IOException {
-        String read = "";
+        boolean pipelining = connection.getSession().isEhloPipelining();
+        List<String> pending = new ArrayList<>();
+        boolean result = true;
 
         if (inputStream != null) {
             try (ChunkedInputStream chunks = new ChunkedInputStream(inputStream, envelope)) {
                 ByteArrayOutputStream chunk;
                 while (chunks.hasChunks()) {
                     chunk = chunks.getChunk();
-                    read = writeChunk(chunk.toByteArray(), !chunks.hasChunks());
+                    pending.add(writeChunk(chunk.toByteArray(), !chunks.hasChunks()));
 
-                    if (!read.startsWith("250")) return false;
+                    if (!pipelining || pending.size() >= PIPELINING_WINDOW) {
+                        result = readChunks(pending);
+                        if (!result) return false;
+                    }
                 }
             }
 
         } else if (envelope.getMessage() != null) {
             // Write headers
-            read = writeChunk((envelope.getHeaders() + "\r\n").getBytes(), false);
-            if (!read.startsWith("250")) return false;
+            pending.add(writeChunk((envelope.getHeaders() + "\r\n").getBytes(), false));
+            if (!pipelining && !readChunks(pending)) return false;
 
             // Write body
-            read = writeChunk((envelope.getMessage() + "\r\n").getBytes(), true);
+            pending.add(writeChunk((envelope.getMessage() + "\r\n").getBytes(), true));
         }
 
-        return read.startsWith("250");
+        return readChunks(pending) && result;
     }
 
     /**
@@ -186,7 +200,7 @@ public class ClientData extends ClientProcessor {
      *
      * @param chunk Chunk to write as byte array.
      * @param last  Is last chunk?
-     * @return SMTP response string.
+     * @return BDAT command string.
      * @throws IOException Unable to communicate.
      */
     private String writeChunk(byte[] chunk, boolean last) throws IOException {
@@ -206,9 +220,27 @@ public class ClientData extends ClientProcessor {
 
         connection.write(payload, envelope.isChunkWrite(), envelope.getSlowBytes(), envelope.getSlowWait());
 
-        String read = connection.read("250");
-        envelopeTransactions.addTransaction("BDAT", new String(bdat), read, !read.startsWith("250"));
+        return new String(bdat);
+    }
+
+    /**
+     * Reads BDAT responses in order.
+     * <p>Every response is read to keep the session in sync even after a failure.
+     *
+     * @param pending BDAT commands awaiting response, cleared once read.
+     * @return Boolean.
+     * @throws IOException Unable to communicate.
+     */
+    private boolean readChunks(List<String> pending) throws IOException {
+        boolean result = true;
+        String read;
+        for (String bdat : pending) {
+            read = connection.read("250");
+            envelopeTransactions.addTransaction("BDAT", bdat, read, !read.startsWith("250"));
+            result = result && read.startsWith("250");
+        }
+        pending.clear();
 
-        return read;
+        return result;
     }
 }
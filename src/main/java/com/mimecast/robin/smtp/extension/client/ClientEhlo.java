@@ -103,6 +103,7 @@ public class ClientEhlo extends ClientProcessor {
             if (line.contains("8bitmime")) connection.getSession().setEhlo8bit(true);
             if (line.contains("binarymime")) connection.getSession().setEhloBinary(true);
             if (line.contains("chunking")) connection.getSession().setEhloBdat(true);
+            if (line.contains("pipelining")) connection.getSession().setEhloPipelining(true);
             if (line.contains("starttls")) connection.getSession().setEhloTls(true);
         }
     }
@@ -6,6 +6,8 @@ import com.mimecast.robin.smtp.transaction.EnvelopeTransactionList;
 
 import java.io.File;
 import java.io.IOException;
+import java.util.ArrayList;
+import java.util.List;
 
 /**
  * MAIL extension processor.
@@ -32,6 +34,12 @@ public class ClientMail extends ClientProcessor {
 
         // Sender.
         String write = "MAIL FROM:<" + envelope.getMail() + "> SIZE=" + sizeMessage(envelope);
+
+        // Send recipients in the same batch if pipelining.
+        if (connection.getSession().isEhloPipelining()) {
+            return pipeline(envelope, write, transactionList);
+        }
+
         connection.write(write);
 
         String read = connection.read("250");
@@ -44,6 +52,42 @@ public class ClientMail extends ClientProcessor {
         return read.startsWith("250");
     }
 
+    /**
+     * Pipeline MAIL and RCPT commands.
+     * <p>Writes MAIL and all RCPT commands in one batch then reads the responses in order.
+     * <p>Each response is added to the envelope transactions so ClientRcpt has nothing left to send.
+     *
+     * @param envelope        MessageEnvelope instance.
+     * @param mail            MAIL command.
+     * @param transactionList EnvelopeTransactionList instance.
+     * @return Boolean.
+     * @throws IOException Unable to communicate.
+     * @see <a href="https://tools.ietf.org/html/rfc2920">RFC 2920</a>
+     */
+    private boolean pipeline(MessageEnvelope envelope, String mail, EnvelopeTransactionList transactionList) throws IOException {
+        List<String> writes = new ArrayList<>();
+        writes.add(mail);
+        for (String to : envelope.getRcpts()) {
+            writes.add("RCPT TO:<" + to + ">");
+        }
+        connection.write(String.join("\r\n", writes));
+
+        // Read responses in order.
+        String read = connection.read("250");
+        transactionList.addTransaction("MAIL", mail, read, !read.startsWith("250"));
+
+        String rcptRead;
+        for (String write : writes.subList(1, writes.size())) {
+            rcptRead = connection.read("250");
+            transactionList.addTransaction("RCPT", write, rcptRead, !rcptRead.startsWith("250"));
+        }
+
+        // Add transaction list to envelope.
+        connection.getSessionTransactionList().addEnvelope(transactionList);
+
+        return read.startsWith("250");
+    }
+
     /**
      * Get envelope size for MAIL parameter.
      *
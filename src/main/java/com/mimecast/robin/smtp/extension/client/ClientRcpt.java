@@ -29,6 +29,11 @@ public class ClientRcpt extends ClientProcessor {
         // Get delivery envelope.
         EnvelopeTransactionList envelopeTransactions = connection.getSessionTransactionList().getEnvelopes().get(messageID);
 
+        // Recipients already sent with MAIL if pipelining.
+        if (connection.getSession().isEhloPipelining() && !envelopeTransactions.getRcpt().isEmpty()) {
+            return envelopeTransactions.getRcpt().size() > envelopeTransactions.getRcptErrors().size();
+        }
+
         // Loop recipients.
         String write;
         String read;
@@ -1,5 +1,6 @@
 package com.mimecast.robin.smtp.extension.server;
 
+import com.mimecast.robin.config.server.ServerConfig;
 import com.mimecast.robin.config.server.UserConfig;
 import com.mimecast.robin.main.Config;
 import com.mimecast.robin.main.Extensions;
@@ -24,7 +25,28 @@ public class ServerAuth extends ServerProcessor {
      */
     @Override
     public String getAdvert() {
-        return Config.getServer().isAuth() ? "AUTH PLAIN LOGIN" : "";
+        return getAdvert(Config.getServer());
+    }
+
+    /**
+     * Advert getter for given server config.
+     *
+     * @param serverConfig ServerConfig instance.
+     * @return Advert string.
+     */
+    @Override
+    public String getAdvert(ServerConfig serverConfig) {
+        return serverConfig.isAuth() ? "AUTH PLAIN LOGIN" : "";
+    }
+
+    /**
+     * Is reusable.
+     *
+     * @return Boolean.
+     */
+    @Override
+    public boolean isReusable() {
+        return true;
     }
 
     /**
@@ -37,17 +59,15 @@ public class ServerAuth extends ServerProcessor {
      */
     @Override
     public boolean process(Connection connection, Verb verb) throws IOException {
-        super.process(connection, verb);
-
         AuthVerb authVerb = new AuthVerb(verb);
         if (verb.getCount() > 1) {
             switch (authVerb.getType()) {
                 case "PLAIN":
-                    processAuthPlain(verb);
+                    processAuthPlain(connection, verb);
                     break;
 
                 case "LOGIN":
-                    processAuthLogin(verb);
+                    processAuthLogin(connection, verb);
                     break;
 
                 default:
@@ -75,10 +95,11 @@ public class ServerAuth extends ServerProcessor {
     /**
      * Process auth plain.
      *
-     * @param verb Verb instance.
+     * @param connection Connection instance.
+     * @param verb       Verb instance.
      * @throws IOException Unable to communicate.
      */
-    private void processAuthPlain(Verb verb) throws IOException {
+    private void processAuthPlain(Connection connection, Verb verb) throws IOException {
         String auth;
 
         if (verb.getCount() == 2) {
@@ -99,10 +120,11 @@ public class ServerAuth extends ServerProcessor {
     /**
      * Process auth login.
      *
-     * @param verb Verb instance.
+     * @param connection Connection instance.
+     * @param verb       Verb instance.
      * @throws IOException Unable to communicate.
      */
-    private void processAuthLogin(Verb verb) throws IOException {
+    private void processAuthLogin(Connection connection, Verb verb) throws IOException {
         String user;
         String pass;
 
@@ -1,27 +1,65 @@
 package com.mimecast.robin.smtp.extension.server;
 
 import com.mimecast.robin.config.server.ScenarioConfig;
+import com.mimecast.robin.config.server.ServerConfig;
 import com.mimecast.robin.main.Config;
 import com.mimecast.robin.main.Factories;
 import com.mimecast.robin.smtp.connection.Connection;
+import com.mimecast.robin.smtp.io.LimitedOutputStream;
+import com.mimecast.robin.smtp.io.LineTooLongException;
+import com.mimecast.robin.smtp.io.SizeLimitException;
 import com.mimecast.robin.smtp.verb.BdatVerb;
 import com.mimecast.robin.smtp.verb.Verb;
+import com.mimecast.robin.storage.HeaderObserver;
+import com.mimecast.robin.storage.HeaderObservingOutputStream;
 import com.mimecast.robin.storage.StorageClient;
+import com.mimecast.robin.storage.TransactionStorage;
+import com.mimecast.robin.storage.WriteBehindStorageClient;
+import com.mimecast.robin.util.CompressionUtils;
 import org.apache.commons.io.output.CountingOutputStream;
 
 import java.io.IOException;
+import java.io.OutputStream;
+import java.nio.channels.FileChannel;
 import java.util.Optional;
 
 /**
  * DATA extension processor.
+ *
+ * <p>Messages growing past the maximum message size are discarded with a 552 and the connection closed.
+ * <br>BDAT chunks are checked against the limit before they are read.
+ * <p>Same goes for DATA lines longer than the DATA line limit which get a 500.
+ * <p>Messages write-behind storage failed to write or sync before the reply get a 451.
+ * <p>Messages may be stored compressed.
+ * <br>Bytes received count the message as received and bytes stored what went to storage.
+ * <br>For DATA that is after dot unstuffing so stuffed dots and the terminator are not counted.
+ * <br>For BDAT it is the chunk bytes as sent.
+ * <br>The maximum message size applies to the same message bytes.
  */
 public class ServerData extends ServerProcessor {
 
+    /**
+     * Storage failure response.
+     */
+    static final String STORAGE_RESPONSE = "451 4.3.0 Message not stored, try again later";
+
     /**
      * Number of MIME bytes received.
+     * <p>Counted after dot unstuffing for DATA.
      */
     protected long bytesReceived = 0L;
 
+    /**
+     * Number of bytes stored.
+     * <p>Differs from bytes received when compressing.
+     */
+    protected long bytesStored = 0L;
+
+    /**
+     * Storage stream byte counter.
+     */
+    private CountingOutputStream storedCounter;
+
     /**
      * CHUNKING advert.
      *
@@ -29,7 +67,18 @@ public class ServerData extends ServerProcessor {
      */
     @Override
     public String getAdvert() {
-        return Config.getServer().isStartTls() ? "CHUNKING" : "";
+        return getAdvert(Config.getServer());
+    }
+
+    /**
+     * CHUNKING advert for given server config.
+     *
+     * @param serverConfig ServerConfig instance.
+     * @return Advert string.
+     */
+    @Override
+    public String getAdvert(ServerConfig serverConfig) {
+        return serverConfig.isStartTls() ? "CHUNKING" : "";
     }
 
     /**
@@ -46,11 +95,11 @@ public class ServerData extends ServerProcessor {
 
         if (verb.getKey().equals("bdat")) {
             binary();
-            log.debug("Received: {} bytes", bytesReceived);
+            log.debug("Received: {} bytes, stored: {} bytes", bytesReceived, bytesStored);
 
         } else if (verb.getKey().equals("data")) {
             ascii();
-            log.debug("Received: {} bytes", bytesReceived);
+            log.debug("Received: {} bytes, stored: {} bytes", bytesReceived, bytesStored);
         }
 
         return true;
@@ -68,7 +117,21 @@ public class ServerData extends ServerProcessor {
         }
 
         // Read email lines and store to disk.
-        StorageClient storageClient = asciiRead("eml");
+        StorageClient storageClient;
+        try {
+            storageClient = asciiRead("eml");
+        } catch (SizeLimitException e) {
+            connection.write(ServerMail.SIZE_RESPONSE);
+            throw e;
+        } catch (LineTooLongException e) {
+            connection.write(LINE_RESPONSE);
+            throw e;
+        }
+
+        if (isFailed(storageClient)) {
+            connection.write(STORAGE_RESPONSE);
+            return;
+        }
 
         Optional<ScenarioConfig> opt = connection.getScenario();
         if (opt.isPresent() && opt.get().getData() != null) {
@@ -88,46 +151,148 @@ public class ServerData extends ServerProcessor {
     protected StorageClient asciiRead(String extension) throws IOException {
         connection.write("354 Ready and willing");
 
-        StorageClient storageClient = Factories.getStorageClient(connection, extension);
+        StorageClient storageClient = getStorageClient(extension);
 
-        try (CountingOutputStream cos = new CountingOutputStream(storageClient.getStream())) {
+        try (CountingOutputStream cos = new CountingOutputStream(limit(observe(storageClient)))) {
             connection.setTimeout(connection.getSession().getExtendedTimeout());
-            connection.readMultiline(cos);
+            connection.readMultiline(cos, Connection.toMaxLineLength(connection.getServerConfig().getDataLineLimit()));
             bytesReceived = cos.getByteCount();
 
+        } catch (IOException e) {
+            // Don't leave partial messages behind.
+            storageClient.discard();
+            throw e;
+
         } finally {
             connection.setTimeout(connection.getSession().getTimeout());
         }
 
+        bytesStored = storedCounter.getByteCount();
         storageClient.save();
 
         return storageClient;
     }
 
+    /**
+     * Gets storage client.
+     * <p>Wrapped to write behind the session if the listener durability policy allows.
+     *
+     * @param extension File extension.
+     * @return StorageClient instance.
+     */
+    private StorageClient getStorageClient(String extension) {
+        StorageClient storageClient = Factories.getStorageClient(connection, extension);
+        String durability = connection.getServerConfig().getDurability();
+        return WriteBehindStorageClient.isWriteBehind(durability) ? new WriteBehindStorageClient(storageClient, durability) : storageClient;
+    }
+
+    /**
+     * Is message not stored.
+     * <p>Write-behind storage knows by the time it saved with write or fsync durability.
+     *
+     * @param storageClient StorageClient instance.
+     * @return Boolean.
+     */
+    private static boolean isFailed(StorageClient storageClient) {
+        return storageClient instanceof WriteBehindStorageClient && ((WriteBehindStorageClient) storageClient).isFailed();
+    }
+
+    /**
+     * Gets storage stream passing headers to the storage client header observer if any.
+     * <p>Headers are seen while the message streams to storage so it is not read back.
+     *
+     * @param storageClient StorageClient instance.
+     * @return OutputStream instance.
+     * @throws IOException Unable to open stream.
+     */
+    private OutputStream observe(StorageClient storageClient) throws IOException {
+        OutputStream stream = compress(storageClient.getStream());
+        HeaderObserver observer = storageClient.getHeaderObserver();
+        return observer != null ? new HeaderObservingOutputStream(stream, observer) : stream;
+    }
+
+    /**
+     * Compresses stream if compression is enabled.
+     * <p>Bytes written to the given stream are counted as stored.
+     *
+     * @param stream OutputStream instance.
+     * @return OutputStream instance.
+     * @throws IOException Unable to write compression header.
+     */
+    private OutputStream compress(OutputStream stream) throws IOException {
+        storedCounter = new CountingOutputStream(stream);
+
+        ServerConfig serverConfig = connection.getServerConfig();
+        return CompressionUtils.isCompressed(serverConfig.getCompression()) ?
+                CompressionUtils.compress(storedCounter, serverConfig.getCompression(), serverConfig.getCompressionLevel()) :
+                storedCounter;
+    }
+
+    /**
+     * Limits stream to the maximum message size if any.
+     *
+     * @param stream OutputStream instance.
+     * @return OutputStream instance.
+     */
+    private OutputStream limit(OutputStream stream) {
+        long maxSize = connection.getServerConfig().getMaxSize();
+        return maxSize > 0 ? new LimitedOutputStream(stream, maxSize) : stream;
+    }
+
     /**
      * Binary receipt.
      *
      * @throws IOException Unable to communicate.
      */
     private void binary() throws IOException {
-        BdatVerb bdatVerb = new BdatVerb(verb);
+        BdatVerb bdatVerb = verb instanceof BdatVerb ? (BdatVerb) verb : new BdatVerb(verb);
 
         if (verb.getCount() == 1) {
             connection.write("501 5.5.4 Invalid arguments");
         } else {
+            // Reject before reading a chunk that would exceed the limit.
+            long maxSize = connection.getServerConfig().getMaxSize();
+            TransactionStorage pending = connection.getTransactionStorage();
+            long stored = pending != null ? pending.getByteCount() : 0L;
+            if (maxSize > 0 && stored + bdatVerb.getSize() > maxSize) {
+                connection.closeTransactionStorage();
+                connection.write(ServerMail.SIZE_RESPONSE);
+                throw new SizeLimitException(maxSize);
+            }
+
+            // Storage is kept open across all chunks of the transaction.
+            TransactionStorage storage = connection.getTransactionStorage();
+            if (storage == null) {
+                ServerConfig serverConfig = connection.getServerConfig();
+                storage = new TransactionStorage(getStorageClient("eml"), serverConfig.getCompression(), serverConfig.getCompressionLevel());
+                connection.setTransactionStorage(storage);
+            }
+
             // Read bytes.
-            StorageClient storageClient = Factories.getStorageClient(connection, "eml");
-            CountingOutputStream cos = new CountingOutputStream(storageClient.getStream());
-            binaryRead(bdatVerb, cos);
-            bytesReceived = cos.getByteCount();
+            FileChannel channel = connection.isSecure() ? null : storage.getChannel();
+            if (channel != null) {
+                bytesReceived = binaryTransfer(bdatVerb, channel);
+            } else {
+                CountingOutputStream cos = new CountingOutputStream(storage.getStream());
+                binaryRead(bdatVerb, cos);
+                bytesReceived = cos.getByteCount();
+            }
+            storage.addByteCount(bytesReceived);
 
             if (bdatVerb.isLast()) {
                 log.debug("Last chunk received.");
-                storageClient.save();
+                connection.setTransactionStorage(null);
+                storage.save();
+            }
+            bytesStored = storage.getStoredByteCount();
+
+            if (bdatVerb.isLast() && isFailed(storage.getStorageClient())) {
+                connection.write(STORAGE_RESPONSE);
+                return;
             }
 
             // Scenario response or accept.
-            scenarioResponse(storageClient.getUID());
+            scenarioResponse(storage.getStorageClient().getUID());
         }
     }
 
@@ -149,6 +314,29 @@ public class ServerData extends ServerProcessor {
         }
     }
 
+    /**
+     * Binary transfer to file channel with extended timeout.
+     * <p>Used for file storage when no TLS is active.
+     *
+     * @param verb    Verb instance.
+     * @param channel FileChannel instance.
+     * @return Number of bytes transferred.
+     * @throws IOException Unable to communicate.
+     */
+    protected long binaryTransfer(BdatVerb verb, FileChannel channel) throws IOException {
+        long transferred = 0;
+        try {
+            connection.setTimeout(connection.getSession().getExtendedTimeout());
+            transferred = connection.readBytes(verb.getSize(), channel);
+
+        } finally {
+            connection.setTimeout(connection.getSession().getTimeout());
+            log.info("<< BYTES {}", transferred);
+        }
+
+        return transferred;
+    }
+
     /**
      * Scenario response.
      *
@@ -175,4 +363,14 @@ public class ServerData extends ServerProcessor {
     public long getBytesReceived() {
         return bytesReceived;
     }
+
+    /**
+     * Gets bytes stored.
+     * <p>For BDAT this is the transaction total so far.
+     *
+     * @return Integer.
+     */
+    public long getBytesStored() {
+        return bytesStored;
+    }
 }
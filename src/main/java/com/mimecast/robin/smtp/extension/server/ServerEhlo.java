@@ -3,6 +3,8 @@ package com.mimecast.robin.smtp.extension.server;
 import com.google.common.collect.Lists;
 import com.google.common.collect.Sets;
 import com.mimecast.robin.config.server.ScenarioConfig;
+import com.mimecast.robin.config.server.ServerConfig;
+import com.mimecast.robin.main.Config;
 import com.mimecast.robin.main.Extensions;
 import com.mimecast.robin.smtp.connection.Connection;
 import com.mimecast.robin.smtp.extension.Extension;
@@ -12,14 +14,33 @@ import org.apache.commons.lang3.StringUtils;
 
 import java.io.IOException;
 import java.util.ArrayList;
+import java.util.Collections;
 import java.util.List;
+import java.util.Map;
 import java.util.Optional;
+import java.util.WeakHashMap;
 
 /**
  * EHLO extension processor.
  */
 public class ServerEhlo extends ServerProcessor {
 
+    /**
+     * Cached adverts by server config snapshot or listener view.
+     * <p>Weak keys let replaced snapshots go and the cache is cleared when the extensions change.
+     */
+    private static final Map<ServerConfig, List<String>> adverts = Collections.synchronizedMap(new WeakHashMap<>());
+
+    /**
+     * Is reusable.
+     *
+     * @return Boolean.
+     */
+    @Override
+    public boolean isReusable() {
+        return true;
+    }
+
     /**
      * EHLO processor.
      *
@@ -30,8 +51,6 @@ public class ServerEhlo extends ServerProcessor {
      */
     @Override
     public boolean process(Connection connection, Verb verb) throws IOException {
-        super.process(connection, verb);
-
         EhloVerb ehloVerb = new EhloVerb(verb);
         connection.getSession().setEhlo(ehloVerb.getDomain());
 
@@ -54,7 +73,7 @@ public class ServerEhlo extends ServerProcessor {
         // EHLO response.
         else {
             connection.write("250-" + welcome);
-            writeAdverts();
+            writeAdverts(connection);
         }
 
         return true;
@@ -62,18 +81,65 @@ public class ServerEhlo extends ServerProcessor {
 
     /**
      * Writes adverts to socket.
+     * <p>Only works for instances a connection was set on which the shared EHLO processor never has.
      *
      * @throws IOException Unable to communicate.
+     * @deprecated Use {@link #writeAdverts(Connection)} instead.
      */
+    @Deprecated
     public void writeAdverts() throws IOException {
-        List<String> adverts = Lists.newArrayList(Sets.newHashSet(collectAdverts()));
+        writeAdverts(connection);
+    }
+
+    /**
+     * Writes adverts to given connection.
+     *
+     * @param connection Connection instance.
+     * @throws IOException Unable to communicate.
+     */
+    public static void writeAdverts(Connection connection) throws IOException {
+        List<String> adverts = getAdverts(connection.getServerConfig());
+
+        // No STARTTLS once encrypted.
+        if (connection.getSession().isStartTls()) {
+            adverts = new ArrayList<>(adverts);
+            adverts.removeIf(advert -> advert.equalsIgnoreCase("STARTTLS"));
+        }
+
         for (int i = 0; i < adverts.size(); i++) {
-            if (!adverts.get(i).equalsIgnoreCase("STARTLS") || !connection.getSession().isStartTls()) {
-                connection.write("250" + ((adverts.size() - 1) > i ? "-" : " ") + adverts.get(i));
-            }
+            connection.write("250" + ((adverts.size() - 1) > i ? "-" : " ") + adverts.get(i));
         }
     }
 
+    /**
+     * Gets unique adverts.
+     *
+     * @return Unmodifiable list of strings.
+     */
+    public static List<String> getAdverts() {
+        return getAdverts(Config.getServer());
+    }
+
+    /**
+     * Gets unique adverts for given server config.
+     * <p>Collected once per server config and kept in the same order.
+     *
+     * @param serverConfig ServerConfig instance.
+     * @return Unmodifiable list of strings.
+     */
+    public static List<String> getAdverts(ServerConfig serverConfig) {
+        return adverts.computeIfAbsent(serverConfig,
+                k -> Collections.unmodifiableList(Lists.newArrayList(Sets.newHashSet(collectAdverts(k)))));
+    }
+
+    /**
+     * Clears cached adverts.
+     * <p>Called when extensions are added or removed.
+     */
+    public static void clearAdverts() {
+        adverts.clear();
+    }
+
     /**
      * Collects adverts from extensions.
      *
@@ -81,6 +147,16 @@ public class ServerEhlo extends ServerProcessor {
      */
     @SuppressWarnings("WeakerAccess")
     public static List<String> collectAdverts() {
+        return collectAdverts(Config.getServer());
+    }
+
+    /**
+     * Collects adverts from extensions for given server config.
+     *
+     * @param serverConfig ServerConfig instance.
+     * @return List of strings.
+     */
+    public static List<String> collectAdverts(ServerConfig serverConfig) {
         List<String> adverts = new ArrayList<>();
         adverts.add("PIPELINING");
         for (String s : Extensions.getExtensions().keySet()) {
@@ -88,7 +164,7 @@ public class ServerEhlo extends ServerProcessor {
             Optional<Extension> ept = Extensions.getExtension(s);
             if (ept.isPresent()) {
 
-                String advert = ept.get().getServer().getAdvert();
+                String advert = ept.get().getServer().getAdvert(serverConfig);
                 if (StringUtils.isNotBlank(advert)) {
                     adverts.add(advert);
                 }
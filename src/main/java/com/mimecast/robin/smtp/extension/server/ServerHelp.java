@@ -21,6 +21,16 @@ public class ServerHelp extends ServerProcessor {
         return "HELP";
     }
 
+    /**
+     * Is reusable.
+     *
+     * @return Boolean.
+     */
+    @Override
+    public boolean isReusable() {
+        return true;
+    }
+
     /**
      * HELP processor.
      *
@@ -31,8 +41,6 @@ public class ServerHelp extends ServerProcessor {
      */
     @Override
     public boolean process(Connection connection, Verb verb) throws IOException {
-        super.process(connection, verb);
-
         connection.write("214 " + Extensions.getHelp());
 
         return true;
@@ -1,8 +1,11 @@
 package com.mimecast.robin.smtp.extension.server;
 
 import com.mimecast.robin.config.server.ScenarioConfig;
+import com.mimecast.robin.config.server.ServerConfig;
+import com.mimecast.robin.main.Config;
 import com.mimecast.robin.smtp.connection.Connection;
 import com.mimecast.robin.smtp.verb.Verb;
+import org.apache.commons.lang3.math.NumberUtils;
 
 import javax.mail.internet.AddressException;
 import javax.mail.internet.InternetAddress;
@@ -19,6 +22,11 @@ import java.util.Optional;
  */
 public class ServerMail extends ServerProcessor {
 
+    /**
+     * Message size exceeded response.
+     */
+    static final String SIZE_RESPONSE = "552 5.3.4 Message size exceeds fixed maximum message size";
+
     /**
      * MAIL FROM address.
      */
@@ -54,6 +62,27 @@ public class ServerMail extends ServerProcessor {
      */
     private InternetAddress oRcpt;
 
+    /**
+     * SIZE advert.
+     *
+     * @return Advert string.
+     */
+    @Override
+    public String getAdvert() {
+        return getAdvert(Config.getServer());
+    }
+
+    /**
+     * SIZE advert for given server config.
+     *
+     * @param serverConfig ServerConfig instance.
+     * @return Advert string.
+     */
+    @Override
+    public String getAdvert(ServerConfig serverConfig) {
+        return serverConfig.getMaxSize() > 0 ? "SIZE " + serverConfig.getMaxSize() : "";
+    }
+
     /**
      * MAIL processor.
      *
@@ -68,6 +97,15 @@ public class ServerMail extends ServerProcessor {
 
         // Bypass for RCPT extension.
         if (verb.getKey().equals("mail")) {
+            // New transaction drops any pending BDAT chunks.
+            connection.closeTransactionStorage();
+
+            // Declared size over the limit.
+            long maxSize = connection.getServerConfig().getMaxSize();
+            if (maxSize > 0 && NumberUtils.toLong(verb.getParam("size"), 0L) > maxSize) {
+                connection.write(SIZE_RESPONSE);
+                return true;
+            }
 
             // ScenarioConfig response.
             Optional<ScenarioConfig> opt = connection.getScenario();
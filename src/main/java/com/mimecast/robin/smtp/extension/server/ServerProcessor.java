@@ -1,5 +1,6 @@
 package com.mimecast.robin.smtp.extension.server;
 
+import com.mimecast.robin.config.server.ServerConfig;
 import com.mimecast.robin.smtp.connection.Connection;
 import com.mimecast.robin.smtp.verb.Verb;
 import org.apache.logging.log4j.LogManager;
@@ -13,6 +14,12 @@ import java.io.IOException;
 public abstract class ServerProcessor {
     static final Logger log = LogManager.getLogger(ServerProcessor.class);
 
+    /**
+     * Line too long response.
+     * <p>Sent for command and DATA lines over the configured limits before closing the connection.
+     */
+    public static final String LINE_RESPONSE = "500 5.5.2 Line too long";
+
     /**
      * Connection instance.
      */
@@ -33,6 +40,28 @@ public abstract class ServerProcessor {
         return "";
     }
 
+    /**
+     * Advert getter for given server config.
+     * <p>Lets listeners with different policies advertise different extensions.
+     *
+     * @param serverConfig ServerConfig instance.
+     * @return Advert string.
+     */
+    String getAdvert(ServerConfig serverConfig) {
+        return getAdvert();
+    }
+
+    /**
+     * Is reusable.
+     * <p>Processors keeping no state can be shared by every command of every connection.
+     * <br>These must only use the connection and verb they are given, not the fields set by process().
+     *
+     * @return Boolean.
+     */
+    public boolean isReusable() {
+        return false;
+    }
+
     /**
      * ClientProcessor.
      *
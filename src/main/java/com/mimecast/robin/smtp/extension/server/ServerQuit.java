@@ -10,6 +10,16 @@ import java.io.IOException;
  */
 public class ServerQuit extends ServerProcessor {
 
+    /**
+     * Is reusable.
+     *
+     * @return Boolean.
+     */
+    @Override
+    public boolean isReusable() {
+        return true;
+    }
+
     /**
      * QUIT processor.
      *
@@ -20,8 +30,6 @@ public class ServerQuit extends ServerProcessor {
      */
     @Override
     public boolean process(Connection connection, Verb verb) throws IOException {
-        super.process(connection, verb);
-
         connection.write("221 2.0.0 Closing connection");
         connection.close();
 
@@ -1,13 +1,13 @@
 package com.mimecast.robin.smtp.extension.server;
 
 import com.mimecast.robin.config.server.ScenarioConfig;
+import com.mimecast.robin.config.server.ServerConfig;
 import com.mimecast.robin.smtp.connection.Connection;
 import com.mimecast.robin.smtp.verb.Verb;
 
 import javax.mail.internet.AddressException;
 import javax.mail.internet.InternetAddress;
 import java.io.IOException;
-import java.util.Map;
 import java.util.Optional;
 
 /**
@@ -15,6 +15,17 @@ import java.util.Optional;
  */
 public class ServerRcpt extends ServerMail {
 
+    /**
+     * No advert as SIZE is advertised by MAIL.
+     *
+     * @param serverConfig ServerConfig instance.
+     * @return Empty string.
+     */
+    @Override
+    public String getAdvert(ServerConfig serverConfig) {
+        return "";
+    }
+
     /**
      * RCPT processor.
      *
@@ -29,16 +40,15 @@ public class ServerRcpt extends ServerMail {
 
         // Scenario response.
         Optional<ScenarioConfig> opt = connection.getScenario();
-        if (opt.isPresent() && opt.get().getRcpt() != null) {
-            for (Map<String, String> entry : opt.get().getRcpt()) {
-                if (getAddress() != null && getAddress().getAddress().matches(entry.get("value"))) {
-                    String response = entry.get("response");
-                    if (response.startsWith("2")) {
-                        connection.getSession().addRcpt(getAddress());
-                    }
-                    connection.write(response);
-                    return response.startsWith("2");
+        if (opt.isPresent() && getAddress() != null) {
+            Optional<String> rcpt = opt.get().getRcptResponse(getAddress().getAddress());
+            if (rcpt.isPresent()) {
+                String response = rcpt.get();
+                if (response.startsWith("2")) {
+                    connection.getSession().addRcpt(getAddress());
                 }
+                connection.write(response);
+                return response.startsWith("2");
             }
         }
 
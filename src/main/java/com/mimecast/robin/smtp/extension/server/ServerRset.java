@@ -10,6 +10,16 @@ import java.io.IOException;
  */
 public class ServerRset extends ServerProcessor {
 
+    /**
+     * Is reusable.
+     *
+     * @return Boolean.
+     */
+    @Override
+    public boolean isReusable() {
+        return true;
+    }
+
     /**
      * RSET processor.
      *
@@ -20,8 +30,6 @@ public class ServerRset extends ServerProcessor {
      */
     @Override
     public boolean process(Connection connection, Verb verb) throws IOException {
-        super.process(connection, verb);
-
         connection.write("250 2.1.5 All clear");
         connection.reset();
 
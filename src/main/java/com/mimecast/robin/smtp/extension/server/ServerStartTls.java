@@ -1,5 +1,6 @@
 package com.mimecast.robin.smtp.extension.server;
 
+import com.mimecast.robin.config.server.ServerConfig;
 import com.mimecast.robin.main.Config;
 import com.mimecast.robin.smtp.connection.Connection;
 import com.mimecast.robin.smtp.verb.Verb;
@@ -18,7 +19,28 @@ public class ServerStartTls extends ServerProcessor {
      */
     @Override
     public String getAdvert() {
-        return Config.getServer().isStartTls() ? "STARTTLS" : "";
+        return getAdvert(Config.getServer());
+    }
+
+    /**
+     * STARTTLS advert for given server config.
+     *
+     * @param serverConfig ServerConfig instance.
+     * @return Advert string.
+     */
+    @Override
+    public String getAdvert(ServerConfig serverConfig) {
+        return serverConfig.isStartTls() ? "STARTTLS" : "";
+    }
+
+    /**
+     * Is reusable.
+     *
+     * @return Boolean.
+     */
+    @Override
+    public boolean isReusable() {
+        return true;
     }
 
     /**
@@ -31,8 +53,6 @@ public class ServerStartTls extends ServerProcessor {
      */
     @Override
     public boolean process(Connection connection, Verb verb) throws IOException {
-        super.process(connection, verb);
-
         connection.write("220 Ready for handshake");
         connection.startTLS(false);
         connection.getSession().setStartTls(true);
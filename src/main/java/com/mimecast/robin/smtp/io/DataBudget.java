@@ -0,0 +1,138 @@
+package com.mimecast.robin.smtp.io;
+
+import com.mimecast.robin.main.Metrics;
+
+import java.io.InterruptedIOException;
+import java.util.concurrent.locks.Condition;
+import java.util.concurrent.locks.ReentrantLock;
+
+/**
+ * Global in-flight DATA budget.
+ *
+ * <p>Limits how many message bytes all connections may have read from their sockets but not yet written to storage.
+ * <p>Readers charge the budget with what every read returned and give it back once the bytes are written.
+ * <br>Nothing is held while waiting on a socket so stalled senders do not starve the others.
+ * <br>When storage falls behind the budget runs out and readers wait before writing and reading any further.
+ * <br>TCP flow control then pushes back on the clients.
+ * <p>A share is never held while waiting for another so readers cannot deadlock.
+ * <br>A single read larger than the budget is let through when nothing else is in flight.
+ * <p>Waits use a lock and condition rather than a monitor as monitors pin virtual threads.
+ */
+public class DataBudget {
+
+    /**
+     * Lock.
+     */
+    private static final ReentrantLock lock = new ReentrantLock();
+
+    /**
+     * Signalled when budget is given back or changed.
+     */
+    private static final Condition available = lock.newCondition();
+
+    /**
+     * Budget in bytes.
+     * <p>Zero disables the budget.
+     */
+    private static volatile long limit = 0L;
+
+    /**
+     * Bytes in flight.
+     */
+    private static long used = 0L;
+
+    /**
+     * Protected constructor.
+     */
+    private DataBudget() {
+        throw new IllegalStateException("Static class");
+    }
+
+    /**
+     * Sets budget.
+     *
+     * @param bytes Budget in bytes (0 to disable).
+     */
+    public static void setLimit(long bytes) {
+        lock.lock();
+        try {
+            limit = Math.max(0L, bytes);
+            available.signalAll();
+        } finally {
+            lock.unlock();
+        }
+    }
+
+    /**
+     * Gets budget.
+     *
+     * @return Budget in bytes.
+     */
+    public static long getLimit() {
+        return limit;
+    }
+
+    /**
+     * Gets bytes in flight.
+     *
+     * @return Bytes.
+     */
+    public static long getUsed() {
+        lock.lock();
+        try {
+            return used;
+        } finally {
+            lock.unlock();
+        }
+    }
+
+    /**
+     * Takes a share of the budget.
+     * <p>Blocks while the budget is exhausted.
+     * <br>Called once bytes were read so nothing is held while waiting on the socket.
+     *
+     * @param bytes Number of bytes.
+     * @return Number of bytes taken, to be given back via release().
+     * @throws InterruptedIOException Interrupted while waiting.
+     */
+    public static long acquire(long bytes) throws InterruptedIOException {
+        if (limit <= 0) return 0L;
+
+        lock.lock();
+        try {
+            if (used > 0 && used + bytes > limit) {
+                Metrics.increment(Metrics.DATA_BUDGET_WAITS);
+                while (limit > 0 && used > 0 && used + bytes > limit) {
+                    try {
+                        available.await();
+                    } catch (InterruptedException e) {
+                        Thread.currentThread().interrupt();
+                        throw new InterruptedIOException("Interrupted waiting for DATA budget");
+                    }
+                }
+            }
+
+            used += bytes;
+            return bytes;
+        } finally {
+            lock.unlock();
+        }
+    }
+
+    /**
+     * Gives back a share of the budget.
+     *
+     * @param bytes Number of bytes returned by acquire().
+     */
+    public static void release(long bytes) {
+        if (bytes <= 0) return;
+
+        lock.lock();
+        try {
+            used -= bytes;
+            available.signalAll();
+        } finally {
+            lock.unlock();
+        }
+    }
+}
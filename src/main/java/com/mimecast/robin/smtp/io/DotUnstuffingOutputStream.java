@@ -0,0 +1,390 @@
+package com.mimecast.robin.smtp.io;
+
+import java.io.IOException;
+import java.io.OutputStream;
+
+/**
+ * Output stream decoding SMTP DATA transparency.
+ *
+ * <p>Bytes written are decoded by a byte level state machine so lines can span write boundaries.
+ * <p>Removes the leading dot of stuffed lines and stops at the end of data terminator.
+ * <br>The terminator is a line with a single dot with the same EOL as the previous line (CRLF, LF or CR).
+ * <br>A terminator at the very start of the data is also recognised.
+ * <p>The EOL before the terminator is not written to keep the stored data consistent with the receipt.
+ * <p>Decoded bytes are written to the wrapped stream in large blocks via an internal buffer.
+ * <p>Once terminated decode() returns the number of bytes consumed so the rest can be unread.
+ * <p>A max line length can be configured to fail lines growing longer with a LineTooLongException.
+ * <br>The EOL bytes are not counted towards the limit.
+ *
+ * @see <a href="https://tools.ietf.org/html/rfc5321#section-4.5.2">RFC 5321 #4.5.2</a>
+ */
+@SuppressWarnings("squid:S4349")
+public class DotUnstuffingOutputStream extends OutputStream {
+
+    /**
+     * Carrige return byte.
+     */
+    private static final byte CR = 13; // \r
+
+    /**
+     * Line feed byte.
+     */
+    private static final byte LF = 10; // \n
+
+    /**
+     * Dot byte.
+     */
+    private static final byte DOT = 46; // .
+
+    /**
+     * Inside line.
+     */
+    private static final int BODY = 0;
+
+    /**
+     * CR found inside line, LF may follow.
+     */
+    private static final int BODY_CR = 1;
+
+    /**
+     * At line start.
+     */
+    private static final int LINE_START = 2;
+
+    /**
+     * Dot found at line start.
+     */
+    private static final int LINE_DOT = 3;
+
+    /**
+     * Dot and CR found at line start, LF may follow.
+     */
+    private static final int LINE_DOT_CR = 4;
+
+    /**
+     * Terminator found.
+     */
+    private static final int TERMINATED = 5;
+
+    /**
+     * Output stream instance.
+     */
+    private final OutputStream out;
+
+    /**
+     * Output buffer.
+     */
+    private final byte[] buffer;
+
+    /**
+     * Output buffer length.
+     */
+    private int length = 0;
+
+    /**
+     * Decoder state.
+     */
+    private int state = LINE_START;
+
+    /**
+     * Pending EOL of previous line.
+     * <p>Written only once the next line is known not to be the terminator.
+     * <br>Empty at the start of the data where any terminator EOL is accepted.
+     */
+    private final byte[] eol = new byte[2];
+
+    /**
+     * Pending EOL length.
+     */
+    private int eolLength = 0;
+
+    /**
+     * Max line length (0 for unlimited).
+     */
+    private final int maxLineLength;
+
+    /**
+     * Current line length.
+     */
+    private int lineLength = 0;
+
+    /**
+     * Constructs a new DotUnstuffingOutputStream instance.
+     *
+     * @param out OutputStream instance.
+     */
+    public DotUnstuffingOutputStream(OutputStream out) {
+        this(out, 8192);
+    }
+
+    /**
+     * Constructs a new DotUnstuffingOutputStream instance with given buffer size.
+     *
+     * @param out        OutputStream instance.
+     * @param bufferSize Output buffer size.
+     */
+    public DotUnstuffingOutputStream(OutputStream out, int bufferSize) {
+        this(out, bufferSize, 0);
+    }
+
+    /**
+     * Constructs a new DotUnstuffingOutputStream instance with given buffer size and max line length.
+     *
+     * @param out           OutputStream instance.
+     * @param bufferSize    Output buffer size.
+     * @param maxLineLength Max line length excluding EOL (0 for unlimited).
+     */
+    public DotUnstuffingOutputStream(OutputStream out, int bufferSize, int maxLineLength) {
+        this.out = out;
+        this.buffer = new byte[Math.max(16, bufferSize)];
+        this.maxLineLength = Math.max(0, maxLineLength);
+    }
+
+    /**
+     * Is terminated.
+     *
+     * @return Boolean.
+     */
+    public boolean isTerminated() {
+        return state == TERMINATED;
+    }
+
+    @Override
+    public void write(int b) throws IOException {
+        decode(new byte[]{(byte) b}, 0, 1);
+    }
+
+    @Override
+    public void write(byte[] b, int off, int len) throws IOException {
+        decode(b, off, len);
+    }
+
+    /**
+     * Decode bytes.
+     *
+     * @param b   Byte array.
+     * @param off Offset.
+     * @param len Length.
+     * @return Number of bytes consumed, less than length if terminated.
+     * @throws IOException Unable to write.
+     */
+    @SuppressWarnings({"squid:S3776", "squid:S135"})
+    public int decode(byte[] b, int off, int len) throws IOException {
+        int end = off + len;
+        int i = off;
+
+        while (i < end && state != TERMINATED) {
+            byte c = b[i];
+
+            switch (state) {
+                case BODY:
+                    // Bulk write line content.
+                    int start = i;
+                    while (i < end && b[i] != CR && b[i] != LF) {
+                        i++;
+                    }
+
+                    lineLength += i - start;
+                    if (maxLineLength > 0 && lineLength > maxLineLength) {
+                        throw new LineTooLongException(maxLineLength);
+                    }
+                    buffer(b, start, i - start);
+
+                    if (i < end) {
+                        if (b[i] == LF) {
+                            setEol(LF);
+                            state = LINE_START;
+                        } else {
+                            state = BODY_CR;
+                        }
+                        i++;
+                    }
+                    break;
+
+                case BODY_CR:
+                    if (c == LF) {
+                        setEol(CR, LF);
+                        i++;
+                    } else {
+                        setEol(CR);
+                    }
+                    state = LINE_START;
+                    break;
+
+                case LINE_START:
+                    if (c == DOT) {
+                        state = LINE_DOT;
+                        i++;
+                    } else {
+                        writeEol();
+                        state = BODY;
+                    }
+                    break;
+
+                case LINE_DOT:
+                    if (c == CR) {
+                        state = LINE_DOT_CR;
+                        i++;
+                    } else if (c == LF) {
+                        i++;
+                        if (isEol(LF)) {
+                            state = TERMINATED;
+                        } else {
+                            writeEol();
+                            buffer(DOT);
+                            setEol(LF);
+                            state = LINE_START;
+                        }
+                    } else {
+                        // Unstuff leading dot.
+                        writeEol();
+                        state = BODY;
+                    }
+                    break;
+
+                case LINE_DOT_CR:
+                    if (c == LF) {
+                        i++;
+                        if (isEol(CR, LF)) {
+                            state = TERMINATED;
+                        } else {
+                            writeEol();
+                            buffer(DOT);
+                            setEol(CR, LF);
+                            state = LINE_START;
+                        }
+                    } else if (isEol(CR)) {
+                        state = TERMINATED;
+                    } else {
+                        writeEol();
+                        buffer(DOT);
+                        setEol(CR);
+                        state = LINE_START;
+                    }
+                    break;
+
+                default:
+                    break;
+            }
+        }
+
+        if (state == TERMINATED) {
+            flushBuffer();
+        }
+
+        return i - off;
+    }
+
+    /**
+     * Finish decoding at end of input.
+     * <p>A pending lone dot line is written, a pending EOL is dropped as the last line EOL.
+     * <p>A dot and CR line ends the data if the previous line ended in CR.
+     *
+     * @throws IOException Unable to write.
+     */
+    public void finish() throws IOException {
+        if (state == LINE_DOT_CR && isEol(CR)) {
+            state = TERMINATED;
+        } else if (state == LINE_DOT || state == LINE_DOT_CR) {
+            writeEol();
+            buffer(DOT);
+        }
+
+        flushBuffer();
+    }
+
+    /**
+     * Sets pending EOL.
+     *
+     * @param bytes EOL bytes.
+     */
+    private void setEol(byte... bytes) {
+        lineLength = 0;
+        eolLength = bytes.length;
+        System.arraycopy(bytes, 0, eol, 0, eolLength);
+    }
+
+    /**
+     * Is pending EOL equal to given bytes.
+     * <p>Matches anything at the start of the data.
+     *
+     * @param bytes EOL bytes.
+     * @return Boolean.
+     */
+    private boolean isEol(byte... bytes) {
+        if (eolLength == 0) {
+            return true;
+        }
+
+        return eolLength == bytes.length && eol[0] == bytes[0] && (eolLength == 1 || eol[1] == bytes[1]);
+    }
+
+    /**
+     * Writes pending EOL.
+     *
+     * @throws IOException Unable to write.
+     */
+    private void writeEol() throws IOException {
+        buffer(eol, 0, eolLength);
+        eolLength = 0;
+    }
+
+    /**
+     * Buffers byte.
+     *
+     * @param b Byte.
+     * @throws IOException Unable to write.
+     */
+    private void buffer(byte b) throws IOException {
+        if (length == buffer.length) {
+            flushBuffer();
+        }
+        buffer[length++] = b;
+    }
+
+    /**
+     * Buffers bytes.
+     * <p>Runs larger than the buffer are written through.
+     *
+     * @param b   Byte array.
+     * @param off Offset.
+     * @param len Length.
+     * @throws IOException Unable to write.
+     */
+    private void buffer(byte[] b, int off, int len) throws IOException {
+        if (len > buffer.length - length) {
+            flushBuffer();
+            if (len >= buffer.length) {
+                out.write(b, off, len);
+                return;
+            }
+        }
+
+        System.arraycopy(b, off, buffer, length, len);
+        length += len;
+    }
+
+    /**
+     * Flushes output buffer to wrapped stream.
+     *
+     * @throws IOException Unable to write.
+     */
+    private void flushBuffer() throws IOException {
+        if (length > 0) {
+            out.write(buffer, 0, length);
+            length = 0;
+        }
+    }
+
+    @Override
+    public void flush() throws IOException {
+        flushBuffer();
+        out.flush();
+    }
+
+    @Override
+    public void close() throws IOException {
+        finish();
+        out.close();
+    }
+}
@@ -0,0 +1,72 @@
+package com.mimecast.robin.smtp.io;
+
+import java.io.FilterOutputStream;
+import java.io.IOException;
+import java.io.OutputStream;
+
+/**
+ * Output stream with a size limit.
+ *
+ * <p>Throws a SizeLimitException on the write that would take it past the limit.
+ * <br>Nothing of that write is passed on so the limit is never exceeded.
+ *
+ * @see SizeLimitException
+ */
+public class LimitedOutputStream extends FilterOutputStream {
+
+    /**
+     * Limit in bytes.
+     */
+    private final long limit;
+
+    /**
+     * Bytes written.
+     */
+    private long count = 0L;
+
+    /**
+     * Constructs a new LimitedOutputStream instance with given limit.
+     *
+     * @param out   OutputStream instance.
+     * @param limit Limit in bytes.
+     */
+    public LimitedOutputStream(OutputStream out, long limit) {
+        super(out);
+        this.limit = limit;
+    }
+
+    @Override
+    public void write(int b) throws IOException {
+        check(1);
+        out.write(b);
+        count++;
+    }
+
+    @Override
+    public void write(byte[] b, int off, int len) throws IOException {
+        check(len);
+        out.write(b, off, len);
+        count += len;
+    }
+
+    /**
+     * Checks limit.
+     *
+     * @param len Number of bytes about to be written.
+     * @throws SizeLimitException Limit exceeded.
+     */
+    private void check(int len) throws SizeLimitException {
+        if (count + len > limit) {
+            throw new SizeLimitException(limit);
+        }
+    }
+
+    /**
+     * Gets bytes written.
+     *
+     * @return Number of bytes.
+     */
+    public long getCount() {
+        return count;
+    }
+}
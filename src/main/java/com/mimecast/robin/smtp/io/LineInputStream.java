@@ -3,15 +3,21 @@ package com.mimecast.robin.smtp.io;
 import org.apache.logging.log4j.LogManager;
 import org.apache.logging.log4j.Logger;
 
-import java.io.ByteArrayOutputStream;
 import java.io.IOException;
 import java.io.InputStream;
 import java.io.PushbackInputStream;
+import java.util.Arrays;
 
 /**
  * Input stream with binary line reading capability.
  *
  * <p>InputStream implementation returns lines with EOL as byte array and counts lines.
+ * <p>Reads are buffered and lines are found by scanning the buffer in bulk for CR and LF.
+ * <p>Lines end on LF, CRLF or a CR not followed by LF to support mixed line endings.
+ * <p>nextLine() reads a line into a reusable line buffer without allocating.
+ * <br>The line buffer is only valid until the next read.
+ * <p>A max line length can be configured to split longer lines.
+ * <br>The EOL bytes are not counted towards the limit.
  */
 public class LineInputStream extends PushbackInputStream {
     private static final Logger log = LogManager.getLogger(LineInputStream.class);
@@ -26,18 +32,80 @@ public class LineInputStream extends PushbackInputStream {
      */
     private static final int LF = 10; // \n
 
+    /**
+     * Default read buffer size.
+     */
+    private static final int BUFFER_SIZE = 8192;
+
+    /**
+     * Read buffer.
+     */
+    private byte[] buffer;
+
+    /**
+     * Read buffer position.
+     */
+    private int position = 0;
+
+    /**
+     * Read buffer limit.
+     */
+    private int limit = 0;
+
+    /**
+     * Line buffer.
+     */
+    private byte[] line = new byte[128];
+
+    /**
+     * Line buffer length.
+     */
+    private int lineLength = 0;
+
+    /**
+     * Max line length (0 for unlimited).
+     */
+    private final int maxLineLength;
+
+    /**
+     * Last line was split at max line length.
+     */
+    private boolean lineSplit = false;
+
     /**
      * Current line number.
      */
     private int lineNumber = 0;
 
+    /**
+     * Bytes read from the wrapped stream.
+     */
+    private long bytesRead = 0L;
+
+    /**
+     * Drain listener.
+     */
+    private DrainListener drainListener;
+
     /**
      * Constructs a new LineInputStream instance.
      *
      * @param stream InputStream instance.
      */
     public LineInputStream(InputStream stream) {
+        this(stream, 0);
+    }
+
+    /**
+     * Constructs a new LineInputStream instance with given max line length.
+     *
+     * @param stream        InputStream instance.
+     * @param maxLineLength Max line length excluding EOL (0 for unlimited).
+     */
+    public LineInputStream(InputStream stream, int maxLineLength) {
         super(stream);
+        this.buffer = new byte[BUFFER_SIZE];
+        this.maxLineLength = Math.max(0, maxLineLength);
     }
 
     /**
@@ -49,43 +117,313 @@ public class LineInputStream extends PushbackInputStream {
         return lineNumber;
     }
 
+    /**
+     * Gets number of bytes read from the wrapped stream.
+     * <p>Includes bytes still buffered.
+     *
+     * @return Bytes count.
+     */
+    public long getBytesRead() {
+        return bytesRead;
+    }
+
+    /**
+     * Sets drain listener.
+     * <p>Called when all input was consumed and the next read may block.
+     *
+     * @param drainListener DrainListener instance.
+     * @return Self.
+     */
+    public LineInputStream setDrainListener(DrainListener drainListener) {
+        this.drainListener = drainListener;
+        return this;
+    }
+
+    /**
+     * Gets max line length.
+     *
+     * @return Max line length (0 for unlimited).
+     */
+    public int getMaxLineLength() {
+        return maxLineLength;
+    }
+
+    /**
+     * Is last line split.
+     * <p>True if the last line read reached the max line length and has no EOL.
+     * <br>The remainder will be returned by the next read.
+     *
+     * @return Boolean.
+     */
+    public boolean isLineSplit() {
+        return lineSplit;
+    }
+
     /**
      * Read line as byte array.
      *
      * @return Byte array.
      * @throws IOException Unable to read.
      */
-    @SuppressWarnings({"squid:S1168", "squid:S135"})
+    @SuppressWarnings("squid:S1168")
     public byte[] readLine() throws IOException {
-        ByteArrayOutputStream buffer = new ByteArrayOutputStream();
-
-        boolean foundCR = false;
-        int intByte;
-        while ((intByte = read()) != -1) {
-            // Have CR but LF doesn't follow unread byte and return what is read so far.
-            if (foundCR && intByte != LF) {
-                unread(intByte);
-                break;
+        int length = nextLine();
+        if (length == -1) {
+            log.debug("Buffer empty.");
+            return null;
+        }
+
+        return Arrays.copyOf(line, length);
+    }
+
+    /**
+     * Read line into line buffer.
+     * <p>The line including EOL can be found in getLineBuffer() from offset 0.
+     *
+     * @return Line length or -1 if end of stream.
+     * @throws IOException Unable to read.
+     */
+    @SuppressWarnings("squid:S135")
+    public int nextLine() throws IOException {
+        lineLength = 0;
+        lineSplit = false;
+
+        while (position < limit || fill()) {
+            // Scan for EOL within max line length.
+            int stop = limit;
+            if (maxLineLength > 0) {
+                stop = Math.min(limit, position + Math.max(0, maxLineLength - lineLength));
             }
 
-            // CR is recorded and read continues in hope of finding LF next.
-            foundCR = foundCR || intByte == CR;
+            int i = position;
+            while (i < stop && buffer[i] != LF && buffer[i] != CR) {
+                i++;
+            }
 
-            // LF will instantly terminate the read and return.
-            if (intByte == LF) {
-                buffer.write(intByte);
+            // Buffer exhausted, keep line so far and fill.
+            if (i == limit) {
+                append(position, i);
+                continue;
+            }
+
+            // Max line length reached without EOL.
+            if (buffer[i] != LF && buffer[i] != CR) {
+                append(position, i);
+                lineSplit = true;
                 break;
             }
 
-            buffer.write(intByte);
+            // LF will instantly terminate the line.
+            // CR will terminate the line and take the LF with it if it follows.
+            append(position, i + 1);
+            if (buffer[i] == CR && (position < limit || fill()) && buffer[position] == LF) {
+                append(position, position + 1);
+            }
+            break;
         }
 
-        if (buffer.size() == 0) {
-            log.debug("Buffer empty.");
-            return null;
+        if (lineLength == 0) {
+            return -1;
         }
 
         lineNumber++;
-        return buffer.toByteArray();
+        return lineLength;
+    }
+
+    /**
+     * Gets line buffer.
+     * <p>Holds the last line read via nextLine() from offset 0.
+     *
+     * @return Byte array.
+     */
+    public byte[] getLineBuffer() {
+        return line;
+    }
+
+    /**
+     * Gets line buffer length.
+     *
+     * @return Line length.
+     */
+    public int getLineLength() {
+        return lineLength;
+    }
+
+    /**
+     * Appends read buffer range to line buffer and advances read position.
+     *
+     * @param from Start offset.
+     * @param to   End offset exclusive.
+     */
+    private void append(int from, int to) {
+        int length = to - from;
+        if (lineLength + length > line.length) {
+            line = Arrays.copyOf(line, Math.max(line.length * 2, lineLength + length));
+        }
+
+        System.arraycopy(buffer, from, line, lineLength, length);
+        lineLength += length;
+        position = to;
+    }
+
+    /**
+     * Fills read buffer.
+     *
+     * @return Boolean, false if end of stream.
+     * @throws IOException Unable to read.
+     */
+    private boolean fill() throws IOException {
+        beforeRead();
+
+        int read;
+        do {
+            read = in.read(buffer, 0, buffer.length);
+        } while (read == 0);
+
+        if (read == -1) {
+            return false;
+        }
+
+        bytesRead += read;
+        position = 0;
+        limit = read;
+        return true;
+    }
+
+    /**
+     * Before reading from the wrapped stream.
+     * <p>Notifies the drain listener if the wrapped stream has nothing available so the read may block.
+     *
+     * @throws IOException Unable to read.
+     */
+    private void beforeRead() throws IOException {
+        ensureOpen();
+        if (drainListener != null && in.available() == 0) {
+            drainListener.drained();
+        }
+    }
+
+    /**
+     * Ensures stream is open.
+     *
+     * @throws IOException Stream closed.
+     */
+    private void ensureOpen() throws IOException {
+        if (in == null) {
+            throw new IOException("Stream closed");
+        }
+    }
+
+    @Override
+    public int read() throws IOException {
+        if (position >= limit && !fill()) {
+            return -1;
+        }
+
+        return buffer[position++] & 0xff;
+    }
+
+    @Override
+    public int read(byte[] b, int off, int len) throws IOException {
+        if (len == 0) {
+            return 0;
+        }
+
+        if (position >= limit) {
+            // Large reads skip the buffer.
+            if (len >= buffer.length) {
+                beforeRead();
+                int read = in.read(b, off, len);
+                if (read > 0) {
+                    bytesRead += read;
+                }
+                return read;
+            }
+
+            if (!fill()) {
+                return -1;
+            }
+        }
+
+        int length = Math.min(len, limit - position);
+        System.arraycopy(buffer, position, b, off, length);
+        position += length;
+        return length;
+    }
+
+    @Override
+    public long skip(long n) throws IOException {
+        if (n <= 0) {
+            return 0;
+        }
+
+        int buffered = limit - position;
+        if (buffered > 0) {
+            int skipped = (int) Math.min(n, buffered);
+            position += skipped;
+            return skipped;
+        }
+
+        ensureOpen();
+        long skipped = in.skip(n);
+        bytesRead += skipped;
+        return skipped;
+    }
+
+    @Override
+    public int available() throws IOException {
+        ensureOpen();
+        int buffered = limit - position;
+        int available = in.available();
+        return buffered > Integer.MAX_VALUE - available ? Integer.MAX_VALUE : buffered + available;
+    }
+
+    @Override
+    public void unread(int b) throws IOException {
+        if (position > 0) {
+            buffer[--position] = (byte) b;
+            return;
+        }
+
+        unread(new byte[]{(byte) b}, 0, 1);
+    }
+
+    @Override
+    public void unread(byte[] b, int off, int len) throws IOException {
+        if (len <= position) {
+            position -= len;
+        } else {
+            // Make room at the front of the buffer.
+            int buffered = limit - position;
+            byte[] target = buffered + len > buffer.length ? new byte[buffered + len] : buffer;
+            System.arraycopy(buffer, position, target, len, buffered);
+            buffer = target;
+            position = 0;
+            limit = buffered + len;
+        }
+
+        System.arraycopy(b, off, buffer, position, len);
+    }
+
+    @Override
+    public void close() throws IOException {
+        super.close();
+        position = 0;
+        limit = 0;
+    }
+
+    /**
+     * Drain listener interface.
+     * <p>Servers use it to flush buffered replies before waiting for more input.
+     */
+    @FunctionalInterface
+    public interface DrainListener {
+
+        /**
+         * Input drained.
+         *
+         * @throws IOException Unable to communicate.
+         */
+        void drained() throws IOException;
     }
 }
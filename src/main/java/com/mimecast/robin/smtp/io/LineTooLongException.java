@@ -0,0 +1,24 @@
+package com.mimecast.robin.smtp.io;
+
+import java.io.IOException;
+
+/**
+ * Line too long exception.
+ *
+ * <p>This is thrown when a command or DATA line grows past the maximum line length.
+ * <br>The rest of the line is not read so memory use stays bounded.
+ *
+ * @see LineInputStream
+ * @see DotUnstuffingOutputStream
+ */
+public class LineTooLongException extends IOException {
+
+    /**
+     * Constructs a new LineTooLongException instance with given limit.
+     *
+     * @param limit Limit in bytes.
+     */
+    public LineTooLongException(int limit) {
+        super("Line exceeds " + limit + " bytes");
+    }
+}
@@ -0,0 +1,22 @@
+package com.mimecast.robin.smtp.io;
+
+import java.io.IOException;
+
+/**
+ * Size limit exception.
+ *
+ * <p>This is thrown when a message grows past the maximum message size.
+ *
+ * @see LimitedOutputStream
+ */
+public class SizeLimitException extends IOException {
+
+    /**
+     * Constructs a new SizeLimitException instance with given limit.
+     *
+     * @param limit Limit in bytes.
+     */
+    public SizeLimitException(long limit) {
+        super("Message size exceeds " + limit + " bytes");
+    }
+}
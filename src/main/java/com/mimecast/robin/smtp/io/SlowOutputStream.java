@@ -11,6 +11,8 @@ import java.io.OutputStream;
  * Output stream with slow data writing capability.
  *
  * <p>Slows down the writing for given miliseconds every given bytes.
+ * <p>Bytes between waits are written in bulk and flushed before every wait.
+ * <br>No locks are held while waiting so virtual threads are free to unmount.
  */
 @SuppressWarnings("squid:S4349")
 public class SlowOutputStream extends OutputStream {
@@ -56,10 +58,11 @@ public class SlowOutputStream extends OutputStream {
 
     @Override
     public void write(int b) throws IOException {
-        if (bytes >= 128 && wait >= 100) {
+        if (isSlow()) {
             count++;
             if (count == bytes) {
                 count = 0;
+                out.flush();
                 log.info("Waiting after {} bytes wrote.", bytes);
                 totalWait += wait;
                 Sleep.nap(wait);
@@ -69,6 +72,43 @@ public class SlowOutputStream extends OutputStream {
         out.write(b);
     }
 
+    @Override
+    public void write(byte[] b, int off, int len) throws IOException {
+        if (!isSlow()) {
+            out.write(b, off, len);
+            return;
+        }
+
+        while (len > 0) {
+            // Bytes that can be written before the next wait.
+            int run = Math.min(len, bytes - count - 1);
+            if (run > 0) {
+                out.write(b, off, run);
+                count += run;
+            } else {
+                run = 1;
+                write(b[off]);
+            }
+
+            off += run;
+            len -= run;
+        }
+    }
+
+    @Override
+    public void flush() throws IOException {
+        out.flush();
+    }
+
+    /**
+     * Is slow writing enabled.
+     *
+     * @return Boolean.
+     */
+    private boolean isSlow() {
+        return bytes >= 128 && wait >= 100;
+    }
+
     /**
      * Gets total wait time spent waiting in miliseconds.
      * <p>This is primarly here for unit testing.
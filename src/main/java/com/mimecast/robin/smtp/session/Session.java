@@ -121,6 +121,11 @@ public class Session {
      */
     private boolean ehloBdat = false;
 
+    /**
+     * [Client] EHLO advertised PIPELINING.
+     */
+    private boolean ehloPipelining = false;
+
     /**
      * [Client] EHLO advertised CHUNKING.
      */
@@ -611,6 +616,26 @@ public class Session {
         return this;
     }
 
+    /**
+     * Gets EHLO advertised PIPELINING.
+     *
+     * @return PIPELINING enablement.
+     */
+    public boolean isEhloPipelining() {
+        return ehloPipelining;
+    }
+
+    /**
+     * Sets EHLO advertised PIPELINING.
+     *
+     * @param ehloPipelining EHLO PIPELINING boolean.
+     * @return Self.
+     */
+    public Session setEhloPipelining(boolean ehloPipelining) {
+        this.ehloPipelining = ehloPipelining;
+        return this;
+    }
+
     /**
      * Gets EHLO advertised authentication mechanisms.
      *
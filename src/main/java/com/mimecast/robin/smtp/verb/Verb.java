@@ -1,11 +1,17 @@
 package com.mimecast.robin.smtp.verb;
 
+import com.mimecast.robin.config.server.ServerConfig;
 import com.mimecast.robin.main.Config;
 
+import java.util.ArrayList;
+import java.util.List;
+
 /**
  * SMTP verb.
  *
  * <p>This implements the basic parsing for SMTP verbs.
+ * <p>Commands are split by a hand written tokenizer equivalent to splitting on (\s+)?(\s+|:|=)(\s+)?.
+ * <br>The lower case key is ASCII folded once and cached.
  *
  * @see AuthVerb
  * @see BdatVerb
@@ -24,6 +30,11 @@ public class Verb {
      */
     final String[] parts;
 
+    /**
+     * Lower case verb.
+     */
+    private String key;
+
     /**
      * Constructs a new Verb instance with given command.
      *
@@ -31,17 +42,101 @@ public class Verb {
      */
     public Verb(String command) {
         this.command = command.trim();
-        this.parts = command.split("(\\s+)?(\\s+|:|=)(\\s+)?");
+        this.parts = split(command);
     }
 
     /**
      * Constructs a new Verb instance with given Verb.
+     * <p>Parts are shared unless the original command had leading separators the trimmed command does not.
      *
      * @param verb Verb instance.
      */
     public Verb(Verb verb) {
         this.command = verb.getCommand();
-        this.parts = command.split("(\\s+)?(\\s+|:|=)(\\s+)?");
+        this.parts = verb.parts.length > 0 && verb.parts[0].isEmpty() ? split(command) : verb.parts;
+        this.key = verb.key;
+    }
+
+    /**
+     * Splits command into parts.
+     * <p>A separator is a whitespace run, a colon or an equals sign, including any whitespace around it.
+     * <p>Matches String.split() semantics, a leading separator gives an empty first part and trailing empty parts are removed.
+     *
+     * @param command SMTP command.
+     * @return Parts array.
+     */
+    static String[] split(String command) {
+        List<String> list = null;
+        int length = command.length();
+        int start = 0;
+        int i = 0;
+
+        while (i < length) {
+            char c = command.charAt(i);
+            if (!isSpace(c) && c != ':' && c != '=') {
+                i++;
+                continue;
+            }
+
+            // Separator whitespace optionally followed by one colon or equals and more whitespace.
+            int end = i;
+            while (end < length && isSpace(command.charAt(end))) end++;
+            if (end < length && (command.charAt(end) == ':' || command.charAt(end) == '=')) {
+                end++;
+                while (end < length && isSpace(command.charAt(end))) end++;
+            }
+
+            if (list == null) list = new ArrayList<>(8);
+            list.add(command.substring(start, i));
+            start = end;
+            i = end;
+        }
+
+        // No separator found.
+        if (list == null) {
+            return new String[]{command};
+        }
+        list.add(command.substring(start));
+
+        int size = list.size();
+        while (size > 0 && list.get(size - 1).isEmpty()) size--;
+
+        return list.subList(0, size).toArray(new String[0]);
+    }
+
+    /**
+     * Is regex whitespace character.
+     *
+     * @param c Character.
+     * @return Boolean.
+     */
+    private static boolean isSpace(char c) {
+        return c == ' ' || c == '\t' || c == '\n' || c == '\r' || c == '\f' || c == '\u000B';
+    }
+
+    /**
+     * ASCII lower case.
+     * <p>Returns the same string if it has no upper case characters.
+     *
+     * @param string String.
+     * @return Lower case string.
+     */
+    static String toLowerAscii(String string) {
+        int length = string.length();
+        int i = 0;
+        while (i < length && (string.charAt(i) < 'A' || string.charAt(i) > 'Z')) i++;
+        if (i == length) {
+            return string;
+        }
+
+        char[] chars = string.toCharArray();
+        for (; i < length; i++) {
+            if (chars[i] >= 'A' && chars[i] <= 'Z') {
+                chars[i] = (char) (chars[i] + ('a' - 'A'));
+            }
+        }
+
+        return new String(chars);
     }
 
     /**
@@ -79,7 +174,7 @@ public class Verb {
      * @return Verb string.
      */
     public String getVerb() {
-        return parts != null ? parts[0] : "";
+        return parts != null && parts.length > 0 ? parts[0] : "";
     }
 
     /**
@@ -88,18 +183,22 @@ public class Verb {
      * @return Key string.
      */
     public String getKey() {
-        return getVerb().toLowerCase();
+        if (key == null) {
+            key = toLowerAscii(getVerb());
+        }
+        return key;
     }
 
     /**
      * Gets parameter by name.
+     * <p>A parameter with no value, like a trailing SIZE=, gives an empty string.
      *
      * @param name Parameter name string.
      * @return Value string.
      */
     public String getParam(String name) {
-        // Look for it.
-        for (int i = 0; i < parts.length; i++) {
+        // Look for it, the value is the part after.
+        for (int i = 0; i + 1 < parts.length; i++) {
             String splinter = parts[i];
 
             // Find the FROM keyword.
@@ -120,18 +219,29 @@ public class Verb {
      * @return Boolean.
      */
     public boolean isError() {
+        return isError(Config.getServer());
+    }
+
+    /**
+     * Is command error with given server configuration.
+     * <p>Check if command is too short to be valid.
+     *
+     * @param serverConfig ServerConfig instance.
+     * @return Boolean.
+     */
+    public boolean isError(ServerConfig serverConfig) {
         return (
                 // Ensures command is at least 4 chars log.
                 command.length() < 4 ||
 
                         // Ensures AUTH is not handled if disabled.
-                        (command.equalsIgnoreCase("AUTH") && !Config.getServer().isAuth()) ||
+                        (command.equalsIgnoreCase("AUTH") && !serverConfig.isAuth()) ||
 
                         // Ensures STARTTLS is not handled if disabled.
-                        (command.equalsIgnoreCase("STARTTLS") && !Config.getServer().isStartTls()) ||
+                        (command.equalsIgnoreCase("STARTTLS") && !serverConfig.isStartTls()) ||
 
                         // Ensures CHUNKING is not handled if disabled.
-                        (command.equalsIgnoreCase("BDAT") && !Config.getServer().isChunking())
+                        (command.equalsIgnoreCase("BDAT") && !serverConfig.isChunking())
         );
     }
 }
@@ -0,0 +1,24 @@
+package com.mimecast.robin.storage;
+
+/**
+ * Storage header observer.
+ *
+ * <p>Storage clients can return one to see the message headers as they are stored.
+ * <br>This lets them pick a file name or collect metadata without reading the message back.
+ * <p>Headers are given unfolded in the order received and only up to the end of the header section.
+ *
+ * @see StorageClient#getHeaderObserver()
+ * @see HeaderObservingOutputStream
+ */
+@FunctionalInterface
+public interface HeaderObserver {
+
+    /**
+     * Header received.
+     *
+     * @param name  Header name.
+     * @param value Header value trimmed.
+     * @return Boolean, false if no more headers are needed.
+     */
+    boolean header(String name, String value);
+}
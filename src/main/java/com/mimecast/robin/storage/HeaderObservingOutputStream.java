@@ -0,0 +1,214 @@
+package com.mimecast.robin.storage;
+
+import java.io.FilterOutputStream;
+import java.io.IOException;
+import java.io.OutputStream;
+import java.nio.charset.StandardCharsets;
+import java.util.Arrays;
+
+/**
+ * Output stream passing message headers to a header observer.
+ *
+ * <p>Bytes are written through as they come and only the header section is scanned on the way.
+ * <br>Once the blank line ending the headers is found or the observer needs no more the stream only passes bytes on.
+ * <p>Lines may end in CRLF, LF or CR like DotUnstuffingOutputStream accepts.
+ * <p>Scanning stops after a fixed number of bytes so memory use stays bounded.
+ *
+ * @see HeaderObserver
+ */
+public class HeaderObservingOutputStream extends FilterOutputStream {
+
+    /**
+     * Line feed byte.
+     */
+    private static final byte LF = 10; // \n
+
+    /**
+     * Carrige return byte.
+     */
+    private static final byte CR = 13; // \r
+
+    /**
+     * Maximum number of header bytes scanned.
+     */
+    private static final int MAX_HEADERS = 65536;
+
+    /**
+     * HeaderObserver instance.
+     */
+    private final HeaderObserver observer;
+
+    /**
+     * Line buffer.
+     */
+    private byte[] line = new byte[256];
+
+    /**
+     * Line buffer length.
+     */
+    private int length = 0;
+
+    /**
+     * Header unfolded so far.
+     */
+    private final StringBuilder header = new StringBuilder();
+
+    /**
+     * Last line ended in CR, LF may follow.
+     */
+    private boolean cr = false;
+
+    /**
+     * Bytes scanned.
+     */
+    private int scanned = 0;
+
+    /**
+     * Done scanning.
+     */
+    private boolean done = false;
+
+    /**
+     * Constructs a new HeaderObservingOutputStream instance with given observer.
+     *
+     * @param out      OutputStream instance.
+     * @param observer HeaderObserver instance.
+     */
+    public HeaderObservingOutputStream(OutputStream out, HeaderObserver observer) {
+        super(out);
+        this.observer = observer;
+    }
+
+    /**
+     * Is done scanning.
+     *
+     * @return Boolean.
+     */
+    public boolean isDone() {
+        return done;
+    }
+
+    @Override
+    public void write(int b) throws IOException {
+        out.write(b);
+        if (!done) {
+            scan(new byte[]{(byte) b}, 0, 1);
+        }
+    }
+
+    @Override
+    public void write(byte[] b, int off, int len) throws IOException {
+        out.write(b, off, len);
+        if (!done) {
+            scan(b, off, len);
+        }
+    }
+
+    /**
+     * Scans bytes for header lines.
+     *
+     * @param b   Byte array.
+     * @param off Offset.
+     * @param len Length.
+     */
+    private void scan(byte[] b, int off, int len) {
+        int end = Math.min(off + len, off + MAX_HEADERS - scanned);
+        scanned += end - off;
+
+        int start = off;
+        for (int i = off; i < end && !done; i++) {
+            if (cr) {
+                cr = false;
+                if (b[i] == LF) {
+                    // Rest of CRLF.
+                    start = i + 1;
+                    continue;
+                }
+            }
+
+            if (b[i] == CR || b[i] == LF) {
+                append(b, start, i - start);
+                start = i + 1;
+                cr = b[i] == CR;
+                endLine();
+            }
+        }
+
+        if (!done) {
+            append(b, start, end - start);
+            if (scanned >= MAX_HEADERS) {
+                finish();
+            }
+        }
+    }
+
+    /**
+     * Appends bytes to line buffer.
+     *
+     * @param b   Byte array.
+     * @param off Offset.
+     * @param len Length.
+     */
+    private void append(byte[] b, int off, int len) {
+        if (length + len > line.length) {
+            line = Arrays.copyOf(line, Math.max(line.length * 2, length + len));
+        }
+
+        System.arraycopy(b, off, line, length, len);
+        length += len;
+    }
+
+    /**
+     * Handles a complete line.
+     * <p>A blank line ends the headers, a line starting with whitespace continues the last header.
+     */
+    private void endLine() {
+        String text = new String(line, 0, length, StandardCharsets.UTF_8);
+        length = 0;
+
+        if (text.trim().isEmpty()) {
+            finish();
+        } else if (Character.isWhitespace(text.charAt(0))) {
+            header.append(text);
+        } else {
+            emit();
+            header.append(text);
+        }
+    }
+
+    /**
+     * Gives last header to the observer.
+     */
+    private void emit() {
+        int colon = header.indexOf(":");
+        if (colon > 0 && !observer.header(header.substring(0, colon).trim(), header.substring(colon + 1).trim())) {
+            done = true;
+        }
+        header.setLength(0);
+    }
+
+    /**
+     * Finishes scanning.
+     * <p>Gives any last header to the observer.
+     * <br>Called on close for messages with no body.
+     */
+    public void finish() {
+        if (done) return;
+
+        if (length > 0) {
+            endLine();
+        }
+        if (!done) {
+            emit();
+        }
+
+        done = true;
+        line = new byte[0];
+    }
+
+    @Override
+    public void close() throws IOException {
+        finish();
+        super.close();
+    }
+}
@@ -1,8 +1,6 @@
 package com.mimecast.robin.storage;
 
 import com.mimecast.robin.main.Config;
-import com.mimecast.robin.mime.EmailParser;
-import com.mimecast.robin.mime.headers.MimeHeader;
 import com.mimecast.robin.smtp.connection.Connection;
 import com.mimecast.robin.util.PathUtils;
 import org.apache.commons.io.output.NullOutputStream;
@@ -17,13 +15,13 @@ import java.nio.file.Paths;
 import java.text.SimpleDateFormat;
 import java.util.Date;
 import java.util.Locale;
-import java.util.Optional;
 import java.util.UUID;
 
 /**
  * Local storage client implementation.
  *
  * <p>Saves files on disk.
+ * <p>A X-Robin-Filename header seen while storing renames the file on save.
  */
 public class LocalStorageClient implements StorageClient {
     protected static final Logger log = LogManager.getLogger(LocalStorageClient.class);
@@ -53,6 +51,11 @@ public class LocalStorageClient implements StorageClient {
      */
     protected OutputStream stream = new NullOutputStream();
 
+    /**
+     * File name from X-Robin-Filename header if any.
+     */
+    protected String headerFileName;
+
     /**
      * Local storage client.
      *
@@ -131,6 +134,36 @@ public class LocalStorageClient implements StorageClient {
         return uid;
     }
 
+    /**
+     * Gets header observer.
+     * <p>Looks for a X-Robin-Filename header and stops once found.
+     *
+     * @return HeaderObserver instance.
+     */
+    @Override
+    public HeaderObserver getHeaderObserver() {
+        return (name, value) -> {
+            if (name.equalsIgnoreCase("x-robin-filename")) {
+                headerFileName = value;
+                return false;
+            }
+            return true;
+        };
+    }
+
+    /**
+     * Syncs file to disk.
+     *
+     * @throws IOException Unable to sync.
+     */
+    @Override
+    public void sync() throws IOException {
+        if (stream instanceof FileOutputStream) {
+            stream.flush();
+            ((FileOutputStream) stream).getChannel().force(false);
+        }
+    }
+
     /**
      * Saves file.
      */
@@ -147,36 +180,45 @@ public class LocalStorageClient implements StorageClient {
         }
     }
 
+    /**
+     * Discards file.
+     * <p>Closes the stream and deletes the partial file.
+     */
+    @Override
+    public void discard() {
+        try {
+            stream.close();
+            if (Files.deleteIfExists(Paths.get(getToken()))) {
+                log.info("Storage discarded: {}", getToken());
+            }
+
+        } catch (IOException e) {
+            log.error("Storage file not discarded: {}", e.getMessage());
+        }
+    }
+
     /**
      * Rename filename.
-     * <p>Will parse and lookup if a X-Robin-Filename header exists and use it's value as a filename.
+     * <p>Uses the X-Robin-Filename header value if one was seen as a filename.
      */
     private void rename() {
+        if (StringUtils.isBlank(headerFileName)) return;
+
         try {
-            EmailParser parser = new EmailParser(getToken())
-                    .parse(true);
-
-            Optional<MimeHeader> optional = parser.getHeaders().get("x-robin-filename");
-            if (optional.isPresent()) {
-                MimeHeader header = optional.get();
-
-                String source = getToken();
-                Path target = Paths.get(path, header.getValue());
-
-                if (StringUtils.isNotBlank(header.getValue())) {
-                    if (Files.deleteIfExists(target)) {
-                        log.info("Storage deleted existing file before rename");
-                    }
-
-                    if (new File(source).renameTo(new File(target.toString()))) {
-                        fileName = header.getValue();
-                        log.info("Storage moved file to: {}", getToken());
-                    }
-                }
+            String source = getToken();
+            Path target = Paths.get(path, headerFileName);
+
+            if (Files.deleteIfExists(target)) {
+                log.info("Storage deleted existing file before rename");
+            }
+
+            if (new File(source).renameTo(new File(target.toString()))) {
+                fileName = headerFileName;
+                log.info("Storage moved file to: {}", getToken());
             }
 
         } catch (IOException e) {
-            log.error("Storage unable to parse email: {}", e.getMessage());
+            log.error("Storage unable to rename file: {}", e.getMessage());
         }
     }
 }
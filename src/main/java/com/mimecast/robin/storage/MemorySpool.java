@@ -0,0 +1,241 @@
+package com.mimecast.robin.storage;
+
+import org.apache.logging.log4j.LogManager;
+import org.apache.logging.log4j.Logger;
+
+import java.util.ArrayDeque;
+import java.util.ArrayList;
+import java.util.Deque;
+import java.util.Iterator;
+import java.util.LinkedHashMap;
+import java.util.List;
+import java.util.Map;
+import java.util.concurrent.locks.ReentrantLock;
+
+/**
+ * Global memory spool.
+ *
+ * <p>Hands out pooled memory chunks to spool storage clients and keeps the messages they saved.
+ * <p>All chunks in use, by messages being received or kept, count towards a global cap.
+ * <br>When the cap is reached the oldest kept messages are spilled to disk to make room.
+ * <br>If nothing is left to spill no chunk is given and the caller spills its own message instead.
+ * <p>Chunks given back are reused so the spool does not churn the heap.
+ *
+ * @see SpoolStorageClient
+ */
+public class MemorySpool {
+    private static final Logger log = LogManager.getLogger(MemorySpool.class);
+
+    /**
+     * Chunk size in bytes.
+     */
+    static final int CHUNK = 8192;
+
+    /**
+     * Lock.
+     * <p>A lock rather than synchronized as monitors pin virtual threads.
+     */
+    private static final ReentrantLock lock = new ReentrantLock();
+
+    /**
+     * Free chunks.
+     */
+    private static final Deque<byte[]> free = new ArrayDeque<>();
+
+    /**
+     * Kept messages by UID, oldest first.
+     */
+    private static final Map<String, SpoolStorageClient> kept = new LinkedHashMap<>();
+
+    /**
+     * Memory cap in bytes.
+     * <p>Zero disables spooling to memory.
+     */
+    private static volatile long limit = 0L;
+
+    /**
+     * Bytes in use.
+     */
+    private static long used = 0L;
+
+    /**
+     * Protected constructor.
+     */
+    private MemorySpool() {
+        throw new IllegalStateException("Static class");
+    }
+
+    /**
+     * Sets memory cap.
+     *
+     * @param bytes Cap in bytes (0 to disable).
+     */
+    public static void setLimit(long bytes) {
+        lock.lock();
+        try {
+            limit = Math.max(0L, bytes);
+            free.clear();
+        } finally {
+            lock.unlock();
+        }
+    }
+
+    /**
+     * Gets memory cap.
+     *
+     * @return Cap in bytes.
+     */
+    public static long getLimit() {
+        return limit;
+    }
+
+    /**
+     * Gets bytes in use.
+     *
+     * @return Bytes.
+     */
+    public static long getUsed() {
+        lock.lock();
+        try {
+            return used;
+        } finally {
+            lock.unlock();
+        }
+    }
+
+    /**
+     * Takes a chunk.
+     * <p>Spills the oldest kept messages while the cap is reached.
+     *
+     * @return Chunk or null if the cap is reached and nothing is left to spill.
+     */
+    static byte[] acquire() {
+        while (true) {
+            SpoolStorageClient oldest;
+            lock.lock();
+            try {
+                if (used + CHUNK <= limit) {
+                    used += CHUNK;
+                    byte[] chunk = free.poll();
+                    return chunk != null ? chunk : new byte[CHUNK];
+                }
+
+                Iterator<SpoolStorageClient> iterator = kept.values().iterator();
+                if (!iterator.hasNext()) {
+                    return null;
+                }
+                oldest = iterator.next();
+                iterator.remove();
+            } finally {
+                lock.unlock();
+            }
+
+            // Spilling gives its chunks back.
+            oldest.spill();
+        }
+    }
+
+    /**
+     * Gives back chunks.
+     *
+     * @param chunks List of chunks taken via acquire().
+     */
+    static void release(List<byte[]> chunks) {
+        if (chunks.isEmpty()) return;
+
+        lock.lock();
+        try {
+            used -= (long) chunks.size() * CHUNK;
+            for (byte[] chunk : chunks) {
+                if ((long) free.size() * CHUNK < limit) {
+                    free.push(chunk);
+                }
+            }
+        } finally {
+            lock.unlock();
+        }
+    }
+
+    /**
+     * Keeps saved message.
+     *
+     * @param client SpoolStorageClient instance.
+     */
+    static void keep(SpoolStorageClient client) {
+        lock.lock();
+        try {
+            kept.put(client.getUID(), client);
+        } finally {
+            lock.unlock();
+        }
+    }
+
+    /**
+     * Forgets kept message.
+     *
+     * @param uid Message UID.
+     */
+    static void forget(String uid) {
+        lock.lock();
+        try {
+            kept.remove(uid);
+        } finally {
+            lock.unlock();
+        }
+    }
+
+    /**
+     * Gets kept message.
+     *
+     * @param uid Message UID.
+     * @return SpoolStorageClient instance or null if not in memory.
+     */
+    public static SpoolStorageClient get(String uid) {
+        lock.lock();
+        try {
+            return kept.get(uid);
+        } finally {
+            lock.unlock();
+        }
+    }
+
+    /**
+     * Gets number of kept messages.
+     *
+     * @return Integer.
+     */
+    public static int size() {
+        lock.lock();
+        try {
+            return kept.size();
+        } finally {
+            lock.unlock();
+        }
+    }
+
+    /**
+     * Spills all kept messages to disk.
+     * <p>Called on shutdown so nothing saved is lost.
+     *
+     * @return Number of messages spilled.
+     */
+    public static int flush() {
+        List<SpoolStorageClient> list;
+        lock.lock();
+        try {
+            list = new ArrayList<>(kept.values());
+            kept.clear();
+        } finally {
+            lock.unlock();
+        }
+
+        for (SpoolStorageClient client : list) {
+            client.spill();
+        }
+
+        if (!list.isEmpty()) {
+            log.info("Spilled {} spooled messages to disk.", list.size());
+        }
+        return list.size();
+    }
+}
@@ -0,0 +1,193 @@
+package com.mimecast.robin.storage;
+
+import com.mimecast.robin.smtp.connection.Connection;
+import org.apache.commons.io.output.CloseShieldOutputStream;
+import org.apache.commons.io.output.NullOutputStream;
+import org.apache.logging.log4j.LogManager;
+import org.apache.logging.log4j.Logger;
+
+import java.io.FileNotFoundException;
+import java.io.IOException;
+import java.io.OutputStream;
+import java.nio.channels.Channels;
+import java.util.ArrayList;
+import java.util.List;
+import java.util.UUID;
+
+/**
+ * Segment storage client implementation.
+ *
+ * <p>Appends messages to a SegmentStore instead of a file each.
+ * <br>The UID is the store lookup key.
+ * <p>The Message-ID header is captured while storing and indexed alongside the recipients.
+ *
+ * @see SegmentStore
+ */
+public class SegmentStorageClient implements StorageClient {
+    private static final Logger log = LogManager.getLogger(SegmentStorageClient.class);
+
+    /**
+     * UID.
+     */
+    private final String uid = UUID.randomUUID().toString();
+
+    /**
+     * SegmentStore instance.
+     */
+    private final SegmentStore store;
+
+    /**
+     * Recipient addresses.
+     */
+    private final List<String> recipients = new ArrayList<>();
+
+    /**
+     * Leased segment.
+     * <p>Null until the stream is requested.
+     */
+    private SegmentStore.Segment segment;
+
+    /**
+     * Message offset in segment.
+     */
+    private long offset;
+
+    /**
+     * Message-ID header value if any.
+     */
+    private String messageId;
+
+    /**
+     * Segment output stream.
+     */
+    private OutputStream stream = new NullOutputStream();
+
+    /**
+     * Constructs a new SegmentStorageClient instance with given store.
+     *
+     * @param store SegmentStore instance.
+     */
+    public SegmentStorageClient(SegmentStore store) {
+        this.store = store;
+    }
+
+    /**
+     * Sets connection.
+     *
+     * @param connection Connection instance.
+     * @return Self.
+     */
+    @Override
+    public SegmentStorageClient setConnection(Connection connection) {
+        if (connection != null) {
+            connection.getSession().getRcpts().forEach(rcpt -> recipients.add(rcpt.getAddress()));
+        }
+
+        return this;
+    }
+
+    /**
+     * Gets segment output stream.
+     * <p>Leases a segment for the duration of the message.
+     *
+     * @return OutputStream instance.
+     * @throws FileNotFoundException Unable to open segment.
+     */
+    @Override
+    public OutputStream getStream() throws FileNotFoundException {
+        if (segment == null) {
+            try {
+                segment = store.lease();
+                offset = segment.channel.position();
+                stream = new CloseShieldOutputStream(Channels.newOutputStream(segment.channel));
+            } catch (IOException e) {
+                throw new FileNotFoundException("Segment not leased: " + e.getMessage());
+            }
+        }
+
+        return stream;
+    }
+
+    /**
+     * Gets file token.
+     *
+     * @return String.
+     */
+    @Override
+    public String getToken() {
+        return store.getDir() + "#" + uid;
+    }
+
+    /**
+     * Gets UID.
+     *
+     * @return String.
+     */
+    @Override
+    public String getUID() {
+        return uid;
+    }
+
+    /**
+     * Gets header observer.
+     * <p>Looks for a Message-ID header and stops once found.
+     *
+     * @return HeaderObserver instance.
+     */
+    @Override
+    public HeaderObserver getHeaderObserver() {
+        return (name, value) -> {
+            if (name.equalsIgnoreCase("message-id")) {
+                messageId = value.trim();
+                return false;
+            }
+            return true;
+        };
+    }
+
+    /**
+     * Syncs segment to disk.
+     *
+     * @throws IOException Unable to sync.
+     */
+    @Override
+    public void sync() throws IOException {
+        if (segment != null) {
+            stream.flush();
+            segment.channel.force(false);
+        }
+    }
+
+    /**
+     * Saves message.
+     * <p>Indexes the message and releases the segment.
+     */
+    @Override
+    public void save() {
+        if (segment == null) return;
+
+        try {
+            stream.flush();
+            long length = segment.channel.position() - offset;
+            store.commit(segment, new SegmentStore.Entry(uid, segment.id, offset, length, System.currentTimeMillis(), messageId, recipients));
+            log.info("Storage saved: {}", getToken());
+
+        } catch (IOException e) {
+            log.error("Storage segment not indexed: {}", e.getMessage());
+        }
+        segment = null;
+    }
+
+    /**
+     * Discards message.
+     * <p>Truncates the segment back to the message offset and releases it.
+     */
+    @Override
+    public void discard() {
+        if (segment == null) return;
+
+        store.discard(segment, offset);
+        log.info("Storage discarded: {}", getToken());
+        segment = null;
+    }
+}
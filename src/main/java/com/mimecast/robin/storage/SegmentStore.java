@@ -0,0 +1,864 @@
+package com.mimecast.robin.storage;
+
+import com.mimecast.robin.util.CompressionUtils;
+import org.apache.commons.io.input.BoundedInputStream;
+import org.apache.logging.log4j.LogManager;
+import org.apache.logging.log4j.Logger;
+
+import java.io.BufferedReader;
+import java.io.BufferedWriter;
+import java.io.Closeable;
+import java.io.IOException;
+import java.io.InputStream;
+import java.nio.channels.Channels;
+import java.nio.channels.FileChannel;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.DirectoryStream;
+import java.nio.file.Files;
+import java.nio.file.Path;
+import java.nio.file.StandardCopyOption;
+import java.nio.file.StandardOpenOption;
+import java.util.ArrayDeque;
+import java.util.ArrayList;
+import java.util.Arrays;
+import java.util.Collections;
+import java.util.Deque;
+import java.util.HashMap;
+import java.util.HashSet;
+import java.util.List;
+import java.util.Map;
+import java.util.Set;
+import java.util.concurrent.ConcurrentHashMap;
+import java.util.concurrent.Executors;
+import java.util.concurrent.ScheduledExecutorService;
+import java.util.concurrent.TimeUnit;
+import java.util.concurrent.locks.ReentrantLock;
+
+/**
+ * Append-only segment store.
+ *
+ * <p>Messages are appended to large rolling segment files instead of a file each.
+ * <br>Every message being written leases a segment of its own so it is stored in one contiguous run without copying.
+ * <br>Once released a segment is reused by the next message until it grows past the segment size and is sealed.
+ * <p>An index maps UIDs to segment, offset and length for random access reads.
+ * <br>Messages can also be looked up by Message-ID and recipient.
+ * <br>The index is kept in memory and appended to an index file replayed on startup.
+ * <br>Index records are flushed outside the store lock and one flush covers every record appended before it.
+ * <p>Compaction drops messages past the retention period, deletes empty sealed segments
+ * and rewrites sparse ones with their live messages only.
+ * <br>Replaced segment files are deleted on the following compaction so readers in flight are not cut short.
+ *
+ * @see SegmentStorageClient
+ */
+public class SegmentStore implements Closeable {
+    private static final Logger log = LogManager.getLogger(SegmentStore.class);
+
+    /**
+     * Index file name.
+     */
+    private static final String INDEX = "index";
+
+    /**
+     * Segment file extension.
+     */
+    private static final String EXTENSION = ".seg";
+
+    /**
+     * Index record for removed messages.
+     */
+    private static final String REMOVED = "-";
+
+    /**
+     * Live bytes ratio under which sealed segments are rewritten.
+     */
+    private static final double SPARSE = 0.5;
+
+    /**
+     * Store directory.
+     */
+    private final Path dir;
+
+    /**
+     * Segment size in bytes.
+     */
+    private final long segmentSize;
+
+    /**
+     * Index entries by UID.
+     */
+    private final Map<String, Entry> entries = new ConcurrentHashMap<>();
+
+    /**
+     * UIDs by Message-ID.
+     */
+    private final Map<String, String> messageIds = new ConcurrentHashMap<>();
+
+    /**
+     * UIDs by recipient.
+     */
+    private final Map<String, Set<String>> recipients = new ConcurrentHashMap<>();
+
+    /**
+     * Writable segments not leased.
+     */
+    private final Deque<Segment> idle = new ArrayDeque<>();
+
+    /**
+     * Writable segment ids, leased or not.
+     */
+    private final Set<Integer> writable = new HashSet<>();
+
+    /**
+     * Segment files to delete on the next compaction.
+     */
+    private final List<Path> obsolete = new ArrayList<>();
+
+    /**
+     * Store lock.
+     * <p>A lock rather than synchronized as monitors pin virtual threads.
+     */
+    private final ReentrantLock lock = new ReentrantLock();
+
+    /**
+     * Index flush lock.
+     * <p>Taken before the store lock, never after.
+     */
+    private final ReentrantLock flushLock = new ReentrantLock();
+
+    /**
+     * Index records appended.
+     */
+    private long appended = 0L;
+
+    /**
+     * Index records flushed.
+     */
+    private long flushed = 0L;
+
+    /**
+     * Next segment id.
+     */
+    private int nextId = 1;
+
+    /**
+     * Index file writer.
+     */
+    private BufferedWriter index;
+
+    /**
+     * Compactor executor.
+     */
+    private ScheduledExecutorService compactor;
+
+    /**
+     * Constructs a new SegmentStore instance in given directory.
+     * <p>Existing segments are sealed and their index replayed.
+     *
+     * @param dir         Store directory.
+     * @param segmentSize Segment size in bytes.
+     * @throws IOException Unable to read index.
+     */
+    public SegmentStore(Path dir, long segmentSize) throws IOException {
+        this.dir = dir;
+        this.segmentSize = segmentSize;
+
+        Files.createDirectories(dir);
+        try (DirectoryStream<Path> files = Files.newDirectoryStream(dir, "*" + EXTENSION)) {
+            for (Path file : files) {
+                nextId = Math.max(nextId, segmentId(file) + 1);
+            }
+        }
+
+        replay();
+        index = Files.newBufferedWriter(dir.resolve(INDEX), StandardCharsets.UTF_8, StandardOpenOption.CREATE, StandardOpenOption.APPEND);
+        log.info("Opened segment store {} with {} messages.", dir, entries.size());
+    }
+
+    /**
+     * Starts compacting in a daemon thread.
+     *
+     * @param retention Retention in seconds (0 to keep forever).
+     * @param interval  Compaction interval in seconds.
+     * @return Self.
+     */
+    public SegmentStore startCompactor(long retention, long interval) {
+        lock.lock();
+        try {
+            if (compactor == null && interval > 0) {
+                compactor = Executors.newSingleThreadScheduledExecutor(runnable -> {
+                    Thread thread = new Thread(runnable, "segment-compactor");
+                    thread.setDaemon(true);
+                    return thread;
+                });
+                compactor.scheduleWithFixedDelay(() -> {
+                    try {
+                        compact(retention);
+                    } catch (IOException e) {
+                        log.error("Segment compaction failed: {}", e.getMessage());
+                    }
+                }, interval, interval, TimeUnit.SECONDS);
+            }
+
+            return this;
+        } finally {
+            lock.unlock();
+        }
+    }
+
+    /**
+     * Gets store directory.
+     *
+     * @return Path instance.
+     */
+    public Path getDir() {
+        return dir;
+    }
+
+    /**
+     * Leases a segment for writing one message.
+     *
+     * @return Segment instance.
+     * @throws IOException Unable to create segment.
+     */
+    Segment lease() throws IOException {
+        lock.lock();
+        try {
+            Segment segment = idle.poll();
+            if (segment == null) {
+                segment = new Segment(nextId++);
+                writable.add(segment.id);
+            }
+
+            return segment;
+        } finally {
+            lock.unlock();
+        }
+    }
+
+    /**
+     * Commits message written to leased segment and releases it.
+     * <p>Returns once its index record is flushed, possibly by another committer.
+     *
+     * @param segment Segment instance.
+     * @param entry   Entry instance.
+     * @throws IOException Unable to write index.
+     */
+    void commit(Segment segment, Entry entry) throws IOException {
+        long record;
+        lock.lock();
+        try {
+            // One write so a concurrent flush never splits the record.
+            index.write(entry.toString() + System.lineSeparator());
+            record = ++appended;
+            add(entry);
+        } finally {
+            release(segment);
+            lock.unlock();
+        }
+
+        flushIndex(record);
+    }
+
+    /**
+     * Flushes index records up to given one.
+     * <p>Committers waiting meanwhile find their records flushed and return without flushing again.
+     *
+     * @param record Index record number.
+     * @throws IOException Unable to flush index.
+     */
+    private void flushIndex(long record) throws IOException {
+        flushLock.lock();
+        try {
+            if (flushed >= record) return;
+
+            BufferedWriter writer;
+            long last;
+            lock.lock();
+            try {
+                writer = index;
+                last = appended;
+            } finally {
+                lock.unlock();
+            }
+
+            writer.flush();
+            flushed = last;
+        } finally {
+            flushLock.unlock();
+        }
+    }
+
+    /**
+     * Discards message written to leased segment from given offset and releases it.
+     *
+     * @param segment Segment instance.
+     * @param offset  Message offset.
+     */
+    void discard(Segment segment, long offset) {
+        // Leased so nobody else writes to it meanwhile.
+        try {
+            segment.channel.truncate(offset);
+            segment.channel.position(offset);
+        } catch (IOException e) {
+            log.error("Segment not truncated: {}", e.getMessage());
+        }
+
+        lock.lock();
+        try {
+            release(segment);
+        } finally {
+            lock.unlock();
+        }
+    }
+
+    /**
+     * Releases segment.
+     * <p>Segments past the segment size are sealed.
+     *
+     * @param segment Segment instance.
+     */
+    private void release(Segment segment) {
+        try {
+            if (segment.channel.position() >= segmentSize) {
+                segment.channel.close();
+                writable.remove(segment.id);
+                log.info("Sealed segment {}.", segment.path);
+            } else {
+                idle.push(segment);
+            }
+        } catch (IOException e) {
+            log.error("Segment not released: {}", e.getMessage());
+            writable.remove(segment.id);
+        }
+    }
+
+    /**
+     * Gets index entry.
+     *
+     * @param uid Message UID.
+     * @return Entry instance or null if not found.
+     */
+    public Entry getEntry(String uid) {
+        return entries.get(uid);
+    }
+
+    /**
+     * Gets index entry by Message-ID.
+     *
+     * @param messageId Message-ID header value.
+     * @return Entry instance or null if not found.
+     */
+    public Entry findByMessageId(String messageId) {
+        String uid = messageIds.get(messageId);
+        return uid != null ? entries.get(uid) : null;
+    }
+
+    /**
+     * Gets index entries by recipient.
+     *
+     * @param recipient Recipient address.
+     * @return List of Entry.
+     */
+    public List<Entry> findByRecipient(String recipient) {
+        List<Entry> list = new ArrayList<>();
+        for (String uid : recipients.getOrDefault(recipient.toLowerCase(), Collections.emptySet())) {
+            Entry entry = entries.get(uid);
+            if (entry != null) {
+                list.add(entry);
+            }
+        }
+
+        return list;
+    }
+
+    /**
+     * Gets number of messages stored.
+     *
+     * @return Integer.
+     */
+    public int size() {
+        return entries.size();
+    }
+
+    /**
+     * Opens message for reading.
+     * <p>Compressed messages are decompressed transparently.
+     *
+     * @param uid Message UID.
+     * @return InputStream instance or null if not found.
+     * @throws IOException Unable to open segment.
+     */
+    public InputStream open(String uid) throws IOException {
+        Entry entry = entries.get(uid);
+        if (entry == null) {
+            return null;
+        }
+
+        FileChannel channel = FileChannel.open(segmentPath(entry.segment), StandardOpenOption.READ);
+        channel.position(entry.offset);
+        return CompressionUtils.decompress(new BoundedInputStream(Channels.newInputStream(channel), entry.length));
+    }
+
+    /**
+     * Compacts store.
+     * <p>Removes messages past retention, deletes empty sealed segments and rewrites sparse ones.
+     *
+     * @param retention Retention in seconds (0 to keep forever).
+     * @return Number of segments removed.
+     * @throws IOException Unable to rewrite segments or index.
+     */
+    public int compact(long retention) throws IOException {
+        deleteObsolete();
+
+        // Retention.
+        if (retention > 0) {
+            long cutoff = System.currentTimeMillis() - TimeUnit.SECONDS.toMillis(retention);
+            for (Entry entry : entries.values()) {
+                if (entry.time < cutoff) {
+                    remove(entry);
+                }
+            }
+        }
+
+        // Segments sealed by now take no more commits so their entries below are complete.
+        Set<Integer> open;
+        int next;
+        lock.lock();
+        try {
+            open = new HashSet<>(writable);
+            next = nextId;
+        } finally {
+            lock.unlock();
+        }
+
+        // Live bytes per sealed segment.
+        Map<Integer, List<Entry>> live = new HashMap<>();
+        for (Entry entry : entries.values()) {
+            live.computeIfAbsent(entry.segment, k -> new ArrayList<>()).add(entry);
+        }
+
+        int removed = 0;
+        List<Path> sealed = new ArrayList<>();
+        try (DirectoryStream<Path> files = Files.newDirectoryStream(dir, "*" + EXTENSION)) {
+            files.forEach(sealed::add);
+        }
+        for (Path file : sealed) {
+            int id = segmentId(file);
+            if (open.contains(id) || id >= next) continue;
+
+            List<Entry> list = live.getOrDefault(id, Collections.emptyList());
+            long bytes = list.stream().mapToLong(e -> e.length).sum();
+            if (list.isEmpty()) {
+                obsolete(file);
+                removed++;
+            } else if (bytes < Files.size(file) * SPARSE) {
+                rewrite(list);
+                obsolete(file);
+                removed++;
+            }
+        }
+
+        writeIndex();
+        log.info("Compacted segment store {}, {} segments removed.", dir, removed);
+        return removed;
+    }
+
+    /**
+     * Copies given messages to a new sealed segment.
+     * <p>The segment is forced to disk before the index pointing at it is written.
+     *
+     * @param list List of Entry.
+     * @throws IOException Unable to copy.
+     */
+    private void rewrite(List<Entry> list) throws IOException {
+        int id;
+        lock.lock();
+        try {
+            id = nextId++;
+        } finally {
+            lock.unlock();
+        }
+
+        try (FileChannel target = FileChannel.open(segmentPath(id), StandardOpenOption.CREATE_NEW, StandardOpenOption.WRITE);
+             FileChannel source = FileChannel.open(segmentPath(list.get(0).segment), StandardOpenOption.READ)) {
+            for (Entry entry : list) {
+                long offset = target.position();
+                long copied = 0;
+                while (copied < entry.length) {
+                    copied += source.transferTo(entry.offset + copied, entry.length - copied, target);
+                }
+
+                entries.put(entry.uid, new Entry(entry.uid, id, offset, entry.length, entry.time, entry.messageId, entry.recipients));
+            }
+            target.force(true);
+        }
+    }
+
+    /**
+     * Rewrites index file from the entries in memory.
+     * <p>Covers every record appended so far.
+     *
+     * @throws IOException Unable to write index.
+     */
+    private void writeIndex() throws IOException {
+        flushLock.lock();
+        lock.lock();
+        try {
+            Path tmp = dir.resolve(INDEX + ".tmp");
+            try (BufferedWriter writer = Files.newBufferedWriter(tmp, StandardCharsets.UTF_8)) {
+                for (Entry entry : entries.values()) {
+                    writer.write(entry.toString());
+                    writer.newLine();
+                }
+            }
+
+            index.close();
+            Files.move(tmp, dir.resolve(INDEX), StandardCopyOption.REPLACE_EXISTING, StandardCopyOption.ATOMIC_MOVE);
+            index = Files.newBufferedWriter(dir.resolve(INDEX), StandardCharsets.UTF_8, StandardOpenOption.CREATE, StandardOpenOption.APPEND);
+            flushed = appended;
+        } finally {
+            lock.unlock();
+            flushLock.unlock();
+        }
+    }
+
+    /**
+     * Replays index file.
+     *
+     * @throws IOException Unable to read index.
+     */
+    private void replay() throws IOException {
+        Path path = dir.resolve(INDEX);
+        if (!Files.exists(path)) return;
+
+        try (BufferedReader reader = Files.newBufferedReader(path, StandardCharsets.UTF_8)) {
+            String line;
+            while ((line = reader.readLine()) != null) {
+                String[] splits = line.split("\t", -1);
+                if (splits.length == 2 && splits[0].equals(REMOVED)) {
+                    Entry entry = entries.get(splits[1]);
+                    if (entry != null) {
+                        unindex(entry);
+                    }
+                } else if (splits.length == 7) {
+                    Entry entry = Entry.parse(splits);
+                    if (Files.exists(segmentPath(entry.segment))) {
+                        add(entry);
+                    }
+                }
+            }
+        }
+    }
+
+    /**
+     * Adds entry to index maps.
+     *
+     * @param entry Entry instance.
+     */
+    private void add(Entry entry) {
+        entries.put(entry.uid, entry);
+        if (!entry.messageId.isEmpty()) {
+            messageIds.put(entry.messageId, entry.uid);
+        }
+        for (String recipient : entry.recipients) {
+            recipients.computeIfAbsent(recipient.toLowerCase(), k -> ConcurrentHashMap.newKeySet()).add(entry.uid);
+        }
+    }
+
+    /**
+     * Removes entry from index and records removal.
+     *
+     * @param entry Entry instance.
+     * @throws IOException Unable to write index.
+     */
+    private void remove(Entry entry) throws IOException {
+        lock.lock();
+        try {
+            index.write(REMOVED + "\t" + entry.uid);
+            index.newLine();
+            unindex(entry);
+        } finally {
+            lock.unlock();
+        }
+    }
+
+    /**
+     * Removes entry from index maps.
+     *
+     * @param entry Entry instance.
+     */
+    private void unindex(Entry entry) {
+        entries.remove(entry.uid);
+        messageIds.remove(entry.messageId, entry.uid);
+        for (String recipient : entry.recipients) {
+            Set<String> uids = recipients.get(recipient.toLowerCase());
+            if (uids != null) {
+                uids.remove(entry.uid);
+                if (uids.isEmpty()) {
+                    recipients.remove(recipient.toLowerCase(), uids);
+                }
+            }
+        }
+    }
+
+    /**
+     * Marks segment file for deletion on the next compaction.
+     *
+     * @param file Segment path.
+     */
+    private void obsolete(Path file) {
+        lock.lock();
+        try {
+            obsolete.add(file);
+        } finally {
+            lock.unlock();
+        }
+    }
+
+    /**
+     * Deletes segment files replaced by the last compaction.
+     *
+     * @throws IOException Unable to delete.
+     */
+    private void deleteObsolete() throws IOException {
+        lock.lock();
+        try {
+            for (Path file : obsolete) {
+                Files.deleteIfExists(file);
+            }
+            obsolete.clear();
+        } finally {
+            lock.unlock();
+        }
+    }
+
+    /**
+     * Gets segment path.
+     *
+     * @param id Segment id.
+     * @return Path instance.
+     */
+    Path segmentPath(int id) {
+        return dir.resolve(String.format("%08d", id) + EXTENSION);
+    }
+
+    /**
+     * Gets segment id from path.
+     *
+     * @param file Segment path.
+     * @return Segment id.
+     */
+    private static int segmentId(Path file) {
+        String name = file.getFileName().toString();
+        return Integer.parseInt(name.substring(0, name.length() - EXTENSION.length()));
+    }
+
+    /**
+     * Closes store.
+     * <p>Stops compaction and closes writable segments and index.
+     *
+     * @throws IOException Unable to close.
+     */
+    @Override
+    public void close() throws IOException {
+        flushLock.lock();
+        lock.lock();
+        try {
+            if (compactor != null) {
+                compactor.shutdownNow();
+            }
+
+            Segment segment;
+            while ((segment = idle.poll()) != null) {
+                segment.channel.close();
+            }
+            index.close();
+        } finally {
+            lock.unlock();
+            flushLock.unlock();
+        }
+    }
+
+    /**
+     * Writable segment.
+     * <p>Leased to one message at a time.
+     */
+    class Segment {
+
+        /**
+         * Segment id.
+         */
+        final int id;
+
+        /**
+         * Segment path.
+         */
+        final Path path;
+
+        /**
+         * Segment channel.
+         */
+        final FileChannel channel;
+
+        /**
+         * Constructs a new Segment instance.
+         *
+         * @param id Segment id.
+         * @throws IOException Unable to create file.
+         */
+        Segment(int id) throws IOException {
+            this.id = id;
+            this.path = segmentPath(id);
+            this.channel = FileChannel.open(path, StandardOpenOption.CREATE_NEW, StandardOpenOption.WRITE);
+        }
+    }
+
+    /**
+     * Index entry.
+     * <p>Immutable so it can be replaced whole on compaction.
+     */
+    public static final class Entry {
+
+        /**
+         * Message UID.
+         */
+        private final String uid;
+
+        /**
+         * Segment id.
+         */
+        private final int segment;
+
+        /**
+         * Message offset in segment.
+         */
+        private final long offset;
+
+        /**
+         * Message length.
+         */
+        private final long length;
+
+        /**
+         * Stored epoch time in milliseconds.
+         */
+        private final long time;
+
+        /**
+         * Message-ID header value or empty.
+         */
+        private final String messageId;
+
+        /**
+         * Recipient addresses.
+         */
+        private final List<String> recipients;
+
+        /**
+         * Constructs a new Entry instance.
+         *
+         * @param uid        Message UID.
+         * @param segment    Segment id.
+         * @param offset     Message offset in segment.
+         * @param length     Message length.
+         * @param time       Stored epoch time in milliseconds.
+         * @param messageId  Message-ID header value or empty.
+         * @param recipients Recipient addresses.
+         */
+        Entry(String uid, int segment, long offset, long length, long time, String messageId, List<String> recipients) {
+            this.uid = uid;
+            this.segment = segment;
+            this.offset = offset;
+            this.length = length;
+            this.time = time;
+            this.messageId = messageId != null ? messageId.replaceAll("\\s", "") : "";
+            this.recipients = recipients;
+        }
+
+        /**
+         * Parses index record.
+         *
+         * @param splits Record fields.
+         * @return Entry instance.
+         */
+        static Entry parse(String[] splits) {
+            List<String> recipients = splits[6].isEmpty() ? Collections.emptyList() : Arrays.asList(splits[6].split(","));
+            return new Entry(splits[0], Integer.parseInt(splits[1]), Long.parseLong(splits[2]), Long.parseLong(splits[3]),
+                    Long.parseLong(splits[4]), splits[5], recipients);
+        }
+
+        /**
+         * Gets message UID.
+         *
+         * @return String.
+         */
+        public String getUid() {
+            return uid;
+        }
+
+        /**
+         * Gets segment id.
+         *
+         * @return Integer.
+         */
+        public int getSegment() {
+            return segment;
+        }
+
+        /**
+         * Gets message offset in segment.
+         *
+         * @return Offset in bytes.
+         */
+        public long getOffset() {
+            return offset;
+        }
+
+        /**
+         * Gets message length.
+         *
+         * @return Length in bytes.
+         */
+        public long getLength() {
+            return length;
+        }
+
+        /**
+         * Gets stored epoch time.
+         *
+         * @return Time in milliseconds.
+         */
+        public long getTime() {
+            return time;
+        }
+
+        /**
+         * Gets Message-ID header value.
+         *
+         * @return String, empty if none.
+         */
+        public String getMessageId() {
+            return messageId;
+        }
+
+        /**
+         * Gets recipient addresses.
+         *
+         * @return List of String.
+         */
+        public List<String> getRecipients() {
+            return recipients;
+        }
+
+        /**
+         * Gets index record.
+         *
+         * @return Tab separated string.
+         */
+        @Override
+        public String toString() {
+            return uid + "\t" + segment + "\t" + offset + "\t" + length + "\t" + time + "\t" +
+                    messageId + "\t" + String.join(",", recipients);
+        }
+    }
+}
@@ -0,0 +1,359 @@
+package com.mimecast.robin.storage;
+
+import com.mimecast.robin.main.Metrics;
+import com.mimecast.robin.util.CompressionUtils;
+import com.mimecast.robin.util.PathUtils;
+import org.apache.commons.lang3.StringUtils;
+
+import java.io.ByteArrayInputStream;
+import java.io.ByteArrayOutputStream;
+import java.io.FileInputStream;
+import java.io.FileOutputStream;
+import java.io.IOException;
+import java.io.InputStream;
+import java.io.OutputStream;
+import java.nio.file.Paths;
+import java.util.ArrayList;
+import java.util.List;
+import java.util.concurrent.locks.ReentrantLock;
+
+/**
+ * Memory spooled storage client implementation.
+ *
+ * <p>Buffers messages in pooled memory chunks from the MemorySpool instead of opening a file each.
+ * <br>A message spills to its local storage file once it grows past the threshold,
+ * when the memory cap is reached or when its token is requested after saving.
+ * <p>Saved messages stay in the spool until spilled and can be read back via open().
+ * <p>Files are named and placed the same as with local storage.
+ * <p>State is guarded by a lock rather than synchronized as spills write to disk and monitors pin virtual threads.
+ *
+ * @see MemorySpool
+ */
+public class SpoolStorageClient extends LocalStorageClient {
+
+    /**
+     * Spill threshold in bytes.
+     */
+    private final long threshold;
+
+    /**
+     * Lock.
+     */
+    private final ReentrantLock lock = new ReentrantLock();
+
+    /**
+     * Memory chunks.
+     */
+    private final List<byte[]> chunks = new ArrayList<>();
+
+    /**
+     * Bytes in memory.
+     */
+    private long size = 0L;
+
+    /**
+     * File output stream.
+     * <p>Null until spilled.
+     */
+    private FileOutputStream file;
+
+    /**
+     * Saved boolean.
+     */
+    private boolean saved = false;
+
+    /**
+     * Discarded boolean.
+     */
+    private boolean discarded = false;
+
+    /**
+     * Constructs a new SpoolStorageClient instance.
+     *
+     * @param extension File extension.
+     * @param threshold Spill threshold in bytes.
+     */
+    public SpoolStorageClient(String extension, long threshold) {
+        super(extension);
+        this.threshold = threshold;
+    }
+
+    /**
+     * Gets spool output stream.
+     * <p>Nothing touches the disk until the message spills.
+     *
+     * @return OutputStream instance.
+     */
+    @Override
+    public OutputStream getStream() {
+        stream = new OutputStream() {
+            @Override
+            public void write(int b) throws IOException {
+                append(new byte[]{(byte) b}, 0, 1);
+            }
+
+            @Override
+            public void write(byte[] b, int off, int len) throws IOException {
+                append(b, off, len);
+            }
+
+            @Override
+            public void flush() throws IOException {
+                lock.lock();
+                try {
+                    if (file != null) {
+                        file.flush();
+                    }
+                } finally {
+                    lock.unlock();
+                }
+            }
+
+            @Override
+            public void close() throws IOException {
+                lock.lock();
+                try {
+                    if (file != null) {
+                        file.close();
+                    }
+                } finally {
+                    lock.unlock();
+                }
+            }
+        };
+
+        return stream;
+    }
+
+    /**
+     * Appends bytes to memory or file once spilled.
+     *
+     * @param b   Byte array.
+     * @param off Offset.
+     * @param len Length.
+     * @throws IOException Unable to spill.
+     */
+    private void append(byte[] b, int off, int len) throws IOException {
+        lock.lock();
+        try {
+            if (file == null && size + len > threshold) {
+                toDisk();
+            }
+
+            while (file == null && len > 0) {
+                int position = (int) (size % MemorySpool.CHUNK);
+                if (position == 0) {
+                    byte[] chunk = MemorySpool.acquire();
+                    if (chunk == null) {
+                        toDisk();
+                        break;
+                    }
+                    chunks.add(chunk);
+                }
+
+                int length = Math.min(len, MemorySpool.CHUNK - position);
+                System.arraycopy(b, off, chunks.get(chunks.size() - 1), position, length);
+                size += length;
+                off += length;
+                len -= length;
+            }
+
+            if (len > 0) {
+                file.write(b, off, len);
+            }
+        } finally {
+            lock.unlock();
+        }
+    }
+
+    /**
+     * Gets file token.
+     * <p>Spills saved messages so the token points to a durable file.
+     *
+     * @return String.
+     */
+    @Override
+    public String getToken() {
+        lock.lock();
+        try {
+            if (saved) {
+                spill();
+            }
+
+            return super.getToken();
+        } finally {
+            lock.unlock();
+        }
+    }
+
+    /**
+     * Is in memory.
+     *
+     * @return Boolean.
+     */
+    public boolean isSpooled() {
+        lock.lock();
+        try {
+            return file == null && !discarded;
+        } finally {
+            lock.unlock();
+        }
+    }
+
+    /**
+     * Opens saved message for reading.
+     * <p>Compressed messages are decompressed transparently.
+     *
+     * @return InputStream instance.
+     * @throws IOException Unable to open file.
+     */
+    public InputStream open() throws IOException {
+        lock.lock();
+        try {
+            if (file != null) {
+                return CompressionUtils.decompress(new FileInputStream(super.getToken()));
+            }
+
+            ByteArrayOutputStream bytes = new ByteArrayOutputStream((int) size);
+            writeChunks(bytes);
+            return CompressionUtils.decompress(new ByteArrayInputStream(bytes.toByteArray()));
+        } finally {
+            lock.unlock();
+        }
+    }
+
+    /**
+     * Saves message.
+     * <p>Spilled messages are saved as local storage would.
+     * <br>Others are kept in the spool under their final file name.
+     */
+    @Override
+    public void save() {
+        lock.lock();
+        try {
+            saved = true;
+            if (file != null) {
+                super.save();
+                return;
+            }
+
+            if (StringUtils.isNotBlank(headerFileName)) {
+                fileName = headerFileName;
+            }
+            MemorySpool.keep(this);
+            log.info("Storage spooled {} bytes: {}", size, uid);
+        } finally {
+            lock.unlock();
+        }
+    }
+
+    /**
+     * Discards message.
+     * <p>Gives back memory and deletes the file if spilled.
+     */
+    @Override
+    public void discard() {
+        lock.lock();
+        try {
+            discarded = true;
+            MemorySpool.forget(uid);
+
+            if (file != null) {
+                super.discard();
+            } else {
+                release();
+            }
+        } finally {
+            lock.unlock();
+        }
+    }
+
+    /**
+     * Spills message and syncs file to disk.
+     *
+     * @throws IOException Unable to spill or sync.
+     */
+    @Override
+    public void sync() throws IOException {
+        lock.lock();
+        try {
+            toDisk();
+            if (file != null) {
+                file.flush();
+                file.getChannel().force(false);
+            }
+        } finally {
+            lock.unlock();
+        }
+    }
+
+    /**
+     * Spills message to disk.
+     *
+     * @return Boolean.
+     */
+    boolean spill() {
+        lock.lock();
+        try {
+            toDisk();
+            return true;
+        } catch (IOException e) {
+            log.error("Storage spool not spilled: {}", e.getMessage());
+            return false;
+        } finally {
+            lock.unlock();
+        }
+    }
+
+    /**
+     * Writes memory chunks to file and continues there.
+     * <p>Saved messages are closed and dropped from the spool.
+     *
+     * @throws IOException Unable to write file.
+     */
+    private void toDisk() throws IOException {
+        if (file != null || discarded) return;
+
+        if (!PathUtils.makePath(path)) {
+            throw new IOException("Storage path could not be created");
+        }
+
+        file = new FileOutputStream(Paths.get(path, fileName).toString());
+        try {
+            writeChunks(file);
+        } finally {
+            release();
+        }
+        Metrics.increment(Metrics.SPOOL_SPILLS);
+
+        if (saved) {
+            file.close();
+            MemorySpool.forget(uid);
+            log.info("Storage spilled to: {}", super.getToken());
+        }
+    }
+
+    /**
+     * Writes memory chunks to given stream.
+     *
+     * @param out OutputStream instance.
+     * @throws IOException Unable to write.
+     */
+    private void writeChunks(OutputStream out) throws IOException {
+        long remaining = size;
+        for (byte[] chunk : chunks) {
+            int length = (int) Math.min(remaining, MemorySpool.CHUNK);
+            out.write(chunk, 0, length);
+            remaining -= length;
+        }
+    }
+
+    /**
+     * Gives memory chunks back to the spool.
+     */
+    private void release() {
+        MemorySpool.release(chunks);
+        chunks.clear();
+        size = 0L;
+    }
+}
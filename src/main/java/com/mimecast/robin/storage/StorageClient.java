@@ -3,6 +3,7 @@ package com.mimecast.robin.storage;
 import com.mimecast.robin.smtp.connection.Connection;
 
 import java.io.FileNotFoundException;
+import java.io.IOException;
 import java.io.OutputStream;
 
 /**
@@ -10,6 +11,7 @@ import java.io.OutputStream;
  *
  * <p>The instanciation of this will be done via Factories.
  * <p>Connection is required to allow customisation based on sender/recipient.
+ * <p>Implementations can observe headers as the message is stored via a HeaderObserver.
  */
 public interface StorageClient {
 
@@ -43,8 +45,37 @@ public interface StorageClient {
      */
     String getUID();
 
+    /**
+     * Gets header observer.
+     * <p>If not null the server passes it the message headers while storing the message.
+     * <br>All headers are seen before save() is called.
+     *
+     * @return HeaderObserver instance or null.
+     */
+    default HeaderObserver getHeaderObserver() {
+        return null;
+    }
+
+    /**
+     * Syncs stored bytes to disk.
+     * <p>Called before save() when the durability policy requires it.
+     *
+     * @throws IOException Unable to sync.
+     */
+    default void sync() throws IOException {
+        // Nothing to sync by default.
+    }
+
     /**
      * Saves file.
      */
     void save();
+
+    /**
+     * Discards file.
+     * <p>Called instead of save() when a message was not received in full.
+     */
+    default void discard() {
+        // Nothing stored by default.
+    }
 }
@@ -0,0 +1,109 @@
+package com.mimecast.robin.storage;
+
+import org.apache.logging.log4j.LogManager;
+import org.apache.logging.log4j.Logger;
+
+import java.util.concurrent.Executor;
+import java.util.concurrent.ExecutorService;
+import java.util.concurrent.Executors;
+import java.util.concurrent.TimeUnit;
+import java.util.concurrent.atomic.AtomicInteger;
+
+/**
+ * Shared storage writer.
+ *
+ * <p>Runs write-behind storage I/O on dedicated daemon threads so sessions do not wait on the disk.
+ * <p>Once shut down sessions still running past the drain timeout write on their own thread.
+ *
+ * @see WriteBehindStorageClient
+ */
+public class StorageWriter {
+    private static final Logger log = LogManager.getLogger(StorageWriter.class);
+
+    /**
+     * Writer threads.
+     */
+    private static int threads = 2;
+
+    /**
+     * Executor instance.
+     */
+    private static ExecutorService executor;
+
+    /**
+     * Shut down boolean.
+     */
+    private static boolean stopped = false;
+
+    /**
+     * Protected constructor.
+     */
+    private StorageWriter() {
+        throw new IllegalStateException("Static class");
+    }
+
+    /**
+     * Configures writer.
+     * <p>Applies to threads started after.
+     *
+     * @param threads Writer threads.
+     */
+    public static synchronized void configure(int threads) {
+        StorageWriter.threads = Math.max(1, threads);
+        stopped = false;
+    }
+
+    /**
+     * Gets executor.
+     * <p>Started on first use.
+     * <br>After shutdown writes run inline on the calling thread instead of starting new writers.
+     *
+     * @return Executor instance.
+     */
+    static synchronized Executor getExecutor() {
+        if (stopped) {
+            return Runnable::run;
+        }
+
+        if (executor == null) {
+            AtomicInteger count = new AtomicInteger();
+            executor = Executors.newFixedThreadPool(threads, runnable -> {
+                Thread thread = new Thread(runnable, "storage-writer-" + count.incrementAndGet());
+                thread.setDaemon(true);
+                return thread;
+            });
+        }
+
+        return executor;
+    }
+
+    /**
+     * Waits for queued storage I/O to finish.
+     * <p>Called on shutdown once sessions are drained.
+     *
+     * @param seconds Time to wait in seconds.
+     * @return Boolean, false if writes were still running.
+     */
+    public static boolean shutdown(long seconds) {
+        ExecutorService writers;
+        synchronized (StorageWriter.class) {
+            writers = executor;
+            executor = null;
+            stopped = true;
+        }
+        if (writers == null) return true;
+
+        writers.shutdown();
+        boolean done = false;
+        try {
+            done = writers.awaitTermination(seconds, TimeUnit.SECONDS);
+        } catch (InterruptedException e) {
+            Thread.currentThread().interrupt();
+        }
+
+        if (!done) {
+            log.warn("Storage writes still queued on shutdown.");
+        }
+        return done;
+    }
+}
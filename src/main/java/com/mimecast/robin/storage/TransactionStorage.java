@@ -0,0 +1,197 @@
+package com.mimecast.robin.storage;
+
+import com.mimecast.robin.util.CompressionUtils;
+import org.apache.commons.io.output.CountingOutputStream;
+import org.apache.logging.log4j.LogManager;
+import org.apache.logging.log4j.Logger;
+
+import java.io.BufferedOutputStream;
+import java.io.FileOutputStream;
+import java.io.IOException;
+import java.io.OutputStream;
+import java.nio.channels.FileChannel;
+import java.util.zip.DeflaterOutputStream;
+
+/**
+ * Storage kept open for the duration of a MAIL transaction.
+ *
+ * <p>Used by BDAT to append every chunk to the same storage stream.
+ * <br>The StorageClient stream is opened once and buffered.
+ * <p>The storage client is only saved once the last chunk was received.
+ * <p>Works with any StorageClient implementation.
+ * <br>File based streams also expose their FileChannel for direct transfers.
+ * <p>If the storage client observes headers chunks go through the stream until the headers were seen.
+ * <p>Chunks may be compressed on the way to storage in which case they always go through the stream.
+ *
+ * @see StorageClient
+ */
+public class TransactionStorage {
+    private static final Logger log = LogManager.getLogger(TransactionStorage.class);
+
+    /**
+     * StorageClient instance.
+     */
+    private final StorageClient storageClient;
+
+    /**
+     * Storage stream.
+     */
+    private final OutputStream stream;
+
+    /**
+     * Storage stream byte counter.
+     */
+    private final CountingOutputStream stored;
+
+    /**
+     * Compressing stream.
+     * <p>Null if not compressing.
+     */
+    private final DeflaterOutputStream compressed;
+
+    /**
+     * Buffered storage stream.
+     */
+    private final BufferedOutputStream buffered;
+
+    /**
+     * Header observing stream.
+     * <p>Null if the storage client does not observe headers.
+     */
+    private final HeaderObservingOutputStream observing;
+
+    /**
+     * Number of bytes stored.
+     */
+    private long byteCount = 0L;
+
+    /**
+     * Constructs a new TransactionStorage instance with given StorageClient.
+     *
+     * @param storageClient StorageClient instance.
+     * @throws IOException Unable to open stream.
+     */
+    public TransactionStorage(StorageClient storageClient) throws IOException {
+        this(storageClient, null, 0);
+    }
+
+    /**
+     * Constructs a new TransactionStorage instance with given StorageClient and compression.
+     *
+     * @param storageClient StorageClient instance.
+     * @param compression   Compression type, gzip, deflate or none.
+     * @param level         Compression level from 0 to 9.
+     * @throws IOException Unable to open stream.
+     */
+    public TransactionStorage(StorageClient storageClient, String compression, int level) throws IOException {
+        this.storageClient = storageClient;
+        this.stream = storageClient.getStream();
+        this.stored = new CountingOutputStream(stream);
+        this.compressed = CompressionUtils.isCompressed(compression) ? CompressionUtils.compress(stored, compression, level) : null;
+        this.buffered = new BufferedOutputStream(compressed != null ? compressed : stored, 65536);
+
+        HeaderObserver observer = storageClient.getHeaderObserver();
+        this.observing = observer != null ? new HeaderObservingOutputStream(buffered, observer) : null;
+    }
+
+    /**
+     * Gets StorageClient instance.
+     *
+     * @return StorageClient instance.
+     */
+    public StorageClient getStorageClient() {
+        return storageClient;
+    }
+
+    /**
+     * Gets buffered storage stream.
+     *
+     * @return OutputStream instance.
+     */
+    public OutputStream getStream() {
+        return observing != null && !observing.isDone() ? observing : buffered;
+    }
+
+    /**
+     * Gets storage file channel.
+     * <p>Buffered bytes are flushed first so the channel position is current.
+     * <p>Not available until the storage client has seen all the headers it needs.
+     * <br>Nor when compressing.
+     *
+     * @return FileChannel instance or null if storage is not file based, compressed or headers still observed.
+     * @throws IOException Unable to flush.
+     */
+    public FileChannel getChannel() throws IOException {
+        if (compressed != null || (observing != null && !observing.isDone())) {
+            return null;
+        }
+
+        if (stream instanceof FileOutputStream) {
+            buffered.flush();
+            return ((FileOutputStream) stream).getChannel();
+        }
+
+        return null;
+    }
+
+    /**
+     * Adds to number of bytes stored.
+     *
+     * @param bytes Number of bytes.
+     * @return Self.
+     */
+    public TransactionStorage addByteCount(long bytes) {
+        byteCount += bytes;
+        return this;
+    }
+
+    /**
+     * Gets number of bytes stored.
+     *
+     * @return Number of bytes.
+     */
+    public long getByteCount() {
+        return byteCount;
+    }
+
+    /**
+     * Gets number of bytes written to storage.
+     * <p>Differs from the byte count when compressing and is only final once saved.
+     *
+     * @return Number of bytes.
+     */
+    public long getStoredByteCount() {
+        return compressed != null ? stored.getByteCount() : byteCount;
+    }
+
+    /**
+     * Flushes buffered stream and saves storage client.
+     *
+     * @throws IOException Unable to flush.
+     */
+    public void save() throws IOException {
+        if (observing != null) {
+            observing.finish();
+        }
+        buffered.flush();
+        if (compressed != null) {
+            compressed.finish();
+        }
+        storageClient.save();
+    }
+
+    /**
+     * Closes storage without saving.
+     * <p>Used when a transaction is abandoned before the last chunk.
+     * <br>The partial message is discarded.
+     */
+    public void close() {
+        try {
+            buffered.close();
+            log.info("Storage closed without last chunk: {}", storageClient.getToken());
+        } catch (IOException e) {
+            log.error("Storage stream not closed: {}", e.getMessage());
+        }
+        storageClient.discard();
+    }
+}
@@ -0,0 +1,264 @@
+package com.mimecast.robin.storage;
+
+import java.io.IOException;
+import java.io.InterruptedIOException;
+import java.io.OutputStream;
+import java.io.UncheckedIOException;
+import java.util.Queue;
+import java.util.concurrent.CompletableFuture;
+import java.util.concurrent.CompletionException;
+import java.util.concurrent.ConcurrentLinkedQueue;
+import java.util.concurrent.Executor;
+import java.util.concurrent.Semaphore;
+import java.util.function.Function;
+
+/**
+ * Write-behind output stream.
+ *
+ * <p>Fills buffers on the calling thread and hands them to an executor to write to the wrapped stream.
+ * <br>Tasks for the same stream run one after the other in the order they were queued.
+ * <p>Only a few buffers may be queued at once so a slow disk still pushes back on the writer.
+ * <br>Written buffers are reused.
+ * <p>The first write error is kept and thrown to the writer on its next write.
+ * <br>Queued writes after an error are skipped.
+ * <p>Closing hands off the last buffer but leaves the wrapped stream open for the storage client to close.
+ */
+public class WriteBehindOutputStream extends OutputStream {
+
+    /**
+     * Buffer size in bytes.
+     */
+    static final int BUFFER = 65536;
+
+    /**
+     * Maximum number of buffers queued.
+     */
+    static final int PENDING = 16;
+
+    /**
+     * Wrapped output stream.
+     */
+    private final OutputStream out;
+
+    /**
+     * Executor instance.
+     */
+    private final Executor executor;
+
+    /**
+     * Queued buffer permits.
+     */
+    private final Semaphore permits = new Semaphore(PENDING);
+
+    /**
+     * Written buffers for reuse.
+     */
+    private final Queue<byte[]> spare = new ConcurrentLinkedQueue<>();
+
+    /**
+     * Last queued task.
+     */
+    private CompletableFuture<Void> tail = CompletableFuture.completedFuture(null);
+
+    /**
+     * First error if any.
+     */
+    private volatile IOException failure;
+
+    /**
+     * Current buffer.
+     */
+    private byte[] buffer = new byte[BUFFER];
+
+    /**
+     * Bytes in current buffer.
+     */
+    private int count = 0;
+
+    /**
+     * Constructs a new WriteBehindOutputStream instance.
+     *
+     * @param out      OutputStream instance.
+     * @param executor Executor instance.
+     */
+    public WriteBehindOutputStream(OutputStream out, Executor executor) {
+        this.out = out;
+        this.executor = executor;
+    }
+
+    /**
+     * Writes byte.
+     *
+     * @param b Byte.
+     * @throws IOException Earlier write failed.
+     */
+    @Override
+    public void write(int b) throws IOException {
+        if (count == BUFFER) {
+            handOff();
+        }
+        buffer[count++] = (byte) b;
+    }
+
+    /**
+     * Writes bytes.
+     *
+     * @param b   Byte array.
+     * @param off Offset.
+     * @param len Length.
+     * @throws IOException Earlier write failed.
+     */
+    @Override
+    public void write(byte[] b, int off, int len) throws IOException {
+        while (len > 0) {
+            if (count == BUFFER) {
+                handOff();
+            }
+
+            int length = Math.min(len, BUFFER - count);
+            System.arraycopy(b, off, buffer, count, length);
+            count += length;
+            off += length;
+            len -= length;
+        }
+    }
+
+    /**
+     * Hands off current buffer if not empty.
+     *
+     * @throws IOException Earlier write failed.
+     */
+    @Override
+    public void flush() throws IOException {
+        if (count > 0) {
+            handOff();
+        }
+        check();
+    }
+
+    /**
+     * Hands off current buffer if not empty.
+     * <p>The wrapped stream is not closed.
+     *
+     * @throws IOException Earlier write failed.
+     */
+    @Override
+    public void close() throws IOException {
+        flush();
+    }
+
+    /**
+     * Queues current buffer for writing.
+     * <p>Blocks while too many buffers are queued.
+     *
+     * @throws IOException Earlier write failed or interrupted.
+     */
+    private void handOff() throws IOException {
+        check();
+        try {
+            permits.acquire();
+        } catch (InterruptedException e) {
+            Thread.currentThread().interrupt();
+            throw new InterruptedIOException("Interrupted waiting for storage writes");
+        }
+
+        byte[] bytes = buffer;
+        int length = count;
+        byte[] next = spare.poll();
+        buffer = next != null ? next : new byte[BUFFER];
+        count = 0;
+
+        enqueue(() -> {
+            try {
+                if (failure == null) {
+                    out.write(bytes, 0, length);
+                }
+            } finally {
+                spare.offer(bytes);
+                permits.release();
+            }
+        });
+    }
+
+    /**
+     * Queues task after all queued writes.
+     * <p>Tasks run even after an error so storage clients can clean up.
+     *
+     * @param task Task instance.
+     * @return CompletableFuture completed once the task ran.
+     */
+    public CompletableFuture<Void> enqueue(Task task) {
+        return chain(previous -> previous.thenRunAsync(() -> {
+            try {
+                task.run();
+            } catch (IOException e) {
+                fail(e);
+            }
+        }, executor));
+    }
+
+    /**
+     * Queues future after all queued tasks.
+     * <p>Errors are kept as write errors.
+     *
+     * @param next Function given the last queued task future returning the next one.
+     * @return CompletableFuture completed once the next one completed.
+     */
+    public synchronized CompletableFuture<Void> chain(Function<CompletableFuture<Void>, CompletableFuture<Void>> next) {
+        tail = next.apply(tail).handle((v, t) -> {
+            if (t != null) {
+                Throwable cause = t instanceof CompletionException ? t.getCause() : t;
+                fail(cause instanceof UncheckedIOException ? ((UncheckedIOException) cause).getCause() : new IOException(cause));
+            }
+            return null;
+        });
+
+        return tail;
+    }
+
+    /**
+     * Gets first error if any.
+     *
+     * @return IOException instance or null.
+     */
+    public IOException getFailure() {
+        return failure;
+    }
+
+    /**
+     * Throws first error if any.
+     *
+     * @throws IOException Earlier write failed.
+     */
+    public void check() throws IOException {
+        IOException e = failure;
+        if (e != null) {
+            throw new IOException("Storage write failed: " + e.getMessage(), e);
+        }
+    }
+
+    /**
+     * Keeps error unless one was kept already.
+     *
+     * @param e IOException instance.
+     */
+    private synchronized void fail(IOException e) {
+        if (failure == null) {
+            failure = e;
+        }
+    }
+
+    /**
+     * Storage I/O task.
+     */
+    @FunctionalInterface
+    public interface Task {
+
+        /**
+         * Runs task.
+         *
+         * @throws IOException Unable to store.
+         */
+        void run() throws IOException;
+    }
+}
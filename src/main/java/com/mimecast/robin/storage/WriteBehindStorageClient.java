@@ -0,0 +1,213 @@
+package com.mimecast.robin.storage;
+
+import com.mimecast.robin.smtp.connection.Connection;
+import org.apache.logging.log4j.LogManager;
+import org.apache.logging.log4j.Logger;
+
+import java.io.FileNotFoundException;
+import java.io.IOException;
+import java.io.OutputStream;
+import java.util.concurrent.CompletableFuture;
+
+/**
+ * Write-behind storage client.
+ *
+ * <p>Wraps another storage client and moves its I/O to the StorageWriter threads.
+ * <br>The session only fills buffers and the wrapped client stream, sync, save and discard run behind it.
+ * <p>The durability policy decides how long save() waits before the session may reply:
+ * <ul>
+ *     <li>enqueue - Returns once everything is queued.</li>
+ *     <li>write - Waits for the message to be written and saved.</li>
+ *     <li>fsync - Also syncs it to disk before saving.</li>
+ * </ul>
+ * <p>With write and fsync a failed write or sync is known once save() returns so the session can refuse the message.
+ *
+ * @see StorageWriter
+ */
+public class WriteBehindStorageClient implements StorageClient {
+    private static final Logger log = LogManager.getLogger(WriteBehindStorageClient.class);
+
+    /**
+     * Reply once queued.
+     */
+    public static final String ENQUEUE = "enqueue";
+
+    /**
+     * Reply once written.
+     */
+    public static final String WRITE = "write";
+
+    /**
+     * Reply once synced to disk.
+     */
+    public static final String FSYNC = "fsync";
+
+    /**
+     * Wrapped StorageClient instance.
+     */
+    private final StorageClient client;
+
+    /**
+     * Durability policy.
+     */
+    private final String durability;
+
+    /**
+     * Write-behind stream.
+     * <p>Null until the stream is requested.
+     */
+    private WriteBehindOutputStream stream;
+
+    /**
+     * Constructs a new WriteBehindStorageClient instance.
+     *
+     * @param client     StorageClient instance to wrap.
+     * @param durability Durability policy.
+     */
+    public WriteBehindStorageClient(StorageClient client, String durability) {
+        this.client = client;
+        this.durability = durability.toLowerCase();
+    }
+
+    /**
+     * Is write-behind durability policy.
+     *
+     * @param durability Durability policy.
+     * @return Boolean, false for sync or unknown policies.
+     */
+    public static boolean isWriteBehind(String durability) {
+        return ENQUEUE.equalsIgnoreCase(durability) || WRITE.equalsIgnoreCase(durability) || FSYNC.equalsIgnoreCase(durability);
+    }
+
+    /**
+     * Sets connection.
+     *
+     * @param connection Connection instance.
+     * @return Self.
+     */
+    @Override
+    public WriteBehindStorageClient setConnection(Connection connection) {
+        client.setConnection(connection);
+        return this;
+    }
+
+    /**
+     * Gets write-behind stream.
+     *
+     * @return OutputStream instance.
+     * @throws FileNotFoundException Unable to open wrapped stream.
+     */
+    @Override
+    public OutputStream getStream() throws FileNotFoundException {
+        if (stream == null) {
+            stream = new WriteBehindOutputStream(client.getStream(), StorageWriter.getExecutor());
+        }
+
+        return stream;
+    }
+
+    /**
+     * Gets file token.
+     *
+     * @return String.
+     */
+    @Override
+    public String getToken() {
+        return client.getToken();
+    }
+
+    /**
+     * Gets UID.
+     *
+     * @return String.
+     */
+    @Override
+    public String getUID() {
+        return client.getUID();
+    }
+
+    /**
+     * Gets wrapped client header observer.
+     * <p>Headers are observed on the session thread before the bytes are queued.
+     *
+     * @return HeaderObserver instance or null.
+     */
+    @Override
+    public HeaderObserver getHeaderObserver() {
+        return client.getHeaderObserver();
+    }
+
+    /**
+     * Saves message behind queued writes.
+     * <p>Waits according to the durability policy.
+     * <br>If a write failed the message is discarded instead.
+     */
+    @Override
+    public void save() {
+        if (stream == null) {
+            client.save();
+            return;
+        }
+
+        try {
+            stream.flush();
+        } catch (IOException e) {
+            log.error("Storage write failed: {}", e.getMessage());
+        }
+
+        CompletableFuture<Void> saved = stream.enqueue(() -> {
+            boolean synced = false;
+            try {
+                if (FSYNC.equals(durability) && stream.getFailure() == null) {
+                    client.sync();
+                }
+                synced = true;
+            } finally {
+                finish(synced);
+            }
+        });
+
+        if (!ENQUEUE.equals(durability)) {
+            saved.join();
+            if (stream.getFailure() != null) {
+                log.error("Storage not saved: {}", stream.getFailure().getMessage());
+            }
+        }
+    }
+
+    /**
+     * Is message not stored.
+     * <p>Final once save() returned for write and fsync durability.
+     * <br>With enqueue the session replies first so later failures are only logged.
+     *
+     * @return Boolean.
+     */
+    public boolean isFailed() {
+        return stream != null && stream.getFailure() != null;
+    }
+
+    /**
+     * Saves or discards wrapped client once queued writes are done.
+     *
+     * @param synced Synced boolean, false if the sync failed.
+     */
+    private void finish(boolean synced) {
+        if (synced && stream.getFailure() == null) {
+            client.save();
+        } else {
+            client.discard();
+        }
+    }
+
+    /**
+     * Discards message behind queued writes.
+     */
+    @Override
+    public void discard() {
+        if (stream == null) {
+            client.discard();
+        } else {
+            stream.enqueue(client::discard);
+        }
+    }
+}
@@ -0,0 +1,117 @@
+package com.mimecast.robin.util;
+
+import java.io.BufferedInputStream;
+import java.io.IOException;
+import java.io.InputStream;
+import java.io.OutputStream;
+import java.util.zip.Deflater;
+import java.util.zip.DeflaterOutputStream;
+import java.util.zip.GZIPInputStream;
+import java.util.zip.GZIPOutputStream;
+import java.util.zip.InflaterInputStream;
+
+/**
+ * Static utilities for compressed storage.
+ *
+ * <p>Messages can be stored gzip or deflate (zlib) compressed.
+ * <br>Readers detect the format from the first two bytes so plain and compressed files read the same.
+ */
+public final class CompressionUtils {
+
+    /**
+     * Gzip compression.
+     */
+    public static final String GZIP = "gzip";
+
+    /**
+     * Deflate compression.
+     */
+    public static final String DEFLATE = "deflate";
+
+    /**
+     * Stream buffer size.
+     */
+    private static final int BUFFER = 8192;
+
+    /**
+     * Protected constructor.
+     */
+    private CompressionUtils() {
+        throw new IllegalStateException("Static class");
+    }
+
+    /**
+     * Is compression type supported.
+     *
+     * @param type Compression type.
+     * @return Boolean, false for none or unknown types.
+     */
+    public static boolean isCompressed(String type) {
+        return GZIP.equalsIgnoreCase(type) || DEFLATE.equalsIgnoreCase(type);
+    }
+
+    /**
+     * Wraps stream to compress what is written to it.
+     * <p>Closing the returned stream finishes it and closes the given one.
+     * <br>Call finish() instead to leave the given stream open.
+     *
+     * @param out   OutputStream instance.
+     * @param type  Compression type, gzip or deflate.
+     * @param level Compression level from 0 to 9.
+     * @return DeflaterOutputStream instance.
+     * @throws IOException Unable to write gzip header.
+     */
+    public static DeflaterOutputStream compress(OutputStream out, String type, int level) throws IOException {
+        int clamped = Math.max(Deflater.NO_COMPRESSION, Math.min(Deflater.BEST_COMPRESSION, level));
+
+        if (GZIP.equalsIgnoreCase(type)) {
+            return new GZIPOutputStream(out, BUFFER) {
+                {
+                    def.setLevel(clamped);
+                }
+            };
+        }
+
+        // Own deflater is not ended by the stream.
+        Deflater deflater = new Deflater(clamped);
+        return new DeflaterOutputStream(out, deflater, BUFFER) {
+            @Override
+            public void close() throws IOException {
+                try {
+                    super.close();
+                } finally {
+                    deflater.end();
+                }
+            }
+        };
+    }
+
+    /**
+     * Wraps stream to decompress it if compressed.
+     * <p>Plain streams are returned as they are, buffered.
+     *
+     * @param in InputStream instance.
+     * @return InputStream instance.
+     * @throws IOException Unable to read.
+     */
+    public static InputStream decompress(InputStream in) throws IOException {
+        BufferedInputStream buffered = new BufferedInputStream(in, BUFFER);
+        buffered.mark(2);
+        int first = buffered.read();
+        int second = buffered.read();
+        buffered.reset();
+
+        // Gzip magic.
+        if (first == 0x1f && second == 0x8b) {
+            return new GZIPInputStream(buffered, BUFFER);
+        }
+
+        // Zlib header with deflate method, no preset dictionary and valid check bits.
+        if (first >= 0 && second >= 0 && (first & 0x0f) == 8 && (first >> 4) <= 7 &&
+                (second & 0x20) == 0 && ((first << 8) | second) % 31 == 0) {
+            return new InflaterInputStream(buffered);
+        }
+
+        return buffered;
+    }
+}
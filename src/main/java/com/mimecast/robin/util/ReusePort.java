@@ -0,0 +1,74 @@
+package com.mimecast.robin.util;
+
+import org.apache.logging.log4j.LogManager;
+import org.apache.logging.log4j.Logger;
+
+import java.io.IOException;
+import java.net.SocketOption;
+import java.net.StandardSocketOptions;
+import java.nio.channels.NetworkChannel;
+
+/**
+ * SO_REUSEPORT utility.
+ *
+ * <p>The project targets Java 8 so the socket option is looked up via reflection.
+ * <p>SO_REUSEPORT lets several sockets listen on the same port and the kernel spreads new connections between them.
+ * <br>It is available from Java 9 on Linux and BSD derived systems.
+ */
+public class ReusePort {
+    private static final Logger log = LogManager.getLogger(ReusePort.class);
+
+    /**
+     * SO_REUSEPORT socket option.
+     * <p>Null if not supported by the runtime.
+     */
+    private static final SocketOption<Boolean> option = lookup();
+
+    /**
+     * Protected constructor.
+     */
+    private ReusePort() {
+        throw new IllegalStateException("Static class");
+    }
+
+    /**
+     * Looks up socket option.
+     *
+     * @return SocketOption instance or null if not supported.
+     */
+    @SuppressWarnings("unchecked")
+    private static SocketOption<Boolean> lookup() {
+        try {
+            return (SocketOption<Boolean>) StandardSocketOptions.class.getField("SO_REUSEPORT").get(null);
+        } catch (ReflectiveOperationException e) {
+            return null;
+        }
+    }
+
+    /**
+     * Is SO_REUSEPORT supported by the runtime.
+     *
+     * @return Boolean.
+     */
+    public static boolean isSupported() {
+        return option != null;
+    }
+
+    /**
+     * Enables SO_REUSEPORT on given channel.
+     * <p>Must be called before binding.
+     *
+     * @param channel NetworkChannel instance.
+     * @return Boolean, false if not supported by the runtime or platform.
+     * @throws IOException Unable to set option.
+     */
+    public static boolean enable(NetworkChannel channel) throws IOException {
+        if (option == null || !channel.supportedOptions().contains(option)) {
+            log.warn("SO_REUSEPORT not supported by this runtime or platform.");
+            return false;
+        }
+
+        channel.setOption(option, true);
+        return true;
+    }
+}
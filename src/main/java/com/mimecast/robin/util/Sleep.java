@@ -18,6 +18,7 @@ public class Sleep {
 
     /**
      * Take a nap.
+     * <p>Thread.sleep() unmounts virtual threads so callers should not hold locks while napping.
      *
      * @param delay Time in miliseconds.
      */
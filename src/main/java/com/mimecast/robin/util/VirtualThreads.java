@@ -0,0 +1,62 @@
+package com.mimecast.robin.util;
+
+import org.apache.logging.log4j.LogManager;
+import org.apache.logging.log4j.Logger;
+
+import java.lang.reflect.Method;
+import java.util.concurrent.ThreadFactory;
+
+/**
+ * Virtual threads utility.
+ *
+ * <p>The project targets Java 8 so virtual threads are looked up via reflection.
+ * <p>On runtimes without virtual threads (Java 20 and older) no factory is provided.
+ */
+public class VirtualThreads {
+    private static final Logger log = LogManager.getLogger(VirtualThreads.class);
+
+    /**
+     * Protected constructor.
+     */
+    private VirtualThreads() {
+        throw new IllegalStateException("Static class");
+    }
+
+    /**
+     * Is virtual threads supported by the runtime.
+     *
+     * @return Boolean.
+     */
+    public static boolean isSupported() {
+        try {
+            Thread.class.getMethod("ofVirtual");
+            return true;
+        } catch (NoSuchMethodException e) {
+            return false;
+        }
+    }
+
+    /**
+     * Gets a virtual thread factory.
+     * <p>Threads are named with given prefix followed by a counter.
+     *
+     * @param prefix Thread name prefix.
+     * @return ThreadFactory instance or null if not supported.
+     */
+    public static ThreadFactory factory(String prefix) {
+        try {
+            Object builder = Thread.class.getMethod("ofVirtual").invoke(null);
+
+            Class<?> builderClass = Class.forName("java.lang.Thread$Builder");
+            Method name = builderClass.getMethod("name", String.class, long.class);
+            Method factory = builderClass.getMethod("factory");
+
+            return (ThreadFactory) factory.invoke(name.invoke(builder, prefix, 1L));
+
+        } catch (ReflectiveOperationException e) {
+            log.warn("Virtual threads not supported by this runtime.");
+        }
+
+        return null;
+    }
+}
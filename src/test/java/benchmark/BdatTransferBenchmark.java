@@ -0,0 +1,97 @@
+package benchmark;
+
+import com.mimecast.robin.main.Foundation;
+import com.mimecast.robin.smtp.connection.ConnectionMock;
+import com.mimecast.robin.smtp.io.LineInputStream;
+import org.junit.jupiter.api.BeforeAll;
+import org.junit.jupiter.api.Test;
+
+import javax.naming.ConfigurationException;
+import java.io.ByteArrayInputStream;
+import java.io.File;
+import java.io.FileOutputStream;
+import java.io.IOException;
+
+/**
+ * BDAT chunk transfer benchmark.
+ *
+ * <p>Compares reading BDAT chunks byte by byte with the bulk copy and FileChannel transfer paths.
+ * <br>The per byte baseline reads from a buffered stream so it only shows the loop cost, not a syscall per byte.
+ * <p>Runs 1 KB, 1 MB and 50 MB chunks to a temporary file and reports throughput in MB/s.
+ * <p>Each size is repeated to move about 100 MB in total, the per byte baseline moves a tenth of that.
+ */
+@SuppressWarnings("java:S2699")
+class BdatTransferBenchmark {
+
+    private static final int[] SIZES = {1024, 1024 * 1024, 50 * 1024 * 1024};
+
+    private static final long TOTAL = 100L * 1024 * 1024;
+
+    @BeforeAll
+    static void before() throws ConfigurationException {
+        Foundation.init("src/test/resources/");
+    }
+
+    @Test
+    void perByte() throws IOException {
+        for (int size : SIZES) {
+            run("per byte", size, TOTAL / 10, (connection, in, out) -> {
+                for (int i = 0; i < size; i++) {
+                    out.write((byte) in.read());
+                }
+            });
+        }
+    }
+
+    @Test
+    void bulk() throws IOException {
+        for (int size : SIZES) {
+            run("bulk", size, TOTAL, (connection, in, out) -> connection.readBytes(size, out));
+        }
+    }
+
+    @Test
+    void transfer() throws IOException {
+        for (int size : SIZES) {
+            run("transfer", size, TOTAL, (connection, in, out) -> connection.readBytes(size, out.getChannel()));
+        }
+    }
+
+    private void run(String name, int size, long total, Transfer transfer) throws IOException {
+        StringBuilder chunk = new StringBuilder(size);
+        for (int i = 0; i < size; i++) {
+            chunk.append((char) ('a' + i % 26));
+        }
+
+        byte[] bytes = chunk.toString().getBytes();
+        int iterations = (int) Math.max(1, total / size);
+        File file = File.createTempFile("bdat", ".eml");
+        file.deleteOnExit();
+
+        long elapsed = 0;
+        try (FileOutputStream out = new FileOutputStream(file)) {
+            for (int i = 0; i < iterations; i++) {
+                ConnectionMock connection = new ConnectionMock(chunk);
+                LineInputStream in = new LineInputStream(new ByteArrayInputStream(bytes));
+
+                long start = System.nanoTime();
+                transfer.run(connection, in, out);
+                elapsed += System.nanoTime() - start;
+
+                out.getChannel().truncate(0);
+            }
+        } finally {
+            //noinspection ResultOfMethodCallIgnored
+            file.delete();
+        }
+
+        double megabytes = (double) size * iterations / (1024 * 1024);
+        System.out.printf("%s: %d byte chunks x %d in %d ms, %.1f MB/s%n",
+                name, size, iterations, elapsed / 1_000_000, megabytes / (elapsed / 1e9));
+    }
+
+    @FunctionalInterface
+    private interface Transfer {
+        void run(ConnectionMock connection, LineInputStream in, FileOutputStream out) throws IOException;
+    }
+}
@@ -0,0 +1,87 @@
+package benchmark;
+
+import com.mimecast.robin.main.Extensions;
+import com.mimecast.robin.main.Foundation;
+import com.mimecast.robin.smtp.extension.Extension;
+import com.mimecast.robin.smtp.verb.Verb;
+import org.junit.jupiter.api.BeforeAll;
+import org.junit.jupiter.api.Test;
+
+import javax.naming.ConfigurationException;
+import java.util.Optional;
+
+/**
+ * Command dispatch benchmark.
+ *
+ * <p>Compares the regex split and per command processor dispatch with the tokenizer and reusable processors.
+ * <p>Parses and dispatches a typical envelope without processing it and reports commands per second on one core.
+ */
+@SuppressWarnings("java:S2699")
+class DispatchBenchmark {
+
+    private static final String[] COMMANDS = {
+            "EHLO client.example.com",
+            "MAIL FROM:<tony@example.com> SIZE=12345 BODY=8BITMIME",
+            "RCPT TO:<pepper@example.com>",
+            "RCPT TO:<happy@example.com> NOTIFY=FAILURE",
+            "DATA",
+            "RSET",
+            "QUIT"
+    };
+
+    private static final int ITERATIONS = 2_000_000;
+
+    @BeforeAll
+    static void before() throws ConfigurationException {
+        Foundation.init("src/test/resources/");
+    }
+
+    @Test
+    void regex() {
+        run("regex", () -> {
+            long count = 0;
+            for (String command : COMMANDS) {
+                String[] parts = command.split("(\\s+)?(\\s+|:|=)(\\s+)?");
+                if (Extensions.isExtension(parts[0])) {
+                    Optional<Extension> opt = Extensions.getExtension(parts[0]);
+                    if (opt.isPresent() && opt.get().getServer() != null) count++;
+                }
+            }
+            return count;
+        });
+    }
+
+    @Test
+    void tokenizer() {
+        run("tokenizer", () -> {
+            long count = 0;
+            for (String command : COMMANDS) {
+                Verb verb = new Verb(command);
+                if (Extensions.isExtension(verb) && Extensions.getServerProcessor(verb) != null) count++;
+            }
+            return count;
+        });
+    }
+
+    private void run(String name, Dispatch dispatch) {
+        long count = 0;
+        for (int i = 0; i < ITERATIONS / 10; i++) {
+            count += dispatch.run(); // Warm up.
+        }
+
+        long start = System.nanoTime();
+        for (int i = 0; i < ITERATIONS; i++) {
+            count += dispatch.run();
+        }
+        long elapsed = System.nanoTime() - start;
+
+        long commands = (long) ITERATIONS * COMMANDS.length;
+        System.out.printf("%s: %d commands in %d ms, %.0f commands/s (%d)%n",
+                name, commands, elapsed / 1_000_000, commands / (elapsed / 1e9), count);
+    }
+
+    @FunctionalInterface
+    private interface Dispatch {
+        long run();
+    }
+}
@@ -0,0 +1,96 @@
+package benchmark;
+
+import com.mimecast.robin.main.Foundation;
+import com.mimecast.robin.smtp.ReceiptExecutor;
+import com.mimecast.robin.util.VirtualThreads;
+import org.junit.jupiter.api.BeforeAll;
+import org.junit.jupiter.api.Test;
+
+import javax.naming.ConfigurationException;
+import java.io.IOException;
+import java.io.InputStream;
+import java.lang.management.ManagementFactory;
+import java.net.InetAddress;
+import java.net.ServerSocket;
+import java.net.Socket;
+import java.util.ArrayList;
+import java.util.List;
+
+/**
+ * Receipt threading benchmark.
+ *
+ * <p>Compares thread per connection with virtual threads for idle sessions.
+ * <p>Opens the given number of concurrent connections, waits for every greeting and keeps them idle.
+ * <p>Reports setup time, heap used and live platform threads while all sessions are open.
+ * <p>Connection count can be set via the robin.benchmark.connections system property.
+ * <br>The OS open files limit needs to allow for two sockets per connection.
+ */
+@SuppressWarnings("java:S2699")
+class ReceiptThreadsBenchmark {
+
+    private static final int CONNECTIONS = Integer.getInteger("robin.benchmark.connections", 2000);
+
+    @BeforeAll
+    static void before() throws ConfigurationException {
+        Foundation.init("src/test/resources/");
+    }
+
+    @Test
+    void platform() throws IOException {
+        run("platform", false);
+    }
+
+    @Test
+    void virtual() throws IOException {
+        if (!VirtualThreads.isSupported()) {
+            System.out.println("Virtual threads not supported by this runtime.");
+            return;
+        }
+        run("virtual", true);
+    }
+
+    private void run(String name, boolean virtual) throws IOException {
+        ReceiptExecutor executor = new ReceiptExecutor(0, 0, ReceiptExecutor.REJECT, virtual);
+        List<Socket> clients = new ArrayList<>();
+
+        try (ServerSocket listener = new ServerSocket(0, CONNECTIONS, InetAddress.getLoopbackAddress())) {
+            System.gc();
+            long heap = usedHeap();
+            long start = System.nanoTime();
+
+            for (int i = 0; i < CONNECTIONS; i++) {
+                clients.add(new Socket(listener.getInetAddress(), listener.getLocalPort()));
+                executor.execute(listener.accept());
+            }
+
+            // Wait for every greeting.
+            for (Socket client : clients) {
+                InputStream in = client.getInputStream();
+                int b;
+                while ((b = in.read()) != -1 && b != '\n') {
+                    // Drain greeting.
+                }
+            }
+
+            long elapsed = (System.nanoTime() - start) / 1_000_000;
+            System.out.printf("%s: %d sessions in %d ms, %d active, %d platform threads, %d KB heap%n",
+                    name, CONNECTIONS, elapsed, executor.getActive(),
+                    ManagementFactory.getThreadMXBean().getThreadCount(),
+                    (usedHeap() - heap) / 1024);
+
+            for (Socket client : clients) {
+                client.getOutputStream().write("QUIT\r\n".getBytes());
+            }
+        } finally {
+            for (Socket client : clients) {
+                client.close();
+            }
+            executor.shutdown();
+        }
+    }
+
+    private long usedHeap() {
+        Runtime runtime = Runtime.getRuntime();
+        return runtime.totalMemory() - runtime.freeMemory();
+    }
+}
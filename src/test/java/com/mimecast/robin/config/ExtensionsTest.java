@@ -130,6 +130,15 @@ class ExtensionsTest {
         assertNotNull(Extensions.getExtension(new Verb("quit")).get().getServer());
     }
 
+    @Test
+    void getServerProcessor() {
+        // Reusable processors are shared, others built every time.
+        assertSame(Extensions.getServerProcessor(new Verb("EHLO example.com")), Extensions.getServerProcessor(new Verb("helo")));
+        assertSame(Extensions.getServerProcessor(new Verb("rset")), Extensions.getServerProcessor(new Verb("RSET")));
+        assertNotSame(Extensions.getServerProcessor(new Verb("mail")), Extensions.getServerProcessor(new Verb("mail")));
+        assertNull(Extensions.getServerProcessor(new Verb("none")));
+    }
+
     private static class ServerTest extends ServerProcessor {}
     private static class ClientTest extends ClientProcessor {}
 
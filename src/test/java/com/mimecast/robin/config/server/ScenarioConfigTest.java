@@ -38,8 +38,33 @@ class ScenarioConfigTest {
         assertEquals("501 Heart not found", scenarioConfig.getRcpt().get(0).get("response"));
     }
 
+    @Test
+    void getRcptResponse() {
+        assertEquals("501 Heart not found", scenarioConfig.getRcptResponse("ultron@reject.com").orElse(null));
+        assertFalse(scenarioConfig.getRcptResponse("tony@reject.com").isPresent());
+
+        ScenarioConfig wildcard = Config.getServer().getScenarios().get("*");
+        assertEquals("252 I think I know this user", wildcard.getRcptResponse("friday-1@example.com").orElse(null));
+        assertFalse(wildcard.getRcptResponse("friday-1@example.com.au").isPresent());
+    }
+
     @Test
     void getData() {
         assertEquals("554 Your data is corrupted", scenarioConfig.getData());
     }
+
+    @Test
+    void getDelay() {
+        ScenarioConfig slow = Config.getServer().getScenarios().get("slow.com");
+        assertEquals(200L, slow.getDelay("mail"));
+        assertEquals(100L, slow.getDelay("rcpt"));
+        assertEquals(0L, slow.getDelay("data"));
+        assertEquals(0L, scenarioConfig.getDelay("mail"));
+    }
+
+    @Test
+    void getReadRate() {
+        assertEquals(1024L, Config.getServer().getScenarios().get("slow.com").getReadRate());
+        assertEquals(0L, scenarioConfig.getReadRate());
+    }
 }
@@ -0,0 +1,88 @@
+package com.mimecast.robin.config.server;
+
+import com.mimecast.robin.main.Config;
+
+import java.io.IOException;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Files;
+import java.nio.file.Path;
+
+/**
+ * Temporary server configuration.
+ *
+ * <p>Backs a server configuration with a temporary JSON file.
+ * <br>Closing it restores the server configuration found on creation and deletes the file.
+ */
+public final class ServerConfigMock implements AutoCloseable {
+
+    /**
+     * Server configuration to restore.
+     */
+    private final ServerConfig original;
+
+    /**
+     * Temporary file path.
+     */
+    private final Path path;
+
+    /**
+     * Constructs a new ServerConfigMock instance with an empty file.
+     * <p>The server configuration is left as is until loaded.
+     *
+     * @throws IOException Unable to create file.
+     */
+    public ServerConfigMock() throws IOException {
+        original = Config.getServer();
+        path = Files.createTempFile("server-", ".json");
+    }
+
+    /**
+     * Creates a new ServerConfigMock instance and sets it as the server configuration.
+     *
+     * @param json JSON content.
+     * @return ServerConfigMock instance.
+     * @throws IOException Unable to write or read file.
+     */
+    public static ServerConfigMock load(String json) throws IOException {
+        ServerConfigMock mock = new ServerConfigMock();
+        try {
+            mock.write(json);
+            Config.setServer(new ServerConfig(mock.path.toString()));
+        } catch (IOException | RuntimeException e) {
+            mock.close();
+            throw e;
+        }
+
+        return mock;
+    }
+
+    /**
+     * Writes file content.
+     *
+     * @param json JSON content.
+     * @throws IOException Unable to write file.
+     */
+    public void write(String json) throws IOException {
+        Files.write(path, json.getBytes(StandardCharsets.UTF_8));
+    }
+
+    /**
+     * Gets file path.
+     *
+     * @return Path instance.
+     */
+    public Path getPath() {
+        return path;
+    }
+
+    /**
+     * Restores server configuration and deletes file.
+     *
+     * @throws IOException Unable to delete file.
+     */
+    @Override
+    public void close() throws IOException {
+        Config.setServer(original);
+        Files.deleteIfExists(path);
+    }
+}
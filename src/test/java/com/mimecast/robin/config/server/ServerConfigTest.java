@@ -6,6 +6,7 @@ import org.junit.jupiter.api.BeforeAll;
 import org.junit.jupiter.api.Test;
 
 import javax.naming.ConfigurationException;
+import java.util.List;
 
 import static org.junit.jupiter.api.Assertions.*;
 
@@ -31,11 +32,80 @@ class ServerConfigTest {
         assertEquals(20, Config.getServer().getBacklog());
     }
 
+    @Test
+    void getLimits() {
+        assertEquals(0, Config.getServer().getRateLimit());
+        assertEquals(10, Config.getServer().getRateBurst());
+        assertEquals(0, Config.getServer().getConnectionLimit());
+        assertEquals("421 4.7.0 Too many connections from your address, try again later", Config.getServer().getLimitResponse());
+    }
+
+    @Test
+    void getAcceptors() {
+        assertEquals(1, Config.getServer().getAcceptors());
+    }
+
+    @Test
+    void getPoolSize() {
+        assertEquals(100, Config.getServer().getPoolSize());
+    }
+
+    @Test
+    void getQueueSize() {
+        assertEquals(50, Config.getServer().getQueueSize());
+    }
+
+    @Test
+    void getOverflow() {
+        assertEquals("reject", Config.getServer().getOverflow());
+    }
+
+    @Test
+    void isVirtualThreads() {
+        assertFalse(Config.getServer().isVirtualThreads());
+    }
+
+    @Test
+    void getEngine() {
+        assertEquals("thread", Config.getServer().getEngine());
+    }
+
+    @Test
+    void getSelectorThreads() {
+        assertEquals(2, Config.getServer().getSelectorThreads());
+    }
+
     @Test
     void getErrorLimit() {
         assertEquals(3, Config.getServer().getErrorLimit());
     }
 
+    @Test
+    void getLineLimits() {
+        assertEquals(512, Config.getServer().getCommandLineLimit());
+        assertEquals(1000, Config.getServer().getDataLineLimit());
+    }
+
+    @Test
+    void getCommandRate() {
+        assertEquals(0, Config.getServer().getCommandRate());
+        assertEquals(50, Config.getServer().getCommandBurst());
+    }
+
+    @Test
+    void getStorage() {
+        assertEquals("local", Config.getServer().getStorageType());
+        assertEquals(1048576L, Config.getServer().getSegmentSize());
+        assertEquals(86400L, Config.getServer().getRetention());
+        assertEquals(600L, Config.getServer().getCompactInterval());
+        assertEquals(65536L, Config.getServer().getSpoolThreshold());
+        assertEquals(1048576L, Config.getServer().getSpoolMemory());
+        assertEquals("none", Config.getServer().getCompression());
+        assertEquals(6, Config.getServer().getCompressionLevel());
+        assertEquals("sync", Config.getServer().getDurability());
+        assertEquals(2, Config.getServer().getStorageThreads());
+    }
+
     @Test
     void isAuth() {
         assertTrue(Config.getServer().isAuth());
@@ -70,6 +140,7 @@ class ServerConfigTest {
     void getUser() {
         // Tested in UserConfigTest.
         assertTrue(Config.getServer().getUser("tony@example.com").isPresent());
+        assertFalse(Config.getServer().getUser("bruce@example.com").isPresent());
     }
 
     @Test
@@ -77,4 +148,52 @@ class ServerConfigTest {
         // Tested in ScenarioConfigTest.
         assertFalse(Config.getServer().getScenarios().isEmpty());
     }
+
+    @Test
+    void getScenario() {
+        assertEquals("501 Not talking to you", Config.getServer().getScenario("reject.com").get().getEhlo());
+        assertSame(Config.getServer().getScenarios().get("*"), Config.getServer().getScenario("example.com").get());
+        assertSame(Config.getServer().getScenarios().get("*"), Config.getServer().getScenario(null).get());
+    }
+
+    @Test
+    void getListeners() {
+        List<ListenerConfig> listeners = Config.getServer().getListeners();
+        assertEquals(3, listeners.size());
+
+        assertEquals(25, listeners.get(0).getPort());
+        assertEquals("::", listeners.get(0).getBind());
+        assertEquals(20, listeners.get(0).getBacklog());
+        assertEquals(2, listeners.get(0).getAcceptors());
+        assertFalse(listeners.get(0).isAuth());
+        assertTrue(listeners.get(0).isStartTls());
+        assertFalse(listeners.get(0).isSecure());
+
+        assertEquals(587, listeners.get(1).getPort());
+        assertEquals(1, listeners.get(1).getAcceptors());
+        assertTrue(listeners.get(1).isAuth());
+        assertEquals("write", listeners.get(1).getDurability());
+        assertEquals("sync", listeners.get(2).getDurability());
+
+        assertEquals(465, listeners.get(2).getPort());
+        assertTrue(listeners.get(2).isSecure());
+        assertFalse(listeners.get(2).isStartTls());
+    }
+
+    @Test
+    void getServerConfig() {
+        ServerConfig serverConfig = Config.getServer();
+        ServerConfig view = serverConfig.getServerConfig(serverConfig.getListeners().get(0));
+
+        assertNotSame(serverConfig, view);
+        assertFalse(view.isAuth());
+        assertTrue(serverConfig.isAuth());
+        assertSame(serverConfig.getScenarios(), view.getScenarios());
+        assertTrue(view.getUser("tony@example.com").isPresent());
+
+        assertEquals("write", serverConfig.getServerConfig(serverConfig.getListeners().get(1)).getDurability());
+
+        assertSame(view, serverConfig.getServerConfig(serverConfig.getListeners().get(0)));
+        assertSame(serverConfig, serverConfig.getServerConfig(null));
+    }
 }
@@ -0,0 +1,58 @@
+package com.mimecast.robin.config.server;
+
+import com.mimecast.robin.main.Config;
+import com.mimecast.robin.main.Foundation;
+import com.mimecast.robin.smtp.connection.Connection;
+import com.mimecast.robin.smtp.session.Session;
+import org.junit.jupiter.api.BeforeAll;
+import org.junit.jupiter.api.Test;
+
+import javax.naming.ConfigurationException;
+import java.io.IOException;
+
+import static org.junit.jupiter.api.Assertions.*;
+
+class ServerConfigWatcherTest {
+
+    private static ServerConfig original;
+
+    @BeforeAll
+    static void before() throws ConfigurationException {
+        Foundation.init("src/test/resources/");
+        original = Config.getServer();
+    }
+
+    @Test
+    void reload() throws IOException {
+        try (ServerConfigMock config = new ServerConfigMock()) {
+            Connection connection = new Connection(new Session());
+
+            config.write("{\"errorLimit\": 7, \"users\": [{\"name\": \"bruce@example.com\", \"pass\": \"hulk\"}]}");
+            assertTrue(new ServerConfigWatcher(config.getPath()).reload());
+
+            assertEquals(7, Config.getServer().getErrorLimit());
+            assertTrue(Config.getServer().getUser("bruce@example.com").isPresent());
+
+            // Open connections keep their snapshot.
+            assertSame(original, connection.getServerConfig());
+            assertTrue(connection.getUser("tony@example.com").isPresent());
+            assertSame(Config.getServer(), new Connection(new Session()).getServerConfig());
+        }
+    }
+
+    @Test
+    void reloadInvalid() throws IOException {
+        try (ServerConfigMock config = new ServerConfigMock()) {
+            config.write("{\"errorLimit\": ");
+            assertFalse(new ServerConfigWatcher(config.getPath()).reload());
+
+            config.write("");
+            assertFalse(new ServerConfigWatcher(config.getPath()).reload());
+
+            config.write("{\"scenarios\": {\"*\": {\"rcpt\": [{\"value\": \"[a-z\", \"response\": \"501\"}]}}}");
+            assertFalse(new ServerConfigWatcher(config.getPath()).reload());
+
+            assertSame(original, Config.getServer());
+        }
+    }
+}
@@ -0,0 +1,91 @@
+package com.mimecast.robin.smtp;
+
+import org.junit.jupiter.api.Test;
+
+import java.net.InetAddress;
+import java.net.UnknownHostException;
+import java.util.ArrayList;
+import java.util.List;
+
+import static org.junit.jupiter.api.Assertions.*;
+
+class ClientLimiterTest {
+
+    private static final String RESPONSE = "421 Too many connections";
+
+    @Test
+    void disabled() {
+        assertFalse(new ClientLimiter(0, 10, 0, RESPONSE).isEnabled());
+        assertTrue(new ClientLimiter(60, 10, 0, RESPONSE).isEnabled());
+        assertTrue(new ClientLimiter(0, 10, 1, RESPONSE).isEnabled());
+    }
+
+    @Test
+    void rateLimit() throws UnknownHostException {
+        ClientLimiter limiter = new ClientLimiter(1, 2, 0, RESPONSE);
+        InetAddress address = InetAddress.getByName("192.0.2.1");
+
+        // Burst is allowed then the bucket is empty.
+        assertNotNull(limiter.acquire(address));
+        assertNotNull(limiter.acquire(address));
+        assertNull(limiter.acquire(address));
+        assertEquals(1, limiter.getRejected());
+
+        // Other addresses have their own bucket.
+        assertNotNull(limiter.acquire(InetAddress.getByName("192.0.2.2")));
+    }
+
+    @Test
+    void connectionLimit() throws UnknownHostException {
+        ClientLimiter limiter = new ClientLimiter(0, 10, 1, RESPONSE);
+        InetAddress address = InetAddress.getByName("192.0.2.1");
+
+        ClientLimiter.Permit permit = limiter.acquire(address);
+        assertNotNull(permit);
+        assertNull(limiter.acquire(address));
+
+        permit.release();
+        assertNotNull(limiter.acquire(address));
+    }
+
+    @Test
+    void expire() throws UnknownHostException {
+        ClientLimiter limiter = new ClientLimiter(0, 10, 1, RESPONSE);
+
+        // Closed connections free their entries as new addresses come in.
+        for (int i = 1; i <= 100; i++) {
+            limiter.acquire(InetAddress.getByName("192.0.2." + i)).release();
+        }
+        assertTrue(limiter.getClients() <= 2);
+
+        // Open connections are kept.
+        ClientLimiter.Permit permit = limiter.acquire(InetAddress.getByName("198.51.100.1"));
+        for (int i = 1; i <= 100; i++) {
+            limiter.acquire(InetAddress.getByName("192.0.2." + i)).release();
+        }
+        assertNull(limiter.acquire(InetAddress.getByName("198.51.100.1")));
+        permit.release();
+    }
+
+    @Test
+    void full() throws UnknownHostException {
+        ClientLimiter limiter = new ClientLimiter(0, 10, 1, RESPONSE);
+
+        // Fill the table with open connections from unique addresses.
+        List<ClientLimiter.Permit> permits = new ArrayList<>();
+        for (int i = 0; i < 65536; i++) {
+            permits.add(limiter.acquire(InetAddress.getByAddress(new byte[]{10, 0, (byte) (i >> 8), (byte) i})));
+        }
+        assertEquals(65536, limiter.getClients());
+
+        // New addresses are not let through untracked.
+        assertNull(limiter.acquire(InetAddress.getByName("198.51.100.1")));
+
+        // Idle entries make room.
+        permits.forEach(ClientLimiter.Permit::release);
+        ClientLimiter.Permit permit = limiter.acquire(InetAddress.getByName("198.51.100.1"));
+        assertNotNull(permit);
+        assertNull(limiter.acquire(InetAddress.getByName("198.51.100.1")));
+        assertTrue(limiter.getClients() <= 65536);
+    }
+}
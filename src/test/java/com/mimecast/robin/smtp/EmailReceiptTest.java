@@ -1,14 +1,19 @@
 package com.mimecast.robin.smtp;
 
+import com.mimecast.robin.config.server.ServerConfigMock;
 import com.mimecast.robin.main.Foundation;
 import com.mimecast.robin.smtp.connection.ConnectionMock;
+import org.apache.commons.lang3.StringUtils;
 import org.junit.jupiter.api.BeforeAll;
 import org.junit.jupiter.api.Test;
 
 import javax.naming.ConfigurationException;
 import java.io.IOException;
+import java.util.concurrent.TimeUnit;
 
 import static org.junit.jupiter.api.Assertions.assertEquals;
+import static org.junit.jupiter.api.Assertions.assertFalse;
+import static org.junit.jupiter.api.Assertions.assertNull;
 import static org.junit.jupiter.api.Assertions.assertTrue;
 
 class EmailReceiptTest {
@@ -44,6 +49,119 @@ class EmailReceiptTest {
         assertEquals("221 2.0.0 Closing connection\r\n", connection.getLine(4));
     }
 
+    @Test
+    void steps() throws IOException {
+        StringBuilder stringBuilder = new StringBuilder();
+        stringBuilder.append("HELO example.com\r\n");
+        stringBuilder.append("QUIT\r\n");
+
+        ConnectionMock connection = getConnection(stringBuilder);
+        EmailReceipt emailReceipt = new EmailReceipt(connection);
+
+        assertTrue(emailReceipt.open());
+        assertTrue(emailReceipt.step());
+        assertTrue(emailReceipt.hasPendingInput());
+        assertFalse(emailReceipt.step());
+        assertFalse(emailReceipt.hasPendingInput());
+        emailReceipt.close();
+
+        connection.parseLines();
+        assertTrue(connection.getLine(1).startsWith("220 example.com ESMTP; "));
+        assertEquals("250 Welcome [example.net (127.0.0.1)]\r\n", connection.getLine(2));
+        assertEquals("221 2.0.0 Closing connection\r\n", connection.getLine(3));
+    }
+
+    @Test
+    void uncheckedFailure() throws IOException {
+        StringBuilder stringBuilder = new StringBuilder();
+        stringBuilder.append("EHLO example.com\r\n");
+        stringBuilder.append("BDAT abc LAST\r\n");
+        stringBuilder.append("QUIT\r\n");
+
+        ConnectionMock connection = getConnection(stringBuilder);
+        EmailReceipt emailReceipt = new EmailReceipt(connection);
+
+        assertTrue(emailReceipt.open());
+        assertTrue(emailReceipt.step());
+
+        // Invalid chunk size closes the connection instead of escaping the receipt.
+        assertFalse(emailReceipt.step());
+        emailReceipt.close();
+    }
+
+    @Test
+    void pause() throws IOException {
+        StringBuilder stringBuilder = new StringBuilder();
+        stringBuilder.append("EHLO slow.com\r\n");
+        stringBuilder.append("MAIL FROM: <john@example.com>\r\n");
+        stringBuilder.append("QUIT\r\n");
+
+        ConnectionMock connection = getConnection(stringBuilder);
+        EmailReceipt emailReceipt = new EmailReceipt(connection);
+
+        assertTrue(emailReceipt.open());
+
+        // The 15 bytes EHLO line is read at 1024 bytes per second.
+        assertTrue(emailReceipt.step());
+        assertEquals(14L, emailReceipt.takePause());
+        assertEquals(0L, emailReceipt.takePause());
+
+        // MAIL reply delay plus its 31 bytes line.
+        assertTrue(emailReceipt.step());
+        assertEquals(230L, emailReceipt.takePause());
+
+        assertFalse(emailReceipt.step());
+        emailReceipt.close();
+    }
+
+    @Test
+    void pauseData() throws IOException {
+        StringBuilder stringBuilder = new StringBuilder();
+        stringBuilder.append("EHLO slow.com\r\n");
+        stringBuilder.append("MAIL FROM: <john@example.com>\r\n");
+        stringBuilder.append("RCPT TO: <jane@example.com>\r\n");
+        stringBuilder.append("DATA\r\n");
+        stringBuilder.append("Subject: Slow\r\n\r\n").append(StringUtils.repeat("a", 510)).append("\r\n.\r\n");
+        stringBuilder.append("QUIT\r\n");
+
+        ConnectionMock connection = getConnection(stringBuilder);
+        EmailReceipt emailReceipt = new EmailReceipt(connection);
+
+        assertTrue(emailReceipt.open());
+        for (int i = 0; i < 3; i++) {
+            assertTrue(emailReceipt.step());
+            emailReceipt.takePause();
+        }
+
+        // The payload is throttled while read so only the DATA line is paused for.
+        long start = System.nanoTime();
+        assertTrue(emailReceipt.step());
+        assertTrue(System.nanoTime() - start >= TimeUnit.MILLISECONDS.toNanos(500));
+        assertEquals(5L, emailReceipt.takePause());
+
+        assertFalse(emailReceipt.step());
+        emailReceipt.close();
+    }
+
+    @Test
+    void pauseRun() throws IOException {
+        StringBuilder stringBuilder = new StringBuilder();
+        stringBuilder.append("EHLO slow.com\r\n");
+        stringBuilder.append("MAIL FROM: <john@example.com>\r\n");
+        stringBuilder.append("RCPT TO: <jane@example.com>\r\n");
+        stringBuilder.append("QUIT\r\n");
+
+        ConnectionMock connection = getConnection(stringBuilder);
+        long start = System.nanoTime();
+        new EmailReceipt(connection).run();
+        assertTrue(System.nanoTime() - start >= TimeUnit.MILLISECONDS.toNanos(300));
+
+        connection.parseLines();
+        assertEquals("250 2.1.0 Sender OK\r\n", connection.getLine(8));
+        assertEquals("250 2.1.5 Recipient OK\r\n", connection.getLine(9));
+        assertEquals("221 2.0.0 Closing connection\r\n", connection.getLine(10));
+    }
+
     @Test
     void receive() throws IOException {
         StringBuilder stringBuilder = new StringBuilder();
@@ -128,4 +246,43 @@ class EmailReceiptTest {
         assertEquals("554 5.5.1 No valid recipients\r\n", connection.getLine(10));
         assertEquals("221 2.0.0 Closing connection\r\n", connection.getLine(11));
     }
+
+    @Test
+    void lineTooLong() throws IOException {
+        StringBuilder stringBuilder = new StringBuilder();
+        stringBuilder.append("HELO example.com\r\n");
+        stringBuilder.append("HELO ").append(StringUtils.repeat('a', 600)).append("\r\n");
+        stringBuilder.append("QUIT\r\n");
+
+        ConnectionMock connection = new ConnectionMock(stringBuilder, 510);
+        connection.getSession().setRdns("example.com");
+        connection.getSession().setFriendRdns("example.net");
+        connection.getSession().setFriendAddr("127.0.0.1");
+        new EmailReceipt(connection).run();
+
+        connection.parseLines();
+        assertEquals("250 Welcome [example.net (127.0.0.1)]\r\n", connection.getLine(2));
+        assertEquals("500 5.5.2 Line too long\r\n", connection.getLine(3));
+        assertNull(connection.getLine(4));
+    }
+
+    @Test
+    void commandRate() throws IOException {
+        StringBuilder stringBuilder = new StringBuilder();
+        stringBuilder.append("HELO example.com\r\n");
+        stringBuilder.append("HELO example.com\r\n");
+        stringBuilder.append("HELO example.com\r\n");
+        stringBuilder.append("QUIT\r\n");
+
+        try (ServerConfigMock ignored = ServerConfigMock.load("{\"commandRate\": 1, \"commandBurst\": 2}")) {
+            ConnectionMock connection = getConnection(stringBuilder);
+            new EmailReceipt(connection).run();
+
+            connection.parseLines();
+            assertEquals("250 Welcome [example.net (127.0.0.1)]\r\n", connection.getLine(2));
+            assertEquals("250 Welcome [example.net (127.0.0.1)]\r\n", connection.getLine(3));
+            assertEquals("421 4.7.0 Too many commands, closing connection\r\n", connection.getLine(4));
+            assertNull(connection.getLine(5));
+        }
+    }
 }
@@ -0,0 +1,64 @@
+package com.mimecast.robin.smtp;
+
+import com.mimecast.robin.main.Foundation;
+import com.mimecast.robin.smtp.connection.ConnectionMock;
+import org.junit.jupiter.api.BeforeAll;
+import org.junit.jupiter.api.Test;
+
+import javax.naming.ConfigurationException;
+import java.io.IOException;
+import java.util.concurrent.TimeUnit;
+
+import static org.junit.jupiter.api.Assertions.*;
+
+class IdleReaperTest {
+
+    @BeforeAll
+    static void before() throws ConfigurationException {
+        Foundation.init("src/test/resources/");
+    }
+
+    private ConnectionMock getConnection() {
+        ConnectionMock connection = new ConnectionMock(new StringBuilder());
+        connection.getSession().setRdns("example.com");
+        return connection;
+    }
+
+    @Test
+    void reap() throws IOException {
+        ConnectionMock connection = getConnection();
+        EmailReceipt emailReceipt = new EmailReceipt(connection);
+        assertTrue(emailReceipt.open());
+
+        IdleReaper reaper = new IdleReaper(0);
+        reaper.add(emailReceipt);
+        assertEquals(1, reaper.tick(System.nanoTime()));
+        assertTrue(emailReceipt.isClosed());
+
+        connection.parseLines();
+        assertEquals("421 4.4.2 Idle timeout, closing connection\r\n", connection.getLine(2));
+    }
+
+    @Test
+    void reschedule() {
+        EmailReceipt emailReceipt = new EmailReceipt(getConnection());
+        assertTrue(emailReceipt.open());
+
+        IdleReaper reaper = new IdleReaper(60);
+        reaper.add(emailReceipt);
+
+        // Not idle long enough.
+        long now = System.nanoTime();
+        assertEquals(0, reaper.tick(now));
+        assertFalse(emailReceipt.isClosed());
+
+        // Reaped once its deadline slot comes around.
+        long later = now + TimeUnit.SECONDS.toNanos(61);
+        int reaped = 0;
+        for (int i = 0; i < 64; i++) {
+            reaped += reaper.tick(later);
+        }
+        assertEquals(1, reaped);
+        assertTrue(emailReceipt.isClosed());
+    }
+}
@@ -0,0 +1,116 @@
+package com.mimecast.robin.smtp;
+
+import com.mimecast.robin.main.Foundation;
+import com.mimecast.robin.smtp.io.LineInputStream;
+import org.junit.jupiter.api.BeforeAll;
+import org.junit.jupiter.api.Test;
+
+import javax.naming.ConfigurationException;
+import java.io.IOException;
+import java.net.InetAddress;
+import java.net.ServerSocket;
+import java.net.Socket;
+
+import static org.junit.jupiter.api.Assertions.assertEquals;
+import static org.junit.jupiter.api.Assertions.assertTrue;
+
+class ReceiptExecutorTest {
+
+    @BeforeAll
+    static void before() throws ConfigurationException {
+        Foundation.init("src/test/resources/");
+    }
+
+    @Test
+    void reject() throws IOException {
+        reject(false);
+    }
+
+    @Test
+    void rejectVirtual() throws IOException {
+        // Falls back to platform threads if the runtime lacks virtual threads.
+        reject(true);
+    }
+
+    private void reject(boolean virtual) throws IOException {
+        ReceiptExecutor executor = new ReceiptExecutor(1, 0, ReceiptExecutor.REJECT, virtual);
+
+        try (ServerSocket listener = new ServerSocket(0, 10, InetAddress.getLoopbackAddress());
+             Socket first = new Socket(listener.getInetAddress(), listener.getLocalPort());
+             Socket second = new Socket(listener.getInetAddress(), listener.getLocalPort())) {
+
+            // First connection takes the only worker.
+            executor.execute(listener.accept());
+            String greeting = new String(new LineInputStream(first.getInputStream()).readLine());
+            assertTrue(greeting.startsWith("220 "));
+            assertEquals(1, executor.getActive());
+
+            // Second connection overflows.
+            executor.execute(listener.accept());
+            String rejection = new String(new LineInputStream(second.getInputStream()).readLine());
+            assertTrue(rejection.startsWith("421 "));
+            assertEquals(1, executor.getRejected());
+            assertEquals(0, executor.getQueued());
+
+            first.getOutputStream().write("QUIT\r\n".getBytes());
+        } finally {
+            executor.shutdown();
+        }
+    }
+
+    @Test
+    void queueVirtual() throws IOException {
+        ReceiptExecutor executor = new ReceiptExecutor(1, 1, ReceiptExecutor.REJECT, true);
+
+        try (ServerSocket listener = new ServerSocket(0, 10, InetAddress.getLoopbackAddress());
+             Socket first = new Socket(listener.getInetAddress(), listener.getLocalPort());
+             Socket second = new Socket(listener.getInetAddress(), listener.getLocalPort());
+             Socket third = new Socket(listener.getInetAddress(), listener.getLocalPort())) {
+
+            executor.execute(listener.accept());
+            String greeting = new String(new LineInputStream(first.getInputStream()).readLine());
+            assertTrue(greeting.startsWith("220 "));
+
+            // Second connection waits for the running one and the third overflows.
+            executor.execute(listener.accept());
+            executor.execute(listener.accept());
+            String rejection = new String(new LineInputStream(third.getInputStream()).readLine());
+            assertTrue(rejection.startsWith("421 "));
+            assertEquals(1, executor.getQueued());
+            assertEquals(1, executor.getRejected());
+
+            // Runs once the first one quits.
+            first.getOutputStream().write("QUIT\r\n".getBytes());
+            greeting = new String(new LineInputStream(second.getInputStream()).readLine());
+            assertTrue(greeting.startsWith("220 "));
+            second.getOutputStream().write("QUIT\r\n".getBytes());
+        } finally {
+            executor.shutdown();
+        }
+    }
+
+    @Test
+    void limit() throws IOException {
+        ReceiptExecutor executor = new ReceiptExecutor(2, 0, ReceiptExecutor.REJECT)
+                .setLimiter(new ClientLimiter(0, 10, 1, "421 4.7.0 Too many connections from your address"));
+
+        try (ServerSocket listener = new ServerSocket(0, 10, InetAddress.getLoopbackAddress());
+             Socket first = new Socket(listener.getInetAddress(), listener.getLocalPort());
+             Socket second = new Socket(listener.getInetAddress(), listener.getLocalPort())) {
+
+            executor.execute(listener.accept());
+            String greeting = new String(new LineInputStream(first.getInputStream()).readLine());
+            assertTrue(greeting.startsWith("220 "));
+
+            // Same address is over the connection limit while a worker is still free.
+            executor.execute(listener.accept());
+            String rejection = new String(new LineInputStream(second.getInputStream()).readLine());
+            assertTrue(rejection.startsWith("421 4.7.0 "));
+            assertEquals(0, executor.getRejected());
+
+            first.getOutputStream().write("QUIT\r\n".getBytes());
+        } finally {
+            executor.shutdown();
+        }
+    }
+}
@@ -0,0 +1,96 @@
+package com.mimecast.robin.smtp;
+
+import com.mimecast.robin.main.Foundation;
+import com.mimecast.robin.smtp.connection.ConnectionMock;
+import org.junit.jupiter.api.AfterEach;
+import org.junit.jupiter.api.BeforeAll;
+import org.junit.jupiter.api.Test;
+
+import javax.naming.ConfigurationException;
+import java.io.IOException;
+
+import static org.junit.jupiter.api.Assertions.*;
+
+class ReceiptsTest {
+
+    @BeforeAll
+    static void before() throws ConfigurationException {
+        Foundation.init("src/test/resources/");
+    }
+
+    @AfterEach
+    void after() {
+        Receipts.setDraining(false);
+    }
+
+    private ConnectionMock getConnection(StringBuilder stringBuilder) {
+        ConnectionMock connection = new ConnectionMock(stringBuilder);
+        connection.getSession().setRdns("example.com");
+        connection.getSession().setFriendRdns("example.net");
+        connection.getSession().setFriendAddr("127.0.0.1");
+
+        return connection;
+    }
+
+    @Test
+    void open() throws IOException {
+        Receipts.setDraining(true);
+
+        ConnectionMock connection = getConnection(new StringBuilder());
+        EmailReceipt emailReceipt = new EmailReceipt(connection);
+        assertFalse(emailReceipt.open());
+        emailReceipt.close();
+
+        connection.parseLines();
+        assertEquals("421 4.3.2 Service shutting down\r\n", connection.getLine(1));
+    }
+
+    @Test
+    void transaction() throws IOException {
+        StringBuilder stringBuilder = new StringBuilder();
+        stringBuilder.append("HELO example.com\r\n");
+        stringBuilder.append("MAIL FROM: <john@example.com>\r\n");
+        stringBuilder.append("RCPT TO: <jane@example.com>\r\n");
+        stringBuilder.append("DATA\r\n");
+        stringBuilder.append("Subject: Lost in space\r\n" +
+                "\r\n" +
+                "Rescue me!\r\n" +
+                ".\r\n");
+        stringBuilder.append("MAIL FROM: <john@example.com>\r\n");
+        stringBuilder.append("QUIT\r\n");
+
+        ConnectionMock connection = getConnection(stringBuilder);
+        EmailReceipt emailReceipt = new EmailReceipt(connection);
+        assertTrue(emailReceipt.open());
+        assertTrue(emailReceipt.step());
+        assertTrue(emailReceipt.step());
+
+        // Transaction in progress is allowed to finish but no new one started.
+        Receipts.setDraining(true);
+        assertTrue(emailReceipt.step());
+        assertTrue(emailReceipt.step());
+        assertFalse(emailReceipt.step());
+        emailReceipt.close();
+
+        connection.parseLines();
+        assertEquals("250 2.1.0 Sender OK\r\n", connection.getLine(3));
+        assertEquals("250 2.1.5 Recipient OK\r\n", connection.getLine(4));
+        assertEquals("354 Ready and willing\r\n", connection.getLine(5));
+        assertTrue(connection.getLine(6).startsWith("250 2.0.0 Received OK"));
+        assertEquals("421 4.3.2 Service shutting down\r\n", connection.getLine(7));
+    }
+
+    @Test
+    void drain() throws IOException {
+        ConnectionMock connection = getConnection(new StringBuilder());
+        EmailReceipt emailReceipt = new EmailReceipt(connection);
+        assertTrue(emailReceipt.open());
+
+        // Idle sessions are closed right away.
+        assertEquals(0, Receipts.drain(5));
+        assertTrue(Receipts.isDraining());
+
+        connection.parseLines();
+        assertEquals("421 4.3.2 Service shutting down\r\n", connection.getLine(2));
+    }
+}
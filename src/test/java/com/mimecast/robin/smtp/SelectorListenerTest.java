@@ -0,0 +1,181 @@
+package com.mimecast.robin.smtp;
+
+import com.mimecast.robin.main.Foundation;
+import com.mimecast.robin.smtp.io.LineInputStream;
+import com.mimecast.robin.util.Sleep;
+import org.junit.jupiter.api.AfterEach;
+import org.junit.jupiter.api.BeforeAll;
+import org.junit.jupiter.api.Test;
+
+import javax.naming.ConfigurationException;
+import java.io.IOException;
+import java.io.OutputStream;
+import java.net.Socket;
+import java.util.concurrent.ExecutorService;
+import java.util.concurrent.Executors;
+
+import static org.junit.jupiter.api.Assertions.*;
+
+class SelectorListenerTest {
+
+    private SelectorListener listener;
+    private ExecutorService workers;
+
+    @BeforeAll
+    static void before() throws ConfigurationException {
+        Foundation.init("src/test/resources/");
+    }
+
+    @AfterEach
+    void after() throws IOException {
+        if (listener != null) {
+            listener.serverShutdown();
+            listener.close();
+        }
+        if (workers != null) {
+            workers.shutdownNow();
+        }
+    }
+
+    @Test
+    void greeting() throws IOException {
+        start(1, null);
+
+        try (Client client = new Client()) {
+            assertTrue(client.readLine().startsWith("220 "));
+
+            client.write("QUIT\r\n");
+            assertTrue(client.readLine().startsWith("221 "));
+        }
+    }
+
+    @Test
+    void pipelining() throws IOException {
+        start(1, null);
+
+        try (Client client = new Client()) {
+            assertTrue(client.readLine().startsWith("220 "));
+
+            // Batch split mid command across reads.
+            client.write("HELO example.com\r\nMAIL FROM: <tony@example.com>\r\nRC");
+            Sleep.nap(100);
+            client.write("PT TO: <pepper@example.com>\r\nQUIT\r\n");
+
+            assertTrue(client.readLine().startsWith("250 Welcome"));
+            assertEquals("250 2.1.0 Sender OK\r\n", client.readLine());
+            assertEquals("250 2.1.5 Recipient OK\r\n", client.readLine());
+            assertTrue(client.readLine().startsWith("221 "));
+        }
+    }
+
+    @Test
+    void readAhead() throws IOException {
+        start(1, null);
+
+        try (Client client = new Client()) {
+            assertTrue(client.readLine().startsWith("220 "));
+
+            // Bytes read ahead by the event loop reach the receipt once the line is complete.
+            client.write("HE");
+            Sleep.nap(100);
+            client.write("LO example.com\r\n");
+            assertTrue(client.readLine().startsWith("250 Welcome"));
+
+            client.write("QUIT\r\n");
+            assertTrue(client.readLine().startsWith("221 "));
+        }
+    }
+
+    @Test
+    void partialLine() throws IOException {
+        // A single worker to be held if partial lines took one.
+        start(1, null);
+
+        try (Client slow = new Client(); Client fast = new Client()) {
+            assertTrue(slow.readLine().startsWith("220 "));
+            slow.write("HELO exa");
+
+            assertTrue(fast.readLine().startsWith("220 "));
+            fast.write("HELO example.com\r\n");
+            assertTrue(fast.readLine().startsWith("250 Welcome"));
+
+            slow.write("mple.com\r\n");
+            assertTrue(slow.readLine().startsWith("250 Welcome"));
+        }
+    }
+
+    @Test
+    void release() throws IOException {
+        ClientLimiter limiter = new ClientLimiter(0, 1, 1, "421 4.7.0 Too many connections");
+        start(1, limiter);
+
+        try (Client client = new Client()) {
+            assertTrue(client.readLine().startsWith("220 "));
+
+            // Over the concurrent limit while the first one is open.
+            try (Client second = new Client()) {
+                assertTrue(second.readLine().startsWith("421 "));
+            }
+
+            // Unchecked processor failure closes the connection.
+            client.write("BDAT abc LAST\r\n");
+            assertNull(client.readLine());
+        }
+        awaitClosed();
+
+        // Permit was given back.
+        try (Client client = new Client()) {
+            assertTrue(client.readLine().startsWith("220 "));
+            client.write("QUIT\r\n");
+            assertTrue(client.readLine().startsWith("221 "));
+        }
+        awaitClosed();
+    }
+
+    private void start(int poolSize, ClientLimiter limiter) throws IOException {
+        workers = Executors.newFixedThreadPool(poolSize);
+        listener = new SelectorListener(SmtpListener.listenerConfig(0, 10, "127.0.0.1"), workers, 1);
+        if (limiter != null) {
+            listener.setLimiter(limiter);
+        }
+
+        Thread thread = new Thread(listener::listen);
+        thread.setDaemon(true);
+        thread.start();
+    }
+
+    private void awaitClosed() {
+        for (int i = 0; i < 50 && listener.getConnections() > 0; i++) {
+            Sleep.nap(100);
+        }
+        assertEquals(0, listener.getConnections());
+    }
+
+    private class Client implements AutoCloseable {
+        private final Socket socket;
+        private final LineInputStream in;
+        private final OutputStream out;
+
+        Client() throws IOException {
+            socket = new Socket("127.0.0.1", listener.getListener().getLocalPort());
+            socket.setSoTimeout(5000);
+            in = new LineInputStream(socket.getInputStream());
+            out = socket.getOutputStream();
+        }
+
+        String readLine() throws IOException {
+            byte[] line = in.readLine();
+            return line != null ? new String(line) : null;
+        }
+
+        void write(String string) throws IOException {
+            out.write(string.getBytes());
+            out.flush();
+        }
+
+        @Override
+        public void close() throws IOException {
+            socket.close();
+        }
+    }
+}
@@ -6,9 +6,11 @@ import com.mimecast.robin.smtp.session.Session;
 import com.mimecast.robin.smtp.transaction.SessionTransactionList;
 import com.mimecast.robin.util.StreamUtils;
 
+import java.io.BufferedOutputStream;
 import java.io.ByteArrayInputStream;
 import java.io.ByteArrayOutputStream;
 import java.io.DataOutputStream;
+import java.io.FilterOutputStream;
 import java.io.IOException;
 import java.net.Socket;
 import java.util.HashMap;
@@ -19,10 +21,16 @@ public class ConnectionMock extends Connection {
 
     private final ByteArrayOutputStream output = new ByteArrayOutputStream();
     private final Map<Integer, String> lines = new HashMap<>();
+    private int flushes = 0;
 
     public ConnectionMock(StringBuilder string) {
+        this(string, 0);
+    }
+
+    public ConnectionMock(StringBuilder string, int maxLineLength) {
         super(Factories.getSession());
-        inc = new LineInputStream(new ByteArrayInputStream(string.toString().getBytes()));
+        this.maxLineLength = maxLineLength;
+        inc = new LineInputStream(new ByteArrayInputStream(string.toString().getBytes()), maxLineLength);
         out = new DataOutputStream(output);
     }
 
@@ -45,6 +53,22 @@ public class ConnectionMock extends Connection {
         // Do nothing.
     }
 
+    public void setCoalesce() {
+        coalesce = true;
+        out = new BufferedOutputStream(new FilterOutputStream(output) {
+            @Override
+            public void flush() throws IOException {
+                flushes++;
+                super.flush();
+            }
+        });
+        inc.setDrainListener(this::drained);
+    }
+
+    public int getFlushes() {
+        return flushes;
+    }
+
     public void setSocket(Socket socket) {
         this.socket = socket;
     }
@@ -0,0 +1,67 @@
+package com.mimecast.robin.smtp.connection;
+
+import com.mimecast.robin.main.Foundation;
+import com.mimecast.robin.main.Metrics;
+import org.junit.jupiter.api.BeforeAll;
+import org.junit.jupiter.api.Test;
+
+import javax.naming.ConfigurationException;
+import java.io.IOException;
+
+import static org.junit.jupiter.api.Assertions.*;
+
+class ConnectionTest {
+
+    @BeforeAll
+    static void before() throws ConfigurationException {
+        Foundation.init("src/test/resources/");
+    }
+
+    @Test
+    void coalesce() throws IOException {
+        StringBuilder stringBuilder = new StringBuilder();
+        stringBuilder.append("MAIL FROM: <john@example.com>\r\n");
+        stringBuilder.append("RCPT TO: <jane@example.com>\r\n");
+        stringBuilder.append("DATA\r\n");
+
+        ConnectionMock connection = new ConnectionMock(stringBuilder);
+        connection.setCoalesce();
+        long drained = Metrics.get(Metrics.FLUSH_DRAINED);
+
+        assertTrue(connection.read().startsWith("MAIL"));
+        connection.write("250 2.1.0 Sender OK");
+        assertTrue(connection.read().startsWith("RCPT"));
+        connection.write("250 2.1.5 Recipient OK");
+        assertTrue(connection.read().startsWith("DATA"));
+        connection.write("354 Ready and willing");
+
+        // Pipelined replies are held while input is buffered.
+        assertEquals(0, connection.getFlushes());
+        assertEquals("", connection.getOutput());
+
+        // Reading past the buffered input flushes all replies at once.
+        assertEquals("", connection.read());
+        assertEquals(1, connection.getFlushes());
+        assertEquals(drained + 1, Metrics.get(Metrics.FLUSH_DRAINED));
+
+        connection.parseLines();
+        assertEquals("250 2.1.0 Sender OK\r\n", connection.getLine(1));
+        assertEquals("250 2.1.5 Recipient OK\r\n", connection.getLine(2));
+        assertEquals("354 Ready and willing\r\n", connection.getLine(3));
+    }
+
+    @Test
+    void flush() throws IOException {
+        ConnectionMock connection = new ConnectionMock(new StringBuilder("QUIT\r\n"));
+        connection.setCoalesce();
+        long sync = Metrics.get(Metrics.FLUSH_SYNC);
+
+        assertTrue(connection.read().startsWith("QUIT"));
+        connection.write("221 2.0.0 Closing connection");
+        connection.flush();
+
+        assertEquals(1, connection.getFlushes());
+        assertEquals(sync + 1, Metrics.get(Metrics.FLUSH_SYNC));
+        assertEquals("221 2.0.0 Closing connection\r\n", connection.getOutput());
+    }
+}
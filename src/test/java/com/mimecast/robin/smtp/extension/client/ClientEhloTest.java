@@ -65,6 +65,7 @@ class ClientEhloTest {
         assertTrue(connection.getSession().isEhlo8bit());
         assertTrue(connection.getSession().isEhloBinary());
         assertTrue(connection.getSession().isEhloBdat());
+        assertTrue(connection.getSession().isEhloPipelining());
         assertTrue(connection.getSession().isEhloTls());
 
     }
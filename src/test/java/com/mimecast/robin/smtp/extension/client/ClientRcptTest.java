@@ -3,11 +3,13 @@ package com.mimecast.robin.smtp.extension.client;
 import com.mimecast.robin.main.Foundation;
 import com.mimecast.robin.smtp.MessageEnvelope;
 import com.mimecast.robin.smtp.connection.ConnectionMock;
+import com.mimecast.robin.smtp.transaction.EnvelopeTransactionList;
 import org.junit.jupiter.api.BeforeAll;
 import org.junit.jupiter.api.Test;
 
 import javax.naming.ConfigurationException;
 import java.io.IOException;
+import java.util.Arrays;
 import java.util.Collections;
 
 import static org.junit.jupiter.api.Assertions.assertEquals;
@@ -69,4 +71,34 @@ class ClientRcptTest {
         assertEquals("MAIL FROM:<tony@example.com> SIZE=2744\r\n", connection.getLine(1));
         assertEquals("RCPT TO:<pepper@example.com>\r\n", connection.getLine(2));
     }
+
+    @Test
+    void processPipelining() throws IOException {
+        StringBuilder stringBuilder = new StringBuilder();
+        stringBuilder.append("250 OK\r\n");
+        stringBuilder.append("550 Unknown\r\n");
+        stringBuilder.append("250 OK\r\n");
+        ConnectionMock connection = new ConnectionMock(stringBuilder);
+        connection.getSession().setEhloPipelining(true);
+
+        MessageEnvelope envelope = new MessageEnvelope();
+        envelope.setMail("tony@example.com");
+        envelope.setRcpts(Arrays.asList("pepper@example.com", "happy@example.com"));
+        envelope.setFile("src/test/resources/lipsum.eml");
+        connection.getSession().addEnvelope(envelope);
+
+        assertTrue(new ClientMail().process(connection));
+        assertTrue(new ClientRcpt().process(connection));
+
+        connection.parseLines();
+        assertEquals("MAIL FROM:<tony@example.com> SIZE=2744\r\n", connection.getLine(1));
+        assertEquals("RCPT TO:<pepper@example.com>\r\n", connection.getLine(2));
+        assertEquals("RCPT TO:<happy@example.com>\r\n", connection.getLine(3));
+
+        EnvelopeTransactionList transactions = connection.getSessionTransactionList().getEnvelopes().get(0);
+        assertEquals("250", transactions.getMail().getResponseCode());
+        assertEquals(2, transactions.getRcpt().size());
+        assertEquals(1, transactions.getRcptErrors().size());
+        assertEquals("RCPT TO:<pepper@example.com>", transactions.getRcptErrors().get(0).getPayload());
+    }
 }
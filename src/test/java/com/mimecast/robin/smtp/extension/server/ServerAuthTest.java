@@ -1,5 +1,7 @@
 package com.mimecast.robin.smtp.extension.server;
 
+import com.mimecast.robin.config.server.ListenerConfig;
+import com.mimecast.robin.main.Config;
 import com.mimecast.robin.main.Foundation;
 import com.mimecast.robin.smtp.connection.ConnectionMock;
 import com.mimecast.robin.smtp.verb.Verb;
@@ -22,6 +24,12 @@ class ServerAuthTest {
     void getAdvert() {
         ServerAuth auth = new ServerAuth();
         assertEquals("AUTH PLAIN LOGIN", auth.getAdvert());
+
+        // Port 25 listener has AUTH disabled.
+        ListenerConfig listener = Config.getServer().getListeners().get(0);
+        assertEquals("", auth.getAdvert(Config.getServer().getServerConfig(listener)));
+        assertFalse(ServerEhlo.getAdverts(Config.getServer().getServerConfig(listener)).contains("AUTH PLAIN LOGIN"));
+        assertTrue(ServerEhlo.getAdverts().contains("AUTH PLAIN LOGIN"));
     }
 
     @Test
@@ -1,19 +1,31 @@
 package com.mimecast.robin.smtp.extension.server;
 
+import com.mimecast.robin.config.server.ServerConfigMock;
+import com.mimecast.robin.main.Factories;
 import com.mimecast.robin.main.Foundation;
+import com.mimecast.robin.mime.EmailParser;
+import com.mimecast.robin.mime.headers.MimeHeader;
 import com.mimecast.robin.smtp.connection.ConnectionMock;
+import com.mimecast.robin.smtp.io.LineTooLongException;
+import com.mimecast.robin.smtp.io.SizeLimitException;
 import com.mimecast.robin.smtp.verb.Verb;
+import com.mimecast.robin.storage.LocalStorageClient;
+import com.mimecast.robin.storage.StorageClient;
+import org.apache.commons.lang3.StringUtils;
 import org.junit.jupiter.api.BeforeAll;
 import org.junit.jupiter.api.Test;
 
 import javax.mail.internet.AddressException;
 import javax.mail.internet.InternetAddress;
 import javax.naming.ConfigurationException;
+import java.io.EOFException;
 import java.io.IOException;
 import java.net.Socket;
+import java.nio.file.Files;
+import java.nio.file.Path;
+import java.nio.file.Paths;
 
-import static org.junit.jupiter.api.Assertions.assertEquals;
-import static org.junit.jupiter.api.Assertions.assertTrue;
+import static org.junit.jupiter.api.Assertions.*;
 
 class ServerDataTest {
 
@@ -50,6 +62,25 @@ class ServerDataTest {
         assertEquals(stringBuilder.toString().length() - (5 + 4), data.getBytesReceived());
     }
 
+    @Test
+    void processAsciiStuffed() throws IOException, AddressException {
+        StringBuilder stringBuilder = new StringBuilder();
+        stringBuilder.append("Subject: Lost in space\r\n");
+        stringBuilder.append("\r\n");
+        stringBuilder.append("..Rescue me!\r\n");
+        stringBuilder.append(".\r\n");
+
+        ConnectionMock connection = new ConnectionMock(stringBuilder);
+        connection.setSocket(new Socket());
+        connection.getSession().addRcpt(new InternetAddress("john@example.com"));
+
+        ServerData data = new ServerData();
+        assertTrue(data.process(connection, new Verb("DATA")));
+
+        // Counted after dot unstuffing without the terminator.
+        assertEquals(stringBuilder.toString().length() - (1 + 5), data.getBytesReceived());
+    }
+
     @Test
     void processAsciiLF() throws IOException, AddressException {
         StringBuilder stringBuilder = new StringBuilder();
@@ -130,4 +161,229 @@ class ServerDataTest {
         assertTrue(connection.getLine(1).startsWith("250 2.0.0 Chunk OK"), "startsWith(\"250 2.0.0 Chunk OK\")");
         assertEquals(stringBuilder.toString().length() - 2, data.getBytesReceived());
     }
+
+    @Test
+    void processBinaryChunks() throws IOException {
+        StringBuilder stringBuilder = new StringBuilder();
+        stringBuilder.append("Subject: Chunks\r\n");
+        stringBuilder.append("\r\n");
+        stringBuilder.append("Rescue me!\r\n");
+
+        ConnectionMock connection = new ConnectionMock(stringBuilder);
+        connection.setSocket(new Socket());
+
+        ServerData first = new ServerData();
+        assertTrue(first.process(connection, new Verb("BDAT 19")));
+        assertEquals(19, first.getBytesReceived());
+
+        assertNotNull(connection.getTransactionStorage());
+        String token = connection.getTransactionStorage().getStorageClient().getToken();
+
+        ServerData last = new ServerData();
+        assertTrue(last.process(connection, new Verb("BDAT 12 LAST")));
+        assertEquals(12, last.getBytesReceived());
+        assertNull(connection.getTransactionStorage());
+
+        connection.parseLines();
+        assertTrue(connection.getLine(1).startsWith("250 2.0.0 Chunk OK"), "startsWith(\"250 2.0.0 Chunk OK\")");
+        assertEquals(connection.getLine(1), connection.getLine(2));
+        assertEquals(stringBuilder.toString(), new String(Files.readAllBytes(Paths.get(token))));
+    }
+
+    @Test
+    void filenameBinaryChunks() throws IOException {
+        String first = "Subject: Chunks\r\nX-Robin-";
+        String last = "Filename: robin-chunks.eml\r\n\r\nRescue me!\r\n";
+
+        ConnectionMock connection = new ConnectionMock(new StringBuilder(first + last));
+        connection.setSocket(new Socket());
+
+        // Header split across chunks.
+        assertTrue(new ServerData().process(connection, new Verb("BDAT " + first.length())));
+        StorageClient storageClient = connection.getTransactionStorage().getStorageClient();
+        assertTrue(new ServerData().process(connection, new Verb("BDAT " + last.length() + " LAST")));
+
+        assertTrue(storageClient.getToken().endsWith("robin-chunks.eml"));
+        assertEquals(first + last, new String(Files.readAllBytes(Paths.get(storageClient.getToken()))));
+        Files.delete(Paths.get(storageClient.getToken()));
+    }
+
+    @Test
+    void compressedBinaryChunks() throws IOException {
+        String first = "Subject: Compressed\r\n\r\n";
+        String last = StringUtils.repeat("Rescue me!\r\n", 100);
+
+        withConfig("{\"compression\": \"gzip\", \"compressionLevel\": 9}", () -> {
+            ConnectionMock connection = new ConnectionMock(new StringBuilder(first + last));
+            connection.setSocket(new Socket());
+
+            assertTrue(new ServerData().process(connection, new Verb("BDAT " + first.length())));
+            StorageClient storageClient = connection.getTransactionStorage().getStorageClient();
+
+            ServerData data = new ServerData();
+            assertTrue(data.process(connection, new Verb("BDAT " + last.length() + " LAST")));
+            assertEquals(last.length(), data.getBytesReceived());
+            assertTrue(data.getBytesStored() < first.length() + last.length());
+
+            // Stored compressed and read back plain.
+            Path path = Paths.get(storageClient.getToken());
+            assertEquals(0x1f, Files.readAllBytes(path)[0] & 0xff);
+            assertEquals("Compressed", new EmailParser(path.toString()).parse(true)
+                    .getHeaders().get("Subject").map(MimeHeader::getValue).orElse(null));
+            Files.delete(path);
+        });
+    }
+
+    @Test
+    void maxSizeAscii() throws IOException, AddressException {
+        StringBuilder stringBuilder = new StringBuilder();
+        stringBuilder.append("Subject: Lost in space\r\n");
+        stringBuilder.append("\r\n");
+        stringBuilder.append("Rescue me!\r\n");
+        stringBuilder.append(".\r\n");
+
+        withMaxSize(20, () -> {
+            ConnectionMock connection = new ConnectionMock(stringBuilder);
+            connection.setSocket(new Socket());
+            connection.getSession().addRcpt(new InternetAddress("john@example.com"));
+
+            assertThrows(SizeLimitException.class, () -> new ServerData().process(connection, new Verb("DATA")));
+
+            connection.parseLines();
+            assertEquals("354 Ready and willing\r\n", connection.getLine(1));
+            assertEquals("552 5.3.4 Message size exceeds fixed maximum message size\r\n", connection.getLine(2));
+        });
+    }
+
+    @Test
+    void maxSizeBinary() throws IOException {
+        StringBuilder stringBuilder = new StringBuilder();
+        stringBuilder.append("Subject: Chunks\r\n");
+        stringBuilder.append("\r\n");
+        stringBuilder.append("Rescue me!\r\n");
+
+        withMaxSize(20, () -> {
+            ConnectionMock connection = new ConnectionMock(stringBuilder);
+            connection.setSocket(new Socket());
+
+            assertTrue(new ServerData().process(connection, new Verb("BDAT 19")));
+            String token = connection.getTransactionStorage().getStorageClient().getToken();
+
+            // Rejected before the chunk is read and the partial message discarded.
+            assertThrows(SizeLimitException.class, () -> new ServerData().process(connection, new Verb("BDAT 12 LAST")));
+            assertNull(connection.getTransactionStorage());
+            assertFalse(Files.exists(Paths.get(token)));
+
+            connection.parseLines();
+            assertEquals("552 5.3.4 Message size exceeds fixed maximum message size\r\n", connection.getLine(2));
+        });
+    }
+
+    @Test
+    void truncatedAscii() throws IOException, AddressException {
+        StringBuilder stringBuilder = new StringBuilder();
+        stringBuilder.append("Subject: Lost in space\r\n");
+        stringBuilder.append("\r\n");
+        stringBuilder.append("Rescue me!\r\n");
+
+        ConnectionMock connection = new ConnectionMock(stringBuilder);
+        connection.setSocket(new Socket());
+        connection.getSession().addRcpt(new InternetAddress("john@example.com"));
+
+        // Partial message is discarded and not accepted.
+        assertThrows(EOFException.class, () -> new ServerData().process(connection, new Verb("DATA")));
+
+        connection.parseLines();
+        assertEquals("354 Ready and willing\r\n", connection.getLine(1));
+        assertNull(connection.getLine(2));
+    }
+
+    @Test
+    void dataLineTooLong() throws IOException, AddressException {
+        StringBuilder stringBuilder = new StringBuilder();
+        stringBuilder.append("Subject: Lost in space\r\n");
+        stringBuilder.append("\r\n");
+        stringBuilder.append(StringUtils.repeat('a', 1200)).append("\r\n");
+        stringBuilder.append(".\r\n");
+
+        ConnectionMock connection = new ConnectionMock(stringBuilder);
+        connection.setSocket(new Socket());
+        connection.getSession().addRcpt(new InternetAddress("john@example.com"));
+
+        assertThrows(LineTooLongException.class, () -> new ServerData().process(connection, new Verb("DATA")));
+
+        connection.parseLines();
+        assertEquals("354 Ready and willing\r\n", connection.getLine(1));
+        assertEquals("500 5.5.2 Line too long\r\n", connection.getLine(2));
+    }
+
+    @Test
+    void storageFailureAscii() throws IOException, AddressException {
+        StringBuilder stringBuilder = new StringBuilder();
+        stringBuilder.append("Subject: Lost in space\r\n");
+        stringBuilder.append("\r\n");
+        stringBuilder.append("Rescue me!\r\n");
+        stringBuilder.append(".\r\n");
+
+        withFailingSync(() -> {
+            ConnectionMock connection = new ConnectionMock(stringBuilder);
+            connection.setSocket(new Socket());
+            connection.getSession().addRcpt(new InternetAddress("john@example.com"));
+
+            assertTrue(new ServerData().process(connection, new Verb("DATA")));
+
+            connection.parseLines();
+            assertEquals("354 Ready and willing\r\n", connection.getLine(1));
+            assertEquals("451 4.3.0 Message not stored, try again later\r\n", connection.getLine(2));
+        });
+    }
+
+    @Test
+    void storageFailureBinary() throws IOException {
+        StringBuilder stringBuilder = new StringBuilder();
+        stringBuilder.append("Subject: Chunks\r\n");
+        stringBuilder.append("\r\n");
+        stringBuilder.append("Rescue me!\r\n");
+
+        withFailingSync(() -> {
+            ConnectionMock connection = new ConnectionMock(stringBuilder);
+            connection.setSocket(new Socket());
+
+            assertTrue(new ServerData().process(connection, new Verb("BDAT 31 LAST")));
+
+            connection.parseLines();
+            assertEquals("451 4.3.0 Message not stored, try again later\r\n", connection.getLine(1));
+        });
+    }
+
+    private void withFailingSync(Block block) throws IOException {
+        Factories.setStorageClient(() -> new LocalStorageClient("eml") {
+            @Override
+            public void sync() throws IOException {
+                throw new IOException("Disk full");
+            }
+        });
+        try {
+            withConfig("{\"durability\": \"fsync\"}", block);
+        } finally {
+            Factories.setStorageClient(null);
+        }
+    }
+
+    private void withMaxSize(long maxSize, Block block) throws IOException {
+        withConfig("{\"maxSize\": " + maxSize + "}", block);
+    }
+
+    private void withConfig(String json, Block block) throws IOException {
+        try (ServerConfigMock ignored = ServerConfigMock.load(json)) {
+            block.run();
+        } catch (AddressException e) {
+            throw new IOException(e);
+        }
+    }
+
+    @FunctionalInterface
+    private interface Block {
+        void run() throws IOException, AddressException;
+    }
 }
@@ -1,5 +1,6 @@
 package com.mimecast.robin.smtp.extension.server;
 
+import com.mimecast.robin.config.server.ServerConfigMock;
 import com.mimecast.robin.main.Foundation;
 import com.mimecast.robin.smtp.connection.ConnectionMock;
 import com.mimecast.robin.smtp.verb.Verb;
@@ -10,8 +11,7 @@ import javax.naming.ConfigurationException;
 import java.io.IOException;
 import java.util.Arrays;
 
-import static org.junit.jupiter.api.Assertions.assertEquals;
-import static org.junit.jupiter.api.Assertions.assertTrue;
+import static org.junit.jupiter.api.Assertions.*;
 
 class ServerMailTest {
 
@@ -41,4 +41,32 @@ class ServerMailTest {
         assertEquals("HDRS", mail.getRet());
         assertEquals("QQ314159", mail.getEnvId());
     }
+
+    @Test
+    void maxSize() throws IOException {
+        try (ServerConfigMock ignored = ServerConfigMock.load("{\"maxSize\": 100}")) {
+            assertEquals("SIZE 100", new ServerMail().getAdvert());
+            assertEquals("", new ServerRcpt().getAdvert());
+
+            ConnectionMock connection = new ConnectionMock(new StringBuilder());
+            assertTrue(new ServerMail().process(connection, new Verb("MAIL FROM: <tony@example.com> SIZE=101")));
+            assertNull(connection.getSession().getMail());
+
+            assertTrue(new ServerMail().process(connection, new Verb("MAIL FROM: <tony@example.com> SIZE=100")));
+            assertEquals("tony@example.com", connection.getSession().getMail().getAddress());
+
+            // Trailing SIZE with no value counts as undeclared.
+            assertTrue(new ServerMail().process(connection, new Verb("MAIL FROM: <tony@example.com> SIZE=")));
+
+            connection.parseLines();
+            assertEquals("552 5.3.4 Message size exceeds fixed maximum message size\r\n", connection.getLine(1));
+            assertEquals("250 2.1.0 Sender OK\r\n", connection.getLine(2));
+            assertEquals("250 2.1.0 Sender OK\r\n", connection.getLine(3));
+        }
+    }
+
+    @Test
+    void noSize() {
+        assertEquals("", new ServerMail().getAdvert());
+    }
 }
@@ -0,0 +1,59 @@
+package com.mimecast.robin.smtp.io;
+
+import org.junit.jupiter.api.AfterEach;
+import org.junit.jupiter.api.Test;
+
+import java.io.InterruptedIOException;
+import java.util.concurrent.CountDownLatch;
+import java.util.concurrent.TimeUnit;
+
+import static org.junit.jupiter.api.Assertions.*;
+
+class DataBudgetTest {
+
+    @AfterEach
+    void after() {
+        DataBudget.setLimit(0);
+    }
+
+    @Test
+    void disabled() throws InterruptedIOException {
+        assertEquals(0, DataBudget.acquire(1024));
+        assertEquals(0, DataBudget.getUsed());
+    }
+
+    @Test
+    void oversize() throws InterruptedIOException {
+        DataBudget.setLimit(100);
+
+        // Let through when nothing else is in flight.
+        long budget = DataBudget.acquire(1024);
+        assertEquals(1024, DataBudget.getUsed());
+        DataBudget.release(budget);
+        assertEquals(0, DataBudget.getUsed());
+    }
+
+    @Test
+    void backpressure() throws InterruptedException, InterruptedIOException {
+        DataBudget.setLimit(100);
+        long budget = DataBudget.acquire(60);
+
+        CountDownLatch acquired = new CountDownLatch(1);
+        Thread reader = new Thread(() -> {
+            try {
+                DataBudget.release(DataBudget.acquire(60));
+                acquired.countDown();
+            } catch (InterruptedIOException e) {
+                Thread.currentThread().interrupt();
+            }
+        });
+        reader.start();
+
+        // Held back until the first share is given back.
+        assertFalse(acquired.await(200, TimeUnit.MILLISECONDS));
+        DataBudget.release(budget);
+        assertTrue(acquired.await(5, TimeUnit.SECONDS));
+        reader.join();
+        assertEquals(0, DataBudget.getUsed());
+    }
+}
@@ -0,0 +1,88 @@
+package com.mimecast.robin.smtp.io;
+
+import org.junit.jupiter.api.Test;
+
+import java.io.ByteArrayOutputStream;
+import java.io.IOException;
+
+import static org.junit.jupiter.api.Assertions.*;
+
+class DotUnstuffingOutputStreamTest {
+
+    @Test
+    void unstuff() throws IOException {
+        ByteArrayOutputStream byteArrayOutputStream = new ByteArrayOutputStream();
+        DotUnstuffingOutputStream decoder = new DotUnstuffingOutputStream(byteArrayOutputStream);
+
+        byte[] bytes = "Subject: Dots\r\n\r\n..hidden\r\n.. \r\n.\r\nQUIT\r\n".getBytes();
+        int consumed = decoder.decode(bytes, 0, bytes.length);
+
+        assertTrue(decoder.isTerminated());
+        assertEquals("QUIT\r\n", new String(bytes, consumed, bytes.length - consumed));
+        assertEquals("Subject: Dots\r\n\r\n.hidden\r\n. ", byteArrayOutputStream.toString());
+    }
+
+    @Test
+    void acrossWrites() throws IOException {
+        ByteArrayOutputStream byteArrayOutputStream = new ByteArrayOutputStream();
+        DotUnstuffingOutputStream decoder = new DotUnstuffingOutputStream(byteArrayOutputStream, 16);
+
+        byte[] bytes = "Line one is long enough to pass the buffer\r\n..two\r\n.\r\n".getBytes();
+        for (byte b : bytes) {
+            assertFalse(decoder.isTerminated());
+            decoder.write(b);
+        }
+
+        assertTrue(decoder.isTerminated());
+        assertEquals("Line one is long enough to pass the buffer\r\n.two", byteArrayOutputStream.toString());
+    }
+
+    @Test
+    void maxLineLength() throws IOException {
+        ByteArrayOutputStream byteArrayOutputStream = new ByteArrayOutputStream();
+        DotUnstuffingOutputStream decoder = new DotUnstuffingOutputStream(byteArrayOutputStream, 16, 10);
+
+        byte[] bytes = "short\r\n0123456789\r\n01234".getBytes();
+        assertEquals(bytes.length, decoder.decode(bytes, 0, bytes.length));
+
+        // Limit applies across writes.
+        byte[] more = "567890\r\n".getBytes();
+        assertThrows(LineTooLongException.class, () -> decoder.decode(more, 0, more.length));
+    }
+
+    @Test
+    void mixedEol() throws IOException {
+        ByteArrayOutputStream byteArrayOutputStream = new ByteArrayOutputStream();
+        DotUnstuffingOutputStream decoder = new DotUnstuffingOutputStream(byteArrayOutputStream);
+
+        byte[] bytes = "one\r\n.\ntwo\n.\r\nthree\r.\r\r".getBytes();
+        int consumed = decoder.decode(bytes, 0, bytes.length);
+
+        assertTrue(decoder.isTerminated());
+        assertEquals(bytes.length - 1, consumed);
+        assertEquals("one\r\n.\ntwo\n.\r\nthree", byteArrayOutputStream.toString());
+    }
+
+    @Test
+    void empty() throws IOException {
+        ByteArrayOutputStream byteArrayOutputStream = new ByteArrayOutputStream();
+        DotUnstuffingOutputStream decoder = new DotUnstuffingOutputStream(byteArrayOutputStream);
+
+        byte[] bytes = ".\r\n".getBytes();
+        assertEquals(3, decoder.decode(bytes, 0, bytes.length));
+        assertTrue(decoder.isTerminated());
+        assertEquals(0, byteArrayOutputStream.size());
+    }
+
+    @Test
+    void unterminated() throws IOException {
+        ByteArrayOutputStream byteArrayOutputStream = new ByteArrayOutputStream();
+        DotUnstuffingOutputStream decoder = new DotUnstuffingOutputStream(byteArrayOutputStream);
+
+        decoder.write("one\r\n.".getBytes());
+        decoder.finish();
+
+        assertFalse(decoder.isTerminated());
+        assertEquals("one\r\n.", byteArrayOutputStream.toString());
+    }
+}
@@ -0,0 +1,27 @@
+package com.mimecast.robin.smtp.io;
+
+import org.junit.jupiter.api.Test;
+
+import java.io.ByteArrayOutputStream;
+import java.io.IOException;
+
+import static org.junit.jupiter.api.Assertions.assertEquals;
+import static org.junit.jupiter.api.Assertions.assertThrows;
+
+class LimitedOutputStreamTest {
+
+    @Test
+    void write() throws IOException {
+        ByteArrayOutputStream out = new ByteArrayOutputStream();
+        LimitedOutputStream limited = new LimitedOutputStream(out, 5);
+
+        limited.write("abc".getBytes());
+        limited.write('d');
+        limited.write('e');
+        assertEquals(5, limited.getCount());
+
+        assertThrows(SizeLimitException.class, () -> limited.write('f'));
+        assertThrows(SizeLimitException.class, () -> limited.write("f".getBytes()));
+        assertEquals("abcde", out.toString());
+    }
+}
@@ -5,12 +5,13 @@ import org.junit.jupiter.api.BeforeAll;
 import org.junit.jupiter.api.Test;
 
 import javax.naming.ConfigurationException;
+import java.io.ByteArrayInputStream;
 import java.io.FileInputStream;
 import java.io.IOException;
 import java.util.HashMap;
 import java.util.Map;
 
-import static org.junit.jupiter.api.Assertions.assertEquals;
+import static org.junit.jupiter.api.Assertions.*;
 
 class LineInputStreamTest {
 
@@ -39,4 +40,46 @@ class LineInputStreamTest {
         assertEquals("Content-Transfer-Encoding: 8bit", lines.get(42).trim());
         assertEquals("--MCBoundary11505141140170031--", lines.get(76).trim());
     }
+
+    @Test
+    void nextLine() throws IOException {
+        LineInputStream stream = new LineInputStream(new ByteArrayInputStream("one\r\ntwo\nthree\rfour\r\rfive".getBytes()));
+
+        String[] expected = {"one\r\n", "two\n", "three\r", "four\r", "\r", "five"};
+        for (String line : expected) {
+            int length = stream.nextLine();
+            assertEquals(line, new String(stream.getLineBuffer(), 0, length));
+        }
+
+        assertEquals(-1, stream.nextLine());
+        assertEquals(6, stream.getLineNumber());
+    }
+
+    @Test
+    void maxLineLength() throws IOException {
+        LineInputStream stream = new LineInputStream(new ByteArrayInputStream("abcdefgh\r\nabcd\r\n".getBytes()), 4);
+
+        assertEquals("abcd", new String(stream.readLine()));
+        assertTrue(stream.isLineSplit());
+        assertEquals("efgh\r\n", new String(stream.readLine()));
+        assertFalse(stream.isLineSplit());
+        assertEquals("abcd\r\n", new String(stream.readLine()));
+        assertFalse(stream.isLineSplit());
+        assertNull(stream.readLine());
+    }
+
+    @Test
+    void readAndUnread() throws IOException {
+        LineInputStream stream = new LineInputStream(new ByteArrayInputStream("line\r\nbytes".getBytes()));
+
+        assertEquals("line\r\n", new String(stream.readLine()));
+        assertEquals('b', stream.read());
+        stream.unread("xy".getBytes());
+        assertEquals(6, stream.available());
+
+        byte[] bytes = new byte[10];
+        int read = stream.read(bytes, 0, bytes.length);
+        assertEquals("xyytes", new String(bytes, 0, read));
+        assertEquals(-1, stream.read());
+    }
 }
@@ -56,4 +56,16 @@ class SlowOutputStreamTest {
         assertEquals(100, slowOutputStream.getTotalWait());
         assertEquals(175, byteArrayOutputStream.toString().length());
     }
+
+    @Test
+    void slowBulk() throws IOException {
+        ByteArrayOutputStream byteArrayOutputStream = new ByteArrayOutputStream();
+        SlowOutputStream slowOutputStream = new SlowOutputStream(byteArrayOutputStream, 128, 100);
+
+        byte[] bytes = new byte[300];
+        slowOutputStream.write(bytes);
+
+        assertEquals(200, slowOutputStream.getTotalWait());
+        assertEquals(300, byteArrayOutputStream.size());
+    }
 }
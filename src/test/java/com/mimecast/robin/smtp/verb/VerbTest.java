@@ -37,6 +37,41 @@ class VerbTest {
         assertEquals("QUIT", verb.getVerb());
     }
 
+    @Test
+    void getParam() {
+        assertEquals("12345", new Verb("MAIL FROM:<tony@example.com> SIZE=12345").getParam("size"));
+        assertEquals("", new Verb("MAIL FROM:<tony@example.com> SIZE=").getParam("size"));
+        assertEquals("", new Verb("MAIL FROM:<tony@example.com>").getParam("size"));
+    }
+
+    @Test
+    void split() {
+        String[] commands = {
+                "MAIL FROM:<tony@example.com> SIZE=12345",
+                "RCPT TO : <tony@example.com>",
+                "AUTH PLAIN dGVzdAB0ZXN0ADEyMzQ=",
+                "  EHLO\texample.com  ",
+                ":MAIL",
+                "a::b= =c",
+                "NOOP",
+                "",
+                "::",
+        };
+
+        for (String command : commands) {
+            assertArrayEquals(command.split("(\\s+)?(\\s+|:|=)(\\s+)?"), Verb.split(command), command);
+        }
+    }
+
+    @Test
+    void key() {
+        Verb verb = new Verb("EhLo example.com");
+        assertEquals("ehlo", verb.getKey());
+        assertSame(verb.getKey(), new EhloVerb(verb).getKey());
+        assertSame("quit", Verb.toLowerAscii("quit"));
+        assertEquals("", new Verb("::").getKey());
+    }
+
     @Test
     void ehlo() {
         EhloVerb verb;
@@ -0,0 +1,105 @@
+package com.mimecast.robin.storage;
+
+import org.apache.commons.lang3.StringUtils;
+import org.junit.jupiter.api.Test;
+
+import java.io.ByteArrayOutputStream;
+import java.io.IOException;
+import java.util.LinkedHashMap;
+import java.util.Map;
+
+import static org.junit.jupiter.api.Assertions.*;
+
+class HeaderObservingOutputStreamTest {
+
+    @Test
+    void headers() throws IOException {
+        ByteArrayOutputStream byteArrayOutputStream = new ByteArrayOutputStream();
+        Map<String, String> headers = new LinkedHashMap<>();
+        HeaderObservingOutputStream stream = new HeaderObservingOutputStream(byteArrayOutputStream, (name, value) -> {
+            headers.put(name, value);
+            return true;
+        });
+
+        String content = "Subject: Lost\r\n in space\r\nFrom: <tony@example.com>\nTo: <pepper@example.com>\r\n\r\nNot: a header\r\n";
+        byte[] bytes = content.getBytes();
+
+        // Written in uneven parts to split lines across writes.
+        stream.write(bytes, 0, 7);
+        stream.write(bytes[7]);
+        assertFalse(stream.isDone());
+        stream.write(bytes, 8, bytes.length - 8);
+        assertTrue(stream.isDone());
+
+        assertEquals(content, byteArrayOutputStream.toString());
+        assertEquals(3, headers.size());
+        assertEquals("Lost in space", headers.get("Subject"));
+        assertEquals("<tony@example.com>", headers.get("From"));
+        assertEquals("<pepper@example.com>", headers.get("To"));
+    }
+
+    @Test
+    void lineEnds() throws IOException {
+        ByteArrayOutputStream byteArrayOutputStream = new ByteArrayOutputStream();
+        Map<String, String> headers = new LinkedHashMap<>();
+        HeaderObservingOutputStream stream = new HeaderObservingOutputStream(byteArrayOutputStream, (name, value) -> {
+            headers.put(name, value);
+            return true;
+        });
+
+        String content = "Subject: Lost\r in space\rFrom: <tony@example.com>\nTo: <pepper@example.com>\r\nCc: <happy@example.com>\r\rNot: a header\r";
+
+        // Written byte by byte to split CRLF across writes.
+        for (byte b : content.getBytes()) {
+            stream.write(b);
+        }
+        assertTrue(stream.isDone());
+
+        assertEquals(content, byteArrayOutputStream.toString());
+        assertEquals(4, headers.size());
+        assertEquals("Lost in space", headers.get("Subject"));
+        assertEquals("<tony@example.com>", headers.get("From"));
+        assertEquals("<pepper@example.com>", headers.get("To"));
+        assertEquals("<happy@example.com>", headers.get("Cc"));
+    }
+
+    @Test
+    void stop() throws IOException {
+        Map<String, String> headers = new LinkedHashMap<>();
+        HeaderObservingOutputStream stream = new HeaderObservingOutputStream(new ByteArrayOutputStream(), (name, value) -> {
+            headers.put(name, value);
+            return false;
+        });
+
+        stream.write("From: <tony@example.com>\r\nTo: <pepper@example.com>\r\n".getBytes());
+        assertTrue(stream.isDone());
+        assertEquals(1, headers.size());
+    }
+
+    @Test
+    void noBody() throws IOException {
+        Map<String, String> headers = new LinkedHashMap<>();
+        HeaderObservingOutputStream stream = new HeaderObservingOutputStream(new ByteArrayOutputStream(), (name, value) -> {
+            headers.put(name, value);
+            return true;
+        });
+
+        stream.write("Subject: Headers only".getBytes());
+        assertTrue(headers.isEmpty());
+
+        stream.close();
+        assertEquals("Headers only", headers.get("Subject"));
+    }
+
+    @Test
+    void bounded() throws IOException {
+        ByteArrayOutputStream byteArrayOutputStream = new ByteArrayOutputStream();
+        HeaderObservingOutputStream stream = new HeaderObservingOutputStream(byteArrayOutputStream, (name, value) -> true);
+
+        String content = "X-Long: " + StringUtils.repeat('a', 70000);
+        stream.write(content.getBytes());
+
+        assertTrue(stream.isDone());
+        assertEquals(content.length(), byteArrayOutputStream.size());
+    }
+}
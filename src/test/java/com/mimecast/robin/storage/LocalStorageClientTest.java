@@ -59,7 +59,8 @@ class LocalStorageClientTest {
         String content = "Mime-Version: 1.0\r\n" +
                 "X-Robin-Filename: robin.eml\r\n" +
                 "\r\n";
-        localStorageClient.getStream().write(content.getBytes());
+        HeaderObservingOutputStream stream = new HeaderObservingOutputStream(localStorageClient.getStream(), localStorageClient.getHeaderObserver());
+        stream.write(content.getBytes());
 
         assertTrue(localStorageClient.getToken().endsWith(".dat"));
 
@@ -0,0 +1,171 @@
+package com.mimecast.robin.storage;
+
+import org.apache.commons.io.FileUtils;
+import org.apache.commons.io.IOUtils;
+import org.junit.jupiter.api.AfterEach;
+import org.junit.jupiter.api.BeforeEach;
+import org.junit.jupiter.api.Test;
+
+import java.io.IOException;
+import java.io.InputStream;
+import java.io.OutputStream;
+import java.nio.ByteBuffer;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Files;
+import java.nio.file.Path;
+import java.util.ArrayList;
+import java.util.Collections;
+import java.util.List;
+import java.util.concurrent.ExecutionException;
+import java.util.concurrent.ExecutorService;
+import java.util.concurrent.Executors;
+import java.util.concurrent.Future;
+
+import static org.junit.jupiter.api.Assertions.*;
+
+class SegmentStoreTest {
+
+    private Path dir;
+
+    @BeforeEach
+    void before() throws IOException {
+        dir = Files.createTempDirectory("segments-");
+    }
+
+    @AfterEach
+    void after() throws IOException {
+        FileUtils.deleteDirectory(dir.toFile());
+    }
+
+    @Test
+    void client() throws IOException {
+        try (SegmentStore store = new SegmentStore(dir, 1048576L)) {
+            SegmentStorageClient client = new SegmentStorageClient(store);
+            String content = "Message-ID: <lost@example.com>\r\nSubject: Lost\r\n\r\nIn space\r\n";
+
+            try (OutputStream stream = new HeaderObservingOutputStream(client.getStream(), client.getHeaderObserver())) {
+                stream.write(content.getBytes());
+            }
+            client.save();
+
+            assertTrue(client.getToken().endsWith("#" + client.getUID()));
+            assertEquals(content, read(store, client.getUID()));
+            assertEquals(client.getUID(), store.findByMessageId("<lost@example.com>").getUid());
+        }
+    }
+
+    @Test
+    void discard() throws IOException {
+        try (SegmentStore store = new SegmentStore(dir, 1048576L)) {
+            SegmentStorageClient partial = new SegmentStorageClient(store);
+            partial.getStream().write("Subject: Partial\r\n".getBytes());
+            partial.discard();
+
+            SegmentStorageClient client = new SegmentStorageClient(store);
+            client.getStream().write("Subject: Whole\r\n\r\n".getBytes());
+            client.save();
+
+            assertNull(store.open(partial.getUID()));
+            assertEquals(0L, store.getEntry(client.getUID()).getOffset());
+            assertEquals("Subject: Whole\r\n\r\n", read(store, client.getUID()));
+        }
+    }
+
+    @Test
+    void recipients() throws IOException {
+        try (SegmentStore store = new SegmentStore(dir, 1048576L)) {
+            put(store, "one", "Subject: One\r\n\r\n", System.currentTimeMillis());
+            put(store, "two", "Subject: Two\r\n\r\n", System.currentTimeMillis());
+
+            assertEquals(2, store.findByRecipient("Tony@Example.com").size());
+            assertTrue(store.findByRecipient("pepper@example.com").isEmpty());
+        }
+    }
+
+    @Test
+    void replay() throws IOException {
+        try (SegmentStore store = new SegmentStore(dir, 1048576L)) {
+            put(store, "one", "Subject: One\r\n\r\n", System.currentTimeMillis());
+        }
+
+        try (SegmentStore store = new SegmentStore(dir, 1048576L)) {
+            assertEquals(1, store.size());
+            assertEquals("Subject: One\r\n\r\n", read(store, "one"));
+
+            // Reopened segments are sealed.
+            put(store, "two", "Subject: Two\r\n\r\n", System.currentTimeMillis());
+            assertNotEquals(store.getEntry("one").getSegment(), store.getEntry("two").getSegment());
+        }
+    }
+
+    @Test
+    void concurrentCommits() throws IOException, InterruptedException, ExecutionException {
+        ExecutorService executor = Executors.newFixedThreadPool(8);
+        try (SegmentStore store = new SegmentStore(dir, 1048576L)) {
+            List<Future<?>> futures = new ArrayList<>();
+            for (int i = 0; i < 64; i++) {
+                String uid = "message-" + i;
+                futures.add(executor.submit(() -> {
+                    put(store, uid, "Subject: " + uid + "\r\n\r\n", System.currentTimeMillis());
+                    return null;
+                }));
+            }
+            for (Future<?> future : futures) {
+                future.get();
+            }
+
+            // Every commit returned with its record flushed.
+            assertEquals(64, Files.readAllLines(dir.resolve("index")).size());
+            assertEquals(64, store.size());
+            assertEquals("Subject: message-7\r\n\r\n", read(store, "message-7"));
+        } finally {
+            executor.shutdownNow();
+        }
+    }
+
+    @Test
+    void compact() throws IOException {
+        long old = System.currentTimeMillis() - 7200000L;
+        String body = "Subject: Live\r\n\r\n";
+
+        try (SegmentStore store = new SegmentStore(dir, 100L)) {
+            // First segment sealed with mostly expired bytes.
+            put(store, "expired", new String(new char[90]).replace('\0', 'x'), old);
+            put(store, "live", body, System.currentTimeMillis());
+            int segment = store.getEntry("live").getSegment();
+
+            // Second segment sealed with expired bytes only.
+            put(store, "empty", new String(new char[100]).replace('\0', 'x'), old);
+
+            assertEquals(2, store.compact(3600L));
+            assertEquals(1, store.size());
+            assertNull(store.getEntry("expired"));
+            assertNotEquals(segment, store.getEntry("live").getSegment());
+            assertEquals(body, read(store, "live"));
+
+            // Replaced segments are deleted on the next run.
+            assertTrue(Files.exists(store.segmentPath(segment)));
+            store.compact(3600L);
+            assertFalse(Files.exists(store.segmentPath(segment)));
+        }
+
+        try (SegmentStore store = new SegmentStore(dir, 100L)) {
+            assertEquals(1, store.size());
+            assertEquals(body, read(store, "live"));
+        }
+    }
+
+    private void put(SegmentStore store, String uid, String content, long time) throws IOException {
+        SegmentStore.Segment segment = store.lease();
+        long offset = segment.channel.position();
+        segment.channel.write(ByteBuffer.wrap(content.getBytes()));
+        store.commit(segment, new SegmentStore.Entry(uid, segment.id, offset, content.length(), time, "",
+                Collections.singletonList("tony@example.com")));
+    }
+
+    private String read(SegmentStore store, String uid) throws IOException {
+        try (InputStream stream = store.open(uid)) {
+            return IOUtils.toString(stream, StandardCharsets.UTF_8);
+        }
+    }
+}
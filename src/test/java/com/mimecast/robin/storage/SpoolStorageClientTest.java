@@ -0,0 +1,109 @@
+package com.mimecast.robin.storage;
+
+import com.mimecast.robin.util.PathUtils;
+import org.apache.commons.io.IOUtils;
+import org.junit.jupiter.api.AfterEach;
+import org.junit.jupiter.api.BeforeEach;
+import org.junit.jupiter.api.Test;
+
+import java.io.File;
+import java.io.IOException;
+import java.io.InputStream;
+import java.nio.charset.Charset;
+import java.nio.charset.StandardCharsets;
+
+import static org.junit.jupiter.api.Assertions.*;
+
+class SpoolStorageClientTest {
+
+    private static final String CONTENT = "Subject: Spooled\r\n\r\nKept in memory\r\n";
+
+    @BeforeEach
+    void before() {
+        MemorySpool.setLimit(1048576L);
+    }
+
+    @AfterEach
+    void after() {
+        MemorySpool.flush();
+        MemorySpool.setLimit(0L);
+    }
+
+    @Test
+    void memory() throws IOException {
+        SpoolStorageClient client = new SpoolStorageClient("eml", 1024L);
+        client.getStream().write(CONTENT.getBytes());
+        client.save();
+
+        assertTrue(client.isSpooled());
+        assertSame(client, MemorySpool.get(client.getUID()));
+        assertEquals(MemorySpool.CHUNK, MemorySpool.getUsed());
+        assertEquals(CONTENT, read(client));
+
+        // Durable token spills.
+        String token = client.getToken();
+        assertFalse(client.isSpooled());
+        assertNull(MemorySpool.get(client.getUID()));
+        assertEquals(0L, MemorySpool.getUsed());
+        assertEquals(CONTENT, PathUtils.readFile(token, Charset.defaultCharset()));
+        assertTrue(new File(token).delete());
+    }
+
+    @Test
+    void threshold() throws IOException {
+        SpoolStorageClient client = new SpoolStorageClient("eml", 16L);
+        client.getStream().write(CONTENT.getBytes(), 0, 10);
+        assertTrue(client.isSpooled());
+
+        client.getStream().write(CONTENT.getBytes(), 10, CONTENT.length() - 10);
+        assertFalse(client.isSpooled());
+        assertEquals(0L, MemorySpool.getUsed());
+
+        client.save();
+        assertEquals(CONTENT, PathUtils.readFile(client.getToken(), Charset.defaultCharset()));
+        assertTrue(new File(client.getToken()).delete());
+    }
+
+    @Test
+    void cap() throws IOException {
+        MemorySpool.setLimit(MemorySpool.CHUNK);
+
+        SpoolStorageClient oldest = new SpoolStorageClient("eml", 1024L);
+        oldest.getStream().write(CONTENT.getBytes());
+        oldest.save();
+
+        // Oldest saved message spills to make room.
+        SpoolStorageClient client = new SpoolStorageClient("eml", 1024L);
+        client.getStream().write(CONTENT.getBytes());
+        assertFalse(oldest.isSpooled());
+        assertTrue(client.isSpooled());
+
+        // Nothing left to spill so the next message goes to disk.
+        SpoolStorageClient overflow = new SpoolStorageClient("eml", 1024L);
+        overflow.getStream().write(CONTENT.getBytes());
+        assertFalse(overflow.isSpooled());
+
+        overflow.discard();
+        client.discard();
+        assertEquals(0L, MemorySpool.getUsed());
+        assertEquals(CONTENT, read(oldest));
+        assertTrue(new File(oldest.getToken()).delete());
+    }
+
+    @Test
+    void discard() throws IOException {
+        SpoolStorageClient client = new SpoolStorageClient("eml", 1024L);
+        client.getStream().write(CONTENT.getBytes());
+        client.discard();
+
+        assertFalse(client.isSpooled());
+        assertEquals(0L, MemorySpool.getUsed());
+        assertFalse(new File(client.getToken()).exists());
+    }
+
+    private String read(SpoolStorageClient client) throws IOException {
+        try (InputStream stream = client.open()) {
+            return IOUtils.toString(stream, StandardCharsets.UTF_8);
+        }
+    }
+}
@@ -0,0 +1,145 @@
+package com.mimecast.robin.storage;
+
+import com.mimecast.robin.smtp.connection.Connection;
+import com.mimecast.robin.util.PathUtils;
+import org.junit.jupiter.api.AfterEach;
+import org.junit.jupiter.api.Test;
+
+import java.io.File;
+import java.io.IOException;
+import java.io.OutputStream;
+import java.nio.charset.Charset;
+
+import static org.junit.jupiter.api.Assertions.*;
+
+class WriteBehindStorageClientTest {
+
+    private static final String LINE = "Lorem ipsum dolor sit amet, consectetur adipiscing elit.\r\n";
+
+    private String token;
+
+    @AfterEach
+    void after() {
+        StorageWriter.shutdown(5);
+        StorageWriter.configure(2);
+    }
+
+    @Test
+    void isWriteBehind() {
+        assertTrue(WriteBehindStorageClient.isWriteBehind("enqueue"));
+        assertTrue(WriteBehindStorageClient.isWriteBehind("Write"));
+        assertTrue(WriteBehindStorageClient.isWriteBehind("fsync"));
+        assertFalse(WriteBehindStorageClient.isWriteBehind("sync"));
+        assertFalse(WriteBehindStorageClient.isWriteBehind(null));
+    }
+
+    @Test
+    void write() throws IOException {
+        String content = store(WriteBehindStorageClient.WRITE);
+        assertEquals(content, PathUtils.readFile(token, Charset.defaultCharset()));
+        assertTrue(new File(token).delete());
+    }
+
+    @Test
+    void enqueue() throws IOException {
+        String content = store(WriteBehindStorageClient.ENQUEUE);
+
+        // Queued writes finish on shutdown.
+        assertTrue(StorageWriter.shutdown(5));
+        assertEquals(content, PathUtils.readFile(token, Charset.defaultCharset()));
+        assertTrue(new File(token).delete());
+    }
+
+    @Test
+    void fsync() throws IOException {
+        String content = store(WriteBehindStorageClient.FSYNC);
+        assertEquals(content, PathUtils.readFile(token, Charset.defaultCharset()));
+        assertTrue(new File(token).delete());
+    }
+
+    @Test
+    void afterShutdown() throws IOException {
+        StorageWriter.shutdown(5);
+
+        // Late sessions write inline rather than starting new writers.
+        String content = store(WriteBehindStorageClient.WRITE);
+        assertEquals(content, PathUtils.readFile(token, Charset.defaultCharset()));
+        assertTrue(new File(token).delete());
+    }
+
+    @Test
+    void failure() throws IOException {
+        FailingStorageClient failing = new FailingStorageClient();
+        WriteBehindStorageClient client = new WriteBehindStorageClient(failing, WriteBehindStorageClient.WRITE);
+
+        OutputStream stream = client.getStream();
+        stream.write(new byte[WriteBehindOutputStream.BUFFER]);
+        client.save();
+
+        assertFalse(failing.saved);
+        assertTrue(failing.discarded);
+        assertTrue(client.isFailed());
+
+        // Writer learns of the error on its next hand off.
+        stream.write(1);
+        assertThrows(IOException.class, stream::flush);
+    }
+
+    private String store(String durability) throws IOException {
+        LocalStorageClient local = new LocalStorageClient("eml");
+        WriteBehindStorageClient client = new WriteBehindStorageClient(local, durability);
+        token = client.getToken();
+
+        // Enough to hand off more than one buffer.
+        StringBuilder content = new StringBuilder();
+        try (OutputStream stream = client.getStream()) {
+            while (content.length() < WriteBehindOutputStream.BUFFER * 2) {
+                stream.write(LINE.getBytes());
+                content.append(LINE);
+            }
+        }
+        client.save();
+
+        return content.toString();
+    }
+
+    private static class FailingStorageClient implements StorageClient {
+        boolean saved = false;
+        boolean discarded = false;
+
+        @Override
+        public StorageClient setConnection(Connection connection) {
+            return this;
+        }
+
+        @Override
+        public OutputStream getStream() {
+            return new OutputStream() {
+                @Override
+                public void write(int b) throws IOException {
+                    throw new IOException("Disk full");
+                }
+            };
+        }
+
+        @Override
+        public String getToken() {
+            return "failing";
+        }
+
+        @Override
+        public String getUID() {
+            return "failing";
+        }
+
+        @Override
+        public void save() {
+            saved = true;
+        }
+
+        @Override
+        public void discard() {
+            discarded = true;
+        }
+    }
+}
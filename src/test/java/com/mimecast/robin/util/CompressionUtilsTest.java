@@ -0,0 +1,61 @@
+package com.mimecast.robin.util;
+
+import org.apache.commons.io.IOUtils;
+import org.junit.jupiter.api.Test;
+
+import java.io.ByteArrayInputStream;
+import java.io.ByteArrayOutputStream;
+import java.io.IOException;
+import java.io.InputStream;
+import java.io.OutputStream;
+import java.nio.charset.StandardCharsets;
+
+import static org.junit.jupiter.api.Assertions.*;
+
+class CompressionUtilsTest {
+
+    private static final String CONTENT = "Subject: Lost in space\r\n\r\nRescue me!\r\nRescue me!\r\nRescue me!\r\n";
+
+    @Test
+    void isCompressed() {
+        assertTrue(CompressionUtils.isCompressed("gzip"));
+        assertTrue(CompressionUtils.isCompressed("Deflate"));
+        assertFalse(CompressionUtils.isCompressed("none"));
+        assertFalse(CompressionUtils.isCompressed(null));
+    }
+
+    @Test
+    void gzip() throws IOException {
+        byte[] compressed = compress(CompressionUtils.GZIP, 9);
+        assertEquals(0x1f, compressed[0] & 0xff);
+        assertEquals(0x8b, compressed[1] & 0xff);
+        assertEquals(CONTENT, decompress(compressed));
+    }
+
+    @Test
+    void deflate() throws IOException {
+        byte[] compressed = compress(CompressionUtils.DEFLATE, 1);
+        assertEquals(0x78, compressed[0] & 0xff);
+        assertEquals(CONTENT, decompress(compressed));
+    }
+
+    @Test
+    void plain() throws IOException {
+        assertEquals(CONTENT, decompress(CONTENT.getBytes(StandardCharsets.UTF_8)));
+        assertEquals("", decompress(new byte[0]));
+    }
+
+    private byte[] compress(String type, int level) throws IOException {
+        ByteArrayOutputStream bytes = new ByteArrayOutputStream();
+        try (OutputStream out = CompressionUtils.compress(bytes, type, level)) {
+            out.write(CONTENT.getBytes(StandardCharsets.UTF_8));
+        }
+        return bytes.toByteArray();
+    }
+
+    private String decompress(byte[] bytes) throws IOException {
+        try (InputStream in = CompressionUtils.decompress(new ByteArrayInputStream(bytes))) {
+            return IOUtils.toString(in, StandardCharsets.UTF_8);
+        }
+    }
+}
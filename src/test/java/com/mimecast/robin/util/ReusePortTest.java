@@ -0,0 +1,31 @@
+package com.mimecast.robin.util;
+
+import org.junit.jupiter.api.Test;
+
+import java.io.IOException;
+import java.net.InetAddress;
+import java.net.InetSocketAddress;
+import java.nio.channels.ServerSocketChannel;
+
+import static org.junit.jupiter.api.Assertions.*;
+import static org.junit.jupiter.api.Assumptions.assumeTrue;
+
+class ReusePortTest {
+
+    @Test
+    void bindTwice() throws IOException {
+        assumeTrue(ReusePort.isSupported());
+
+        try (ServerSocketChannel first = ServerSocketChannel.open();
+             ServerSocketChannel second = ServerSocketChannel.open()) {
+            assumeTrue(ReusePort.enable(first));
+            assertTrue(ReusePort.enable(second));
+
+            first.bind(new InetSocketAddress(InetAddress.getLoopbackAddress(), 0));
+            int port = first.socket().getLocalPort();
+            second.bind(new InetSocketAddress(InetAddress.getLoopbackAddress(), port));
+
+            assertEquals(port, second.socket().getLocalPort());
+        }
+    }
+}